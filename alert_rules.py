@@ -0,0 +1,230 @@
+# alert_rules.py
+# Motore alert multi-regola: le regole (default hit/trailing/entry + regole utente da JSON) diventano
+# maschere vettoriali valutate in un solo passaggio per snapshot; cooldown tramite TTLDedupStore.
+# I messaggi vengono formattati solo per le righe che verranno davvero accodate.
+# Formato regola (JSON, lista di oggetti — vedi README):
+#   {"name": "whale", "source": "pairs", "when": [["Txns 1h", ">=", 800], ["DEX", "in", ["raydium"]]],
+#    "sort": [["Txns 1h", false]], "max_per_run": 3, "cooldown_min": 30, "format": "hit"}
+# Requisiti: pandas, numpy
+
+import re, json, time, heapq, itertools, threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from radar_pipeline import alert_key, format_hit_alert, format_trailing_alert, format_entry_alert
+
+FORMATTERS: Dict[str, Callable[[Any], str]] = {
+    "hit": format_hit_alert, "trail": format_trailing_alert, "entry": format_entry_alert,
+}
+NUM_OPS = {">=": np.greater_equal, ">": np.greater, "<=": np.less_equal, "<": np.less,
+           "==": np.equal, "!=": np.not_equal}
+STR_OPS = ("==", "!=", "in", "not in", "contains")
+SOURCES = ("pairs", "entry")  # tabella PAIRS filtrata | candidati Entry Finder (già ordinati)
+
+
+# ================= Dedup con scadenza =================
+class TTLDedupStore:
+    """
+    Chiavi con scadenza (cooldown). Le scadute vengono rimosse in modo lazy (heap per scadenza);
+    oltre max_keys si eliminano per prime quelle più vicine alla scadenza. Thread-safe.
+    """
+
+    def __init__(self, max_keys: int = 20_000):
+        self.max_keys = max(1, int(max_keys))
+        self._exp: Dict[Hashable, float] = {}
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _purge(self, now: float) -> None:
+        h = self._heap
+        while h and (h[0][0] <= now or len(self._exp) > self.max_keys):
+            exp, _, k = heapq.heappop(h)
+            if self._exp.get(k) == exp: del self._exp[k]
+        if len(h) > 2 * len(self._exp) + 1024:  # troppe voci stale (chiavi re-impostate): ricostruisci
+            self._heap = [(e, next(self._seq), k) for k, e in self._exp.items()]
+            heapq.heapify(self._heap)
+
+    def add_if_absent(self, key: Hashable, ttl: float, now: Optional[float] = None) -> bool:
+        """True (e chiave registrata per ttl secondi) se key non è attiva; False se ancora in cooldown."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._purge(now)
+            if self._exp.get(key, 0.0) > now: return False
+            if ttl > 0:
+                exp = now + float(ttl)
+                self._exp[key] = exp
+                heapq.heappush(self._heap, (exp, next(self._seq), key))
+                if len(self._exp) > self.max_keys: self._purge(now)
+            return True
+
+    def active(self, key: Hashable, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._exp.get(key, 0.0) > now
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._exp.pop(key, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge(time.time())
+            return len(self._exp)
+
+
+# ================= Regole =================
+class _Columns:
+    """Colonne di un frame convertite una sola volta e condivise da tutte le regole della stessa sorgente."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.n = len(df)
+        self._num: Dict[str, np.ndarray] = {}
+        self._str: Dict[str, np.ndarray] = {}
+
+    def num(self, col: str) -> Optional[np.ndarray]:
+        if col not in self.df.columns: return None
+        a = self._num.get(col)
+        if a is None:
+            a = self._num[col] = pd.to_numeric(self.df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        return a
+
+    def text(self, col: str) -> Optional[np.ndarray]:
+        if col not in self.df.columns: return None
+        a = self._str.get(col)
+        if a is None:
+            a = self._str[col] = self.df[col].fillna("").astype(str).str.lower().to_numpy()
+        return a
+
+
+@dataclass
+class AlertRule:
+    name: str
+    when: List[Tuple[str, str, Any]] = field(default_factory=list)
+    source: str = "pairs"
+    sort: List[Tuple[str, bool]] = field(default_factory=list)  # (colonna, ascending)
+    max_per_run: Optional[int] = None                            # None = tutte le righe
+    cooldown_sec: float = 1800.0
+    format: str = "hit"                                          # hit | trail | entry | template
+    template: str = ""
+    enabled: bool = True
+
+    def __post_init__(self):
+        if self.source not in SOURCES: raise ValueError(f"regola {self.name}: source '{self.source}' non valida")
+        if self.format not in FORMATTERS and self.format != "template":
+            raise ValueError(f"regola {self.name}: format '{self.format}' non valido")
+        if self.format == "template" and not self.template:
+            raise ValueError(f"regola {self.name}: format 'template' senza template")
+        for col, op, val in self.when:
+            if op not in NUM_OPS and op not in STR_OPS:
+                raise ValueError(f"regola {self.name}: operatore '{op}' non valido")
+
+    def mask(self, cols: _Columns) -> np.ndarray:
+        m = np.ones(cols.n, dtype=bool)
+        for col, op, val in self.when:
+            if op in NUM_OPS and isinstance(val, (int, float)) and not isinstance(val, bool):
+                a = cols.num(col)
+                if a is None: return np.zeros(cols.n, dtype=bool)
+                with np.errstate(invalid="ignore"):
+                    m &= NUM_OPS[op](a, float(val)) & ~np.isnan(a)  # NaN non soddisfa mai (anche con !=)
+            else:
+                a = cols.text(col)
+                if a is None: return np.zeros(cols.n, dtype=bool)
+                vals = [str(v).lower() for v in (val if isinstance(val, (list, tuple, set)) else [val])]
+                if op == "contains":
+                    pat = "|".join(map(re.escape, vals))
+                    m &= pd.Series(a, copy=False).str.contains(pat, regex=True).to_numpy(dtype=bool)
+                elif op in ("in", "=="):
+                    m &= np.isin(a, vals)
+                elif op in ("not in", "!="):
+                    m &= ~np.isin(a, vals)
+                else:
+                    raise ValueError(f"regola {self.name}: '{op}' richiede un valore numerico")
+        return m
+
+    def order(self, cols: _Columns, idx: np.ndarray) -> np.ndarray:
+        """Ordina gli indici candidati (NaN in coda, ordinamento stabile come sort_values multi-colonna)."""
+        keys = []
+        for col, asc in reversed(self.sort):
+            a = cols.num(col)
+            if a is None: continue
+            v = a[idx]
+            keys.append(v if asc else -v)
+        return idx[np.lexsort(keys)] if keys else idx
+
+    def render(self, row) -> str:
+        if self.format == "template":
+            return self.template.format_map(_RowFormat(row))
+        return FORMATTERS[self.format](row)
+
+
+class _RowFormat(dict):
+    def __init__(self, row):
+        super().__init__(row.to_dict() if hasattr(row, "to_dict") else row)
+
+    def __missing__(self, k):
+        return ""
+
+
+def rule_from_spec(spec: Dict[str, Any]) -> AlertRule:
+    spec = dict(spec)
+    if "cooldown_min" in spec: spec["cooldown_sec"] = float(spec.pop("cooldown_min")) * 60
+    spec["when"] = [tuple(c) for c in spec.get("when", [])]
+    spec["sort"] = [(c[0], bool(c[1])) if isinstance(c, (list, tuple)) else (c, False) for c in spec.get("sort", [])]
+    return AlertRule(**spec)
+
+def load_rules(path: str) -> List[AlertRule]:
+    with open(path, "r", encoding="utf-8") as fh:
+        data = json.load(fh)
+    return [rule_from_spec(s) for s in (data.get("rules", []) if isinstance(data, dict) else data)]
+
+def default_rules(*, tx_min: int, liq_min: int, meme_min: int, dd_thr: float, max_per_run: int,
+                  cooldown_sec: float, hit: bool = True, trail: bool = True, entry: bool = True) -> List[AlertRule]:
+    """Le tre regole storiche (hit radar, trailing-stop, Entry Finder) con le soglie di sidebar/daemon."""
+    hit_when = [("Txns 1h", ">=", int(tx_min)), ("Liquidity (USD)", ">=", int(liq_min))]
+    if int(meme_min) > 0: hit_when.append(("Meme Score", ">=", int(meme_min)))
+    return [
+        AlertRule("hit", hit_when, sort=[("Meme Score", False), ("Txns 1h", False), ("Liquidity (USD)", False)],
+                  max_per_run=int(max_per_run), cooldown_sec=cooldown_sec, format="hit", enabled=hit),
+        AlertRule("trail", [("Drawdown (%)", "<=", float(dd_thr)), ("ROI (%)", ">=", 0)],
+                  cooldown_sec=cooldown_sec, format="trail", enabled=trail),
+        AlertRule("entry", source="entry", max_per_run=int(max_per_run), cooldown_sec=cooldown_sec,
+                  format="entry", enabled=entry),
+    ]
+
+
+# ================= Motore =================
+class RuleEngine:
+    def __init__(self, rules: Sequence[AlertRule]):
+        self.rules = [r for r in rules if r.enabled]
+
+    def evaluate(self, frames: Dict[str, pd.DataFrame]) -> List[Tuple[AlertRule, pd.DataFrame]]:
+        """Candidati per regola, già ordinati e limitati a 2×max_per_run (margine per i cooldown)."""
+        cols = {s: _Columns(df) for s, df in frames.items() if df is not None and not df.empty}
+        out = []
+        for r in self.rules:
+            c = cols.get(r.source)
+            if c is None: continue
+            idx = np.flatnonzero(r.mask(c))
+            if not len(idx): continue
+            idx = r.order(c, idx)
+            if r.max_per_run is not None: idx = idx[: r.max_per_run * 2]
+            out.append((r, c.df.iloc[idx]))
+        return out
+
+    def dispatch(self, frames: Dict[str, pd.DataFrame], outbox, token: str, chat_id: str) -> Dict[str, int]:
+        """Valuta tutte le regole e accoda sull'outbox le righe fuori cooldown. Ritorna gli accodati per regola."""
+        sent: Dict[str, int] = {}
+        for r, cand in self.evaluate(frames):
+            n = 0
+            for _, row in cand.iterrows():
+                if r.max_per_run is not None and n >= r.max_per_run: break
+                key = (r.name, alert_key(row))
+                if outbox.is_cooling(chat_id, key): continue
+                if outbox.enqueue(token, chat_id, key, r.render(row), r.cooldown_sec): n += 1
+            sent[r.name] = n
+        return sent
@@ -0,0 +1,44 @@
+# arrow_frames.py
+# Frame "Arrow-native" per snapshot provider e tabella PAIRS: niente colonne object.
+#   - stringhe ad alta cardinalità (Pair, address, link, età formattata) → string[pyarrow]
+#   - stringhe a bassa cardinalità (DEX, simboli) → category = dizionario (DictionaryArray in Arrow)
+# Streamlit serializza in Arrow ogni frame mostrato a ogni rerun: con colonne già Arrow/dizionario la
+# conversione è quasi zero-copy e la memoria per snapshot scende. La conversione avviene una volta per
+# versione di snapshot (provider) e per voce della cache derivata (tabella PAIRS), non per rerun.
+# Requisiti: pandas (pyarrow opzionale: senza, le stringhe restano object e si applica solo il dizionario)
+
+import importlib.util
+
+import pandas as pd
+
+HAS_ARROW = importlib.util.find_spec("pyarrow") is not None  # usato da pandas per string[pyarrow]
+
+STRING_DTYPE = "string[pyarrow]" if HAS_ARROW else None
+
+SNAPSHOT_DICT_COLS = ("dexId", "baseSymbol", "quoteSymbol")
+TABLE_DICT_COLS = ("DEX", "baseSymbol", "quoteSymbol")
+
+
+def _is_text(s: pd.Series) -> bool:
+    if s.dtype != object: return False
+    v = s.dropna()
+    return v.empty or v.map(type).eq(str).all()
+
+def to_dictionary(s: pd.Series) -> pd.Series:
+    """Colonna testo → category (dizionario). "" sempre tra le categorie, così fillna("") resta valido."""
+    s = s.astype("category")
+    return s.cat.add_categories("") if "" not in s.cat.categories else s
+
+def arrow_frame(df: pd.DataFrame, dict_cols=()) -> pd.DataFrame:
+    """Copia di df con le colonne testo convertite (dizionario per dict_cols, string[pyarrow] per le altre).
+    Colonne object non testuali (dict/list) restano invariate."""
+    if df is None or df.empty: return df
+    conv = {}
+    for col in df.columns:
+        s = df[col]
+        if not _is_text(s): continue
+        if col in dict_cols:
+            conv[col] = to_dictionary(s)
+        elif STRING_DTYPE is not None:
+            conv[col] = s.astype(STRING_DTYPE)
+    return df.assign(**conv) if conv else df
@@ -0,0 +1,248 @@
+# backtest.py
+# Backtest vettoriale dei segnali Entry Finder sullo storico snapshot (snapshot_history.py).
+#   segnali: stessa maschera dell'app (radar_pipeline.entry_mask) su tutte le righe pair × snapshot;
+#            preset fisso o "auto" (preset suggerito dalla heat di mercato di ogni snapshot, come il daemon)
+#   entrata: al prezzo dello snapshot in cui la maschera si accende per la pair
+#   uscita:  trailing stop dal massimo dall'entrata, stop dal prezzo di entrata, take profit, tempo massimo,
+#            fine storico della pair — la prima che scatta
+# Le uscite di tutti i trade si calcolano insieme: finestre [entrata, fine] concatenate, massimo cumulato per
+# segmento con offset per trade (np.maximum.accumulate), prima soglia superata per segmento con searchsorted.
+# Una posizione per pair: round vettoriali sul primo segnale libero di ogni pair; solo il tetto di posizioni
+# aperte (--max-open) scorre i trade in ordine di tempo.
+# Uso:
+#   python backtest.py --history snapshots --preset auto --trail-pct 15 --stop-pct 25 --max-hold-min 1440
+#   python backtest.py --history snapshots --preset Medio --max-open 5 --out trades.csv
+# L'auto-relax dell'app non si applica: si valuta la maschera del preset così com'è.
+# Requisiti: numpy, pandas
+
+import sys, time, argparse, heapq
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+from radar_pipeline import (ENTRY_PRESETS, DEFAULT_WEIGHTS, entry_mask, meme_score_array, suggest_entry_preset,
+                            max_drawdown)
+from snapshot_history import SNAPSHOT_HISTORY_DIR, SnapshotPanel, list_history
+from entry_sweep import panel_columns
+
+BACKTEST_CHUNK_ROWS = 4_000_000  # righe di finestra per blocco di trade (memoria ≈ 40 B/riga)
+EXIT_REASONS = ("trail", "stop", "tp", "time", "end")
+
+
+def snapshot_presets(panel: SnapshotPanel) -> np.ndarray:
+    """Preset suggerito per ogni snapshot (market_tx_heat: Txns 1h medie delle Top 10 per Volume 24h)."""
+    T = len(panel.times)
+    vol = np.nan_to_num(panel.cols["volume24hUsd"], nan=-np.inf)
+    order = np.lexsort((-vol, panel.t_idx))
+    t = panel.t_idx[order]
+    start = np.searchsorted(t, np.arange(T))
+    rank = np.arange(len(t)) - start[t]
+    top = order[rank < 10]
+    tx = panel.cols["txns1h"][top]
+    ok = ~np.isnan(tx)
+    tt = panel.t_idx[top][ok]
+    with np.errstate(invalid="ignore"):
+        heat = np.bincount(tt, tx[ok], T) / np.bincount(tt, minlength=T)
+    return np.array([suggest_entry_preset(0 if np.isnan(h) else int(h)) for h in heat], dtype=object)
+
+def entry_signals(panel: SnapshotPanel, cols: Dict[str, np.ndarray], ms: np.ndarray,
+                  preset: str = "auto") -> np.ndarray:
+    """Righe in cui la maschera Entry Finder si accende per la pair (non attiva nello snapshot precedente)."""
+    c = dict(cols, ms=ms)
+    if preset == "auto":
+        row_preset = snapshot_presets(panel)[panel.t_idx]
+        m = np.zeros(len(panel), dtype=bool)
+        for name in ENTRY_PRESETS:
+            sel = row_preset == name
+            if sel.any(): m |= sel & entry_mask(c, ENTRY_PRESETS[name])
+    else:
+        m = entry_mask(c, ENTRY_PRESETS[preset])
+    prev = cols["prev"]
+    onset = m & ~np.where(prev >= 0, m[np.maximum(prev, 0)], False)
+    return np.flatnonzero(onset)
+
+def _exits_chunk(logp: np.ndarray, entry: np.ndarray, end: np.ndarray, trail: float, stop: float,
+                 tp: float) -> tuple:
+    """Uscite per un blocco di trade: (riga di uscita, motivo, picco log dal prezzo di entrata)."""
+    n = end - entry + 1
+    seg_start = np.concatenate(([0], np.cumsum(n)[:-1]))
+    seg = np.repeat(np.arange(len(entry)), n)
+    rows = np.arange(n.sum()) - seg_start[seg] + entry[seg]
+    rel = logp[rows] - logp[entry][seg]  # log(prezzo / prezzo di entrata)
+    # massimo cumulato per trade: offset crescente per segmento, così il massimo non passa al trade successivo
+    span_ = float(np.nanmax(np.abs(rel))) * 2 + 1.0 if len(rel) else 1.0
+    off = seg * span_
+    runmax = np.maximum.accumulate(np.nan_to_num(rel, nan=-span_ / 2) + off) - off
+    hits = {
+        "trail": rel <= runmax + np.log1p(-trail) if trail > 0 else None,
+        "stop": rel <= np.log1p(-stop) if stop > 0 else None,
+        "tp": rel >= np.log1p(tp) if tp > 0 else None,
+    }
+    first = np.full(len(entry), np.iinfo(np.int64).max)
+    reason = np.full(len(entry), EXIT_REASONS.index("end"), dtype=np.int8)
+    for k, h in hits.items():
+        if h is None: continue
+        pos = np.flatnonzero(h & (rows > entry[seg]))
+        if not len(pos): continue
+        j = np.searchsorted(pos, seg_start)
+        cand = np.where(j < len(pos), pos[np.minimum(j, len(pos) - 1)], np.iinfo(np.int64).max)
+        cand = np.where(cand < seg_start + n, cand, np.iinfo(np.int64).max)
+        better = cand < first
+        first = np.where(better, cand, first); reason = np.where(better, EXIT_REASONS.index(k), reason)
+    hit = first < np.iinfo(np.int64).max
+    exit_row = np.where(hit, rows[np.minimum(first, len(rows) - 1)], end)
+    seg_end = seg_start + n - 1
+    peak = runmax[np.where(hit, np.minimum(first, len(rows) - 1), seg_end)]
+    return exit_row, reason, peak
+
+def compute_exits(panel: SnapshotPanel, entries: np.ndarray, *, trail_pct: float = 15.0, stop_pct: float = 25.0,
+                  tp_pct: float = 0.0, max_hold_sec: float = 86400.0,
+                  chunk_rows: int = BACKTEST_CHUNK_ROWS) -> pd.DataFrame:
+    """Uscita di ogni entrata, indipendente dalle altre (la selezione avviene dopo)."""
+    px = panel.cols["priceUsd"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logp = np.where(px > 0, np.log(px), np.nan)
+    ts = panel.ts
+    # ultima riga della pair (il panel è ordinato per pair, tempo) e limite di tempo
+    pair_last = np.searchsorted(panel.p_idx, panel.p_idx[entries], side="right") - 1
+    keys = panel._row_keys()
+    t_lim = np.searchsorted(panel.times, ts[entries] + max_hold_sec, side="right") - 1
+    time_last = np.searchsorted(keys, panel.p_idx[entries].astype(np.int64) * (len(panel.times) + 1) + t_lim,
+                                side="right") - 1
+    end = np.maximum(entries, np.minimum(pair_last, time_last))
+    by_time = time_last < pair_last
+
+    exit_row = np.empty(len(entries), dtype=np.int64)
+    reason = np.empty(len(entries), dtype=np.int8)
+    peak = np.empty(len(entries))
+    csum = np.cumsum(end - entries + 1)
+    lo = 0
+    while lo < len(entries):
+        base = csum[lo - 1] if lo else 0
+        hi = max(lo + 1, int(np.searchsorted(csum, base + chunk_rows, side="right")))
+        e, r, pk = _exits_chunk(logp, entries[lo:hi], end[lo:hi], trail_pct / 100.0, stop_pct / 100.0, tp_pct / 100.0)
+        exit_row[lo:hi], reason[lo:hi], peak[lo:hi] = e, r, pk
+        lo = hi
+    reason = np.where((reason == EXIT_REASONS.index("end")) & by_time, EXIT_REASONS.index("time"), reason)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = (px[exit_row] / px[entries] - 1.0) * 100.0
+    return pd.DataFrame({
+        "row": entries, "exit_row": exit_row, "pair": panel.pairs[panel.p_idx[entries]],
+        "symbol": panel.symbols[panel.p_idx[entries]],
+        "entry_ts": ts[entries], "exit_ts": ts[exit_row], "entry_px": px[entries], "exit_px": px[exit_row],
+        "ret_pct": ret, "peak_pct": np.expm1(peak) * 100.0,
+        "reason": np.asarray(EXIT_REASONS, dtype=object)[reason],
+    })
+
+def pair_chains(panel: SnapshotPanel, entries: np.ndarray, **exit_kw) -> pd.DataFrame:
+    """Trade con una posizione per pair alla volta. A ogni round si prende il primo segnale libero di ogni pair,
+    se ne calcola l'uscita (tutte le pair insieme) e si scartano i segnali della pair prima di quell'uscita:
+    le uscite si calcolano solo per i trade eseguibili, non per ogni segnale."""
+    entries = np.sort(entries)  # ordine del panel = (pair, tempo)
+    ts, pidx = panel.ts[entries], panel.p_idx[entries]
+    active = np.ones(len(entries), dtype=bool)
+    busy_until = np.full(len(panel.pairs), -np.inf)
+    parts = []
+    while active.any():
+        idx = np.flatnonzero(active)
+        first = idx[np.r_[True, pidx[idx[1:]] != pidx[idx[:-1]]]]
+        tr = compute_exits(panel, entries[first], **exit_kw)
+        parts.append(tr)
+        busy_until[pidx[first]] = tr["exit_ts"].to_numpy()
+        active[first] = False
+        active &= ts >= busy_until[pidx]
+    if not parts: return compute_exits(panel, entries[:0], **exit_kw)
+    return pd.concat(parts, ignore_index=True).sort_values("row", kind="stable").reset_index(drop=True)
+
+def select_trades(cand: pd.DataFrame, priority: np.ndarray, max_open: int = 0) -> pd.DataFrame:
+    """Al massimo max_open posizioni aperte (0 = illimitate); a parità di snapshot vince la priorità più alta
+    (Meme Score). Un segnale scartato per capienza tiene comunque occupata la pair fino alla sua uscita."""
+    if cand.empty or not max_open: return cand
+    order = np.lexsort((-priority, cand["entry_ts"].to_numpy()))
+    entry_ts, exit_ts = cand["entry_ts"].to_numpy(), cand["exit_ts"].to_numpy()
+    open_heap: list = []
+    keep = []
+    for i in order:
+        while open_heap and open_heap[0] <= entry_ts[i]: heapq.heappop(open_heap)
+        if len(open_heap) >= max_open: continue
+        heapq.heappush(open_heap, exit_ts[i])
+        keep.append(i)
+    return cand.iloc[np.sort(np.asarray(keep, dtype=np.int64))].reset_index(drop=True)
+
+def equity_curve(trades: pd.DataFrame, initial: float = 1000.0, alloc_pct: float = 2.0) -> pd.DataFrame:
+    """Equity realizzata: allocazione flat (alloc_pct dell'equity iniziale) per posizione, PnL alla chiusura."""
+    if trades.empty: return pd.DataFrame({"ts": [], "equity": []})
+    t = trades.sort_values("exit_ts")
+    pnl = initial * alloc_pct / 100.0 * np.nan_to_num(t["ret_pct"].to_numpy()) / 100.0
+    return pd.DataFrame({"ts": t["exit_ts"].to_numpy(), "equity": initial + np.cumsum(pnl)})
+
+def summarize(trades: pd.DataFrame, eq: pd.DataFrame, initial: float = 1000.0) -> Dict[str, Any]:
+    r = trades["ret_pct"].dropna().to_numpy() if not trades.empty else np.empty(0)
+    out = {
+        "trades": len(trades), "pairs": int(trades["pair"].nunique()) if len(trades) else 0,
+        "win_rate": float((r > 0).mean()) if len(r) else float("nan"),
+        "ret_mean_pct": float(r.mean()) if len(r) else float("nan"),
+        "ret_median_pct": float(np.median(r)) if len(r) else float("nan"),
+        "hold_median_min": float(((trades["exit_ts"] - trades["entry_ts"]) / 60).median()) if len(trades) else 0.0,
+        "final_equity": float(eq["equity"].iloc[-1]) if len(eq) else initial,
+        "max_drawdown_pct": max_drawdown(np.concatenate(([initial], eq["equity"].to_numpy()))) * 100.0,
+    }
+    if len(trades):
+        out.update({f"exit_{k}": int(v) for k, v in trades["reason"].value_counts().items()})
+    return out
+
+def run_backtest(panel: SnapshotPanel, preset: str = "auto", *, trail_pct: float = 15.0, stop_pct: float = 25.0,
+                 tp_pct: float = 0.0, max_hold_min: float = 1440.0, max_open: int = 0, initial: float = 1000.0,
+                 alloc_pct: float = 2.0, weights=DEFAULT_WEIGHTS, sweet_min=None,
+                 sweet_max=None) -> Dict[str, Any]:
+    """Ritorna {"trades": DataFrame, "equity": DataFrame(ts, equity), "summary": dict}."""
+    if preset != "auto" and preset not in ENTRY_PRESETS: raise ValueError(f"preset sconosciuto: {preset}")
+    cols = panel_columns(panel)
+    ms = meme_score_array(cols["sym_score"], cols["dex_score"], cols["age_h"], cols["tx"], cols["liq"],
+                          weights, sweet_min, sweet_max)
+    entries = entry_signals(panel, cols, ms, preset)
+    entries = entries[panel.cols["priceUsd"][entries] > 0]
+    cand = pair_chains(panel, entries, trail_pct=trail_pct, stop_pct=stop_pct, tp_pct=tp_pct,
+                       max_hold_sec=max_hold_min * 60.0)
+    trades = select_trades(cand, ms[cand["row"].to_numpy()], max_open)
+    eq = equity_curve(trades, initial, alloc_pct)
+    return {"trades": trades.drop(columns=["row", "exit_row"]), "equity": eq,
+            "summary": dict(summarize(trades, eq, initial), signals=len(entries))}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Backtest segnali Entry Finder su storico snapshot")
+    ap.add_argument("--history", default=SNAPSHOT_HISTORY_DIR or "snapshots", help="directory snapshot (.npz)")
+    ap.add_argument("--preset", default="auto", choices=["auto", *ENTRY_PRESETS])
+    ap.add_argument("--since-hours", type=float, default=0, help="solo gli ultimi N ore di storico (0 = tutto)")
+    ap.add_argument("--trail-pct", type=float, default=15.0, help="trailing stop dal massimo dall'entrata (0 = off)")
+    ap.add_argument("--stop-pct", type=float, default=25.0, help="stop dal prezzo di entrata (0 = off)")
+    ap.add_argument("--tp-pct", type=float, default=0.0, help="take profit (0 = off)")
+    ap.add_argument("--max-hold-min", type=float, default=1440.0)
+    ap.add_argument("--max-open", type=int, default=0, help="posizioni aperte massime (0 = illimitate)")
+    ap.add_argument("--capital", type=float, default=1000.0)
+    ap.add_argument("--alloc-pct", type=float, default=2.0, help="allocazione per posizione (%% capitale)")
+    ap.add_argument("--out", default="", help="CSV dei trade")
+    a = ap.parse_args(argv)
+
+    paths = list_history(a.history, since=(time.time() - a.since_hours * 3600) if a.since_hours else None)
+    if len(paths) < 2: raise SystemExit(f"Storico insufficiente in {a.history} ({len(paths)} snapshot)")
+    t0 = time.perf_counter()
+    panel = SnapshotPanel.from_files(paths)
+    t1 = time.perf_counter()
+    res = run_backtest(panel, a.preset, trail_pct=a.trail_pct, stop_pct=a.stop_pct, tp_pct=a.tp_pct,
+                       max_hold_min=a.max_hold_min, max_open=a.max_open, initial=a.capital, alloc_pct=a.alloc_pct)
+    t2 = time.perf_counter()
+    print(f"{len(paths)} snapshot, {len(panel)} righe, {len(panel.pairs)} pair • panel {t1 - t0:.1f}s • "
+          f"backtest {t2 - t1:.2f}s")
+    for k, v in res["summary"].items():
+        print(f"  {k:18s} {v:.3f}" if isinstance(v, float) else f"  {k:18s} {v}")
+    if a.out:
+        res["trades"].to_csv(a.out, index=False)
+        print(f"Trade: {a.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# benchmarks/bench_json.py
+# Benchmark decodifica + normalizzazione per risposta DexScreener /search, per ogni decoder disponibile
+# (fast_json.py: msgspec tipizzato, orjson, json stdlib). Verifica anche che le righe normalizzate coincidano.
+# Uso:
+#   python benchmarks/bench_json.py                               # 20 risposte sintetiche da 300 pair
+#   python benchmarks/bench_json.py --pairs 30 --responses 200 --repeat 7
+#   python benchmarks/bench_json.py --replay dex_search.json       # risposta /search salvata
+
+import sys, json, time, random, argparse, statistics
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from market_data import MarketDataProvider
+from fast_json import AVAILABLE, decode_pairs
+from bench_pipeline import synth_pairs
+
+
+def realistic(p: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    """Aggiunge i campi che DexScreener restituisce ma _normalize_pair non legge (dimensione realistica)."""
+    q = dict(p)
+    q["labels"] = ["v4"] if rng.random() > 0.5 else []
+    q["priceNative"] = f"{rng.random():.9f}"
+    q["txns"] = dict(p["txns"], **{k: {"buys": rng.randint(0, 5000), "sells": rng.randint(0, 5000)}
+                                   for k in ("m5", "h6", "h24")})
+    q["volume"] = dict(p["volume"], m5=rng.random() * 1e3, h1=rng.random() * 1e4, h6=rng.random() * 1e5)
+    q["liquidity"] = dict(p["liquidity"], base=rng.random() * 1e9, quote=rng.random() * 1e3)
+    q["fdv"] = q["marketCap"] = rng.randint(10_000, 10**9)
+    q["info"] = {"imageUrl": f"https://dd.dexscreener.com/ds-data/tokens/solana/{p['baseToken']['address']}.png",
+                 "header": "https://dd.dexscreener.com/ds-data/tokens/solana/header.png",
+                 "websites": [{"label": "Website", "url": "https://example.org"}],
+                 "socials": [{"type": "twitter", "url": "https://x.com/example"},
+                             {"type": "telegram", "url": "https://t.me/example"}]}
+    q["boosts"] = {"active": rng.randint(0, 50)}
+    return q
+
+def responses(n_resp: int, n_pairs: int, seed: int, replay: str = "") -> List[bytes]:
+    if replay:
+        with open(replay, "rb") as fh: return [fh.read()] * n_resp
+    rng = random.Random(seed)
+    pairs = [realistic(p, rng) for p in synth_pairs(n_resp * n_pairs, seed)]
+    return [json.dumps({"schemaVersion": "1.0.0", "pairs": pairs[i * n_pairs:(i + 1) * n_pairs]}).encode()
+            for i in range(n_resp)]
+
+
+def bench(bodies: List[bytes], decoder: str, repeat: int) -> Dict[str, Any]:
+    norm = MarketDataProvider(metrics_port=0)._normalize_pair
+    dec_t, tot_t, rows = [], [], []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        decoded = [decode_pairs(b, decoder) for b in bodies]
+        t1 = time.perf_counter()
+        rows = [r for pairs in decoded for r in map(norm, pairs) if r]
+        t2 = time.perf_counter()
+        dec_t.append(t1 - t0); tot_t.append(t2 - t0)
+    n = len(bodies)
+    return {"decoder": decoder, "decode_us": min(dec_t) / n * 1e6, "total_us": min(tot_t) / n * 1e6,
+            "total_med_us": statistics.median(tot_t) / n * 1e6, "rows": rows}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark decodifica JSON + normalizzazione per risposta /search")
+    ap.add_argument("--responses", type=int, default=20)
+    ap.add_argument("--pairs", type=int, default=300, help="pair per risposta (sintetiche)")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--replay", default="", help="JSON di una risposta DexScreener /search salvata")
+    a = ap.parse_args(argv)
+
+    bodies = responses(a.responses, a.pairs, a.seed, a.replay)
+    kb = sum(map(len, bodies)) / len(bodies) / 1024
+    print(f"{len(bodies)} risposte • {kb:.0f} KB/risposta • decoder disponibili: {', '.join(AVAILABLE)}")
+    results = [bench(bodies, d, a.repeat) for d in reversed(AVAILABLE)]  # json (riferimento) per primo
+    ref = results[0]
+    print(f"{'decoder':<9}{'decode µs':>12}{'decode+norm µs':>16}{'mediana µs':>12}{'speedup':>9}  righe")
+    for r in results:
+        same = "ok" if r["rows"] == ref["rows"] else "DIVERSE"
+        print(f"{r['decoder']:<9}{r['decode_us']:>12.0f}{r['total_us']:>16.0f}{r['total_med_us']:>12.0f}"
+              f"{ref['total_us'] / r['total_us']:>8.2f}x  {len(r['rows'])} {same}")
+    return 0 if all(r["rows"] == ref["rows"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
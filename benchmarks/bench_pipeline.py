@@ -0,0 +1,222 @@
+# benchmarks/bench_pipeline.py
+# Benchmark end-to-end della pipeline Meme Radar (senza Streamlit né rete)
+# Uso:
+#   python benchmarks/bench_pipeline.py                       # 1k, 10k, 100k pair sintetiche
+#   python benchmarks/bench_pipeline.py --sizes 1000 --repeat 5 --out bench.json
+#   python benchmarks/bench_pipeline.py --replay dex_search.json   # replay di una risposta /search salvata
+#   python benchmarks/bench_pipeline.py --compare bench_prev.json  # delta vs run precedente
+
+import os, sys, json, time, random, argparse, platform, statistics, subprocess, tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+import pandas as pd
+
+from market_data import MarketDataProvider
+from arrow_frames import arrow_frame, SNAPSHOT_DICT_COLS
+from price_state import update_price_state
+from radar_pipeline import (
+    build_table, apply_pairs_filters, entry_finder_scan, annotate_entries,
+    equity_tick,
+)
+from alert_rules import RuleEngine, default_rules
+from equity_series import EquitySeries
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+SYMBOLS = ["WIF","BONK","PEPE","DOGE","CAT","MOON","FROG","INU","APE","RICK","ALPHA","BETA","ZETA","NOVA","LUNAR","XYZ"]
+QUOTES  = ["SOL","SOL","SOL","USDC","USDT","wSOL"]
+DEXES   = ["raydium","raydium","orca","meteora","lifinity","pumpswap"]
+
+# Parametri Entry Finder ≈ preset "Medio"
+EF_PARAMS = {
+    "ms_min": 65, "tx_min": 150,
+    "liq_min": 10_000, "liq_max": 250_000,
+    "age_min_m": 5, "age_max_m": 360,
+    "vol_min": 0, "vol_max": 0,
+    "ch1_min": -5, "ch1_max": 25,
+    "cap_24h": 150,
+    "trend_pos": True,
+    "allow_missing_ch1": True, "allow_missing_h4": True,
+    "survivor": False, "targetN": 12, "auto_relax": True,
+}
+
+
+# ================= Dataset =================
+def _rand_addr(rng: random.Random) -> str:
+    return "".join(rng.choice("123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz") for _ in range(44))
+
+def synth_pairs(n: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Pair in formato DexScreener /search (stessi campi letti da _normalize_pair)."""
+    rng = random.Random(seed)
+    now_ms = int(time.time() * 1000)
+    out = []
+    for i in range(n):
+        pc = {}
+        for tf, sd in (("m5", 3), ("h1", 12), ("h6", 30), ("h24", 80)):
+            if rng.random() > 0.15: pc[tf] = round(rng.gauss(2, sd), 2)
+        if rng.random() > 0.5 and "h6" in pc: pc["h4"] = pc["h6"]
+        out.append({
+            "chainId": "solana" if rng.random() > 0.03 else "ethereum",
+            "dexId": rng.choice(DEXES),
+            "url": f"https://dexscreener.com/solana/pair{i}",
+            "pairAddress": _rand_addr(rng) if rng.random() > 0.02 else f"dup{i % 50}",
+            "baseToken": {"address": _rand_addr(rng), "symbol": rng.choice(SYMBOLS) + str(rng.randint(0, 99))},
+            "quoteToken": {"address": _rand_addr(rng), "symbol": rng.choice(QUOTES)},
+            "priceUsd": f"{rng.lognormvariate(-9, 3):.10f}" if rng.random() > 0.05 else None,
+            "txns": {"h1": {"buys": rng.randint(0, 800), "sells": rng.randint(0, 800)}},
+            "volume": {"h24": rng.lognormvariate(11, 2)},
+            "liquidity": {"usd": rng.lognormvariate(10, 1.5)},
+            "pairCreatedAt": now_ms - rng.randint(60_000, 30 * 86_400_000),
+            "priceChange": pc,
+        })
+    return out
+
+def replay_pairs(path: str, n: int) -> List[Dict[str, Any]]:
+    """Replica le pair di una risposta salvata fino a n elementi (pairAddress resi univoci)."""
+    with open(path, "r", encoding="utf-8") as fh:
+        data = json.load(fh)
+    src = data.get("pairs") if isinstance(data, dict) else data
+    src = [p for p in (src or []) if isinstance(p, dict)]
+    if not src: raise SystemExit(f"Nessuna pair in {path}")
+    out = []
+    for i in range(n):
+        p = dict(src[i % len(src)])
+        p["pairAddress"] = f"{p.get('pairAddress') or 'pair'}-{i // len(src)}"
+        out.append(p)
+    return out
+
+
+# ================= Misura =================
+def _measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    times = []
+    result = None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    rows = len(result) if hasattr(result, "__len__") else None
+    return {
+        "time_s_min": min(times), "time_s_median": statistics.median(times),
+        "peak_mem_mb": peak / 1e6, "rows_out": rows,
+    }
+
+def run_size(raw: List[Dict[str, Any]], repeat: int) -> Dict[str, Dict[str, Any]]:
+    prov = MarketDataProvider(refresh_sec=60)
+    prov.set_filters(only_raydium=False, min_liq=0, exclude_quotes=["USDC", "USDT"])
+    res: Dict[str, Dict[str, Any]] = {}
+
+    def normalize():
+        rows = [r for r in (prov._normalize_pair(p) for p in raw) if r]
+        return pd.DataFrame(rows)
+    res["normalize"] = _measure(normalize, repeat)
+    df_raw = normalize()
+
+    res["provider_filters"] = _measure(lambda: prov._apply_filters(df_raw), repeat)
+    df_filt = prov._apply_filters(df_raw)
+    # snapshot come lo pubblica il provider (stringhe Arrow/dizionario)
+    res["snapshot_arrow"] = _measure(lambda: arrow_frame(df_filt, dict_cols=SNAPSHOT_DICT_COLS), repeat)
+    df_prov = arrow_frame(df_filt, dict_cols=SNAPSHOT_DICT_COLS)
+
+    baseline, ath = {}, {}
+    res["price_state"] = _measure(lambda: update_price_state(df_prov, baseline, ath), repeat)
+    build = lambda: build_table(df_prov, sweet_min=10_000, sweet_max=200_000, baseline_px=baseline, ath_px=ath)
+    res["build_table"] = _measure(build, repeat)
+    df_pairs = build()
+
+    pairs_kw = dict(meme_min=30, age_range_h=(0.0, 240.0), liq_range=(1e3, 1e7), vol_range=(1e3, 1e9))
+    res["pairs_filters"] = _measure(lambda: apply_pairs_filters(df_pairs, **pairs_kw), repeat)
+    df_table = apply_pairs_filters(df_pairs, **pairs_kw)
+
+    res["entry_finder"] = _measure(lambda: entry_finder_scan(df_table, EF_PARAMS)[0], repeat)
+    dfE = entry_finder_scan(df_table, EF_PARAMS)[0]
+    res["entry_annotate"] = _measure(lambda: annotate_entries(dfE.copy(), EF_PARAMS, 10_000, 200_000), repeat)
+
+    # Equity: stato già inizializzato con un tick, così la misura include il calcolo dei ritorni
+    eq_state = {"eq_equity": 1000.0, "eq_series": EquitySeries(1000.0), "eq_last_prices": {}}
+    equity_tick(eq_state, df_table, topN=10)
+    res["equity_tick"] = _measure(lambda: equity_tick(eq_state, df_table, topN=10) or eq_state["eq_last_prices"], repeat)
+
+    engine = RuleEngine(default_rules(tx_min=200, liq_min=20_000, meme_min=70, dd_thr=-15.0,
+                                      max_per_run=3, cooldown_sec=1800))
+    def alerts():
+        msgs = []
+        for rule, cand in engine.evaluate({"pairs": df_table, "entry": dfE}):
+            msgs += [rule.render(r) for _, r in cand.head(6).iterrows()]
+        return msgs
+    res["alert_selection"] = _measure(alerts, repeat)
+    return res
+
+
+# ================= Report =================
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def _print_table(results: List[Dict[str, Any]], baseline: Dict[tuple, Dict[str, Any]]) -> None:
+    hdr = f"{'n':>8}  {'stage':<18} {'min (ms)':>10} {'median (ms)':>12} {'peak (MB)':>10} {'rows':>8}"
+    if baseline: hdr += f" {'Δ time':>8} {'Δ mem':>8}"
+    print(hdr); print("-" * len(hdr))
+    for r in results:
+        line = (f"{r['n']:>8}  {r['stage']:<18} {r['time_s_min']*1e3:>10.2f} {r['time_s_median']*1e3:>12.2f} "
+                f"{r['peak_mem_mb']:>10.2f} {str(r['rows_out']):>8}")
+        prev = baseline.get((r["n"], r["stage"]))
+        if prev:
+            dt = (r["time_s_median"] / prev["time_s_median"] - 1.0) * 100 if prev["time_s_median"] else 0.0
+            dm = (r["peak_mem_mb"] / prev["peak_mem_mb"] - 1.0) * 100 if prev["peak_mem_mb"] else 0.0
+            line += f" {dt:>+7.1f}% {dm:>+7.1f}%"
+        print(line)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark pipeline Meme Radar (tempo + picco memoria per stadio)")
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--repeat", type=int, default=3, help="ripetizioni per stadio (tempo min/mediana)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--replay", help="JSON di una risposta DexScreener /search da replicare")
+    ap.add_argument("--out", default=None, help="file JSON dei risultati (default: bench_<rev>.json)")
+    ap.add_argument("--compare", default=None, help="JSON di un run precedente per i delta")
+    args = ap.parse_args(argv)
+
+    rev = _git_rev()
+    results = []
+    for n in args.sizes:
+        raw = replay_pairs(args.replay, n) if args.replay else synth_pairs(n, seed=args.seed)
+        for stage, m in run_size(raw, args.repeat).items():
+            results.append({"n": n, "stage": stage, **m})
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            baseline = {(r["n"], r["stage"]): r for r in json.load(fh).get("results", [])}
+    _print_table(results, baseline)
+
+    payload = {
+        "meta": {
+            "git_rev": rev, "timestamp": time.time(), "dataset": "replay" if args.replay else "synthetic",
+            "seed": args.seed, "repeat": args.repeat, "python": platform.python_version(),
+            "pandas": pd.__version__, "numpy": np.__version__, "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    out = args.out or f"bench_{rev}.json"
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, indent=2)
+    print(f"\nRisultati salvati in {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
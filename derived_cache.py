@@ -0,0 +1,149 @@
+# derived_cache.py
+# Cache di processo per le tabelle derivate (tabella PAIRS, filtri, Entry Finder), condivisa tra sessioni
+# Chiave: (namespace, versione snapshot, hash canonico dei parametri che influenzano il risultato).
+# LRU con tetto di memoria/voci; single-flight: sessioni che chiedono la stessa chiave calcolano una volta.
+#   DERIVED_CACHE_MB      = tetto memoria stimata (deep) delle voci     default: 256
+#   DERIVED_CACHE_ENTRIES = numero massimo di voci                      default: 512
+# I valori restituiti sono condivisi: chi li usa non deve modificarli in-place (copy() prima).
+
+import os, sys, json, hashlib, threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+import metrics
+
+DERIVED_CACHE_MB      = float(os.getenv("DERIVED_CACHE_MB", "256"))
+DERIVED_CACHE_ENTRIES = int(os.getenv("DERIVED_CACHE_ENTRIES", "512"))
+
+
+def params_key(params: Any) -> str:
+    """Hash canonico (ordine chiavi, tuple/list, numpy scalari) dei parametri."""
+    blob = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(blob.encode("utf-8"), digest_size=12).hexdigest()
+
+def estimate_bytes(value: Any) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_bytes(v) for v in value) + sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sum(estimate_bytes(v) for v in value.values()) + sys.getsizeof(value)
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ("value", "nbytes", "owner")
+
+    def __init__(self, value: Any, nbytes: int, owner: Optional[str]):
+        self.value = value
+        self.nbytes = nbytes
+        self.owner = owner  # sessione che l'ha calcolata (per la hit-rate cross-sessione)
+
+
+class _Flight:
+    """Calcolo in corso per una chiave: chi aspetta riceve il valore da qui (anche se non entra in cache)."""
+    __slots__ = ("done", "value", "ok", "owner")
+
+    def __init__(self, owner: Optional[str]):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.ok = False
+        self.owner = owner
+
+
+class DerivedCache:
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = int(max_bytes)
+        self.max_entries = max(1, int(max_entries))
+        self._data: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._inflight: Dict[Tuple, _Flight] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "cross_session_hits": 0, "evictions": 0, "uncacheable": 0}
+        self._ns: Dict[str, Dict[str, int]] = {}
+
+    def get_or_compute(self, namespace: str, version: Hashable, params: Any, compute: Callable[[], Any],
+                       session: Optional[str] = None) -> Any:
+        key = (namespace, version, params_key(params))
+        while True:
+            with self._lock:
+                e = self._data.get(key)
+                if e is not None:
+                    self._data.move_to_end(key)
+                    self._count(namespace, "hit", cross=session is not None and e.owner not in (None, session))
+                    return e.value
+                fl = self._inflight.get(key)
+                if fl is None:
+                    fl = self._inflight[key] = _Flight(session)
+                    self._count(namespace, "miss")
+                    break
+            # un'altra sessione sta calcolando la stessa chiave
+            if not fl.done.wait(timeout=60.0):
+                with self._lock: self._count(namespace, "miss")
+                return compute()  # calcolo bloccato altrove: procedi senza cache
+            if fl.ok:
+                with self._lock:
+                    self._count(namespace, "hit", cross=session is not None and fl.owner not in (None, session))
+                return fl.value
+            # calcolo fallito altrove: si riprova (il primo a rientrare calcola)
+
+        try:
+            value = compute()
+        except BaseException:
+            with self._lock: self._inflight.pop(key, None)
+            fl.done.set()
+            raise
+        # prima in cache e sul flight, poi si svegliano gli altri: nessuno ricalcola
+        self._store(key, value, session)
+        fl.value, fl.ok = value, True
+        with self._lock: self._inflight.pop(key, None)
+        fl.done.set()
+        return value
+
+    def _count(self, namespace: str, result: str, cross: bool = False) -> None:
+        ns = self._ns.setdefault(namespace, {"hits": 0, "misses": 0})
+        if result == "hit":
+            self._stats["hits"] += 1; ns["hits"] += 1
+            if cross: self._stats["cross_session_hits"] += 1
+        else:
+            self._stats["misses"] += 1; ns["misses"] += 1
+        metrics.CACHE_REQUESTS.inc(cache=f"derived.{namespace}", result=result)
+
+    def _store(self, key: Tuple, value: Any, owner: Optional[str]) -> None:
+        nbytes = estimate_bytes(value)
+        with self._lock:
+            if nbytes > self.max_bytes:
+                self._stats["uncacheable"] += 1
+                return
+            old = self._data.pop(key, None)
+            if old is not None: self._bytes -= old.nbytes
+            self._data[key] = _Entry(value, nbytes, owner)
+            self._bytes += nbytes
+            while self._data and (self._bytes > self.max_bytes or len(self._data) > self.max_entries):
+                _, ev = self._data.popitem(last=False)
+                self._bytes -= ev.nbytes
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear(); self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            req = out["hits"] + out["misses"]
+            out.update(requests=req, entries=len(self._data), bytes=self._bytes, max_bytes=self.max_bytes,
+                       hit_rate=(out["hits"] / req) if req else 0.0,
+                       cross_session_hit_rate=(out["cross_session_hits"] / req) if req else 0.0,
+                       namespaces={k: dict(v) for k, v in self._ns.items()})
+        return out
+
+
+CACHE = DerivedCache(max_bytes=int(DERIVED_CACHE_MB * 1e6), max_entries=DERIVED_CACHE_ENTRIES)
+
+metrics.REGISTRY.register(metrics.Gauge(
+    "memeradar_derived_cache_bytes", "Memoria stimata delle voci nella cache derivata.", fn=lambda: CACHE.stats()["bytes"]))
+metrics.REGISTRY.register(metrics.Gauge(
+    "memeradar_derived_cache_entries", "Voci nella cache derivata.", fn=lambda: CACHE.stats()["entries"]))
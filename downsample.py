@@ -0,0 +1,61 @@
+# downsample.py
+# Downsampling lato server delle serie temporali prima del plot (Plotly riceve ~1 punto per pixel, non ogni tick).
+#   LTTB (Largest-Triangle-Three-Buckets): preserva la forma visiva (picchi/valli) — default per le linee
+#   min/max per bucket: conserva esattamente gli estremi di ogni bucket
+#   CHART_MAX_POINTS = punti massimi per serie, ≈ larghezza in pixel del grafico     default: 1200
+# Gli export (CSV) usano sempre il frame originale.
+# Requisiti: numpy, pandas
+
+import os
+
+import numpy as np
+import pandas as pd
+
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "1200"))
+
+
+def _as_float(a) -> np.ndarray:
+    s = pd.Series(a)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.astype("int64").to_numpy(dtype="float64")
+    return pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """Indici (crescenti) dei punti scelti da LTTB; primo e ultimo punto sempre inclusi."""
+    x = _as_float(x); y = np.nan_to_num(_as_float(y))
+    n = len(x)
+    if n_out >= n or n_out < 3: return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # n_out-2 bucket sui punti interni
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 1 < n_out - 2:
+            nx, ny = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            nx, ny = x[-1], y[-1]
+        area = np.abs((x[a] - nx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ny - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+def minmax_indices(y, n_out: int) -> np.ndarray:
+    """Indici (crescenti) di minimo e massimo di ogni bucket (n_out // 2 bucket)."""
+    y = _as_float(y)
+    n = len(y)
+    if n_out >= n or n_out < 2: return np.arange(n)
+    edges = np.linspace(0, n, n_out // 2 + 1).astype(np.int64)
+    keep = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        seg = y[lo:hi]
+        if not len(seg) or np.isnan(seg).all(): continue
+        keep += [lo + int(np.nanargmin(seg)), lo + int(np.nanargmax(seg))]
+    return np.unique(np.asarray(keep, dtype=np.int64))
+
+def downsample_frame(df: pd.DataFrame, x: str, y: str, max_points: int = CHART_MAX_POINTS,
+                     method: str = "lttb") -> pd.DataFrame:
+    """Sottoinsieme di righe di df (ordinato per x) da passare al grafico."""
+    if df is None or len(df) <= max_points: return df
+    idx = lttb_indices(df[x], df[y], max_points) if method == "lttb" else minmax_indices(df[y], max_points)
+    return df.iloc[idx]
@@ -0,0 +1,183 @@
+# entry_sweep.py
+# Sweep dei parametri Entry Finder e dei pesi Meme Score sullo storico snapshot (snapshot_history.py).
+# Ogni combinazione è valutata in modo vettoriale su tutte le righe pair × snapshot con la stessa maschera
+# dell'app (radar_pipeline.entry_mask); le combinazioni sono distribuite su un process pool i cui worker
+# leggono le colonne da shared memory (sola lettura, nessuna copia per worker).
+# Segnale = la maschera si accende per una pair (non era attiva nello snapshot precedente).
+# Metriche: segnali, hit rate (ritorno a orizzonte > soglia), ritorno forward medio/mediano.
+# Uso:
+#   python entry_sweep.py --history snapshots                          # griglia di default attorno a "Medio"
+#   python entry_sweep.py --history snapshots --grid grid.json --horizon-min 60 --out sweep.csv
+# Griglia (JSON): {"base": "Medio", "params": {"ms_min": [55, 65, 75], "tx_min": [100, 150, 250]},
+#                  "weights": [[20, 20, 25, 20, 15], [30, 15, 25, 15, 15]], "sweet": [10000, 200000]}
+# L'auto-relax dell'app non si applica: si valuta la maschera così com'è.
+# Requisiti: numpy, pandas
+
+import os, sys, json, math, time, argparse, itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from radar_pipeline import ENTRY_PRESETS, DEFAULT_WEIGHTS, entry_mask, meme_score_array, score_symbol, score_dex
+from snapshot_history import (SNAPSHOT_HISTORY_DIR, SnapshotPanel, list_history, share_arrays, attach_arrays,
+                              release)
+
+DEFAULT_GRID = {
+    "relative": True,  # ms_min/ch1_max come delta sul preset base, tx_min come moltiplicatore
+    "params": {"ms_min": [-10, 0, 10], "tx_min": [0.5, 1.0, 2.0], "ch1_max": [-10, 0, 10], "trend_pos": [True, False]},
+    "weights": [list(DEFAULT_WEIGHTS), [30, 15, 25, 15, 15], [15, 25, 30, 15, 15]],
+}
+_RELATIVE = {"ms_min": "add", "ch1_max": "add", "tx_min": "mul"}
+
+
+# ================= Colonne =================
+def panel_columns(panel: SnapshotPanel, horizon_sec: Optional[float] = None,
+                  h6_fallback: bool = True) -> Dict[str, np.ndarray]:
+    """Colonne Entry Finder (stessi default di entry_columns) + riga precedente per pair e, con horizon_sec,
+    ritorno forward (%) a quell'orizzonte."""
+    c = panel.cols
+    ch4 = np.where(np.isnan(c["priceChange4hPct"]), c["priceChange6hPct"], c["priceChange4hPct"]) if h6_fallback \
+        else c["priceChange4hPct"]
+    out = {
+        "sym_score": np.array([score_symbol(s) for s in panel.symbols], dtype="float64")[panel.p_idx],
+        "dex_score": np.array([score_dex(d) for d in panel.dexes], dtype="float64")[panel.p_idx],
+        "tx": np.nan_to_num(c["txns1h"]), "liq": np.nan_to_num(c["liquidityUsd"]),
+        "vol": np.nan_to_num(c["volume24hUsd"]), "age_h": panel.age_hours(),
+        "ch1": np.nan_to_num(c["priceChange1hPct"], nan=-9999.0), "ch4": np.nan_to_num(ch4, nan=-9999.0),
+        "ch24": np.nan_to_num(c["priceChange24hPct"], nan=-9999.0),
+        "roi": np.nan_to_num(panel.roi_pct(), nan=-9999.0),
+        "prev": panel.prev_index(), "p_idx": panel.p_idx,
+    }
+    if horizon_sec is not None:
+        px = c["priceUsd"]
+        fwd = panel.forward_index(horizon_sec)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out["fwd_ret"] = np.where((fwd >= 0) & (px > 0), (px[np.maximum(fwd, 0)] / px - 1.0) * 100.0, np.nan)
+    return out
+
+def signal_stats(cols: Dict[str, np.ndarray], ms: np.ndarray, p: Dict[str, Any], hit_thr: float) -> Dict[str, Any]:
+    m = entry_mask(dict(cols, ms=ms), p)
+    prev = cols["prev"]
+    onset = m & ~np.where(prev >= 0, m[np.maximum(prev, 0)], False)
+    r = cols["fwd_ret"][onset]
+    r = r[~np.isnan(r)]
+    return {
+        "signals": int(onset.sum()), "pairs": int(len(np.unique(cols["p_idx"][onset]))), "evaluated": len(r),
+        "hit_rate": float((r > hit_thr).mean()) if len(r) else float("nan"),
+        "fwd_mean_pct": float(r.mean()) if len(r) else float("nan"),
+        "fwd_median_pct": float(np.median(r)) if len(r) else float("nan"),
+    }
+
+
+# ================= Worker =================
+_W: Dict[str, np.ndarray] = {}
+_W_SHM: list = []
+
+def _init_worker(spec: Dict[str, tuple]) -> None:
+    global _W, _W_SHM
+    _W, _W_SHM = attach_arrays(spec)
+
+def _eval_task(task: Tuple[Sequence[float], Tuple, List[Dict[str, Any]], float]) -> List[Dict[str, Any]]:
+    """Un set di pesi (Meme Score calcolato una volta) × un blocco di combinazioni di parametri."""
+    weights, sweet, plist, hit_thr = task
+    ms = meme_score_array(_W["sym_score"], _W["dex_score"], _W["age_h"], _W["tx"], _W["liq"], weights, *sweet)
+    return [signal_stats(_W, ms, p, hit_thr) for p in plist]
+
+
+# ================= Griglia =================
+def expand_grid(grid: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[List[float]], Tuple]:
+    """(preset base, combinazioni di parametri, set di pesi, sweet range)."""
+    base_name = grid.get("base", "Medio")
+    if base_name not in ENTRY_PRESETS: raise SystemExit(f"preset base sconosciuto: {base_name}")
+    base = dict(ENTRY_PRESETS[base_name])
+    params = grid.get("params", {})
+    relative = bool(grid.get("relative", False))
+    keys = list(params)
+    for k in keys:
+        if k not in base: raise SystemExit(f"parametro sconosciuto: {k}")
+    combos = []
+    for values in itertools.product(*(params[k] for k in keys)):
+        p = dict(base)
+        for k, v in zip(keys, values):
+            if relative and _RELATIVE.get(k) == "add": v = base[k] + v
+            elif relative and _RELATIVE.get(k) == "mul": v = int(round(base[k] * v))
+            p[k] = v
+        combos.append(p)
+    weights = [list(w) for w in grid.get("weights", [list(DEFAULT_WEIGHTS)])]
+    sweet = tuple(grid.get("sweet", (10_000, 200_000)))
+    return base, combos, weights, sweet
+
+def run_sweep(panel: SnapshotPanel, grid: Dict[str, Any], horizon_sec: float = 3600.0, hit_thr: float = 0.0,
+              workers: Optional[int] = None, min_signals: int = 20) -> pd.DataFrame:
+    _, combos, weights, sweet = expand_grid(grid)
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    cols = panel_columns(panel, horizon_sec)
+    shms, spec = share_arrays(cols)
+    # blocchi piccoli abbastanza da bilanciare il carico, grandi abbastanza da ammortizzare il Meme Score
+    chunk = max(1, math.ceil(len(combos) * len(weights) / (workers * 4)))
+    tasks, meta = [], []
+    for w in weights:
+        for i in range(0, len(combos), chunk):
+            tasks.append((w, sweet, combos[i:i + chunk], hit_thr))
+            meta.append((w, combos[i:i + chunk]))
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(spec,)) as ex:
+            results = list(ex.map(_eval_task, tasks))
+    finally:
+        release(shms, unlink=True)
+
+    swept = [k for k in grid.get("params", {})]
+    rows = []
+    for (w, plist), stats in zip(meta, results):
+        for p, st in zip(plist, stats):
+            rows.append({"weights": "/".join(str(x) for x in w), **{k: p[k] for k in swept}, **st})
+    out = pd.DataFrame(rows)
+    if out.empty: return out
+    out["ok"] = out["evaluated"] >= int(min_signals)
+    out = out.sort_values(by=["ok", "hit_rate", "fwd_mean_pct", "signals"], ascending=[False, False, False, False],
+                          na_position="last").drop(columns="ok").reset_index(drop=True)
+    out.insert(0, "rank", np.arange(1, len(out) + 1))
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Sweep parametri Entry Finder / pesi Meme Score su storico snapshot")
+    ap.add_argument("--history", default=SNAPSHOT_HISTORY_DIR or "snapshots", help="directory snapshot (.npz)")
+    ap.add_argument("--grid", default="", help="griglia JSON (default: attorno al preset --base)")
+    ap.add_argument("--base", default="Medio", choices=list(ENTRY_PRESETS))
+    ap.add_argument("--since-hours", type=float, default=0, help="solo gli ultimi N ore di storico (0 = tutto)")
+    ap.add_argument("--horizon-min", type=float, default=60, help="orizzonte del ritorno forward (minuti)")
+    ap.add_argument("--hit-thr", type=float, default=0.0, help="ritorno forward (%%) oltre cui un segnale è un hit")
+    ap.add_argument("--min-signals", type=int, default=20, help="segnali valutati minimi per entrare in classifica")
+    ap.add_argument("--workers", type=int, default=0, help="processi (0 = tutti i core)")
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--out", default="", help="CSV con la tabella completa")
+    a = ap.parse_args(argv)
+
+    paths = list_history(a.history, since=(time.time() - a.since_hours * 3600) if a.since_hours else None)
+    if len(paths) < 2: raise SystemExit(f"Storico insufficiente in {a.history} ({len(paths)} snapshot)")
+    if a.grid:
+        with open(a.grid, "r", encoding="utf-8") as fh: grid = json.load(fh)
+    else:
+        grid = dict(DEFAULT_GRID, base=a.base)
+
+    t0 = time.perf_counter()
+    panel = SnapshotPanel.from_files(paths)
+    t1 = time.perf_counter()
+    res = run_sweep(panel, grid, horizon_sec=a.horizon_min * 60, hit_thr=a.hit_thr,
+                    workers=a.workers or None, min_signals=a.min_signals)
+    t2 = time.perf_counter()
+    print(f"{len(paths)} snapshot, {len(panel)} righe, {len(panel.pairs)} pair • panel {t1 - t0:.1f}s • "
+          f"{len(res)} combinazioni in {t2 - t1:.1f}s")
+    with pd.option_context("display.width", 200, "display.max_columns", 30):
+        print(res.head(a.top).to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    if a.out:
+        res.to_csv(a.out, index=False)
+        print(f"Tabella completa: {a.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+# equity_series.py
+# Serie equity incrementale per l'equity curve paper: picco, max drawdown e rendimento cumulato
+# aggiornati a ogni tick in O(1); storico limitato con ring buffer a livelli (downsampling per sessioni lunghe).
+#   livello 0: ultimi EQUITY_RING_POINTS tick a piena risoluzione
+#   livello i: blocchi di EQUITY_TIER_FACTOR^i tick accorpati in un punto (ultimo ts/equity, ritorno composto)
+# Con i default (2048 punti, fattore 8, 3 livelli) lo storico copre ~150k tick in < 200 KB.
+# Requisiti: numpy, pandas
+
+import os
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+EQUITY_RING_POINTS = int(os.getenv("EQUITY_RING_POINTS", "2048"))
+EQUITY_TIER_FACTOR = int(os.getenv("EQUITY_TIER_FACTOR", "8"))
+EQUITY_TIERS       = int(os.getenv("EQUITY_TIERS", "3"))
+
+COLUMNS = ("ts", "equity", "ret", "n")
+
+
+class _Ring:
+    """Buffer circolare a capacità fissa, colonne numpy (ts, equity, ret, n)."""
+    __slots__ = ("cap", "head", "size", "cols")
+
+    def __init__(self, cap: int):
+        self.cap = cap
+        self.head = 0
+        self.size = 0
+        self.cols = (np.empty(cap), np.empty(cap), np.empty(cap), np.empty(cap, dtype=np.int32))
+
+    def push(self, row: Tuple[float, float, float, int]) -> None:
+        i = (self.head + self.size) % self.cap
+        for c, v in zip(self.cols, row): c[i] = v
+        self.size += 1
+
+    def _idx(self, k: int) -> np.ndarray:
+        return (self.head + np.arange(k)) % self.cap
+
+    def pop_oldest(self, k: int) -> Tuple[np.ndarray, ...]:
+        idx = self._idx(k)
+        out = tuple(c[idx] for c in self.cols)
+        self.head = (self.head + k) % self.cap
+        self.size -= k
+        return out
+
+    def arrays(self) -> Tuple[np.ndarray, ...]:
+        idx = self._idx(self.size)
+        return tuple(c[idx] for c in self.cols)
+
+
+class EquitySeries:
+    """
+    Storico equity (ts, equity, ret, n) a memoria limitata con statistiche esatte sull'intera sessione:
+    le statistiche non dipendono dal downsampling dello storico.
+    """
+
+    def __init__(self, initial: float, capacity: int = EQUITY_RING_POINTS,
+                 factor: int = EQUITY_TIER_FACTOR, tiers: int = EQUITY_TIERS):
+        self.initial = float(initial)
+        self.factor = max(2, int(factor))
+        self._tiers = [_Ring(max(2 * self.factor, int(capacity))) for _ in range(max(1, int(tiers)))]
+        self.ticks = 0
+        self.peak = float("-inf")
+        self.max_drawdown = 0.0
+        self._last: Dict[str, Any] = {}
+
+    def append(self, ts: float, equity: float, ret: float, n: int) -> None:
+        equity = float(equity)
+        self.ticks += 1
+        if equity > self.peak: self.peak = equity
+        if self.peak > 0: self.max_drawdown = min(self.max_drawdown, equity / self.peak - 1.0)
+        row = (float(ts), equity, float(ret), int(n))
+        self._last = dict(zip(COLUMNS, row))
+        for i, ring in enumerate(self._tiers):
+            ring.push(row)
+            if ring.size < ring.cap: break
+            # livello pieno: i `factor` punti più vecchi diventano un punto del livello successivo
+            ts_b, eq_b, ret_b, n_b = ring.pop_oldest(self.factor)
+            row = (ts_b[-1], eq_b[-1], float(np.prod(1.0 + ret_b) - 1.0), int(n_b[-1]))
+            if i + 1 == len(self._tiers): break  # ultimo livello: il blocco più vecchio esce dallo storico
+
+    @property
+    def equity(self) -> float:
+        return self._last.get("equity", self.initial)
+
+    @property
+    def cum_return(self) -> float:
+        return (self.equity / self.initial - 1.0) if self.initial > 0 else 0.0
+
+    @property
+    def drawdown(self) -> float:
+        return (self.equity / self.peak - 1.0) if self.peak > 0 else 0.0
+
+    def last(self) -> Dict[str, Any]:
+        return dict(self._last)
+
+    def __len__(self) -> int:
+        return sum(r.size for r in self._tiers)
+
+    def arrays(self) -> Tuple[np.ndarray, ...]:
+        """Colonne dello storico, dal punto più vecchio (livello più alto) al più recente."""
+        parts = [r.arrays() for r in reversed(self._tiers) if r.size]
+        if not parts: return tuple(np.empty(0, dtype=c.dtype) for c in self._tiers[0].cols)
+        return tuple(np.concatenate(cs) for cs in zip(*parts))
+
+    def to_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame(dict(zip(COLUMNS, self.arrays())))
+        df["t"] = pd.to_datetime(df["ts"], unit="s")
+        return df
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sum(c.nbytes for r in self._tiers for c in r.cols)
@@ -0,0 +1,84 @@
+# fast_json.py
+# Decodifica delle risposte DexScreener /search per il provider.
+#   - msgspec: decodifica tipizzata (TypedDict) dei soli campi letti da MarketDataProvider._normalize_pair;
+#     il resto della pair (info, socials, fdv, txns m5/h6/h24, ...) viene saltato senza creare oggetti Python
+#   - orjson: decodifica completa, più veloce di json
+#   - json (stdlib): sempre disponibile
+# Con msgspec, una risposta che non rispetta i tipi attesi viene ridecodificata col decoder generico.
+#   JSON_DECODER = auto | msgspec | orjson | json     default: auto (il primo disponibile in quest'ordine)
+# Benchmark: python benchmarks/bench_json.py
+# Requisiti: nessuno (msgspec, orjson opzionali)
+
+import os, json
+from typing import Any, Dict, List, Optional, TypedDict
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# ================= Schema (solo i campi usati da _normalize_pair) =================
+class _Token(TypedDict, total=False):
+    symbol: Any
+    address: Any
+
+class _Usd(TypedDict, total=False):
+    usd: Any
+
+class _Volume(TypedDict, total=False):
+    h24: Any
+
+class _Count(TypedDict, total=False):
+    buys: Any
+    sells: Any
+
+class _Txns(TypedDict, total=False):
+    h1: Optional[_Count]
+
+class _Pair(TypedDict, total=False):
+    chainId: Any
+    dexId: Any
+    url: Any
+    pairAddress: Any
+    priceUsd: Any
+    pairCreatedAt: Any
+    baseToken: Optional[_Token]
+    quoteToken: Optional[_Token]
+    liquidity: Optional[_Usd]
+    volume: Optional[_Volume]
+    txns: Optional[_Txns]
+    priceChange: Any
+
+class _Search(TypedDict, total=False):
+    pairs: Optional[List[_Pair]]
+
+
+AVAILABLE = [name for name, mod in (("msgspec", msgspec), ("orjson", orjson), ("json", json)) if mod is not None]
+
+def resolve_decoder(name: str = "auto") -> str:
+    name = (name or "auto").strip().lower()
+    return name if name in AVAILABLE else AVAILABLE[0]
+
+JSON_DECODER = resolve_decoder(os.getenv("JSON_DECODER", "auto"))
+
+_MSGSPEC = msgspec.json.Decoder(_Search) if msgspec is not None else None
+
+
+def _loads(content: bytes) -> Any:
+    return orjson.loads(content) if orjson is not None else json.loads(content)
+
+def decode_pairs(content: bytes, decoder: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Lista `pairs` di una risposta /search come dict (con msgspec: solo i campi usati dalla normalizzazione)."""
+    decoder = JSON_DECODER if decoder is None else decoder
+    if decoder == "msgspec" and _MSGSPEC is not None:
+        try:
+            return _MSGSPEC.decode(content).get("pairs") or []
+        except msgspec.ValidationError:
+            pass  # tipi inattesi in qualche pair: decodifica generica
+    data = json.loads(content) if decoder == "json" else _loads(content)
+    return (data.get("pairs") if isinstance(data, dict) else None) or []
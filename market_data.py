@@ -1,16 +1,38 @@
 # market_data.py
 # Provider per Meme Radar — Solana
-# Requisiti: requests, pandas
+# Requisiti: requests, pandas (msgspec/orjson opzionali, fast_json.py)
 
+import os
 import time
+import hashlib
 import threading
+from collections import OrderedDict
 from typing import List, Tuple, Dict, Any, Optional
 
 import requests
 import pandas as pd
 
+from timing import span
+from arrow_frames import arrow_frame, SNAPSHOT_DICT_COLS
+from fast_json import decode_pairs
+from price_state import price_maps, update_price_state
+import metrics
+import profiling
+
 
 DEX_SEARCH_URL = "https://api.dexscreener.com/latest/dex/search"
+SEARCH_QUERIES = [
+    "chain:solana raydium","chain:solana orca","chain:solana meteora","chain:solana lifinity",
+    "chain:solana usdc","chain:solana usdt","chain:solana sol","chain:solana bonk","chain:solana wif","chain:solana pepe",
+    "chain:solana pump",
+]
+# blocco priceChange appiattito in colonne numeriche (niente dict per riga nello snapshot): colonna -> chiavi
+PRICE_CHANGE_COLS = {
+    "priceChange1hPct": ("h1", "1h", "m60", "60m"),
+    "priceChange4hPct": ("h4", "4h", "m240", "240m"),
+    "priceChange6hPct": ("h6", "6h", "m360", "360m"),
+    "priceChange24hPct": ("h24", "24h", "m1440", "1440m"),
+}
 UA_HEADERS = {
     "User-Agent": "Mozilla/5.0 MemeRadar/1.0",
     "Accept": "application/json",
@@ -23,13 +45,18 @@ class MarketDataProvider:
     Aggrega risultati da DexScreener /search per una lista di query.
     Mantiene in memoria l'ultimo snapshot come DataFrame normalizzato e timestamp UNIX.
     Applica filtri provider-level (dex, min_liq, exclude_quotes).
-    Thread di auto-refresh opzionale.
+    Ogni snapshot nuovo incrementa una versione: wait_for_snapshot() permette ai consumer
+    (es. radar_daemon.py) di reagire all'arrivo dei dati invece di fare polling.
+    Thread di auto-refresh opzionale; all'avvio espone anche /metrics (Prometheus) su
+    METRICS_HOST:METRICS_PORT (metrics_port=0 per disattivare).
     """
 
-    def __init__(self, refresh_sec: int = 60, preserve_on_empty: bool = True, timeout: int = 15):
+    def __init__(self, refresh_sec: int = 60, preserve_on_empty: bool = True, timeout: int = 15,
+                 metrics_port: Optional[int] = None, track_prices: bool = True):
         self.refresh_sec = max(5, int(refresh_sec))
         self.preserve_on_empty = bool(preserve_on_empty)
         self.timeout = int(timeout)
+        self.metrics_port = metrics.METRICS_PORT if metrics_port is None else int(metrics_port)
 
         self._queries: List[str] = []
         self._filters = {
@@ -40,8 +67,16 @@ class MarketDataProvider:
 
         self._snapshot_df: pd.DataFrame = pd.DataFrame()
         self._snapshot_ts: float = 0.0
+        self._snapshot_version: int = 0
+        self.key: Optional[Tuple] = None  # chiave nel registro condiviso (get_shared_provider)
+        self.name = "provider"  # label `provider` delle metriche snapshot
+        # Prezzi di riferimento ROI/ATH condivisi da chi legge questo provider: aggiornati qui una volta per snapshot,
+        # sul frame completo, prima di pubblicarlo (build_table li legge soltanto)
+        self.baseline_px, self.ath_px = price_maps()  # limitati (PRICE_STATE_MAX_ITEMS/TTL): pair non più viste escono
+        self.track_prices = bool(track_prices)  # False nel writer di provider_process.py (i lettori hanno le loro)
         self._last_http_codes: Dict[str, Any] = {}  # query -> code/ERR
         self._lock = threading.Lock()
+        self._updated = threading.Condition(self._lock)
         self._running = False
         self._th: Optional[threading.Thread] = None
 
@@ -64,15 +99,33 @@ class MarketDataProvider:
         if self._running:
             return
         self._running = True
+        metrics.start_metrics_server(self.metrics_port)
         self._th = threading.Thread(target=self._auto_loop, daemon=True)
         self._th.start()
 
     def stop(self) -> None:
         self._running = False
+        metrics.SNAPSHOT_ROWS.remove(provider=self.name)
+        metrics.SNAPSHOT_TS.remove(provider=self.name)
 
     def get_snapshot(self) -> Tuple[pd.DataFrame, float]:
         with self._lock:
-            return self._snapshot_df.copy(), float(self._snapshot_ts)
+            return self._snapshot_df.copy(deep=False), float(self._snapshot_ts)
+
+    def get_snapshot_versioned(self) -> Tuple[pd.DataFrame, float, int]:
+        """Come get_snapshot() più la versione, lette insieme (chiave coerente per le cache derivate)."""
+        with self._lock:
+            return self._snapshot_df.copy(deep=False), float(self._snapshot_ts), self._snapshot_version
+
+    def get_snapshot_version(self) -> int:
+        with self._lock:
+            return self._snapshot_version
+
+    def wait_for_snapshot(self, since_version: int, timeout: Optional[float] = None) -> int:
+        """Attende uno snapshot con versione > since_version (o il timeout). Ritorna la versione corrente."""
+        with self._updated:
+            self._updated.wait_for(lambda: self._snapshot_version > since_version, timeout=timeout)
+            return self._snapshot_version
 
     def get_last_http_codes(self) -> Dict[str, Any]:
         with self._lock:
@@ -100,6 +153,14 @@ class MarketDataProvider:
             time.sleep(to_sleep)
 
     def _refresh_once(self):
+        t0 = time.perf_counter()
+        try:
+            with profiling.profiled("refresh"), span("provider.refresh"):
+                self._refresh_phases()
+        finally:
+            metrics.PROVIDER_REFRESH_SECONDS.observe(time.perf_counter() - t0)
+
+    def _refresh_phases(self):
         queries = []
         with self._lock:
             queries = list(self._queries)
@@ -109,18 +170,24 @@ class MarketDataProvider:
         for q in queries:
             try:
                 params = {"q": q}
-                r = requests.get(DEX_SEARCH_URL, params=params, headers=UA_HEADERS, timeout=self.timeout)
+                t_q = time.perf_counter()
+                with span("provider.http"):
+                    r = requests.get(DEX_SEARCH_URL, params=params, headers=UA_HEADERS, timeout=self.timeout)
+                metrics.PROVIDER_QUERY_SECONDS.observe(time.perf_counter() - t_q, query=q)
                 http_codes[q] = r.status_code
                 if not r.ok:
                     continue
-                data = r.json()
-                pairs = data.get("pairs") or []
-                for p in pairs:
-                    row = self._normalize_pair(p)
-                    if row:
-                        all_rows.append(row)
+                with span("provider.json_decode"):
+                    pairs = decode_pairs(r.content)
+                with span("provider.normalize"):
+                    for p in pairs:
+                        row = self._normalize_pair(p)
+                        if row:
+                            all_rows.append(row)
             except Exception:
                 http_codes[q] = "ERR"
+        for q, code in http_codes.items():
+            metrics.PROVIDER_QUERY_STATUS.inc(query=q, code=code)
 
         if not all_rows:
             # Se vuoto e vogliamo preservare, non tocchiamo lo snapshot
@@ -128,13 +195,23 @@ class MarketDataProvider:
                 self._last_http_codes = http_codes
             return
 
-        df = pd.DataFrame(all_rows)
-        df = self._apply_filters(df)
+        with span("provider.filter"):
+            df = pd.DataFrame(all_rows)
+            df = self._apply_filters(df)
+        with span("provider.arrow"):
+            df = arrow_frame(df, dict_cols=SNAPSHOT_DICT_COLS)
+        if self.track_prices:
+            with span("provider.price_state"):
+                update_price_state(df, self.baseline_px, self.ath_px)
 
         with self._lock:
             self._snapshot_df = df
             self._snapshot_ts = time.time()
+            self._snapshot_version += 1
             self._last_http_codes = http_codes
+            self._updated.notify_all()
+        metrics.SNAPSHOT_ROWS.set(len(df), provider=self.name)
+        metrics.SNAPSHOT_TS.set(self._snapshot_ts, provider=self.name)
 
     # ---- mapping ----
     def _normalize_pair(self, p: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -170,13 +247,14 @@ class MarketDataProvider:
                 "txns1h": int(txns1h),
                 "volume24hUsd": float(vol.get("h24") or 0),
                 "priceUsd": (float(p.get("priceUsd")) if p.get("priceUsd") not in (None, "") else None),
-                "pairCreatedAt": int(p.get("pairCreatedAt") or 0),  # seconds
+                "pairCreatedAt": _created_ms(p.get("pairCreatedAt")),  # ms (normalizzato all'ingest, 0 = mancante)
                 "url": p.get("url") or "",
                 "baseAddress": base.get("address") or "",
                 "pairAddress": p.get("pairAddress") or "",
-                # porta dentro il blocco priceChange così com'è (h1/h4/h6/h24…)
-                "priceChange": price_change if isinstance(price_change, dict) else {},
             }
+            pc = price_change if isinstance(price_change, dict) else {}
+            for col, keys in PRICE_CHANGE_COLS.items():
+                row[col] = next((v for v in (_pct(pc.get(k)) for k in keys) if v is not None), None)
             return row
         except Exception:
             return None
@@ -185,30 +263,7 @@ class MarketDataProvider:
         if df is None or df.empty:
             return df
 
-        f = self._filters
-        out = df.copy()
-
-        # only raydium
-        if f.get("only_raydium", False):
-            try:
-                out = out[out["dexId"].str.lower() == "raydium"]
-            except Exception:
-                pass
-
-        # min liquidity
-        try:
-            out = out[pd.to_numeric(out["liquidityUsd"], errors="coerce").fillna(0) >= float(f.get("min_liq", 0.0))]
-        except Exception:
-            pass
-
-        # exclude quote symbols
-        excl = [s.upper() for s in (f.get("exclude_quotes") or [])]
-        if excl:
-            try:
-                mask = ~out["quoteSymbol"].astype(str).str.upper().isin(excl)
-                out = out[mask]
-            except Exception:
-                pass
+        out = apply_provider_filters(df, **self._filters)
 
         # dedup: preferisci vol24hUsd maggiore per la stessa pairAddress
         try:
@@ -219,3 +274,99 @@ class MarketDataProvider:
 
         out.reset_index(drop=True, inplace=True)
         return out
+
+
+def apply_provider_filters(df: pd.DataFrame, *, only_raydium: bool = False, min_liq: float = 0.0,
+                           exclude_quotes=()) -> pd.DataFrame:
+    """Filtri provider-level (dex, min_liq, exclude_quotes) su uno snapshot; senza filtri attivi ritorna df."""
+    if df is None or df.empty:
+        return df
+    excl = [str(s).upper() for s in (exclude_quotes or [])]
+    if not only_raydium and not float(min_liq or 0.0) > 0 and not excl:
+        return df
+    out = df
+
+    # only raydium
+    if only_raydium:
+        try:
+            out = out[out["dexId"].astype(str).str.lower() == "raydium"]
+        except Exception:
+            pass
+
+    # min liquidity
+    try:
+        out = out[pd.to_numeric(out["liquidityUsd"], errors="coerce").fillna(0) >= float(min_liq or 0.0)]
+    except Exception:
+        pass
+
+    # exclude quote symbols
+    if excl:
+        try:
+            mask = ~out["quoteSymbol"].astype(str).str.upper().isin(excl)
+            out = out[mask]
+        except Exception:
+            pass
+    return out.reset_index(drop=True)
+
+
+def _created_ms(x) -> int:
+    """pairCreatedAt in ms: DexScreener usa ms, valori ≤ 1e10 sono secondi."""
+    v = int(x or 0)
+    return v if v > 10_000_000_000 else v * 1000
+
+def _pct(x) -> Optional[float]:
+    if x is None: return None
+    if type(x) is float or type(x) is int: return float(x)  # caso comune (JSON numerico): niente str()/replace
+    try:
+        s = str(x).replace("%", "").strip()
+        return float(s) if s != "" else None
+    except Exception:
+        return None
+
+
+# ---------------- Provider condivisi tra sessioni ----------------
+MAX_SHARED_PROVIDERS = 4
+SHARED_PROVIDER_IDLE_SEC = float(os.getenv("SHARED_PROVIDER_IDLE_SEC", "600"))
+PROVIDER_MODE = os.getenv("PROVIDER_MODE", "thread").strip().lower()  # thread | process
+_shared: "OrderedDict[Tuple, MarketDataProvider]" = OrderedDict()
+_shared_used: Dict[Tuple, float] = {}
+_shared_lock = threading.Lock()
+
+def shared_provider_name(key: Tuple) -> str:
+    """Nome breve di un provider condiviso (label delle metriche): refresh più hash delle query se non di default."""
+    refresh, queries = key
+    return f"shared_{refresh}s" + (f"_{hashlib.sha1(repr(queries).encode()).hexdigest()[:8]}" if queries else "")
+
+def get_shared_provider(*, refresh_sec: int, queries: Optional[List[str]] = None) -> MarketDataProvider:
+    """
+    Un provider (thread + snapshot) per (refresh, query), senza filtri, condiviso da tutte le sessioni: un solo
+    fetch per universo; i filtri provider di ogni sessione si applicano allo snapshot (apply_provider_filters,
+    in cache derivata per versione). Stesse versioni → tabelle derivate riusabili tra sessioni (derived_cache.py).
+    Le sessioni lo chiedono a ogni rerun: oltre MAX_SHARED_PROVIDERS si fermano solo i provider che nessuno
+    chiede da SHARED_PROVIDER_IDLE_SEC, mai uno ancora in uso.
+    Con PROVIDER_MODE=process il provider gira in un processo separato e qui si ottiene un lettore
+    dello snapshot in shared memory con la stessa API (provider_process.py).
+    """
+    key = (int(refresh_sec), tuple(queries) if queries is not None else ())  # () = SEARCH_QUERIES
+    now = time.time()
+    with _shared_lock:
+        _shared_used[key] = now
+        prov = _shared.get(key)
+        if prov is not None:
+            _shared.move_to_end(key)
+            return prov
+        if PROVIDER_MODE == "process":
+            from provider_process import ProcessProvider
+            prov = ProcessProvider(key, queries, refresh_sec=refresh_sec)
+        else:
+            prov = MarketDataProvider(refresh_sec=refresh_sec, preserve_on_empty=True)
+            prov.key, prov.name = key, shared_provider_name(key)
+            prov.set_queries(queries if queries is not None else SEARCH_QUERIES)
+        prov.start_auto_refresh()
+        _shared[key] = prov
+        idle = [k for k in _shared if now - _shared_used.get(k, 0.0) > SHARED_PROVIDER_IDLE_SEC]
+        while len(_shared) > MAX_SHARED_PROVIDERS and idle:
+            k = idle.pop(0)
+            _shared.pop(k).stop()
+            _shared_used.pop(k, None)
+        return prov
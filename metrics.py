@@ -0,0 +1,245 @@
+# metrics.py
+# Metriche provider/app in formato testo Prometheus + piccolo listener HTTP locale
+# Requisiti: solo stdlib (nessuna dipendenza da prometheus_client)
+
+import os, time, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from timing import STATS
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # 0 = disattivato
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _esc(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_labels(names: Sequence[str], values: Sequence, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)] + [f'{n}="{_esc(v)}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"): return "+Inf"
+    if v != v: return "NaN"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_num(v)}" for k, v in self._values.items()]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = float(self._values.get(k, 0.0)) + float(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, help, labels)
+        self._fn = fn  # gauge calcolato al momento dello scrape: valore, o {valori label: valore} con label
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def get(self, **labels) -> Optional[float]:
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+    def items(self) -> Dict[tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def remove(self, **labels) -> None:
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def _samples(self) -> List[str]:
+        if self._fn is not None:
+            try: v = self._fn()
+            except Exception: return []
+            if isinstance(v, dict):
+                return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_num(float(x))}" for k, x in v.items()]
+            return [f"{self.name} {_fmt_num(float(v))}"]
+        return super()._samples()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels) -> None:
+        k = self._key(labels)
+        with self._lock:
+            st = self._values.get(k)
+            if st is None:
+                st = self._values[k] = {"b": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, ub in enumerate(self.buckets):
+                if value <= ub: st["b"][i] += 1
+            st["sum"] += float(value); st["count"] += 1
+
+    def _samples(self) -> List[str]:
+        out = []
+        with self._lock:
+            items = [(k, {"b": list(v["b"]), "sum": v["sum"], "count": v["count"]}) for k, v in self._values.items()]
+        for k, st in items:
+            for ub, c in zip(self.buckets, st["b"]):
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, (('le', _fmt_num(ub)),))} {c}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {_fmt_num(st['sum'])}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {st['count']}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn: Callable[[], List[str]]) -> None:
+        with self._lock:
+            self._collectors.append(fn)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics); collectors = list(self._collectors)
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        for fn in collectors:
+            try: lines.extend(fn())
+            except Exception: pass
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---------------- Metriche provider ----------------
+PROVIDER_REFRESH_SECONDS = REGISTRY.register(Histogram(
+    "memeradar_provider_refresh_seconds", "Durata di un refresh completo del provider."))
+PROVIDER_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "memeradar_provider_query_seconds", "Latenza HTTP per query DexScreener /search.", ["query"]))
+PROVIDER_QUERY_STATUS = REGISTRY.register(Counter(
+    "memeradar_provider_query_status_total", "Risposte per query e status HTTP (ERR = eccezione).", ["query", "code"]))
+# label provider: nome del provider (registro condiviso, segmento del writer, daemon)
+SNAPSHOT_ROWS = REGISTRY.register(Gauge(
+    "memeradar_snapshot_rows", "Righe dell'ultimo snapshot per provider.", ["provider"]))
+SNAPSHOT_TS = REGISTRY.register(Gauge(
+    "memeradar_snapshot_timestamp_seconds", "Timestamp UNIX dell'ultimo snapshot per provider.", ["provider"]))
+
+def _snapshot_age() -> Dict[tuple, float]:
+    now = time.time()
+    return {k: max(0.0, now - ts) for k, ts in SNAPSHOT_TS.items().items() if ts}
+
+SNAPSHOT_AGE = REGISTRY.register(Gauge(
+    "memeradar_snapshot_age_seconds", "Età dell'ultimo snapshot per provider.", ["provider"], fn=_snapshot_age))
+
+# ---------------- Metriche app ----------------
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "memeradar_cache_requests_total", "Accessi alle cache per esito (hit/miss).", ["cache", "result"]))
+UI_RERUNS = REGISTRY.register(Counter(
+    "memeradar_ui_reruns_total", "Rerun automatici UI: snapshot nuovo (snapshot) o rinviati per intervallo minimo (throttled).", ["trigger"]))
+ALERT_SEND_SECONDS = REGISTRY.register(Histogram(
+    "memeradar_alert_send_seconds", "Latenza invio alert Telegram.", ["result"]))
+ALERT_OUTBOX_EVENTS = REGISTRY.register(Counter(
+    "memeradar_alert_outbox_events_total", "Eventi outbox Telegram (enqueued/deduped/sent/retry/dropped).", ["event"]))
+
+# Sessioni attive: heartbeat per sessione, scadenza dopo SESSION_TTL_SEC senza rerun
+SESSION_TTL_SEC = float(os.getenv("METRICS_SESSION_TTL_SEC", "300"))
+_sessions: Dict[str, float] = {}
+_sessions_lock = threading.Lock()
+
+def touch_session(session_id: str) -> None:
+    with _sessions_lock:
+        _sessions[session_id] = time.time()
+
+def active_sessions() -> int:
+    cutoff = time.time() - SESSION_TTL_SEC
+    with _sessions_lock:
+        for sid in [k for k, ts in _sessions.items() if ts < cutoff]:
+            _sessions.pop(sid, None)
+        return len(_sessions)
+
+ACTIVE_SESSIONS = REGISTRY.register(Gauge(
+    "memeradar_active_sessions", "Sessioni Streamlit con un rerun negli ultimi METRICS_SESSION_TTL_SEC.", fn=active_sessions))
+
+def _stage_collector() -> List[str]:
+    rows = STATS.summary()
+    if not rows: return []
+    name = "memeradar_stage_seconds"
+    lines = [f"# HELP {name} Durata per stadio (p50/p95 su finestra rolling, vedi timing.py).", f"# TYPE {name} gauge"]
+    for r in rows:
+        for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+            lines.append(f'{name}{{stage="{_esc(r["stage"])}",quantile="{q}"}} {_fmt_num(r[key] / 1e3)}')
+    return lines
+
+REGISTRY.add_collector(_stage_collector)
+
+
+# ---------------- Listener HTTP ----------------
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_response(404); self.end_headers(); return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # niente log per ogni scrape
+        pass
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[int]:
+    """Avvia (una sola volta per processo) il listener /metrics. Ritorna la porta o None."""
+    global _server
+    if not port: return None
+    with _server_lock:
+        if _server is not None:
+            return _server.server_address[1]
+        try:
+            _server = ThreadingHTTPServer((host, int(port)), _Handler)
+        except OSError:
+            # porta occupata (es. altra replica sullo stesso host): metriche solo in-process
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        return _server.server_address[1]
@@ -0,0 +1,262 @@
+# paper_ledger.py
+# Ledger paper trading persistente (SQLite): posizioni + ordini, sopravvive a rerun, sessioni e riavvii.
+#   - apertura in blocco dai candidati Entry Finder (una posizione aperta per pair)
+#   - mark-to-market a ogni snapshot provider: un solo join vettoriale su pairAddress per tutte le posizioni
+#     aperte (prezzo, picco, PnL), uscite trailing stop / stop loss in blocco, aggiornamenti con executemany
+#   - idempotente per snapshot di ogni provider (meta.last_mark_ts:<source>): UI (più sessioni/processi) e daemon
+#     possono chiamarlo tutti; i ts di provider diversi non si confrontano, quindi lo snapshot di un provider non
+#     viene scartato perché un altro ne ha marcato uno più recente
+#   PAPER_LEDGER_PATH = file SQLite                              default: paper_ledger.sqlite
+#   PAPER_TRAIL_PCT / PAPER_STOP_PCT = uscite di default (%)     default: 15 / 25 (0 = off)
+#   PAPER_INITIAL_CAPITAL = capitale iniziale del ledger         default: 1000
+# Requisiti: pandas (sqlite3 della libreria standard)
+
+import os, time, sqlite3, threading
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+PAPER_LEDGER_PATH = os.getenv("PAPER_LEDGER_PATH", "paper_ledger.sqlite")
+PAPER_TRAIL_PCT = float(os.getenv("PAPER_TRAIL_PCT", "15"))
+PAPER_STOP_PCT = float(os.getenv("PAPER_STOP_PCT", "25"))
+PAPER_INITIAL_CAPITAL = float(os.getenv("PAPER_INITIAL_CAPITAL", "1000"))
+
+BUSY_TIMEOUT_SEC = 30.0  # attesa del lock di scrittura SQLite tenuto da un altro processo
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pair_address TEXT NOT NULL, pair TEXT, link TEXT, badge TEXT, entry_grade INTEGER,
+    opened_ts REAL NOT NULL, entry_px REAL NOT NULL, qty REAL NOT NULL, alloc REAL NOT NULL,
+    trail_pct REAL NOT NULL, stop_pct REAL NOT NULL,
+    peak_px REAL NOT NULL, last_px REAL NOT NULL, last_ts REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'open', closed_ts REAL, exit_px REAL, exit_reason TEXT
+);
+CREATE INDEX IF NOT EXISTS positions_status ON positions (status, pair_address);
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    position_id INTEGER NOT NULL REFERENCES positions (id),
+    ts REAL NOT NULL, side TEXT NOT NULL, px REAL NOT NULL, qty REAL NOT NULL, reason TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL);
+"""
+
+MARK_KEY = "last_mark_ts"
+
+OPEN_COLS = "id, pair_address, pair, opened_ts, entry_px, qty, alloc, trail_pct, stop_pct, peak_px, last_px, last_ts"
+
+
+def mark_source(key: Any) -> str:
+    """Sorgente di mark-to-market per un provider: la sua chiave (get_shared_provider) come stringa."""
+    return "|".join(map(str, key)) if isinstance(key, tuple) else str(key or "")
+
+def _mark_key(source: str) -> str:
+    return f"{MARK_KEY}:{source}" if source else MARK_KEY
+
+
+def snapshot_prices(df: pd.DataFrame) -> pd.DataFrame:
+    """pairAddress -> priceUsd (> 0) dallo snapshot provider, una riga per pair."""
+    if df is None or df.empty or not {"pairAddress", "priceUsd"} <= set(df.columns):
+        return pd.DataFrame({"pair_address": pd.Series(dtype=object), "px": pd.Series(dtype="float64")})
+    out = pd.DataFrame({"pair_address": df["pairAddress"].astype(object).to_numpy(),
+                        "px": pd.to_numeric(df["priceUsd"], errors="coerce").to_numpy(dtype="float64")})
+    return out[out["px"] > 0].drop_duplicates("pair_address", keep="last")
+
+
+class PaperLedger:
+    """Ledger su SQLite (WAL). Una connessione per istanza, serializzata da un lock; tra processi decide SQLite."""
+
+    def __init__(self, path: str = PAPER_LEDGER_PATH, initial_capital: float = PAPER_INITIAL_CAPITAL):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=BUSY_TIMEOUT_SEC)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('initial_capital', ?)", (float(initial_capital),))
+        self._marked_ts: Dict[str, float] = {}  # sorgente -> ultimo snapshot marcato da questo processo (evita la query a ogni rerun)
+
+    def _meta(self, key: str, default: float = 0.0) -> float:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return float(row[0]) if row and row[0] is not None else default
+
+    def _set_meta(self, key: str, value: float) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, float(value)))
+
+    def _close_rows(self, ids: np.ndarray, px: np.ndarray, qty: np.ndarray, ts: float, reasons: Sequence[str]) -> None:
+        ids = [int(i) for i in ids]
+        self._db.executemany(
+            "UPDATE positions SET status = 'closed', closed_ts = ?, exit_px = ?, exit_reason = ?, last_px = ?,"
+            " last_ts = ? WHERE id = ? AND status = 'open'",
+            zip([ts] * len(ids), px.tolist(), reasons, px.tolist(), [ts] * len(ids), ids))
+        self._db.executemany("INSERT INTO orders (position_id, ts, side, px, qty, reason) VALUES (?, ?, 'sell', ?, ?, ?)",
+                             zip(ids, [ts] * len(ids), px.tolist(), qty.tolist(), reasons))
+
+    # ---------------- Posizioni ----------------
+
+    def open_positions(self, rows: pd.DataFrame, alloc: float, ts: Optional[float] = None,
+                       trail_pct: float = PAPER_TRAIL_PCT, stop_pct: float = PAPER_STOP_PCT) -> int:
+        """Apre una posizione per riga (colonne tabella PAIRS: Pair Address, Price (USD), Pair, Link, Badge,
+        Entry Grade). Salta prezzi non validi e pair con una posizione già aperta. Ritorna le posizioni aperte."""
+        if rows is None or rows.empty or "Pair Address" not in rows.columns or alloc <= 0: return 0
+        ts = time.time() if ts is None else float(ts)
+        px = pd.to_numeric(rows["Price (USD)"], errors="coerce").to_numpy(dtype="float64")
+        addr = rows["Pair Address"].astype(object).to_numpy()
+        ok = (px > 0) & pd.notna(addr) & (addr != "")
+        def col(name, default):
+            return rows[name].astype(object).where(rows[name].notna(), default).to_numpy()[ok] if name in rows.columns \
+                else np.full(int(ok.sum()), default, dtype=object)
+        new = pd.DataFrame({"pair_address": addr[ok], "pair": col("Pair", ""), "link": col("Link", ""),
+                            "badge": col("Badge", ""), "entry_grade": col("Entry Grade", 0), "entry_px": px[ok]})
+        new = new.drop_duplicates("pair_address")
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                held = {r[0] for r in self._db.execute("SELECT pair_address FROM positions WHERE status = 'open'")}
+                new = new[~new["pair_address"].isin(held)]
+                if not new.empty:
+                    last_id = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM positions").fetchone()[0]
+                    qty = float(alloc) / new["entry_px"].to_numpy()
+                    self._db.executemany(
+                        "INSERT INTO positions (pair_address, pair, link, badge, entry_grade, opened_ts, entry_px, qty,"
+                        " alloc, trail_pct, stop_pct, peak_px, last_px, last_ts) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                        zip(new["pair_address"].astype(str), new["pair"].astype(str), new["link"].astype(str),
+                            new["badge"].astype(str), pd.to_numeric(new["entry_grade"], errors="coerce").fillna(0).astype(int).tolist(),
+                            [ts] * len(new), new["entry_px"].tolist(), qty.tolist(), [float(alloc)] * len(new),
+                            [float(trail_pct)] * len(new), [float(stop_pct)] * len(new),
+                            new["entry_px"].tolist(), new["entry_px"].tolist(), [ts] * len(new)))
+                    self._db.execute("INSERT INTO orders (position_id, ts, side, px, qty, reason)"
+                                     " SELECT id, opened_ts, 'buy', entry_px, qty, 'open' FROM positions WHERE id > ?",
+                                     (last_id,))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(new)
+
+    def mark_to_market(self, df_snapshot: pd.DataFrame, ts: float, source: str = "",
+                       busy_timeout: Optional[float] = None) -> Optional[Dict[str, int]]:
+        """Aggiorna prezzo/picco delle posizioni aperte e chiude quelle oltre trailing stop o stop loss.
+        None se lo snapshot `ts` del provider `source` (mark_source) è già stato marcato (da questo o da un altro
+        processo). `busy_timeout`: attesa massima (s) del lock di scrittura al posto di BUSY_TIMEOUT_SEC, poi
+        sqlite3.OperationalError (la UI non resta bloccata se un altro processo sta marcando)."""
+        ts = float(ts or 0.0)
+        if ts <= self._marked_ts.get(source, 0.0): return None
+        prices = snapshot_prices(df_snapshot)
+        key = _mark_key(source)
+        with self._lock:
+            if busy_timeout is not None: self._db.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+            finally:
+                if busy_timeout is not None: self._db.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT_SEC * 1000)}")
+            try:
+                if ts <= self._meta(key):
+                    self._db.execute("COMMIT")
+                    self._marked_ts[source] = ts
+                    return None
+                pos = pd.read_sql_query(f"SELECT {OPEN_COLS} FROM positions WHERE status = 'open'", self._db)
+                out = {"open": len(pos), "marked": 0, "closed": 0}
+                if not pos.empty:
+                    m = pos.merge(prices, on="pair_address", how="inner")  # join vettoriale sullo snapshot
+                    px = m["px"].to_numpy()
+                    peak = np.maximum(m["peak_px"].to_numpy(), px)
+                    entry = m["entry_px"].to_numpy()
+                    trail, stop = m["trail_pct"].to_numpy() / 100.0, m["stop_pct"].to_numpy() / 100.0
+                    hit_trail = (trail > 0) & (px <= peak * (1.0 - trail))
+                    hit_stop = (stop > 0) & (px <= entry * (1.0 - stop))
+                    close = hit_trail | hit_stop
+                    keep = ~close
+                    self._db.executemany("UPDATE positions SET last_px = ?, peak_px = ?, last_ts = ? WHERE id = ?",
+                                         zip(px[keep].tolist(), peak[keep].tolist(), [ts] * int(keep.sum()),
+                                             m["id"].to_numpy()[keep].tolist()))
+                    if close.any():
+                        reasons = np.where(hit_stop, "stop", "trail")[close].tolist()
+                        self._db.executemany("UPDATE positions SET peak_px = ? WHERE id = ?",
+                                             zip(peak[close].tolist(), m["id"].to_numpy()[close].tolist()))
+                        self._close_rows(m["id"].to_numpy()[close], px[close], m["qty"].to_numpy()[close], ts, reasons)
+                    out.update(marked=len(m), closed=int(close.sum()))
+                self._set_meta(key, ts)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        self._marked_ts[source] = ts
+        return out
+
+    def close_positions(self, ids: Optional[Sequence[int]] = None, ts: Optional[float] = None,
+                        reason: str = "manual") -> int:
+        """Chiude all'ultimo prezzo marcato le posizioni `ids` (None = tutte le aperte)."""
+        ts = time.time() if ts is None else float(ts)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                pos = pd.read_sql_query(f"SELECT {OPEN_COLS} FROM positions WHERE status = 'open'", self._db)
+                if ids is not None: pos = pos[pos["id"].isin([int(i) for i in ids])]
+                if not pos.empty:
+                    self._close_rows(pos["id"].to_numpy(), pos["last_px"].to_numpy(), pos["qty"].to_numpy(), ts,
+                                     [reason] * len(pos))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(pos)
+
+    def reset(self, initial_capital: Optional[float] = None) -> None:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM orders")
+                self._db.execute("DELETE FROM positions")
+                self._db.execute("DELETE FROM meta WHERE key = ? OR key LIKE ?", (MARK_KEY, MARK_KEY + ":%"))
+                if initial_capital is not None: self._set_meta("initial_capital", initial_capital)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._marked_ts = {}
+
+    # ---------------- Letture ----------------
+
+    def positions(self, status: str = "open", limit: int = 1000) -> pd.DataFrame:
+        """Posizioni con valore e PnL (all'ultimo prezzo marcato per le aperte, all'uscita per le chiuse)."""
+        with self._lock:
+            df = pd.read_sql_query("SELECT * FROM positions WHERE status = ? ORDER BY id DESC LIMIT ?", self._db,
+                                   params=(status, int(limit)))
+        px = df["exit_px"].where(df["status"] == "closed", df["last_px"]).astype("float64")
+        df["value"] = df["qty"] * px
+        df["pnl"] = df["value"] - df["alloc"]
+        df["pnl_pct"] = (px / df["entry_px"] - 1.0) * 100.0
+        df["dd_from_peak_pct"] = (px / df["peak_px"] - 1.0) * 100.0
+        return df
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            o = self._db.execute("SELECT COUNT(*), COALESCE(SUM(qty * last_px), 0), COALESCE(SUM(alloc), 0)"
+                                 " FROM positions WHERE status = 'open'").fetchone()
+            c = self._db.execute("SELECT COUNT(*), COALESCE(SUM(qty * exit_px - alloc), 0),"
+                                 " COALESCE(SUM(exit_px > entry_px), 0) FROM positions WHERE status = 'closed'").fetchone()
+            initial = self._meta("initial_capital", PAPER_INITIAL_CAPITAL)
+            last_mark = float(self._db.execute("SELECT COALESCE(MAX(value), 0) FROM meta WHERE key = ? OR key LIKE ?",
+                                               (MARK_KEY, MARK_KEY + ":%")).fetchone()[0])
+        unrealized = float(o[1]) - float(o[2])
+        return {
+            "open": int(o[0]), "exposure": float(o[1]), "unrealized_pnl": unrealized,
+            "closed": int(c[0]), "realized_pnl": float(c[1]), "win_rate": (c[2] / c[0]) if c[0] else float("nan"),
+            "initial_capital": initial, "equity": initial + float(c[1]) + unrealized,
+            "cash": initial + float(c[1]) - float(o[2]), "last_mark_ts": last_mark,
+        }
+
+    def close(self) -> None:
+        with self._lock: self._db.close()
+
+
+_ledgers: Dict[str, PaperLedger] = {}
+_ledgers_lock = threading.Lock()
+
+def get_ledger(path: str = PAPER_LEDGER_PATH) -> PaperLedger:
+    """Ledger condiviso dal processo (tutte le sessioni Streamlit) per file."""
+    with _ledgers_lock:
+        if path not in _ledgers: _ledgers[path] = PaperLedger(path)
+        return _ledgers[path]
@@ -0,0 +1,110 @@
+# price_state.py
+# Stato prezzi di processo per ROI/ATH/Drawdown (baseline e massimo per pair), condiviso da provider, provider
+# in processo separato e daemon: mappe con limite di voci e TTL dall'ultima scrittura, così le pair non più
+# viste escono anche da processi che girano per settimane.
+# Le mappe si aggiornano una volta per versione di snapshot, sull'intero frame del provider (update_price_state);
+# build_table e le viste le leggono soltanto.
+#   PRICE_STATE_MAX_ITEMS  = pair massime in baseline/ATH (per provider/daemon)    default: 50000
+#   PRICE_STATE_TTL_SEC    = oltre questo tempo senza aggiornamenti la pair esce   default: 172800 (48 h)
+# Requisiti: numpy, pandas
+
+import os, sys, time, threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, MutableMapping, Optional
+
+import numpy as np
+import pandas as pd
+
+PRICE_STATE_MAX_ITEMS = int(os.getenv("PRICE_STATE_MAX_ITEMS", "50000"))
+PRICE_STATE_TTL_SEC = float(os.getenv("PRICE_STATE_TTL_SEC", "172800"))
+
+
+class PriceMap(MutableMapping):
+    """dict con al più max_items voci; TTL dall'ultima scrittura. L'ordine è quello di scrittura (LRU per
+    scrittura), quindi l'evizione guarda solo la testa (TTL verificato ogni 256 scritture); letture come un dict.
+    `linked`: mapping da cui rimuovere le stesse chiavi (baseline_px insieme ad ath_px, scritto a ogni snapshot)."""
+
+    def __init__(self, max_items: int = PRICE_STATE_MAX_ITEMS, ttl_sec: float = PRICE_STATE_TTL_SEC,
+                 linked: Optional[MutableMapping] = None):
+        self.max_items = max(1, int(max_items))
+        self.ttl_sec = float(ttl_sec)
+        self.linked = linked
+        self._d: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._t: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()  # condiviso tra sessioni (build_table in thread diversi)
+        self._writes = 0
+        self.evictions = 0
+
+    def __getitem__(self, key): return self._d[key]
+    def get(self, key, default=None): return self._d.get(key, default)
+    def __contains__(self, key) -> bool: return key in self._d
+    def __iter__(self) -> Iterator: return iter(self._d)
+    def __len__(self) -> int: return len(self._d)
+
+    def __setitem__(self, key, value) -> None:
+        with self._lock:
+            d = self._d
+            if key in d: d.move_to_end(key)
+            d[key] = value
+            self._t[key] = time.time()
+            self._writes += 1
+            if len(d) > self.max_items or not self._writes & 255: self._expire()
+
+    def _expire(self) -> None:
+        d, t = self._d, self._t
+        limit = time.time() - self.ttl_sec if self.ttl_sec > 0 else float("-inf")
+        while d:
+            k = next(iter(d))
+            if len(d) <= self.max_items and t[k] >= limit: break
+            self._evict(k)
+
+    def __delitem__(self, key) -> None:
+        with self._lock:
+            del self._d[key]
+            del self._t[key]
+
+    def _evict(self, key) -> None:
+        del self._d[key]
+        del self._t[key]
+        if self.linked is not None: self.linked.pop(key, None)
+        self.evictions += 1
+
+    def __sizeof__(self) -> int:
+        return sys.getsizeof(self._d) + sys.getsizeof(self._t) + 64 * len(self._d)
+
+def price_maps() -> tuple:
+    """(baseline_px, ath_px): baseline senza limite proprio, ripulita insieme alle evizioni di ath_px."""
+    baseline: Dict[str, float] = {}
+    return baseline, PriceMap(linked=baseline)
+
+# chiave di una pair nelle mappe: primo valore non vuoto in quest'ordine
+PRICE_KEY_COLS = ("baseAddress", "pairAddress", "Base Address", "Pair Address", "Pair", "pair")
+
+def price_key(row) -> Optional[str]:
+    """Chiave baseline/ATH di una riga (dict): indirizzo base, poi pair address, poi nome pair."""
+    for k in PRICE_KEY_COLS[:4]:
+        v = row.get(k)
+        if v: return str(v)
+    return row.get("Pair") or row.get("pair") or None
+
+def update_price_state(df: pd.DataFrame, baseline_px: MutableMapping, ath_px: MutableMapping) -> int:
+    """Registra baseline (primo prezzo > 0) e ATH per ogni pair dello snapshot; da chiamare una volta per
+    versione, sul frame completo del provider. Ritorna le righe con prezzo valido."""
+    if df is None or df.empty or "priceUsd" not in df.columns: return 0
+    keys = np.full(len(df), None, dtype=object)
+    for c in PRICE_KEY_COLS:
+        if c not in df.columns: continue
+        v = df[c].astype(object).to_numpy()
+        fill = pd.isna(keys) & pd.notna(v)
+        fill[fill] = v[fill] != ""
+        keys[fill] = v[fill]
+    px = pd.to_numeric(df["priceUsd"], errors="coerce").to_numpy(dtype="float64")
+    n = 0
+    for k, p in zip(keys.tolist(), px.tolist()):
+        if k is None or not p > 0: continue
+        k = str(k)
+        base = baseline_px.setdefault(k, p)
+        ath = ath_px.get(k, base)
+        ath_px[k] = p if p > ath else ath  # scrittura a ogni snapshot: rinnova il TTL della pair
+        n += 1
+    return n
@@ -0,0 +1,152 @@
+# profiling.py
+# Profiling opt-in (env) su una frazione campionata di rerun Streamlit e refresh provider
+#   PROFILE_MODE   = off | cpu (cProfile) | mem (tracemalloc)     default: off
+#   PROFILE_SAMPLE = frazione di esecuzioni profilate (0..1)      default: 0.05
+#   PROFILE_DIR    = directory dei dump (ruotati)                 default: ./profiles
+#   PROFILE_KEEP   = numero massimo di dump conservati            default: 20
+#   PROFILE_TOP_N  = funzioni/righe "hot" nel report              default: 15
+
+import os, io, time, random, logging, threading, cProfile, pstats, tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+PROFILE_MODE   = os.getenv("PROFILE_MODE", "off").strip().lower()
+PROFILE_SAMPLE = float(os.getenv("PROFILE_SAMPLE", "0.05"))
+PROFILE_DIR    = Path(os.getenv("PROFILE_DIR", "profiles"))
+PROFILE_KEEP   = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_TOP_N  = int(os.getenv("PROFILE_TOP_N", "15"))
+STALE_SEC      = 300.0  # un profilo non chiuso (es. rerun interrotto) oltre questo tempo viene scavalcato
+
+_lock = threading.Lock()
+_active: Optional["ProfileHandle"] = None
+_reports: Deque[Dict[str, Any]] = deque(maxlen=20)
+
+log = logging.getLogger("profiling")
+
+
+def enabled() -> bool:
+    return PROFILE_MODE in ("cpu", "mem") and PROFILE_SAMPLE > 0
+
+
+class ProfileHandle:
+    """Un'esecuzione profilata. Un solo profilo attivo per processo (tracemalloc è globale)."""
+
+    def __init__(self, kind: str, mode: str):
+        self.kind = kind
+        self.mode = mode
+        self.t_wall = time.time()
+        self._t0 = time.perf_counter()
+        self._prof: Optional[cProfile.Profile] = None
+        self._stopped = False
+
+    def _begin(self) -> None:
+        if self.mode == "cpu":
+            self._prof = cProfile.Profile()
+            self._prof.enable()
+        else:
+            if tracemalloc.is_tracing(): tracemalloc.stop()
+            tracemalloc.start(10)
+
+    def stop(self, status: str = "ok") -> Optional[Dict[str, Any]]:
+        global _active
+        if self._stopped: return None
+        self._stopped = True
+        duration = time.perf_counter() - self._t0
+        try:
+            report = self._collect(duration, status)
+        except Exception as e:
+            # PROFILE_DIR non scrivibile, disco pieno, dump fallito: il profilo si perde, il rerun/refresh no
+            log.warning("profilo %s non salvato: %s", self.kind, e)
+            self._abort()
+            report = {"kind": self.kind, "mode": self.mode, "ts": self.t_wall, "duration_s": duration,
+                      "status": f"{status}, dump fallito: {e}", "file": None, "top": []}
+        finally:
+            with _lock:
+                if _active is self: _active = None
+        _reports.append(report)
+        return report
+
+    def _abort(self) -> None:
+        try:
+            if self._prof is not None: self._prof.disable()
+            elif tracemalloc.is_tracing(): tracemalloc.stop()
+        except Exception:
+            pass
+
+    def _collect(self, duration: float, status: str) -> Dict[str, Any]:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        stem = f"{self.kind}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.t_wall))}-{os.getpid()}-{id(self) & 0xffff:04x}"
+        report: Dict[str, Any] = {"kind": self.kind, "mode": self.mode, "ts": self.t_wall,
+                                  "duration_s": duration, "status": status, "file": None, "top": []}
+        if self.mode == "cpu":
+            self._prof.disable()
+            path = PROFILE_DIR / f"{stem}.prof"
+            self._prof.dump_stats(str(path))
+            st = pstats.Stats(self._prof, stream=io.StringIO())
+            rows = []
+            for (fname, line, func), (cc, nc, tt, ct, _) in st.stats.items():
+                rows.append({"function": f"{func} ({os.path.basename(fname)}:{line})", "calls": nc,
+                             "tottime_ms": tt * 1e3, "cumtime_ms": ct * 1e3})
+            rows.sort(key=lambda r: r["tottime_ms"], reverse=True)
+            report["top"] = rows[:PROFILE_TOP_N]
+        else:
+            snap = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            path = PROFILE_DIR / f"{stem}.tracemalloc"
+            snap.dump(str(path))
+            report["peak_mb"] = peak / 1e6
+            report["top"] = [{"where": str(s.traceback[0]), "size_kb": s.size / 1024, "count": s.count}
+                             for s in snap.statistics("lineno")[:PROFILE_TOP_N]]
+        report["file"] = str(path)
+        _rotate()
+        return report
+
+
+def _rotate() -> None:
+    try:
+        files = sorted((p for p in PROFILE_DIR.iterdir() if p.suffix in (".prof", ".tracemalloc")),
+                       key=lambda p: p.stat().st_mtime)
+        for p in files[:max(0, len(files) - PROFILE_KEEP)]:
+            p.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+def start(kind: str) -> Optional[ProfileHandle]:
+    """Avvia un profilo se il campionamento lo seleziona; None altrimenti (costo ~0)."""
+    global _active
+    if not enabled() or random.random() >= PROFILE_SAMPLE:
+        return None
+    with _lock:
+        if _active is not None and (time.time() - _active.t_wall) < STALE_SEC:
+            return None
+        h = ProfileHandle(kind, PROFILE_MODE)
+        _active = h
+    try:
+        h._begin()
+    except Exception:
+        # es. un altro profiler già attivo nel processo
+        with _lock:
+            if _active is h: _active = None
+        return None
+    return h
+
+
+@contextmanager
+def profiled(kind: str) -> Iterator[Optional[ProfileHandle]]:
+    h = start(kind)
+    try:
+        yield h
+    except BaseException as e:
+        # anche le eccezioni di controllo di Streamlit (rerun/stop interrotto): il tipo finisce nel report
+        if h is not None: h.stop(status=f"error: {type(e).__name__}")
+        raise
+    else:
+        if h is not None: h.stop()
+
+
+def last_reports() -> List[Dict[str, Any]]:
+    return list(_reports)
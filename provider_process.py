@@ -0,0 +1,193 @@
+# provider_process.py
+# Modalità PROVIDER_MODE=process: MarketDataProvider gira in un processo dedicato (HTTP, decodifica JSON e
+# normalizzazione fuori dal GIL di Streamlit) e pubblica ogni snapshot in shared memory (shared_snapshot.py) o,
+# con PROVIDER_SNAPSHOT_DIR, come file colonnari mappati in memoria (snapshot_files.py).
+# I server Streamlit (anche più processi/repliche sullo stesso host, con /dev/shm condiviso) leggono in sola
+# lettura tramite ProcessProvider, che espone la stessa API di lettura di MarketDataProvider.
+# Il primo lettore che non trova un writer attivo lo avvia; il writer termina se il processo che l'ha avviato
+# esce o lo sfratta dal registro dei provider condivisi, e un altro lettore lo riavvia quando l'heartbeat scade.
+#   PROVIDER_MODE        = thread | process (market_data.py)        default: thread
+#   PROVIDER_SHM_PREFIX  = prefisso dei segmenti shared memory      default: memeradar
+#   PROVIDER_PROCESS_METRICS_PORT = porta /metrics del writer       default: 0 (off)
+# Uso diretto (writer fuori da Streamlit, es. un servizio dedicato):
+#   python provider_process.py --refresh-sec 60
+# Lo snapshot pubblicato non è filtrato: i filtri provider di ogni sessione si applicano in lettura (market_data.py).
+# Requisiti: pandas, requests; POSIX
+
+import os, sys, json, time, signal, hashlib, logging, argparse, threading, subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import metrics
+from timing import span
+from market_data import MarketDataProvider, SEARCH_QUERIES
+from price_state import price_maps, update_price_state
+from shared_snapshot import STALE_SEC, is_stale
+from snapshot_files import PROVIDER_SNAPSHOT_DIR, open_publisher, open_reader
+
+PROVIDER_SHM_PREFIX = os.getenv("PROVIDER_SHM_PREFIX", "memeradar")
+PROVIDER_PROCESS_METRICS_PORT = int(os.getenv("PROVIDER_PROCESS_METRICS_PORT", "0"))
+
+HEARTBEAT_SEC = 1.0
+
+log = logging.getLogger("provider_process")
+
+
+def shm_name(key: Tuple, queries: Optional[List[str]] = None) -> str:
+    """Nome corto e stabile per (refresh, query): i nomi POSIX shm hanno limiti di lunghezza (macOS: 31)."""
+    h = hashlib.sha1(repr((key, tuple(queries or SEARCH_QUERIES))).encode()).hexdigest()[:10]
+    return f"{PROVIDER_SHM_PREFIX[:12]}_{h}"
+
+
+# ================= Writer =================
+def run_writer(name: str, *, refresh_sec: int, only_raydium: bool, min_liq: float, exclude_quotes: List[str],
+               queries: Optional[List[str]] = None, parent_pid: int = 0) -> int:
+    try:
+        pub = open_publisher(name)
+    except RuntimeError as e:  # un altro writer è già attivo: niente da fare
+        log.info("%s", e)
+        return 0
+    prov = MarketDataProvider(refresh_sec=refresh_sec, preserve_on_empty=True,
+                              metrics_port=PROVIDER_PROCESS_METRICS_PORT, track_prices=False)
+    prov.name = name
+    prov.set_queries(queries if queries is not None else SEARCH_QUERIES)
+    prov.set_filters(only_raydium=only_raydium, min_liq=min_liq, exclude_quotes=exclude_quotes)
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(1))
+    signal.signal(signal.SIGINT, lambda *_: stop.append(1))
+    prov.start_auto_refresh()
+    version = 0
+    try:
+        while not stop:
+            if parent_pid and os.getppid() != parent_pid: break  # processo avviante uscito
+            v = prov.wait_for_snapshot(version, timeout=HEARTBEAT_SEC)
+            if v == version:
+                pub.heartbeat(prov.get_last_http_codes())
+                continue
+            df, ts, version = prov.get_snapshot_versioned()
+            with span("provider.publish"):
+                pub.publish(df, ts, prov.get_last_http_codes())
+    finally:
+        prov.stop()
+        pub.close()
+    return 0
+
+
+# ================= Lettore =================
+class ProcessProvider:
+    """Stessa API di lettura di MarketDataProvider sopra lo snapshot pubblicato dal processo provider.
+    set_queries/set_filters non hanno effetto: le query sono fissate dalla chiave all'avvio del writer.
+    Baseline/ATH sono di questo processo: aggiornati una volta per versione letta, sul frame completo."""
+
+    def __init__(self, key: Tuple, queries: Optional[List[str]] = None, refresh_sec: int = 60):
+        self.key = key
+        self.refresh_sec = int(refresh_sec)
+        self.queries = list(queries) if queries is not None else None
+        self.name = shm_name(key, self.queries)
+        self.baseline_px, self.ath_px = price_maps()
+        self._priced_version = 0
+        self._price_lock = threading.Lock()
+        self._reader = open_reader(self.name)
+        self._proc: Optional[subprocess.Popen] = None
+        self._spawned_at = 0.0
+
+    def _ensure_writer(self, h: Optional[Dict[str, Any]] = None) -> None:
+        if not is_stale(h if h is not None else self._reader.header()): return
+        if self._proc is not None and self._proc.poll() is None and time.time() - self._spawned_at < STALE_SEC:
+            return  # avviato da poco, primo heartbeat in arrivo
+        self.stop()  # nostro writer precedente bloccato o uscito: terminato e raccolto prima di sostituirlo
+        cmd = [sys.executable, os.path.abspath(__file__), "--name", self.name, "--refresh-sec", str(self.refresh_sec),
+               "--parent-pid", str(os.getpid())]
+        if self.queries is not None: cmd += ["--queries", json.dumps(self.queries)]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL)
+        self._spawned_at = time.time()
+        log.info("avviato writer provider %s (pid %d)", self.name, self._proc.pid)
+
+    def set_queries(self, queries: List[str]) -> None: pass
+
+    def set_filters(self, **_) -> None: pass
+
+    def start_auto_refresh(self) -> None:
+        metrics.start_metrics_server(metrics.METRICS_PORT)  # metriche UI di questo processo
+        self._ensure_writer()
+
+    def stop(self) -> None:
+        """Evizione dal registro: termina (e raccoglie) il writer se l'ha avviato questo processo. Altri processi
+        lettori dello stesso snapshot ne riavviano uno quando l'heartbeat scade."""
+        metrics.SNAPSHOT_ROWS.remove(provider=self.name)
+        metrics.SNAPSHOT_TS.remove(provider=self.name)
+        proc, self._proc = self._proc, None
+        if proc is None: return
+        if proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        log.info("fermato writer provider %s (pid %d, exit %s)", self.name, proc.pid, proc.returncode)
+
+    def _snapshot(self) -> Tuple[pd.DataFrame, float, int]:
+        df, ts, v = self._reader.snapshot()
+        if v != self._priced_version:
+            with self._price_lock:
+                if v != self._priced_version:
+                    update_price_state(df, self.baseline_px, self.ath_px)
+                    self._priced_version = v
+                    metrics.SNAPSHOT_ROWS.set(len(df), provider=self.name)  # età vista da questo lettore
+                    metrics.SNAPSHOT_TS.set(ts, provider=self.name)
+        return df, ts, v
+
+    def get_snapshot_versioned(self) -> Tuple[pd.DataFrame, float, int]:
+        h = self._reader.header()
+        self._ensure_writer(h)
+        return self._snapshot()
+
+    def get_snapshot(self) -> Tuple[pd.DataFrame, float]:
+        df, ts, _ = self._snapshot()
+        return df, ts
+
+    def get_snapshot_version(self) -> int:
+        h = self._reader.header()
+        return int(h["version"]) if h else 0
+
+    def wait_for_snapshot(self, since_version: int, timeout: Optional[float] = None) -> int:
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            v = self.get_snapshot_version()
+            if v > since_version or (deadline is not None and time.time() >= deadline): return v
+            time.sleep(0.2 if deadline is None else max(0.0, min(0.2, deadline - time.time())))
+
+    def writer_status(self) -> Dict[str, Any]:
+        h = self._reader.header()
+        return {"name": self.name, "backend": "file" if PROVIDER_SNAPSHOT_DIR else "shm", "alive": not is_stale(h), "pid": h["pid"] if h else 0,
+                "heartbeat_age": (time.time() - h["heartbeat"]) if h else float("inf"),
+                "version": h["version"] if h else 0, "size": h["size"] if h else 0,
+                "private_cols": list(getattr(self._reader, "private_columns", []))}
+
+    def get_last_http_codes(self) -> Dict[str, Any]:
+        h = self._reader.header()
+        return dict(h["codes"]) if h else {}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Processo provider Meme Radar (snapshot in shared memory o su file)")
+    ap.add_argument("--name", default="", help="nome dei segmenti (default: da filtri e query)")
+    ap.add_argument("--refresh-sec", type=int, default=int(os.getenv("REFRESH_SEC", "60")))
+    ap.add_argument("--only-raydium", action="store_true")
+    ap.add_argument("--min-liq", type=float, default=0.0)
+    ap.add_argument("--exclude-quotes", default="", help="filtro sullo snapshot pubblicato (default: nessuno)")
+    ap.add_argument("--queries", default="", help="lista JSON di query (default: SEARCH_QUERIES)")
+    ap.add_argument("--parent-pid", type=int, default=0, help="termina quando questo processo esce")
+    a = ap.parse_args(argv)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(message)s")
+    excl = [x.strip().upper() for x in a.exclude_quotes.split(",") if x.strip()]
+    queries = json.loads(a.queries) if a.queries else None
+    key = (int(a.refresh_sec), tuple(queries) if queries is not None else ())  # come get_shared_provider
+    return run_writer(a.name or shm_name(key, queries), refresh_sec=a.refresh_sec, only_raydium=a.only_raydium,
+                      min_liq=a.min_liq, exclude_quotes=excl, queries=queries, parent_pid=a.parent_pid)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# radar_daemon.py
+# Servizio headless Meme Radar: provider + tabella PAIRS + Entry Finder + alert Telegram, senza Streamlit.
+# Gira un ciclo per ogni snapshot nuovo del provider (latenza alert = arrivo dati, non refresh del browser);
+# la UI Streamlit diventa un viewer opzionale (UI_ALERTS=0 per non duplicare gli alert).
+# Uso:
+#   python radar_daemon.py                          # config da env (vedi README)
+#   python radar_daemon.py --rules hit,entry --entry-preset Medio --once
+#   python radar_daemon.py --record-dir snapshots  # registra lo storico snapshot per entry_sweep.py
+# Requisiti: pandas, requests
+
+import os, sys, time, signal, logging, argparse
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from market_data import MarketDataProvider, SEARCH_QUERIES
+from telegram_outbox import get_outbox
+from alert_rules import RuleEngine, default_rules, load_rules
+from timing import span
+from paper_ledger import PaperLedger
+from snapshot_history import SNAPSHOT_HISTORY_DIR, SNAPSHOT_HISTORY_DAYS, record_snapshot, prune_history
+from radar_pipeline import (
+    ENTRY_PRESETS, market_tx_heat, suggest_entry_preset,
+    build_table, apply_pairs_filters, entry_finder_scan, annotate_entries, sort_entries,
+)
+
+log = logging.getLogger("radar_daemon")
+
+ALL_RULES = ("hit", "trail", "entry")
+
+
+def _env_list(name: str, default: str) -> List[str]:
+    return [x.strip() for x in os.getenv(name, default).split(",") if x.strip()]
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Default da env (stessi valori di default della sidebar), sovrascrivibili da CLI."""
+    ap = argparse.ArgumentParser(description="Meme Radar — scanner/alert headless")
+    ap.add_argument("--refresh-sec", type=int, default=int(os.getenv("REFRESH_SEC", "60")))
+    ap.add_argument("--rules", default=os.getenv("DAEMON_RULES", ",".join(ALL_RULES)),
+                    help="regole predefinite attive, es. hit,trail,entry")
+    ap.add_argument("--rules-file", default=os.getenv("ALERT_RULES_FILE", ""),
+                    help="regole alert aggiuntive (JSON, vedi alert_rules.py)")
+    # filtri provider
+    ap.add_argument("--only-raydium", action="store_true", default=os.getenv("PROVIDER_ONLY_RAYDIUM", "0") == "1")
+    ap.add_argument("--min-liq", type=float, default=float(os.getenv("PROVIDER_MIN_LIQ", "0")))
+    ap.add_argument("--exclude-quotes", default=",".join(_env_list("PROVIDER_EXCLUDE_QUOTES", "USDC,USDT")))
+    # tabella PAIRS
+    ap.add_argument("--sweet-min", type=float, default=float(os.getenv("SWEET_LIQ_MIN", "10000")))
+    ap.add_argument("--sweet-max", type=float, default=float(os.getenv("SWEET_LIQ_MAX", "200000")))
+    ap.add_argument("--pairs-meme-min", type=int, default=int(os.getenv("PAIRS_MEME_MIN", "0")))
+    # soglie alert
+    ap.add_argument("--tx-min", type=int, default=int(os.getenv("ALERT_TX1H_MIN", "200")))
+    ap.add_argument("--liq-min", type=int, default=int(os.getenv("ALERT_LIQ_MIN", "20000")))
+    ap.add_argument("--meme-min", type=int, default=int(os.getenv("ALERT_MEME_MIN", "70")))
+    ap.add_argument("--dd-thr", type=float, default=float(os.getenv("ALERT_DD_THR", "-15")))
+    ap.add_argument("--cooldown-min", type=float, default=float(os.getenv("ALERT_COOLDOWN_MIN", "30")))
+    ap.add_argument("--max-per-run", type=int, default=int(os.getenv("ALERT_MAX_PER_RUN", "3")))
+    ap.add_argument("--entry-preset", default=os.getenv("ENTRY_PRESET", "auto"),
+                    help="auto (da heat di mercato) | " + " | ".join(ENTRY_PRESETS))
+    ap.add_argument("--record-dir", default=SNAPSHOT_HISTORY_DIR, help="directory storico snapshot ('' = off)")
+    ap.add_argument("--record-days", type=float, default=SNAPSHOT_HISTORY_DAYS, help="retention storico (giorni)")
+    ap.add_argument("--paper-ledger", default=os.getenv("PAPER_LEDGER_PATH", ""),
+                    help="ledger paper trading (SQLite) da marcare a ogni snapshot ('' = off)")
+    ap.add_argument("--once", action="store_true", help="un solo ciclo sul primo snapshot, poi esce")
+    args = ap.parse_args(argv)
+    args.rules = {r.strip() for r in args.rules.split(",") if r.strip()}
+    unknown = args.rules - set(ALL_RULES)
+    if unknown: ap.error(f"regole sconosciute: {', '.join(sorted(unknown))}")
+    if args.entry_preset != "auto" and args.entry_preset not in ENTRY_PRESETS:
+        ap.error(f"preset sconosciuto: {args.entry_preset}")
+    args.exclude_quotes = [x.strip().upper() for x in args.exclude_quotes.split(",") if x.strip()]
+    args.token = os.getenv("TELEGRAM_BOT_TOKEN", "")
+    args.chat_id = os.getenv("TELEGRAM_CHAT_ID", "")
+    return args
+
+
+class RadarDaemon:
+    """Stato tra i cicli: provider (con baseline/ATH per ROI e Drawdown, aggiornati a ogni snapshot), regole, ledger."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.outbox = get_outbox()
+        self.provider = MarketDataProvider(refresh_sec=args.refresh_sec, preserve_on_empty=True)
+        self.provider.name = "daemon"
+        self.provider.set_queries(SEARCH_QUERIES)
+        self.provider.set_filters(only_raydium=args.only_raydium, min_liq=args.min_liq,
+                                  exclude_quotes=args.exclude_quotes)
+        rules = default_rules(tx_min=args.tx_min, liq_min=args.liq_min, meme_min=args.meme_min, dd_thr=args.dd_thr,
+                              max_per_run=args.max_per_run, cooldown_sec=args.cooldown_min * 60,
+                              hit="hit" in args.rules, trail="trail" in args.rules, entry="entry" in args.rules)
+        self.engine = RuleEngine(rules + (load_rules(args.rules_file) if args.rules_file else []))
+        self._stop = False
+        self._pruned_at = 0.0
+        self.ledger = PaperLedger(args.paper_ledger) if args.paper_ledger else None
+
+    def stop(self, *_):
+        self._stop = True
+
+    def run_cycle(self, df_provider: pd.DataFrame) -> Dict[str, Any]:
+        """Un ciclo completo su uno snapshot. Ritorna i conteggi per il log."""
+        a = self.args
+        out: Dict[str, Any] = {"rows": len(df_provider), "candidates": 0}
+        if df_provider.empty: return out
+        with span("daemon.pipeline"):
+            df_pairs = build_table(df_provider, sweet_min=a.sweet_min, sweet_max=a.sweet_max,
+                                   baseline_px=self.provider.baseline_px, ath_px=self.provider.ath_px)
+            df_table = apply_pairs_filters(df_pairs, meme_min=a.pairs_meme_min)
+        if df_table.empty: return out
+
+        dfE = pd.DataFrame()
+        if any(r.source == "entry" for r in self.engine.rules):
+            with span("daemon.entry_finder"):
+                name = a.entry_preset if a.entry_preset != "auto" else suggest_entry_preset(market_tx_heat(df_provider))
+                p = dict(ENTRY_PRESETS[name], auto_relax=True)
+                dfE, _, _ = entry_finder_scan(df_table.copy(), p)
+                if not dfE.empty:
+                    dfE = sort_entries(annotate_entries(dfE, p, a.sweet_min, a.sweet_max), "Momentum (1h %)")
+                out.update(preset=name, candidates=len(dfE))
+        with span("daemon.alerts"):
+            out.update(self.engine.dispatch({"pairs": df_table, "entry": dfE}, self.outbox, a.token, a.chat_id))
+        return out
+
+    def record(self, df: pd.DataFrame, ts: float) -> None:
+        a = self.args
+        if not a.record_dir: return
+        try:
+            with span("daemon.record"):
+                record_snapshot(df, ts, a.record_dir)
+                if time.time() - self._pruned_at > 3600:
+                    self._pruned_at = time.time()
+                    prune_history(a.record_dir, a.record_days)
+        except OSError:
+            log.exception("registrazione snapshot fallita (%s)", a.record_dir)
+
+    def run(self) -> int:
+        a = self.args
+        if not (a.token and a.chat_id):
+            log.warning("TELEGRAM_BOT_TOKEN/TELEGRAM_CHAT_ID mancanti: scansione senza invio alert")
+        self.provider.start_auto_refresh()
+        version = 0
+        while not self._stop:
+            v = self.provider.wait_for_snapshot(version, timeout=1.0)
+            if v == version: continue
+            version = v
+            df, ts = self.provider.get_snapshot()
+            self.record(df, ts)
+            if self.ledger is not None:
+                try:
+                    with span("daemon.paper_mtm"):
+                        mtm = self.ledger.mark_to_market(df, ts, source="daemon")
+                    if mtm and mtm["closed"]: log.info("paper ledger: %d posizioni chiuse (trailing/stop)", mtm["closed"])
+                except Exception:
+                    log.exception("mark-to-market ledger fallito")
+            t0 = time.perf_counter()
+            try:
+                res = self.run_cycle(df)
+            except Exception:
+                log.exception("ciclo fallito (snapshot v%d)", version)
+                continue
+            log.info("snapshot v%d (%s) %.0f ms — %s", version, time.strftime("%H:%M:%S", time.localtime(ts)),
+                     (time.perf_counter() - t0) * 1e3, " ".join(f"{k}={v}" for k, v in res.items()))
+            if a.once: break
+        self.provider.stop()
+        if a.once:
+            # lascia all'outbox il tempo di svuotare la coda prima di uscire
+            deadline = time.time() + 30
+            while self.outbox.stats()["pending"] and time.time() < deadline: time.sleep(0.5)
+        return 0
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(message)s")
+    d = RadarDaemon(parse_args(argv))
+    signal.signal(signal.SIGTERM, d.stop)
+    signal.signal(signal.SIGINT, d.stop)
+    return d.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
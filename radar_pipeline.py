@@ -0,0 +1,724 @@
+# radar_pipeline.py
+# Pipeline di calcolo Meme Radar — senza Streamlit
+# (Meme Score, tabella PAIRS, filtri PAIRS, indici di ranking/watchlist, Entry Finder, equity curve, selezione alert)
+# Requisiti: pandas, numpy
+
+import time, math, datetime
+from typing import Any, Dict, Mapping, MutableMapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from arrow_frames import arrow_frame, TABLE_DICT_COLS
+from equity_series import EquitySeries
+from price_state import price_key
+
+
+# ================= Helpers numerici / tempo =================
+def hours_since_ms(ms_or_s):
+    if ms_or_s is None: return None
+    try:
+        v = int(ms_or_s)
+        if v > 10_000_000_000: v = v/1000.0
+        return max(0.0, (time.time() - v) / 3600.0)
+    except Exception: return None
+
+def ms_to_dt(ms_or_s):
+    if not ms_or_s: return ""
+    try:
+        v = int(ms_or_s)
+        if v > 10_000_000_000: v = v//1000
+        return datetime.datetime.utcfromtimestamp(v).strftime("%Y-%m-%d %H:%M")
+    except Exception: return str(ms_or_s)
+
+def fmt_age(hours):
+    if hours is None: return ""
+    if hours < 1: return f"{int(round(hours*60))}m"
+    if hours < 48:
+        h = int(hours); m = int(round((hours - h) * 60))
+        return f"{h}h {m}m"
+    d = int(hours // 24); h = int(hours % 24)
+    return f"{d}d {h}h"
+
+# Versioni per colonna: unità normalizzate una volta, un solo "now" per tutto il frame, stringhe in batch
+def created_ms_array(values) -> np.ndarray:
+    """pairCreatedAt (ms o secondi, anche misti) → float64 in ms; NaN se mancante/non numerico."""
+    v = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return np.where(v > 10_000_000_000, v, v * 1000.0)
+
+def _str_join(*parts) -> np.ndarray:
+    out = None
+    for p in parts:
+        p = p.astype(np.int64).astype(str) if isinstance(p, np.ndarray) else p
+        out = p if out is None else np.char.add(out, p)
+    return np.asarray(out, dtype=object)
+
+def fmt_age_array(hours) -> np.ndarray:
+    """Come fmt_age su un array di ore (NaN → "")."""
+    h = np.asarray(hours, dtype="float64")
+    out = np.full(len(h), "", dtype=object)
+    with np.errstate(invalid="ignore"):
+        m, mid, big = h < 1, (h >= 1) & (h < 48), h >= 48
+    if m.any(): out[m] = _str_join(np.round(h[m] * 60), "m")
+    if mid.any():
+        hh = np.floor(h[mid])
+        out[mid] = _str_join(hh, "h ", np.round((h[mid] - hh) * 60), "m")
+    if big.any(): out[big] = _str_join(h[big] // 24, "d ", h[big] % 24, "h")
+    return out
+
+def pair_time_columns(created, now: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """Created (UTC) / Pair Age / PairAgeHours per colonna (stessa semantica di ms_to_dt/hours_since_ms/fmt_age)."""
+    now = time.time() if now is None else float(now)
+    ms = created_ms_array(created)
+    hours = np.maximum(0.0, (now - ms / 1000.0) / 3600.0)
+    created_str = np.full(len(ms), "", dtype=object)
+    ok = ~np.isnan(ms) & (ms != 0)
+    if ok.any():
+        secs = np.floor(ms[ok] / 1000.0).astype(np.int64)
+        iso = np.datetime_as_string(secs.astype("datetime64[s]").astype("datetime64[m]"), unit="m")  # 'YYYY-MM-DDTHH:MM'
+        created_str[ok] = np.char.replace(iso, "T", " ").astype(object)
+    return {"Created (UTC)": created_str, "Pair Age": fmt_age_array(hours), "PairAgeHours": hours}
+
+def to_float0(x, default=0.0):
+    if x is None: return default
+    try:
+        v = float(x); return v if math.isfinite(v) else default
+    except (TypeError, ValueError):
+        try:
+            s = str(x).replace(",", "").strip().replace("%", "")
+            v = float(s) if s else default
+            return v if math.isfinite(v) else default
+        except Exception:
+            return default
+
+def to_int0(x, default=0):
+    v = to_float0(x, float(default)); return int(round(v))
+
+# ================= Meme Score =================
+STRONG_MEMES = {"WIF","BONK","PEPE","DOGE","DOG","SHIB","WOJAK","MOG","TRUMP","ELON","CAT","KITTY","MOON","PUMP","FLOKI","BABYDOGE"}
+WEAK_MEMES   = {"FROG","COIN","INU","APE","GIGA","PONZI","LUNA","RUG","RICK","MORTY","ROCKET","HAMSTER"}
+DEX_WEIGHTS  = {"raydium":1.0, "orca":0.9, "meteora":0.85, "lifinity":0.8}
+DEFAULT_WEIGHTS = (20, 20, 25, 20, 15)  # symbol, age, txns, liq, dex
+
+def s_sigmoid(x, k=0.02):
+    try: return 1.0 / (1.0 + math.exp(-k * (float(x) - 200)))
+    except Exception: return 0.0
+def score_symbol(s):
+    S=(s or "").upper()
+    return 1.0 if any(t in S for t in STRONG_MEMES) else (0.6 if any(t in S for t in WEAK_MEMES) else 0.3)
+def score_age(hours):
+    if hours is None: return 0.5
+    return max(0.0, min(1.0, 1.0 - (hours / 72.0)))
+def score_liq(liq, mn, mx):
+    if liq is None or liq <= 0: return 0.0
+    try: mn = float(mn) if mn is not None else 0.0
+    except Exception: mn = 0.0
+    try: mx = float(mx) if mx not in (None, 0) else float("inf")
+    except Exception: mx = float("inf")
+    if mn <= liq <= mx: return 1.0
+    if liq < mn: return max(0.0, liq / (mn if mn > 0 else 1.0))
+    return max(0.0, (mx if mx < float("inf") else 0.0) / liq) if mx < float("inf") else 0.6
+def score_dex(d): return DEX_WEIGHTS.get((d or "").lower(), 0.6)
+
+def compute_meme_score_row(r, weights=None, sweet_min=None, sweet_max=None, age_h=None):
+    base = r.get("baseSymbol","") if hasattr(r, "get") else r["baseSymbol"]
+    dex  = r.get("dexId","") if hasattr(r, "get") else r["dexId"]
+    liq  = r.get("liquidityUsd", None) if hasattr(r, "get") else r["liquidityUsd"]
+    tx1  = r.get("txns1h", 0) if hasattr(r, "get") else r["txns1h"]
+    if age_h is not None:
+        ageh = age_h
+    else:
+        ageh = hours_since_ms(r.get("pairCreatedAt", 0) if hasattr(r, "get") else r["pairCreatedAt"])
+    local_weights = tuple(weights or DEFAULT_WEIGHTS)
+    f = (local_weights[0]*score_symbol(base) + local_weights[1]*score_age(ageh) +
+         local_weights[2]*s_sigmoid(tx1) + local_weights[3]*score_liq((liq or 0.0), sweet_min, sweet_max) +
+         local_weights[4]*score_dex(dex))
+    return round(100.0 * f / max(1e-6, sum(local_weights)))
+
+def score_liq_array(liq: np.ndarray, mn, mx) -> np.ndarray:
+    """score_liq su array (NaN = 0)."""
+    liq = np.nan_to_num(np.asarray(liq, dtype="float64"))
+    try: mn = float(mn) if mn is not None else 0.0
+    except Exception: mn = 0.0
+    try: mx = float(mx) if mx not in (None, 0) else float("inf")
+    except Exception: mx = float("inf")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        above = (mx / liq) if math.isfinite(mx) else np.full(liq.shape, 0.6)
+        out = np.where(liq < mn, liq / (mn if mn > 0 else 1.0), np.where(liq <= mx, 1.0, np.maximum(0.0, above)))
+    return np.where(liq <= 0, 0.0, out)
+
+def meme_score_array(sym_score, dex_score, age_h, tx, liq, weights=None, sweet_min=None, sweet_max=None) -> np.ndarray:
+    """compute_meme_score_row su colonne: sym_score/dex_score già valutati (score_symbol/score_dex), age_h NaN = n/d."""
+    w = tuple(weights or DEFAULT_WEIGHTS)
+    age_h = np.asarray(age_h, dtype="float64")
+    s_age = np.where(np.isnan(age_h), 0.5, np.clip(1.0 - age_h / 72.0, 0.0, 1.0))
+    with np.errstate(over="ignore"):
+        s_tx = 1.0 / (1.0 + np.exp(-0.02 * (np.nan_to_num(np.asarray(tx, dtype="float64")) - 200)))
+    f = (w[0] * np.asarray(sym_score) + w[1] * s_age + w[2] * s_tx
+         + w[3] * score_liq_array(liq, sweet_min, sweet_max) + w[4] * np.asarray(dex_score))
+    return np.round(100.0 * f / max(1e-6, sum(w)))
+
+# ================= ROI/ATH/DD =================
+def profit_metrics_from_raw(rdict, baseline_px: Mapping, ath_px: Mapping):
+    """(ROI%, ATH%, DD%) dai prezzi di riferimento, in sola lettura (aggiornati da price_state.update_price_state)."""
+    addr = price_key(rdict)
+    if not addr: return None, None, None
+    px = rdict.get("priceUsd")
+    try:
+        px = None if px in (None, "") else float(px)
+    except Exception:
+        px = None
+    if not px or px <= 0: return None, None, None
+
+    base = baseline_px.get(addr)
+    if not base or base <= 0: return None, None, None  # pair non ancora registrata
+    ath = max(ath_px.get(addr, base), px)
+
+    roi_pct = (px/base - 1.0)*100.0
+    ath_pct = (ath/base - 1.0)*100.0
+    dd_pct  = (px/ath - 1.0)*100.0
+    return roi_pct, ath_pct, dd_pct
+
+# ================= Change helpers =================
+def _to_float_pct(x):
+    if x is None or (isinstance(x, float) and x != x): return None  # NaN = mancante (colonne appiattite)
+    try:
+        s = str(x).replace("%", "").strip()
+        return float(s) if s != "" else None
+    except Exception:
+        return None
+
+def _get_change_pct_from_nested(r, nested_key, candidates):
+    try:
+        obj = r.get(nested_key) if hasattr(r, "get") else r[nested_key]
+    except Exception:
+        obj = None
+    if isinstance(obj, dict):
+        for name in candidates:
+            if name in obj and obj[name] is not None:
+                val = _to_float_pct(obj[name])
+                if val is not None: return val
+    return None
+
+def _get_change_pct(r, flat_keys, nested_key, nested_candidates):
+    for k in flat_keys:
+        v = r.get(k) if hasattr(r, "get") else r[k]
+        val = _to_float_pct(v)
+        if val is not None: return val
+    return _get_change_pct_from_nested(r, nested_key, nested_candidates)
+
+# ================= Tabella PAIRS =================
+def build_table(df: pd.DataFrame, *, weights=DEFAULT_WEIGHTS, sweet_min=None, sweet_max=None,
+                h6_fallback: bool = True, sort_by_meme: bool = True,
+                baseline_px: Optional[Mapping] = None, ath_px: Optional[Mapping] = None,
+                now: Optional[float] = None) -> pd.DataFrame:
+    """
+    Snapshot provider → tabella PAIRS (colonne display + PairAgeHours/indirizzi).
+    baseline_px/ath_px sono solo letti: ROI/ATH sono riferiti al primo prezzo registrato in queste mappe (quelle del
+    provider, aggiornate una volta per snapshot; senza mappe o per pair non ancora registrate ROI/ATH/DD sono vuoti).
+    `now`: istante di riferimento per le età (default: adesso), uguale per tutte le righe.
+    """
+    baseline_px = {} if baseline_px is None else baseline_px
+    ath_px = {} if ath_px is None else ath_px
+    tcols = pair_time_columns(df["pairCreatedAt"] if "pairCreatedAt" in df.columns else [None] * len(df), now)
+    ages = tcols["PairAgeHours"]
+    rows = []
+    for i, r in enumerate(df.to_dict(orient="records")):
+        ageh = None if np.isnan(ages[i]) else float(ages[i])
+        mscore = compute_meme_score_row(r, weights, sweet_min, sweet_max, age_h=ageh)
+        chg_1h = _get_change_pct(r, ["priceChange1hPct","priceChangeH1Pct","pc1h","priceChange1h"], "priceChange", ("h1","1h","m60","60m"))
+        chg_4h = _get_change_pct(r, ["priceChange4hPct","priceChangeH4Pct","pc4h","priceChange4h"], "priceChange", ("h4","4h","m240","240m"))
+        if h6_fallback and chg_4h is None:
+            chg_4h = _get_change_pct(r, ["priceChange6hPct","priceChangeH6Pct","pc6h","priceChange6h"], "priceChange", ("h6","6h","m360","360m"))
+        chg_24h = _get_change_pct(r, ["priceChange24hPct","priceChangeH24Pct","pc24h","priceChange24h"], "priceChange", ("h24","24h","m1440","1440m"))
+        roi_pct, ath_pct, dd_pct = profit_metrics_from_raw(r, baseline_px, ath_px)
+
+        rows.append({
+            "Meme Score": mscore,
+            "Pair": f"{r.get('baseSymbol','')}/{r.get('quoteSymbol','')}",
+            "DEX": r.get("dexId",""),
+            "Liquidity (USD)": to_int0(r.get("liquidityUsd"), 0),
+            "Txns 1h": to_int0(r.get("txns1h"), 0),
+            "Volume 24h (USD)": to_int0(r.get("volume24hUsd"), 0),
+            "Price (USD)": (None if r.get("priceUsd") in (None, "") else to_float0(r.get("priceUsd"), None)),
+            "ROI (%)": roi_pct, "ATH (%)": ath_pct, "Drawdown (%)": dd_pct,
+            "Change 1h (%)": chg_1h, "Change 4h/6h (%)": chg_4h, "Change 24h (%)": chg_24h,
+            "Created (UTC)": None, "Pair Age": None, "PairAgeHours": None,  # colonne riempite in batch sotto
+            "Link": r.get("url",""),
+            "Base Address": r.get("baseAddress",""), "Pair Address": r.get("pairAddress",""),
+            "baseSymbol": r.get("baseSymbol",""), "quoteSymbol": r.get("quoteSymbol",""),
+        })
+    out = pd.DataFrame(rows)
+    if not out.empty:
+        for col, vals in tcols.items(): out[col] = vals
+    if not out.empty and sort_by_meme:
+        out = out.sort_values(by=["Meme Score","Txns 1h","Liquidity (USD)"], ascending=[False, False, False])
+    return arrow_frame(out, dict_cols=TABLE_DICT_COLS)
+
+def apply_pairs_filters(df: pd.DataFrame, *, meme_min: int = 0,
+                        age_range_h: Optional[Tuple[float, float]] = None,
+                        liq_range: Optional[Tuple[float, float]] = None,
+                        vol_range: Optional[Tuple[float, float]] = None,
+                        survivors: bool = False) -> pd.DataFrame:
+    """Filtri PAIRS sulla tabella. I range a None sono disattivati."""
+    out = df.copy()
+    if not out.empty and meme_min > 0:
+        out = out[pd.to_numeric(out["Meme Score"], errors="coerce").fillna(0) >= int(meme_min)]
+    if age_range_h is not None and not out.empty and "PairAgeHours" in out.columns:
+        age_series = pd.to_numeric(out["PairAgeHours"], errors="coerce")
+        out = out[age_series.between(float(age_range_h[0]), float(age_range_h[1]), inclusive="both")]
+    if liq_range is not None and not out.empty and "Liquidity (USD)" in out.columns:
+        liq_series = pd.to_numeric(out["Liquidity (USD)"], errors="coerce").fillna(0)
+        out = out[(liq_series >= liq_range[0]) & (liq_series <= liq_range[1])]
+    if vol_range is not None and not out.empty and "Volume 24h (USD)" in out.columns:
+        vol_series = pd.to_numeric(out["Volume 24h (USD)"], errors="coerce").fillna(0)
+        out = out[(vol_series >= vol_range[0]) & (vol_series <= vol_range[1])]
+    if survivors and not out.empty:
+        age_series = pd.to_numeric(out["PairAgeHours"], errors="coerce").fillna(0)
+        roi_series = pd.to_numeric(out["ROI (%)"], errors="coerce")
+        out = out[(age_series >= 1.0) & (roi_series > 0)]
+    return out
+
+# Vista paginata: ricerca/ordinamento lato server, al browser va solo la pagina visibile
+PAIRS_SEARCH_COLS = ("Pair", "DEX", "Pair Address", "Base Address")
+
+def pair_row_ids(df: pd.DataFrame) -> np.ndarray:
+    """Identità stabile di riga tra rerun e pagine: Pair Address, altrimenti Link, altrimenti Pair."""
+    ids = df["Pair"].fillna("").astype(str) if "Pair" in df.columns else pd.Series("", index=df.index)
+    for col in ("Link", "Pair Address"):
+        if col in df.columns:
+            v = df[col].fillna("").astype(str)
+            ids = v.where(v != "", ids)
+    return ids.to_numpy(dtype=object)
+
+def pairs_view_positions(df: pd.DataFrame, query: str = "", sort_col: Optional[str] = None,
+                         ascending: bool = False) -> np.ndarray:
+    """Posizioni (iloc) delle righe che contengono `query` (case-insensitive), ordinate per sort_col (NaN in coda)."""
+    pos = np.arange(len(df))
+    q = (query or "").strip().lower()
+    if q and len(df):
+        m = np.zeros(len(df), dtype=bool)
+        for col in PAIRS_SEARCH_COLS:
+            if col in df.columns:
+                m |= df[col].fillna("").astype(str).str.lower().str.contains(q, regex=False).to_numpy()
+        pos = pos[m]
+    if sort_col and sort_col in df.columns and len(pos):
+        key = df[sort_col].iloc[pos].reset_index(drop=True)
+        key = key.fillna("").astype(str).str.lower() if sort_col == "Pair" else pd.to_numeric(key, errors="coerce")
+        pos = pos[key.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()]
+    return pos
+
+# ================= Indici di ranking =================
+# Ordinamenti calcolati una volta per snapshot: ogni vista fa un take delle posizioni invece di sort_values.
+# Spec: nome -> (colonna, ascending, dropna)
+TABLE_RANKS = {
+    "volume": ("Volume 24h (USD)", False, False),
+    "roi": ("ROI (%)", False, True),
+    "ch1": ("Change 1h (%)", False, True),
+}
+PROVIDER_RANKS = {
+    "volume": ("volume24hUsd", False, False),
+    "recent": ("pairCreatedAt", False, False),
+}
+
+def _col_values(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns: return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+def top_k_positions(values: np.ndarray, k: int, ascending: bool = False, dropna: bool = False) -> np.ndarray:
+    """Posizioni dei primi k valori (argpartition + ordinamento del solo top-K). NaN in coda o esclusi; pari merito per posizione."""
+    pos = np.flatnonzero(~np.isnan(values)) if dropna else np.arange(len(values))
+    key = values[pos] if ascending else -values[pos]
+    k = min(max(0, int(k)), len(pos))
+    if k == 0: return pos[:0]
+    if k < len(pos):
+        part = np.argpartition(key, k - 1)[:k]
+        pos, key = pos[part], key[part]
+    return pos[np.lexsort((pos, key))]
+
+class RankIndex:
+    """Top-K per ogni spec su un frame (non modificato dopo la costruzione); tiene solo array di posizioni."""
+
+    def __init__(self, df: pd.DataFrame, specs: Dict[str, Tuple[str, bool, bool]], k: int = 100):
+        self.n = len(df)
+        self.k = int(k)
+        self.specs = dict(specs)
+        self._pos = {name: top_k_positions(_col_values(df, col), self.k, asc, dropna)
+                     for name, (col, asc, dropna) in self.specs.items()}
+
+    def positions(self, name: str, k: int, df: Optional[pd.DataFrame] = None) -> np.ndarray:
+        pos = self._pos[name]
+        if k > self.k and len(pos) >= self.k:  # oltre il top-K precalcolato: ricalcolo (serve il frame)
+            if df is None: raise ValueError(f"rank '{name}': k={k} oltre il top-{self.k} precalcolato")
+            col, asc, dropna = self.specs[name]
+            pos = top_k_positions(_col_values(df, col), k, asc, dropna)
+        return pos[:k]
+
+    def take(self, df: pd.DataFrame, name: str, k: int) -> pd.DataFrame:
+        if len(df) != self.n: raise ValueError("RankIndex usato su un frame diverso da quello indicizzato")
+        return df.iloc[self.positions(name, k, df)]
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sum(a.nbytes for a in self._pos.values())
+
+# ================= Indice watchlist =================
+# Simboli confrontati in maiuscolo, address così come sono (base58 è case-sensitive).
+WATCH_COLUMNS = (("baseSymbol", True), ("quoteSymbol", True), ("pairAddress", False))
+
+def norm_watchlist(s: str) -> list:
+    """'wif, bonk,So111…' -> ['WIF', 'BONK', 'So111…']: token corti (≤8) come simboli in maiuscolo."""
+    out = []
+    for part in (s or "").replace(" ", "").split(","):
+        if not part: continue
+        out.append(part.upper() if len(part) <= 8 else part)
+    return out
+
+class WatchlistIndex:
+    """Mappa simbolo/address -> posizioni riga di uno snapshot; il filtro watchlist è un lookup per voce."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.n = len(df)
+        self._pos: Dict[str, np.ndarray] = {}
+        keys = [(df[col].fillna("").astype(str).str.upper() if upper else df[col].fillna("").astype(str)).to_numpy()
+                for col, upper in WATCH_COLUMNS if col in df.columns]
+        if not self.n or not keys: return
+        rows = np.tile(np.arange(self.n), len(keys))
+        codes, uniq = pd.factorize(np.concatenate(keys))
+        order = np.argsort(codes, kind="stable")
+        bounds = np.cumsum(np.bincount(codes, minlength=len(uniq)))[:-1]
+        self._pos = dict(zip(uniq, np.split(rows[order], bounds)))
+        self._pos.pop("", None)
+
+    def mask(self, watchlist) -> np.ndarray:
+        m = np.zeros(self.n, dtype=bool)
+        hits = [self._pos[k] for k in set(watchlist) if k in self._pos]
+        if hits: m[np.concatenate(hits)] = True
+        return m
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sum(a.nbytes + 64 for a in self._pos.values())
+
+# ================= Entry Finder =================
+# Parametri: stesse chiavi dei preset (ms_min, tx_min, liq_min, liq_max, age_min_m, age_max_m,
+# vol_min, vol_max, ch1_min, ch1_max, cap_24h, trend_pos, allow_missing_ch1, allow_missing_h4,
+# survivor, targetN) + auto_relax.
+ENTRY_PRESETS = {
+    "Fiacco": {
+        "ms_min": 55, "tx_min": 80,
+        "liq_min": 5000, "liq_max": 150_000,
+        "age_min_m": 10, "age_max_m": 720,
+        "vol_min": 0, "vol_max": 0,
+        "ch1_min": -8, "ch1_max": 18,
+        "cap_24h": 120,
+        "trend_pos": True,
+        "allow_missing_ch1": True, "allow_missing_h4": True,
+        "survivor": False, "targetN": 10
+    },
+    "Medio": {
+        "ms_min": 65, "tx_min": 150,
+        "liq_min": 10_000, "liq_max": 250_000,
+        "age_min_m": 5, "age_max_m": 360,
+        "vol_min": 0, "vol_max": 0,
+        "ch1_min": -5, "ch1_max": 25,
+        "cap_24h": 150,
+        "trend_pos": True,
+        "allow_missing_ch1": True, "allow_missing_h4": True,
+        "survivor": False, "targetN": 12
+    },
+    "On-Fire": {
+        "ms_min": 70, "tx_min": 250,
+        "liq_min": 10_000, "liq_max": 0,
+        "age_min_m": 0, "age_max_m": 240,
+        "vol_min": 0, "vol_max": 0,
+        "ch1_min": -3, "ch1_max": 35,
+        "cap_24h": 200,
+        "trend_pos": True,
+        "allow_missing_ch1": True, "allow_missing_h4": True,
+        "survivor": False, "targetN": 15
+    }
+}
+
+def market_tx_heat(df_provider: pd.DataFrame) -> int:
+    """Txns 1h medie delle Top 10 per Volume 24h (snapshot provider grezzo)."""
+    if df_provider is None or df_provider.empty or "txns1h" not in df_provider.columns: return 0
+    top10 = df_provider.iloc[top_k_positions(_col_values(df_provider, "volume24hUsd"), 10)]
+    v = pd.to_numeric(top10["txns1h"], errors="coerce").mean()
+    return 0 if pd.isna(v) else int(v)
+
+def suggest_entry_preset(tx_heat) -> str:
+    try: heat = int(float(tx_heat or 0))
+    except Exception: heat = 0
+    if heat >= 900: return "On-Fire"
+    if heat >= 250: return "Medio"
+    return "Fiacco"
+
+def _num(s, col, default=0.0):
+    if col not in s.columns: return pd.Series([default]*len(s))
+    return pd.to_numeric(s[col], errors="coerce").fillna(default)
+
+# Colonne Entry Finder: chiave -> (colonna tabella PAIRS, valore se mancante); -9999 = "n/d"
+ENTRY_COLUMNS = {
+    "ms": ("Meme Score", 0.0), "tx": ("Txns 1h", 0.0), "liq": ("Liquidity (USD)", 0.0), "vol": ("Volume 24h (USD)", 0.0),
+    "ch1": ("Change 1h (%)", -9999.0), "ch4": ("Change 4h/6h (%)", -9999.0), "ch24": ("Change 24h (%)", -9999.0),
+    "roi": ("ROI (%)", -9999.0),
+}
+
+def entry_columns(dfC: pd.DataFrame) -> Dict[str, np.ndarray]:
+    c = {k: np.nan_to_num(_col_values(dfC, col), nan=d) for k, (col, d) in ENTRY_COLUMNS.items()}
+    c["age_h"] = _col_values(dfC, "PairAgeHours")  # NaN resta NaN: fuori da ogni range di età
+    return c
+
+def entry_mask(c: Dict[str, np.ndarray], p: Dict[str, Any]) -> np.ndarray:
+    """Maschere Entry Finder su colonne già riempite (entry_columns). Array di qualunque forma
+    (una tabella, o pair × tempo per sweep/backtest): stessa logica ovunque."""
+    ms, tx, liq, vol, age_h = c["ms"], c["tx"], c["liq"], c["vol"], c["age_h"]
+    ch1, ch4, ch24 = c["ch1"], c["ch4"], c["ch24"]
+    with np.errstate(invalid="ignore"):
+        m = (ms >= p["ms_min"]) & (tx >= p["tx_min"])
+        m &= (liq >= p["liq_min"]) & ((p["liq_max"] == 0) | (liq <= p["liq_max"]))
+        m &= (age_h >= p["age_min_m"] / 60.0) & (age_h <= p["age_max_m"] / 60.0)
+        m &= (vol >= p["vol_min"]) & ((p["vol_max"] == 0) | (vol <= p["vol_max"]))
+        has1 = ch1 > -9998
+        in1 = (ch1 >= p["ch1_min"]) & (ch1 <= p["ch1_max"])
+        m &= ((~has1) | in1) if p["allow_missing_ch1"] else (has1 & in1)
+        has4 = ch4 > -9998
+        if p["trend_pos"]:
+            m &= ((~has4) & bool(p["allow_missing_h4"])) | (has4 & (ch4 > 0))
+        else:
+            m &= has4 | bool(p["allow_missing_h4"])
+        m &= (ch24 <= p["cap_24h"]) | (ch24 < -9998)
+        if p["survivor"]:
+            m &= (age_h >= 1.0) & (c["roi"] > 0)
+    return m
+
+def entry_finder_scan(dfC: pd.DataFrame, p: Dict[str, Any]) -> Tuple[pd.DataFrame, bool, Optional[Dict[str, int]]]:
+    """Maschere Entry Finder + auto-relax. Ritorna (candidati, relax_applicato, parametri_relax)."""
+    tx_min = p["tx_min"]
+    liq_min_e, liq_max_e = p["liq_min"], p["liq_max"]
+    age_min_m, age_max_m = p["age_min_m"], p["age_max_m"]
+    vol_min_e, vol_max_e = p["vol_min"], p["vol_max"]
+    ch1_min, ch1_max, cap_24h = p["ch1_min"], p["ch1_max"], p["cap_24h"]
+    trend_pos = p["trend_pos"]
+    targetN = p["targetN"]
+
+    cols = entry_columns(dfC)
+    dfE = dfC[entry_mask(cols, p)].copy()
+
+    # Auto-relax (senza toccare i widget's session_state per evitare eccezioni)
+    relax_applied = False
+    chosen_params = None
+    if p.get("auto_relax", True) and (dfE.empty or len(dfE) < targetN):
+        relax_applied = True
+        _tx = int(tx_min); _ch1min = int(ch1_min); _ch1max = int(ch1_max)
+        _liqmin = int(liq_min_e); _liqmax = int(liq_max_e)
+        _volmin = int(vol_min_e); _volmax = int(vol_max_e)
+        _agemin = int(age_min_m); _agemax = int(age_max_m)
+        _cap24 = int(cap_24h)
+        for _ in range(10):
+            _tx = max(50, _tx - 50)
+            _ch1min -= 3; _ch1max += 5
+            _liqmin = max(0, _liqmin - 5000)
+            _liqmax = 0 if _liqmax == 0 else min(1_000_000_000, int(_liqmax * 2))
+            _volmin = max(0, _volmin - 20_000)
+            _volmax = 0 if _volmax == 0 else min(2_000_000_000, int(_volmax * 2))
+            _agemin = max(0, _agemin - 5)
+            _agemax = min(720, _agemax + 60)
+            _cap24  = min(300, _cap24 + 30)
+
+            # nel relax con trend_pos le H4/6 mancanti passano sempre
+            p_relax = dict(p, tx_min=_tx, ch1_min=_ch1min, ch1_max=_ch1max, liq_min=_liqmin, liq_max=_liqmax,
+                           vol_min=_volmin, vol_max=_volmax, age_min_m=_agemin, age_max_m=_agemax, cap_24h=_cap24,
+                           allow_missing_h4=True if trend_pos else p["allow_missing_h4"])
+            dfE = dfC[entry_mask(cols, p_relax)].copy()
+            chosen_params = dict(tx=_tx, ch1min=_ch1min, ch1max=_ch1max, liqmin=_liqmin, liqmax=_liqmax,
+                                 volmin=_volmin, volmax=_volmax, agemin=_agemin, agemax=_agemax, cap24=_cap24)
+            if len(dfE) >= targetN or len(dfE) > 0: break
+
+    return dfE, relax_applied, chosen_params
+
+def entry_diag_counts(dfC: pd.DataFrame) -> Dict[str, int]:
+    return {
+        "Universe": len(dfC),
+        "H1 n/d": int((_num(dfC, "Change 1h (%)", default=-9999) <= -9998).sum()),
+        "H4/6 n/d": int((_num(dfC, "Change 4h/6h (%)", default=-9999) <= -9998).sum())
+    }
+
+def _entry_grade(row, p, sweet_min, sweet_max) -> tuple[int, str]:
+    ms = float(row.get("Meme Score", 0) or 0)
+    tx = float(row.get("Txns 1h", 0) or 0)
+    liq= float(row.get("Liquidity (USD)", 0) or 0)
+    vol= float(row.get("Volume 24h (USD)", 0) or 0)
+    c1 = row.get("Change 1h (%)", None)
+    c4 = row.get("Change 4h/6h (%)", None)
+    c24= row.get("Change 24h (%)", None)
+
+    heat = s_sigmoid(tx) * 100
+    sweet_liq = score_liq(liq, sweet_min, sweet_max) * 100
+    sweet_vol = 100.0 if (vol >= p["vol_min"] and (p["vol_max"]==0 or vol <= p["vol_max"])) else (70.0 if vol>0 else 30.0)
+    mom_ok = 100.0 if (c1 is not None and p["ch1_min"] <= float(c1) <= p["ch1_max"]) else (60.0 if (c1 is None and p["allow_missing_ch1"]) else 20.0)
+    trend_ok = 100.0 if (c4 is not None and float(c4) > 0) else (60.0 if p["allow_missing_h4"] else 20.0)
+    overext = 100.0 if (c24 is None or float(c24) <= p["cap_24h"]) else 40.0
+
+    grade = 0.25*ms + 0.2*heat + 0.15*sweet_liq + 0.1*sweet_vol + 0.15*mom_ok + 0.1*trend_ok + 0.05*overext
+    badge = "🟢" if grade >= 70 else ("🟡" if grade >= 55 else "🔴")
+    return int(round(grade)), badge
+
+def _entry_reasons(r, p) -> str:
+    rs = []
+    try:
+        if float(r.get("Meme Score", 0)) >= p["ms_min"]: rs.append("MS✓")
+        if float(r.get("Txns 1h", 0)) >= p["tx_min"]: rs.append("Tx1h✓")
+        L = float(r.get("Liquidity (USD)", 0))
+        if (L >= p["liq_min"]) and ((p["liq_max"] == 0) or (L <= p["liq_max"])): rs.append("Liq✓")
+        V = float(r.get("Volume 24h (USD)", 0))
+        if (V >= p["vol_min"]) and ((p["vol_max"] == 0) or (V <= p["vol_max"])): rs.append("Vol24✓")
+        v1 = r.get("Change 1h (%)", None)
+        if pd.isna(v1):
+            if p["allow_missing_ch1"]: rs.append("H1 n/d✓")
+        else:
+            if p["ch1_min"] <= float(v1) <= p["ch1_max"]: rs.append("H1✓")
+        v4 = r.get("Change 4h/6h (%)", None)
+        if pd.isna(v4):
+            if p["allow_missing_h4"]: rs.append("H4/6 n/d✓")
+        else:
+            if (not p["trend_pos"]) or float(v4) > 0: rs.append("H4/6✓")
+        if float(r.get("Change 24h (%)", 9999)) <= p["cap_24h"]: rs.append("24h≤cap")
+        if p["survivor"] and float(r.get("ROI (%)", -999))>0 and float(r.get("PairAgeHours",0))>=1.0:
+            rs.append("Survivor✓")
+    except Exception:
+        pass
+    return ", ".join(rs)
+
+def annotate_entries(dfE: pd.DataFrame, p: Dict[str, Any], sweet_min=None, sweet_max=None) -> pd.DataFrame:
+    """Aggiunge Reasons / Entry Grade / Badge ai candidati Entry Finder (in-place)."""
+    reasons, grades, badges = [], [], []
+    for _, r in dfE.iterrows():
+        reasons.append(_entry_reasons(r, p))
+        g, b = _entry_grade(r, p, sweet_min, sweet_max)
+        grades.append(g); badges.append(b)
+    dfE["Reasons"] = reasons
+    dfE["Entry Grade"] = grades
+    dfE["Badge"] = badges
+    return dfE
+
+def sort_entries(dfE: pd.DataFrame, sort_mode: str) -> pd.DataFrame:
+    if sort_mode.startswith("Momentum"):
+        return dfE.sort_values(by=["Change 1h (%)","Entry Grade","Meme Score"], ascending=[False, False, False])
+    if sort_mode.startswith("Qualità"):
+        return dfE.sort_values(by=["Entry Grade","Meme Score","Txns 1h"], ascending=[False, False, False])
+    return dfE.sort_values(by=["PairAgeHours","Entry Grade","Meme Score"], ascending=[True, False, False])
+
+# ================= Equity curve =================
+def _addr_from_row(row: dict):
+    for k in ("Base Address","Pair Address"):
+        v = row.get(k)
+        if isinstance(v, str) and v: return v
+    return row.get("Pair")
+
+def _price_map(sel: pd.DataFrame) -> Dict[Any, float]:
+    """Chiave (come _addr_from_row) -> prezzo > 0 per le righe selezionate, senza iterrows."""
+    if "Price (USD)" not in sel.columns: return {}
+    addr = sel["Pair"].astype(object) if "Pair" in sel.columns else pd.Series(None, index=sel.index, dtype=object)
+    for k in ("Pair Address", "Base Address"):  # priorità crescente
+        if k in sel.columns:
+            v = sel[k]
+            addr = v.where(v.map(lambda x: isinstance(x, str) and x != ""), addr)
+    px = pd.to_numeric(sel["Price (USD)"], errors="coerce")
+    ok = addr.notna() & addr.astype(bool) & (px > 0)
+    return dict(zip(addr[ok], px[ok].astype(float)))
+
+def select_top_roi(df_pairs_table: pd.DataFrame, topN: int, ranks: Optional[RankIndex] = None) -> pd.DataFrame:
+    """Top N per ROI (fallback: Change 1h se nessun ROI). `ranks`: RankIndex(TABLE_RANKS) del frame, se disponibile."""
+    if df_pairs_table is None or df_pairs_table.empty: return pd.DataFrame()
+    if ranks is None: ranks = RankIndex(df_pairs_table, {k: TABLE_RANKS[k] for k in ("roi", "ch1")}, k=topN)
+    sel = ranks.take(df_pairs_table, "roi", topN)
+    # Change 1h solo se nessuna riga ha ROI
+    return sel if not sel.empty else ranks.take(df_pairs_table, "ch1", topN)
+
+def equity_tick(state: MutableMapping, df_pairs_table: pd.DataFrame, topN: int = 10,
+                ranks: Optional[RankIndex] = None) -> None:
+    """Un tick di rebalance Top ROI. `state` contiene eq_equity / eq_series (EquitySeries) / eq_last_prices."""
+    if df_pairs_table is None or df_pairs_table.empty: return
+    sel = select_top_roi(df_pairs_table, topN, ranks)
+    if sel.empty: return
+    curr_prices = _price_map(sel)
+    if not curr_prices: return
+    prev = state["eq_last_prices"] or {}
+    keys = [k for k in curr_prices if prev.get(k, 0) > 0]
+    series: EquitySeries = state["eq_series"]
+    if keys:
+        port_ret = float(np.mean(np.fromiter((curr_prices[k] for k in keys), float, len(keys))
+                                 / np.fromiter((prev[k] for k in keys), float, len(keys)) - 1.0))
+        state["eq_equity"] *= (1.0 + port_ret)
+        series.append(time.time(), state["eq_equity"], port_ret, len(keys))
+    else:
+        series.append(time.time(), state["eq_equity"], 0.0, 0)
+    state["eq_last_prices"] = curr_prices
+
+def max_drawdown(equity_series) -> float:
+    """Max drawdown (≤ 0) di una serie completa; lo storico live lo tiene incrementale (EquitySeries)."""
+    x = np.asarray(equity_series, dtype="float64")
+    if not len(x): return 0.0
+    peak = np.maximum.accumulate(x)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd = np.where(peak > 0, x / peak - 1.0, 0.0)
+    return float(min(0.0, dd.min()))
+
+# ================= Selezione alert =================
+def select_hit_alerts(df: pd.DataFrame, *, tx_min: int, liq_min: int, meme_min: int = 0) -> pd.DataFrame:
+    """Candidati alert "hit radar", ordinati per priorità (Meme Score, Txns, Liquidity)."""
+    mask = (df["Txns 1h"] >= int(tx_min)) & (df["Liquidity (USD)"] >= int(liq_min))
+    if int(meme_min) > 0: mask &= (df["Meme Score"] >= int(meme_min))
+    out = df[mask]
+    if out.empty: return out
+    return out.sort_values(by=["Meme Score","Txns 1h","Liquidity (USD)"], ascending=[False, False, False])
+
+def select_trailing_alerts(df: pd.DataFrame, *, dd_thr: float) -> pd.DataFrame:
+    """Candidati trailing-stop: drawdown oltre soglia con ROI ancora ≥ 0."""
+    dd_series = pd.to_numeric(df["Drawdown (%)"], errors="coerce")
+    roi_series = pd.to_numeric(df["ROI (%)"], errors="coerce")
+    return df[(dd_series <= float(dd_thr)) & (roi_series >= 0)]
+
+def alert_key(row) -> str:
+    return str(row.get("Base Address","")) or row.get("Pair")
+
+def format_hit_alert(row) -> str:
+    pair = row.get("Pair",""); dex = row.get("DEX",""); ms = int(row.get("Meme Score",0) or 0)
+    tx1 = int(row.get("Txns 1h",0) or 0); liq = int(row.get("Liquidity (USD)",0) or 0)
+    vol = int(row.get("Volume 24h (USD)",0) or 0)
+    px  = row.get("Price (USD)", None); chg = row.get("Change 24h (%)", None)
+    link= row.get("Link","")
+    txt = f"⚡️ Radar Hit — {pair}\nDEX: {dex}  |  MemeScore: {ms}\nTxns 1h: {tx1:,}  |  Liq: ${liq:,}  |  Vol24h: ${vol:,}"
+    if isinstance(px,(int,float)) and px: txt += f"\nPrice: {px:.8f}"
+    if chg is not None:
+        try: txt += f"  |  24h: {float(chg):.2f}%"
+        except Exception: pass
+    if link: txt += f"\n{link}"
+    return txt
+
+def format_trailing_alert(row) -> str:
+    pair = row.get("Pair",""); dd = row.get("Drawdown (%)"); roi=row.get("ROI (%)"); link=row.get("Link","")
+    txt = f"⚠️ Trailing stop — {pair}\nDD: {dd:.1f}%  |  ROI: {roi:.1f}%"
+    if link: txt += f"\n{link}"
+    return txt
+
+def format_entry_alert(row) -> str:
+    pair = row.get("Pair",""); dex = row.get("DEX","")
+    ms   = int(row.get("Meme Score",0) or 0)
+    tx1  = int(row.get("Txns 1h",0) or 0)
+    liq  = int(row.get("Liquidity (USD)",0) or 0)
+    vol  = int(row.get("Volume 24h (USD)",0) or 0)
+    px   = row.get("Price (USD)", None)
+    ch1  = row.get("Change 1h (%)", None)
+    link = row.get("Link","")
+    grade= int(row.get("Entry Grade",0) or 0)
+    badge= row.get("Badge","")
+    txt = (f"🎯 ENTRY SIGNAL {badge} — {pair}\n"
+           f"DEX: {dex} | Grade: {grade} | MS: {ms}\n"
+           f"Tx1h: {tx1:,} | Liq: ${liq:,} | Vol24h: ${vol:,}")
+    if isinstance(px,(int,float)) and px: txt += f"\nPrice: {px:.8f}"
+    if ch1 is not None:
+        try: txt += f"  |  H1: {float(ch1):.2f}%"
+        except Exception: pass
+    if link: txt += f"\n{link}"
+    return txt
@@ -0,0 +1,158 @@
+# session_store.py
+# Stato di sessione limitato per sessioni lunghe (kiosk); lo stato prezzi di processo è in price_state.py.
+#   - SessionStore: sopra st.session_state, per le chiavi registrate in SESSION_LIMITS applica TTL dall'ultimo
+#     accesso, limite di voci e di byte; oltre il tetto per sessione evita le chiavi evictable usate meno di
+#     recente. Contabilità in byte per chiave (anche delle chiavi non gestite, es. widget) per la Diagnostica.
+#   - EntryRefs: risultati Entry Finder come riferimenti di riga (id riga della tabella PAIRS condivisa) più le
+#     sole colonne calcolate dall'Entry Finder; le altre colonne si leggono dalla tabella al momento dell'uso.
+#   SESSION_STATE_MAX_MB   = tetto per sessione delle chiavi gestite              default: 32
+#   SESSION_STATE_TTL_SEC  = TTL delle chiavi gestite senza TTL proprio            default: 21600 (6 h)
+# Requisiti: numpy, pandas
+
+import os, sys, time
+from typing import Any, Dict, List, MutableMapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from derived_cache import estimate_bytes
+
+SESSION_STATE_MAX_MB = float(os.getenv("SESSION_STATE_MAX_MB", "32"))
+SESSION_STATE_TTL_SEC = float(os.getenv("SESSION_STATE_TTL_SEC", "21600"))
+
+# chiave -> limiti: ttl (s, 0 = nessuno), max_items, max_bytes, evict (rimovibile per il tetto di sessione)
+SESSION_LIMITS: Dict[str, Dict[str, Any]] = {
+    "entry_finder_results": {"ttl": SESSION_STATE_TTL_SEC, "max_items": 500, "evict": True},
+    "bt_result": {"ttl": 3600.0, "max_bytes": 16 * 2**20, "evict": True},
+    "eq_last_prices": {"ttl": 0.0, "max_items": 1000, "evict": False},
+    "eq_series": {"ttl": 0.0, "evict": False},  # già a dimensione fissa (ring buffer a livelli)
+}
+_META = "_store_meta"
+
+
+# ================= EntryRefs =================
+class EntryRefs:
+    """Candidati Entry Finder come id riga (radar_pipeline.pair_row_ids) nell'ordine del risultato, più le colonne
+    proprie dell'Entry Finder. La tabella di partenza (condivisa, cache derivata) fornisce il resto."""
+    __slots__ = ("ids", "ann", "use_table", "saved_at")
+    ANN_COLS = ("Badge", "Entry Grade", "Reasons")
+
+    def __init__(self, ids: np.ndarray, ann: Dict[str, np.ndarray], use_table: bool, saved_at: float):
+        self.ids, self.ann, self.use_table, self.saved_at = ids, ann, use_table, saved_at
+
+    @classmethod
+    def from_frame(cls, dfE: pd.DataFrame, ids: np.ndarray, use_table: bool) -> "EntryRefs":
+        ann = {c: dfE[c].to_numpy() for c in cls.ANN_COLS if c in dfE.columns}
+        return cls(np.asarray(ids, dtype=object), ann, bool(use_table), time.time())
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def head(self, n: int) -> "EntryRefs":
+        return EntryRefs(self.ids[:n], {c: a[:n] for c, a in self.ann.items()}, self.use_table, self.saved_at)
+
+    def materialize(self, base: pd.DataFrame, lookup: pd.Series) -> pd.DataFrame:
+        """Righe di `base` (id -> posizione in `lookup`, vedi row_lookup) + colonne Entry Finder. Le pair uscite
+        dalla tabella nel frattempo vengono saltate; i prezzi sono quelli dello snapshot corrente."""
+        pos = lookup.reindex(self.ids).to_numpy()
+        ok = ~pd.isna(pos)
+        out = base.iloc[pos[ok].astype(np.int64)].reset_index(drop=True)
+        for c, a in self.ann.items(): out[c] = a[ok]
+        return out
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + estimate_bytes(list(self.ids)) + sum(estimate_bytes(list(a)) for a in self.ann.values())
+
+def row_lookup(ids: np.ndarray) -> pd.Series:
+    """id riga -> prima posizione (iloc), per EntryRefs.materialize."""
+    s = pd.Series(np.arange(len(ids)), index=pd.Index(ids, dtype=object))
+    return s[~s.index.duplicated()]
+
+
+# ================= SessionStore =================
+def _trim(value: Any, n: int) -> Any:
+    if isinstance(value, (EntryRefs, pd.DataFrame)): return value.head(n)
+    if isinstance(value, dict): return dict(list(value.items())[-n:])  # le più recenti
+    if isinstance(value, list): return value[-n:]
+    return value
+
+def _items(value: Any) -> Optional[int]:
+    try: return len(value)
+    except TypeError: return None
+
+
+class SessionStore:
+    """Vista con limiti su uno stato di sessione (dict-like). Metadati (ultimo accesso, byte) nello stato stesso,
+    quindi sopravvivono ai rerun; costruire uno SessionStore per rerun costa O(1)."""
+
+    def __init__(self, state: MutableMapping, limits: Dict[str, Dict[str, Any]] = SESSION_LIMITS,
+                 max_bytes: float = SESSION_STATE_MAX_MB * 2**20):
+        self.state = state
+        self.limits = limits
+        self.max_bytes = int(max_bytes)
+        if _META not in state: state[_META] = {"access": {}, "bytes": {}, "evicted": 0}
+        self.meta = state[_META]
+
+    def put(self, key: str, value: Any) -> None:
+        lim = self.limits.get(key, {})
+        if lim.get("max_items") and (_items(value) or 0) > lim["max_items"]: value = _trim(value, lim["max_items"])
+        self.state[key] = value
+        self.meta["access"][key] = time.time()
+        self.meta["bytes"].pop(key, None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self.state: return default
+        self.meta["access"][key] = time.time()
+        return self.state[key]
+
+    def drop(self, key: str) -> None:
+        self.state.pop(key, None)
+        self.meta["access"].pop(key, None); self.meta["bytes"].pop(key, None)
+        self.meta["evicted"] += 1
+
+    def _nbytes(self, key: str, value: Any) -> int:
+        """Byte stimati; memoizzati per identità dell'oggetto (i valori gestiti vengono sostituiti, non mutati)."""
+        cached = self.meta["bytes"].get(key)
+        if cached is not None and cached[0] == id(value) and key in self.limits: return cached[1]
+        try: n = estimate_bytes(value)
+        except Exception: n = sys.getsizeof(value)
+        self.meta["bytes"][key] = (id(value), n)
+        return n
+
+    def enforce(self, now: Optional[float] = None) -> List[str]:
+        """TTL, limiti per chiave e tetto di sessione. Ritorna le chiavi rimosse."""
+        now = time.time() if now is None else now
+        access, dropped = self.meta["access"], []
+        for key, lim in self.limits.items():
+            if key not in self.state: continue
+            access.setdefault(key, now)
+            if lim.get("ttl") and now - access[key] > lim["ttl"]:
+                self.drop(key); dropped.append(key); continue
+            v = self.state[key]
+            if lim.get("max_items") and (_items(v) or 0) > lim["max_items"]:
+                self.state[key] = _trim(v, lim["max_items"])
+            if lim.get("max_bytes") and self._nbytes(key, self.state[key]) > lim["max_bytes"]:
+                self.drop(key); dropped.append(key)
+        managed = [k for k in self.limits if k in self.state]
+        total = sum(self._nbytes(k, self.state[k]) for k in managed)
+        for key in sorted((k for k in managed if self.limits[k].get("evict")), key=lambda k: access.get(k, 0)):
+            if total <= self.max_bytes: break
+            total -= self._nbytes(key, self.state[key])
+            self.drop(key); dropped.append(key)
+        return dropped
+
+    def stats(self, keys: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Byte per chiave (gestite + altre) e totale della sessione."""
+        now = time.time()
+        rows = []
+        for key in list(keys if keys is not None else self.state.keys()):
+            if key == _META or key not in self.state: continue
+            v = self.state[key]
+            lim = self.limits.get(key)
+            rows.append({"key": key, "bytes": self._nbytes(key, v), "items": _items(v), "managed": lim is not None,
+                         "age_s": now - self.meta["access"][key] if key in self.meta["access"] else None,
+                         "ttl_s": (lim or {}).get("ttl") or None})
+        rows.sort(key=lambda r: -r["bytes"])
+        managed = sum(r["bytes"] for r in rows if r["managed"])
+        return {"rows": rows, "total_bytes": sum(r["bytes"] for r in rows), "managed_bytes": managed,
+                "max_bytes": self.max_bytes, "evicted": self.meta["evicted"]}
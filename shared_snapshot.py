@@ -0,0 +1,287 @@
+# shared_snapshot.py
+# Snapshot provider in shared memory: un processo scrive, più processi (server Streamlit, repliche, daemon)
+# leggono in sola lettura senza copiare i dati.
+#   - formato colonnare: colonne numeriche come buffer numpy, stringhe come offset + dati UTF-8 (layout Arrow),
+#     colonne dizionario come codici int32 + categorie; manifest JSON in testa
+#   - ogni versione in un segmento nuovo (immutabile); il writer tiene le ultime SHM_KEEP versioni e rimuove le
+#     altre (chi le ha già mappate continua a leggerle: unlink non invalida i mapping)
+#   - header a dimensione fissa con seqlock: versione, timestamp, heartbeat, pid del writer, segmento corrente,
+#     codici HTTP dell'ultimo refresh
+#   - lettori: mmap PROT_READ del segmento (nessun resource tracker, nessuna scrittura possibile); numeriche
+#     zero-copy, stringhe zero-copy con pyarrow (string[pyarrow]) altrimenti decodificate una volta per versione
+# Requisiti: numpy, pandas (pyarrow opzionale); POSIX (shm_open)
+
+import os, json, mmap, time, struct
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from arrow_frames import HAS_ARROW
+
+try:
+    import _posixshmem  # stesso shm_open usato da multiprocessing.shared_memory
+except ImportError:  # Windows: niente modalità processo
+    _posixshmem = None
+
+SHM_KEEP = int(os.getenv("PROVIDER_SHM_KEEP", "2"))
+# writer considerato morto oltre questo intervallo senza heartbeat (i pid non valgono tra container diversi)
+STALE_SEC = float(os.getenv("PROVIDER_STALE_SEC", "30"))
+
+_ALIGN = 64
+_MAGIC = 0x4D524E50  # "MRNP"
+_LAYOUT = 1
+# magic, layout, seq, version, ts, heartbeat, pid, data_size, data_name[64], codes_len
+_HDR = struct.Struct("<IIQQddQQ64sI")
+HEADER_SIZE = 4096
+_CODES_MAX = HEADER_SIZE - _HDR.size
+
+
+def _pad(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+# ================= Formato colonnare =================
+def _encode_strings(values) -> Tuple[np.ndarray, bytes, np.ndarray]:
+    """(offset int64 n+1, dati UTF-8, bitmap validità Arrow) di una sequenza di stringhe/None."""
+    valid = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+    enc = [v.encode("utf-8") if ok else b"" for v, ok in zip(values, valid)]
+    offsets = np.zeros(len(enc) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, enc), dtype=np.int64, count=len(enc)), out=offsets[1:])
+    return offsets, b"".join(enc), np.packbits(valid, bitorder="little")
+
+def _column_parts(s: pd.Series) -> Tuple[Dict[str, Any], List[Tuple[str, Any]]]:
+    """Manifest della colonna + parti binarie (nome parte, buffer)."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        off, data, valid = _encode_strings(s.cat.categories.astype(object).map(str).tolist())
+        return ({"kind": "dict", "n_cats": len(s.cat.categories)},
+                [("codes", s.cat.codes.to_numpy().astype(np.int32)), ("offsets", off), ("data", data), ("valid", valid)])
+    if pd.api.types.is_bool_dtype(s.dtype) and not s.hasnans:
+        return {"kind": "num", "dtype": "|b1"}, [("values", s.to_numpy(dtype=bool))]
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        a = s.to_numpy(dtype="float64", na_value=np.nan) if s.hasnans or not isinstance(s.dtype, np.dtype) \
+            else s.to_numpy()
+        return {"kind": "num", "dtype": a.dtype.str}, [("values", np.ascontiguousarray(a))]
+    vals = s.astype(object).where(s.notna(), None).tolist()
+    off, data, valid = _encode_strings([v if v is None or isinstance(v, str) else str(v) for v in vals])
+    return {"kind": "str"}, [("offsets", off), ("data", data), ("valid", valid)]
+
+def pack_frame(df: pd.DataFrame, meta: Optional[Dict[str, Any]] = None) -> Tuple[int, Any]:
+    """Piano di serializzazione: (dimensione totale, write(buf)) — write scrive il frame in un buffer scrivibile."""
+    cols, parts, pos = [], [], 0
+    for name in df.columns:
+        man, ps = _column_parts(df[name])
+        man.update(name=str(name), parts={})
+        for pname, buf in ps:
+            nbytes = buf.nbytes if isinstance(buf, np.ndarray) else len(buf)
+            man["parts"][pname] = [pos, nbytes]
+            parts.append((pos, buf))
+            pos = _pad(pos + nbytes)
+        cols.append(man)
+    manifest = json.dumps({"n": len(df), "columns": cols, "meta": meta or {}}).encode("utf-8")
+    base = _pad(8 + len(manifest))
+    total = base + max(pos, 1)
+
+    def write(buf) -> None:
+        mv = memoryview(buf).cast("B")
+        mv[:8] = struct.pack("<Q", len(manifest))
+        mv[8:8 + len(manifest)] = manifest
+        for off, b in parts:
+            raw = b.view(np.uint8).reshape(-1) if isinstance(b, np.ndarray) else np.frombuffer(b, dtype=np.uint8)
+            mv[base + off: base + off + len(raw)] = raw
+    return total, write
+
+def _decode_strings(buf, n: int, p: Dict[str, list], base: int, arrow: bool):
+    offsets = np.frombuffer(buf, np.int64, n + 1, base + p["offsets"][0])
+    data_off, data_len = base + p["data"][0], p["data"][1]
+    valid_off, valid_len = base + p["valid"][0], p["valid"][1]
+    if arrow:
+        import pyarrow as pa
+        mv = memoryview(buf)
+        arr = pa.LargeStringArray.from_buffers(n, pa.py_buffer(offsets), pa.py_buffer(mv[data_off:data_off + data_len]),
+                                               pa.py_buffer(mv[valid_off:valid_off + valid_len]))
+        return pd.arrays.ArrowStringArray(arr)
+    raw = bytes(memoryview(buf)[data_off:data_off + data_len])
+    valid = np.unpackbits(np.frombuffer(buf, np.uint8, valid_len, valid_off), count=n, bitorder="little").astype(bool)
+    o = offsets.tolist()
+    out = np.empty(n, dtype=object)
+    out[:] = [raw[o[i]:o[i + 1]].decode("utf-8") if valid[i] else None for i in range(n)]
+    return out
+
+def unpack_frame(buf) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """DataFrame sopra `buf` (mmap/bytes): numeriche zero-copy, in sola lettura se buf è in sola lettura."""
+    (mlen,) = struct.unpack_from("<Q", buf, 0)
+    man = json.loads(bytes(memoryview(buf)[8:8 + mlen]))
+    base, n = _pad(8 + mlen), man["n"]
+    data: Dict[str, Any] = {}
+    for c in man["columns"]:
+        p = c["parts"]
+        if c["kind"] == "num":
+            data[c["name"]] = np.frombuffer(buf, np.dtype(c["dtype"]), n, base + p["values"][0])
+        elif c["kind"] == "dict":
+            cats = _decode_strings(buf, c["n_cats"], p, base, arrow=False)
+            codes = np.frombuffer(buf, np.int32, n, base + p["codes"][0])
+            data[c["name"]] = pd.Categorical.from_codes(codes, categories=pd.Index(cats, dtype=object))
+        else:
+            data[c["name"]] = _decode_strings(buf, n, p, base, arrow=HAS_ARROW)
+    return pd.DataFrame(data, copy=False), man.get("meta", {})
+
+
+# ================= Header =================
+def _read_header(buf) -> Optional[Dict[str, Any]]:
+    """Lettura coerente (seqlock): None se il writer sta scrivendo da troppo tempo o l'header non è valido."""
+    for _ in range(1000):
+        s1 = struct.unpack_from("<Q", buf, 8)[0]
+        if s1 % 2 == 0:
+            raw = bytes(memoryview(buf)[:HEADER_SIZE])
+            if struct.unpack_from("<Q", buf, 8)[0] == s1:
+                magic, layout, _, version, ts, hb, pid, size, name, clen = _HDR.unpack_from(raw, 0)
+                if magic != _MAGIC or layout != _LAYOUT: return None
+                codes = json.loads(raw[_HDR.size:_HDR.size + clen] or b"{}")
+                return {"version": version, "ts": ts, "heartbeat": hb, "pid": pid, "size": size,
+                        "data_name": name.rstrip(b"\0").decode(), "codes": codes}
+        time.sleep(0.0005)
+    return None
+
+def is_stale(h: Optional[Dict[str, Any]], now: Optional[float] = None) -> bool:
+    return h is None or ((now or time.time()) - h["heartbeat"]) > STALE_SEC
+
+def _create_segment(name: str, size: int) -> shared_memory.SharedMemory:
+    """Segmento nuovo fuori dal resource tracker: se il writer muore l'header (con l'ultima versione) resta e il
+    writer successivo riparte dalla versione seguente e rimuove i segmenti rimasti."""
+    seg = shared_memory.SharedMemory(name, create=True, size=size)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(seg._name, "shared_memory")
+    except Exception:
+        pass
+    return seg
+
+def _unlink(name: str) -> None:
+    try:
+        seg = shared_memory.SharedMemory(name)
+    except FileNotFoundError:
+        return
+    seg.close()
+    seg.unlink()  # registra e rimuove dal resource tracker in coppia
+
+def map_readonly(name: str, size: Optional[int] = None) -> mmap.mmap:
+    """mmap PROT_READ di un segmento esistente (nome senza '/'). FileNotFoundError se non esiste."""
+    if _posixshmem is None: raise OSError("shared memory POSIX non disponibile")
+    fd = _posixshmem.shm_open("/" + name, os.O_RDONLY, mode=0o600)
+    try:
+        return mmap.mmap(fd, size or os.fstat(fd).st_size, prot=mmap.PROT_READ)
+    finally:
+        os.close(fd)
+
+
+class SnapshotPublisher:
+    """Writer: un solo processo per nome. Alla creazione prende l'header (o lo rileva da un writer morto)."""
+
+    def __init__(self, name: str, keep: int = SHM_KEEP):
+        self.name = name
+        self.keep = max(1, int(keep))
+        self._segments: List[shared_memory.SharedMemory] = []
+        last_version = 0
+        try:
+            self._hdr = _create_segment(f"{name}_h", HEADER_SIZE)
+        except FileExistsError:
+            h = read_header(name)
+            if not is_stale(h) and h["pid"] != os.getpid():
+                raise RuntimeError(f"writer già attivo per {name} (pid {h['pid']})")
+            last_version = h["version"] if h else 0  # le versioni restano crescenti per i lettori già attaccati
+            for v in range(max(1, last_version - self.keep), last_version + 1): _unlink(f"{name}_{v}")
+            _unlink(f"{name}_h")
+            self._hdr = _create_segment(f"{name}_h", HEADER_SIZE)
+        self._seq = 0
+        self._state = {"version": last_version, "ts": 0.0, "size": 0, "data_name": b"", "codes": b"{}"}
+        self._write_header()
+
+    def _write_header(self) -> None:
+        st = self._state
+        buf = self._hdr.buf
+        self._seq += 1
+        struct.pack_into("<Q", buf, 8, self._seq)  # dispari: scrittura in corso
+        codes = st["codes"] if len(st["codes"]) <= _CODES_MAX else b"{}"
+        _HDR.pack_into(buf, 0, _MAGIC, _LAYOUT, self._seq, st["version"], st["ts"], time.time(), os.getpid(),
+                       st["size"], st["data_name"], len(codes))
+        buf[_HDR.size:_HDR.size + len(codes)] = codes
+        self._seq += 1
+        struct.pack_into("<Q", buf, 8, self._seq)
+
+    def publish(self, df: pd.DataFrame, ts: float, http_codes: Optional[Dict[str, Any]] = None) -> int:
+        """Pubblica una nuova versione. Ritorna il numero di versione (crescente anche tra riavvii del writer)."""
+        size, write = pack_frame(df)
+        version = self._state["version"] + 1
+        seg_name = f"{self.name}_{version}"
+        try:
+            seg = _create_segment(seg_name, size)
+        except FileExistsError:  # residuo di un writer precedente con la stessa versione
+            _unlink(seg_name)
+            seg = _create_segment(seg_name, size)
+        write(seg.buf)
+        self._segments.append(seg)
+        self._state.update(version=version, ts=float(ts), size=size, data_name=seg_name.encode(),
+                           codes=json.dumps({str(k): v for k, v in (http_codes or {}).items()}).encode())
+        self._write_header()
+        while len(self._segments) > self.keep:
+            old = self._segments.pop(0)
+            old.close(); _unlink(old.name)
+        return version
+
+    def heartbeat(self, http_codes: Optional[Dict[str, Any]] = None) -> None:
+        if http_codes is not None:
+            self._state["codes"] = json.dumps({str(k): v for k, v in http_codes.items()}).encode()
+        self._write_header()
+
+    def close(self) -> None:
+        for seg in self._segments:
+            try: seg.close(); _unlink(seg.name)
+            except Exception: pass
+        self._segments = []
+        try: self._hdr.close(); _unlink(self._hdr.name)
+        except Exception: pass
+
+
+def read_header(name: str) -> Optional[Dict[str, Any]]:
+    try: mm = map_readonly(f"{name}_h", HEADER_SIZE)
+    except (FileNotFoundError, OSError): return None
+    try: return _read_header(mm)
+    finally: mm.close()
+
+
+class SharedSnapshotReader:
+    """Lettore: header mappato una volta, frame decodificato una volta per versione e condiviso da tutti i
+    chiamanti del processo (copia shallow: aggiungere colonne non tocca il frame condiviso)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._hdr: Optional[mmap.mmap] = None
+        self._cache: Tuple[int, pd.DataFrame, float] = (0, pd.DataFrame(), 0.0)
+
+    def header(self) -> Optional[Dict[str, Any]]:
+        # reader condiviso dai thread delle sessioni: si lavora su un riferimento locale e il mapping non si
+        # chiude mai esplicitamente (altri thread possono starlo leggendo); lo rilascia il GC
+        hdr = self._hdr
+        if hdr is None:
+            try: hdr = self._hdr = map_readonly(f"{self.name}_h", HEADER_SIZE)
+            except (FileNotFoundError, OSError): return None
+        h = _read_header(hdr)
+        if is_stale(h) and self._hdr is hdr:
+            # writer fermo: un writer nuovo ricrea l'header, quindi si rimappa al prossimo giro
+            self._hdr = None
+        return h
+
+    def snapshot(self) -> Tuple[pd.DataFrame, float, int]:
+        h = self.header()
+        version, df, ts = self._cache
+        if h is not None and h["version"] and h["version"] != version:
+            try:
+                mm = map_readonly(h["data_name"], h["size"])
+                df, _ = unpack_frame(mm)  # i buffer numpy tengono vivo il mapping
+                version, ts = h["version"], h["ts"]
+                self._cache = (version, df, ts)
+            except FileNotFoundError:
+                pass  # segmento già sostituito: resta la versione in cache
+        return df.copy(deep=False), ts, version
@@ -0,0 +1,218 @@
+# snapshot_files.py
+# Snapshot provider come file colonnari immutabili mappati in memoria (PROVIDER_SNAPSHOT_DIR).
+# Alternativa alla shared memory di shared_snapshot.py per host con più repliche/container che condividono una
+# directory (tmpfs o disco): le pagine del file stanno una volta sola nella page cache del kernel e ogni
+# replica le mappa in sola lettura, quindi la memoria residente per replica non cresce con l'universo.
+#   - una versione = un file <dir>/<nome>/<versione>.arrow (Arrow IPC, con pyarrow) o .mrcol (formato colonnare
+#     di shared_snapshot, senza pyarrow); scritto in un file temporaneo e pubblicato con rename atomico
+#   - CURRENT (JSON, anch'esso sostituito con rename): versione, timestamp, heartbeat, pid, file, codici HTTP
+#   - un solo writer per directory (flock su LOCK, rilasciato dal kernel se il writer muore); il writer
+#     successivo riprende la numerazione da CURRENT
+#   - il writer tiene le ultime PROVIDER_SNAPSHOT_KEEP versioni: chi ha già mappato un file rimosso continua a
+#     leggerlo (unlink non invalida i mapping)
+#   PROVIDER_SNAPSHOT_DIR    = directory degli snapshot (vuoto = shared memory)   default: ""
+#   PROVIDER_SNAPSHOT_FORMAT = arrow | columnar                                   default: arrow se c'è pyarrow
+# Requisiti: numpy, pandas (pyarrow opzionale); POSIX (fcntl)
+
+import os, json, mmap, time, logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from arrow_frames import HAS_ARROW
+from shared_snapshot import SHM_KEEP, pack_frame, unpack_frame
+
+PROVIDER_SNAPSHOT_DIR = os.getenv("PROVIDER_SNAPSHOT_DIR", "")
+PROVIDER_SNAPSHOT_KEEP = int(os.getenv("PROVIDER_SNAPSHOT_KEEP", str(max(SHM_KEEP, 2))))
+PROVIDER_SNAPSHOT_FORMAT = os.getenv("PROVIDER_SNAPSHOT_FORMAT", "arrow" if HAS_ARROW else "columnar").lower()
+
+_EXT = {"arrow": ".arrow", "columnar": ".mrcol"}
+
+log = logging.getLogger("snapshot_files")
+
+
+def _replace_bytes(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh: fh.write(data)
+    os.replace(tmp, path)
+
+
+# ================= Formati =================
+def _write_arrow(df: pd.DataFrame, path: str) -> None:
+    import pyarrow as pa
+    # Tipi scelti perché to_pandas usi i buffer del file così come sono: float con NaN come NaN (con i null
+    # ricostruirebbe in memoria privata ogni colonna numerica con mancanti), stringhe large_string (il tipo di
+    # pd.StringDtype("pyarrow"); con string gli offset verrebbero convertiti in copia)
+    cols = {}
+    for c in df.columns:
+        a = pa.array(df[c], from_pandas=df[c].dtype.kind != "f")
+        cols[str(c)] = a.cast(pa.large_string()) if pa.types.is_string(a.type) else a
+    table = pa.table(cols)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as w:
+        w.write_table(table)
+
+def _write_columnar(df: pd.DataFrame, path: str) -> None:
+    size, write = pack_frame(df)
+    with open(path, "w+b") as fh:
+        fh.truncate(size)
+        mm = mmap.mmap(fh.fileno(), size)
+        try:
+            write(mm); mm.flush()
+        finally:
+            mm.close()
+
+def write_frame(df: pd.DataFrame, path_noext: str, fmt: str = PROVIDER_SNAPSHOT_FORMAT) -> str:
+    """Scrive df in <path_noext>.<ext> con rename atomico; ritorna il percorso finale. Se Arrow non riesce a
+    convertire qualche colonna si ripiega sul formato colonnare (il lettore sceglie dall'estensione)."""
+    if fmt == "arrow" and HAS_ARROW:
+        tmp = f"{path_noext}.arrow.tmp"
+        try:
+            _write_arrow(df, tmp)
+            os.replace(tmp, path_noext + ".arrow")
+            return path_noext + ".arrow"
+        except Exception:
+            if os.path.exists(tmp): os.unlink(tmp)
+    tmp = f"{path_noext}.mrcol.tmp"
+    _write_columnar(df, tmp)
+    os.replace(tmp, path_noext + ".mrcol")
+    return path_noext + ".mrcol"
+
+def _read_mapped(path: str) -> Tuple[pd.DataFrame, int, int]:
+    """(df, inizio, fine) dell'intervallo di indirizzi del mapping del file."""
+    if path.endswith(".arrow"):
+        import pyarrow as pa
+        src = pa.memory_map(path, "r")
+        whole = src.read_buffer(); src.seek(0)
+        table = pa.ipc.open_file(src).read_all()
+        strings = pd.StringDtype("pyarrow")
+        df = table.to_pandas(split_blocks=True, types_mapper={pa.string(): strings, pa.large_string(): strings}.get)
+        return df, whole.address, whole.address + whole.size
+    with open(path, "rb") as fh:
+        mm = mmap.mmap(fh.fileno(), 0, prot=mmap.PROT_READ)
+    df, _ = unpack_frame(mm)  # i buffer numpy tengono vivo il mapping
+    lo = np.frombuffer(mm, dtype=np.uint8).ctypes.data
+    return df, lo, lo + len(mm)
+
+def read_frame(path: str) -> pd.DataFrame:
+    """DataFrame sopra il file mappato in sola lettura: numeriche (e stringhe, con pyarrow) senza copie."""
+    return _read_mapped(path)[0]
+
+def _addresses(s: pd.Series) -> List[int]:
+    chunks = getattr(s.array, "_pa_array", None)
+    if chunks is not None:
+        return [b.address for c in chunks.chunks for b in c.buffers() if b is not None and b.size]
+    if s.dtype.kind in "iufbmM": return [s.to_numpy(copy=False).__array_interface__["data"][0]]
+    return []  # object (stringhe del formato colonnare): sempre decodificate in memoria privata
+
+def private_columns(df: pd.DataFrame, lo: int, hi: int) -> List[str]:
+    """Colonne numeriche/Arrow con dati fuori da [lo, hi), cioè copiate in memoria privata della replica."""
+    return [c for c in df.columns if len(df) and any(not lo <= a < hi for a in _addresses(df[c]))]
+
+
+# ================= Writer / lettore =================
+def read_current(directory: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(directory, "CURRENT"), "rb") as fh: h = json.loads(fh.read())
+    except (FileNotFoundError, ValueError):
+        return None
+    return h if isinstance(h, dict) and "version" in h else None
+
+
+class FileSnapshotPublisher:
+    """Stessa interfaccia di shared_snapshot.SnapshotPublisher, su file in `directory`."""
+
+    def __init__(self, directory: str, keep: int = PROVIDER_SNAPSHOT_KEEP, fmt: str = PROVIDER_SNAPSHOT_FORMAT):
+        import fcntl
+        self.dir = directory
+        self.keep = max(1, int(keep))
+        self.fmt = fmt if fmt in _EXT else "columnar"
+        os.makedirs(directory, exist_ok=True)
+        self._lock = open(os.path.join(directory, "LOCK"), "a+")
+        try:
+            fcntl.flock(self._lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock.close()
+            h = read_current(directory)
+            raise RuntimeError(f"writer già attivo per {directory} (pid {h['pid'] if h else '?'})")
+        h = read_current(directory)
+        self._state: Dict[str, Any] = {"version": int(h["version"]) if h else 0, "ts": float(h["ts"]) if h else 0.0,
+                                       "file": h.get("file", "") if h else "", "size": int(h.get("size", 0)) if h else 0,
+                                       "codes": h.get("codes", {}) if h else {}}
+        # residui del writer precedente: resta solo il file corrente (i lettori lo vedono fino al prossimo publish)
+        for f in os.listdir(directory):
+            if (f.endswith(".tmp") or os.path.splitext(f)[1] in (".arrow", ".mrcol")) and f != self._state["file"]:
+                try: os.unlink(os.path.join(directory, f))
+                except FileNotFoundError: pass
+        self._files = [self._state["file"]] if self._state["file"] else []
+        self._write_current()
+
+    def _write_current(self) -> None:
+        _replace_bytes(os.path.join(self.dir, "CURRENT"),
+                       json.dumps(dict(self._state, heartbeat=time.time(), pid=os.getpid())).encode())
+
+    def publish(self, df: pd.DataFrame, ts: float, http_codes: Optional[Dict[str, Any]] = None) -> int:
+        version = self._state["version"] + 1
+        path = write_frame(df, os.path.join(self.dir, f"{version:012d}"), self.fmt)
+        fname = os.path.basename(path)
+        self._files.append(fname)
+        self._state.update(version=version, ts=float(ts), file=fname, size=os.path.getsize(path),
+                           codes={str(k): v for k, v in (http_codes or {}).items()})
+        self._write_current()
+        while len(self._files) > self.keep:
+            try: os.unlink(os.path.join(self.dir, self._files.pop(0)))
+            except FileNotFoundError: pass
+        return version
+
+    def heartbeat(self, http_codes: Optional[Dict[str, Any]] = None) -> None:
+        if http_codes is not None: self._state["codes"] = {str(k): v for k, v in http_codes.items()}
+        self._write_current()
+
+    def close(self) -> None:
+        # i file restano: un writer successivo (o i lettori) ripartono dall'ultima versione
+        try: self._lock.close()
+        except Exception: pass
+
+
+class FileSnapshotReader:
+    """Stessa interfaccia di shared_snapshot.SharedSnapshotReader: frame mappato una volta per versione e
+    condiviso dai chiamanti del processo (copia shallow)."""
+
+    def __init__(self, directory: str):
+        self.name = directory
+        self._cache: Tuple[int, pd.DataFrame, float] = (0, pd.DataFrame(), 0.0)
+        self.private_columns: List[str] = []  # dell'ultima versione letta: atteso vuoto
+
+    def header(self) -> Optional[Dict[str, Any]]:
+        h = read_current(self.name)
+        if h is not None: h.setdefault("data_name", h.get("file", ""))
+        return h
+
+    def snapshot(self) -> Tuple[pd.DataFrame, float, int]:
+        h = self.header()
+        version, df, ts = self._cache
+        if h is not None and h["version"] and h["version"] != version and h.get("file"):
+            try:
+                df, lo, hi = _read_mapped(os.path.join(self.name, h["file"]))
+                private = private_columns(df, lo, hi)
+                if private and private != self.private_columns:
+                    log.warning("snapshot %s: colonne copiate in memoria privata: %s", h["file"], ", ".join(map(str, private)))
+                self.private_columns = private
+                version, ts = int(h["version"]), float(h["ts"])
+                self._cache = (version, df, ts)
+            except FileNotFoundError:
+                pass  # file già sostituito: resta la versione in cache
+        return df.copy(deep=False), ts, version
+
+
+def open_publisher(name: str):
+    """Publisher per `name`: file in PROVIDER_SNAPSHOT_DIR se impostata, altrimenti shared memory."""
+    if PROVIDER_SNAPSHOT_DIR: return FileSnapshotPublisher(os.path.join(PROVIDER_SNAPSHOT_DIR, name))
+    from shared_snapshot import SnapshotPublisher
+    return SnapshotPublisher(name)
+
+def open_reader(name: str):
+    if PROVIDER_SNAPSHOT_DIR: return FileSnapshotReader(os.path.join(PROVIDER_SNAPSHOT_DIR, name))
+    from shared_snapshot import SharedSnapshotReader
+    return SharedSnapshotReader(name)
+
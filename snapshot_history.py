@@ -0,0 +1,193 @@
+# snapshot_history.py
+# Storico snapshot provider su disco e "panel" per analisi offline (sweep parametri, backtest).
+#   - un file .npz per snapshot (colonne numeriche + testo, niente pickle), scrittura atomica (tmp + rename)
+#   - SnapshotPanel: formato lungo, una riga per pair × snapshot, ordinato per (pair, tempo); i ritorni a
+#     orizzonte e la riga precedente della stessa pair sono lookup vettoriali (searchsorted), non loop
+#   - share_arrays/attach_arrays: colonne in shared memory, lette in sola lettura dai worker di un process pool
+#   SNAPSHOT_HISTORY_DIR  = directory dei file (radar_daemon.py --record-dir)     default: "" (off)
+#   SNAPSHOT_HISTORY_DAYS = retention in giorni                                   default: 7
+# Requisiti: numpy, pandas
+
+import os, glob, time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_HISTORY_DIR  = os.getenv("SNAPSHOT_HISTORY_DIR", "")
+SNAPSHOT_HISTORY_DAYS = float(os.getenv("SNAPSHOT_HISTORY_DAYS", "7"))
+
+NUM_FIELDS = ("priceUsd", "liquidityUsd", "txns1h", "volume24hUsd", "pairCreatedAt",
+              "priceChange1hPct", "priceChange4hPct", "priceChange6hPct", "priceChange24hPct")
+TEXT_FIELDS = ("pairAddress", "baseSymbol", "quoteSymbol", "dexId")
+
+
+# ================= File =================
+def _snap_path(directory: str, ts: float) -> str:
+    return os.path.join(directory, f"snap_{int(ts * 1000)}.npz")
+
+def record_snapshot(df: pd.DataFrame, ts: float, directory: str = SNAPSHOT_HISTORY_DIR) -> Optional[str]:
+    """Salva le colonne dello snapshot usate da sweep/backtest. None se directory vuota o snapshot vuoto."""
+    if not directory or df is None or df.empty: return None
+    os.makedirs(directory, exist_ok=True)
+    cols = {"ts": np.array([float(ts)])}
+    for f in NUM_FIELDS:
+        if f in df.columns: cols[f] = pd.to_numeric(df[f], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    for f in TEXT_FIELDS:
+        if f in df.columns: cols[f] = df[f].astype(object).fillna("").astype(str).to_numpy(dtype=str)
+    path = _snap_path(directory, ts)
+    tmp = os.path.join(directory, f".{os.path.basename(path)}.tmp")
+    with open(tmp, "wb") as fh:
+        np.savez_compressed(fh, **cols)
+    os.replace(tmp, path)  # i lettori vedono solo file completi
+    return path
+
+def list_history(directory: str = SNAPSHOT_HISTORY_DIR, since: Optional[float] = None,
+                 until: Optional[float] = None) -> List[str]:
+    """File di snapshot in ordine di tempo, opzionalmente nell'intervallo [since, until] (UNIX s)."""
+    out = []
+    for path in glob.glob(os.path.join(directory, "snap_*.npz")):
+        try: ts = int(os.path.basename(path)[5:-4]) / 1000.0
+        except ValueError: continue
+        if (since is None or ts >= since) and (until is None or ts <= until): out.append((ts, path))
+    return [p for _, p in sorted(out)]
+
+def prune_history(directory: str = SNAPSHOT_HISTORY_DIR, days: float = SNAPSHOT_HISTORY_DAYS) -> int:
+    if not directory or days <= 0: return 0
+    old = list_history(directory, until=time.time() - days * 86400)
+    for path in old:
+        try: os.remove(path)
+        except OSError: pass
+    return len(old)
+
+def load_snapshot(path: str) -> Tuple[float, Dict[str, np.ndarray]]:
+    with np.load(path, allow_pickle=False) as z:
+        cols = {k: z[k] for k in z.files}
+    return float(cols.pop("ts")[0]), cols
+
+
+# ================= Panel =================
+class SnapshotPanel:
+    """
+    Righe pair × snapshot ordinate per (pair, tempo).
+    times (T,), t_idx/p_idx (N,), cols[campo] (N,) float64; pairs/symbols/dexes per pair (P,).
+    """
+
+    def __init__(self, times: np.ndarray, t_idx: np.ndarray, p_idx: np.ndarray, cols: Dict[str, np.ndarray],
+                 pairs: np.ndarray, symbols: np.ndarray, dexes: np.ndarray):
+        self.times, self.t_idx, self.p_idx, self.cols = times, t_idx, p_idx, cols
+        self.pairs, self.symbols, self.dexes = pairs, symbols, dexes
+        self._ts: Optional[np.ndarray] = None
+        self._keys: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_snapshots(cls, snaps: Sequence[Tuple[float, Dict[str, np.ndarray]]]) -> "SnapshotPanel":
+        snaps = sorted(snaps, key=lambda s: s[0])
+        sizes = [len(c.get("pairAddress", ())) for _, c in snaps]
+        n = sum(sizes)
+        times = np.array([ts for ts, _ in snaps], dtype="float64")
+        t_idx = np.repeat(np.arange(len(snaps), dtype=np.int32), sizes)
+        def cat(field, fill):
+            parts = [c[field] if field in c else np.full(k, fill) for (_, c), k in zip(snaps, sizes)]
+            return np.concatenate(parts) if parts else np.empty(0)
+        codes, pairs = pd.factorize(cat("pairAddress", ""))
+        p_idx = codes.astype(np.int32)
+        order = np.lexsort((t_idx, p_idx))
+        cols = {f: cat(f, np.nan).astype("float64")[order] for f in NUM_FIELDS}
+        first = np.unique(p_idx[order], return_index=True)[1]  # prima riga (in ordine di tempo) di ogni pair
+        symbols = cat("baseSymbol", "")[order][first] if n else np.empty(0, dtype=str)
+        dexes = cat("dexId", "")[order][first] if n else np.empty(0, dtype=str)
+        return cls(times, t_idx[order], p_idx[order], cols, np.asarray(pairs, dtype=object), symbols, dexes)
+
+    @classmethod
+    def from_files(cls, paths: Sequence[str]) -> "SnapshotPanel":
+        return cls.from_snapshots([load_snapshot(p) for p in paths])
+
+    def __len__(self) -> int:
+        return len(self.p_idx)
+
+    @property
+    def ts(self) -> np.ndarray:
+        if self._ts is None: self._ts = self.times[self.t_idx]
+        return self._ts
+
+    def age_hours(self) -> np.ndarray:
+        """Età della pair a ogni snapshot (pairCreatedAt in ms, come nello snapshot provider)."""
+        created = self.cols["pairCreatedAt"]
+        ms = np.where(created > 10_000_000_000, created, created * 1000.0)
+        return np.maximum(0.0, (self.ts - ms / 1000.0) / 3600.0)
+
+    def first_price(self) -> np.ndarray:
+        """Prezzo baseline per riga: primo prezzo > 0 della pair (come baseline_px); NaN prima di averlo."""
+        px = self.cols["priceUsd"]
+        valid = np.flatnonzero(px > 0)
+        base_pos = np.full(len(self.pairs), -1, dtype=np.int64)
+        u, fi = np.unique(self.p_idx[valid], return_index=True)
+        base_pos[u] = valid[fi]
+        pos = base_pos[self.p_idx]
+        base = np.where(pos >= 0, px[np.maximum(pos, 0)], np.nan)
+        return np.where(np.arange(len(px)) >= pos, base, np.nan)
+
+    def roi_pct(self) -> np.ndarray:
+        px = self.cols["priceUsd"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(px > 0, (px / self.first_price() - 1.0) * 100.0, np.nan)
+
+    def _row_keys(self) -> np.ndarray:
+        if self._keys is None: self._keys = self.p_idx.astype(np.int64) * (len(self.times) + 1) + self.t_idx
+        return self._keys
+
+    def prev_index(self) -> np.ndarray:
+        """Riga della stessa pair nello snapshot precedente (-1 se assente)."""
+        n = len(self.p_idx)
+        prev = np.full(n, -1, dtype=np.int64)
+        if n > 1:
+            ok = (self.p_idx[1:] == self.p_idx[:-1]) & (self.t_idx[1:] == self.t_idx[:-1] + 1)
+            prev[1:][ok] = np.flatnonzero(ok)
+        return prev
+
+    def forward_index(self, horizon_sec: float, max_lag_sec: Optional[float] = None) -> np.ndarray:
+        """Prima riga della stessa pair con ts ≥ ts + horizon (entro max_lag, default = horizon); -1 se assente."""
+        max_lag = float(horizon_sec if max_lag_sec is None else max_lag_sec)
+        ts = self.ts
+        t_target = np.searchsorted(self.times, ts + horizon_sec, side="left")
+        keys = self._row_keys()
+        pos = np.searchsorted(keys, self.p_idx.astype(np.int64) * (len(self.times) + 1) + t_target, side="left")
+        pos_c = np.minimum(pos, len(keys) - 1)
+        ok = (pos < len(keys)) & (self.p_idx[pos_c] == self.p_idx) & (ts[pos_c] <= ts + horizon_sec + max_lag)
+        return np.where(ok, pos_c, -1)
+
+
+# ================= Shared memory =================
+def share_arrays(arrays: Dict[str, np.ndarray]) -> Tuple[List[shared_memory.SharedMemory], Dict[str, tuple]]:
+    """Copia gli array in blocchi di shared memory. Ritorna (blocchi da chiudere/unlink, spec per attach_arrays)."""
+    shms, spec = [], {}
+    for name, a in arrays.items():
+        a = np.ascontiguousarray(a)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, a.nbytes))
+        np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)[...] = a
+        shms.append(shm)
+        spec[name] = (shm.name, a.shape, a.dtype.str)
+    return shms, spec
+
+def attach_arrays(spec: Dict[str, tuple]) -> Tuple[Dict[str, np.ndarray], List[shared_memory.SharedMemory]]:
+    """Viste in sola lettura sui blocchi creati da share_arrays (tenere vivi i blocchi ritornati).
+    Da usare nei processi figli (es. initializer di ProcessPoolExecutor) del processo che li ha creati."""
+    out, shms = {}, []
+    for name, (shm_name, shape, dtype) in spec.items():
+        # i worker di multiprocessing condividono il resource tracker del padre: niente unregister qui,
+        # il blocco resta registrato una volta e lo rimuove il padre (release(..., unlink=True))
+        shm = shared_memory.SharedMemory(name=shm_name)
+        a = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        a.flags.writeable = False
+        out[name] = a; shms.append(shm)
+    return out, shms
+
+def release(shms: Sequence[shared_memory.SharedMemory], unlink: bool = False) -> None:
+    for shm in shms:
+        try:
+            shm.close()
+            if unlink: shm.unlink()
+        except Exception:
+            pass
@@ -1,16 +1,51 @@
-
 # streamlit_app.py — Meme Radar (no trading) + Drill-down + ROI/ATH/DD + Survivors + Winners
 # + Equity + Entry Finder (smart+presets+vol filter) + Paper Trading (vanilla) + Telegram alerts
 # Requisiti: streamlit, plotly, pandas, requests; file market_data.py con MarketDataProvider
 
-import os, time, math, random, datetime, threading
+import os, time, math, random, uuid, runpy
+_RERUN_T0 = time.perf_counter()
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import requests
 import streamlit as st
-from urllib.parse import urlparse
 
-from market_data import MarketDataProvider
+from market_data import MarketDataProvider, SEARCH_QUERIES, UA_HEADERS, apply_provider_filters, get_shared_provider
+from derived_cache import CACHE as DERIVED, params_key
+from telegram_outbox import get_outbox
+import metrics
+import profiling
+from timing import STATS, STARTUP, PROCESS_START, mark_startup, span
+from radar_pipeline import (
+    ENTRY_PRESETS, suggest_entry_preset, RankIndex, TABLE_RANKS, PROVIDER_RANKS,
+    WatchlistIndex, norm_watchlist, pair_row_ids, pairs_view_positions,
+    build_table, apply_pairs_filters, entry_finder_scan, entry_diag_counts, annotate_entries, sort_entries,
+    equity_tick,
+)
+from equity_series import EquitySeries
+from downsample import downsample_frame
+from snapshot_history import SNAPSHOT_HISTORY_DIR, SnapshotPanel, list_history
+from paper_ledger import get_ledger, mark_source, PAPER_LEDGER_PATH, PAPER_TRAIL_PCT, PAPER_STOP_PCT
+from alert_rules import RuleEngine, default_rules, load_rules
+from session_store import SessionStore, EntryRefs, row_lookup
+# costanti UI e import pesanti (plotly.express) caricati una volta per processo / al primo grafico
+from ui_static import (
+    px, http_session, TAB_LABELS, HEAT_TONE, PAIRS_SORT, PAIRS_PAGE_SIZES, PAIRS_DISPLAY_COLS, pairs_column_config,
+    WINNERS_COLS, ENTRY_DISPLAY_COLS, PT_SORTS, POSITION_COLS, EF_DEFAULTS, STAGE_MS_COLS,
+    EF_SOURCES, EF_SORT_MODES, LAZY_WIDGET_DEFAULTS,
+    SOCIAL_LABELS, collect_socials, linkset_status,
+)
+
+# import dei moduli: a freddo solo al primo rerun del processo, poi già in sys.modules
+_IMPORT_SEC = time.perf_counter() - _RERUN_T0
+STATS.record("app.imports", _IMPORT_SEC)
+mark_startup("imports", _IMPORT_SEC)
+
+# Profiling opt-in (PROFILE_MODE): Streamlit esegue questo file come __main__; con il profiling attivo la pagina
+# gira come modulo dentro profiled("rerun"), così il profilo si chiude nel thread del rerun anche quando questo
+# è interrotto (st.rerun / st.stop sollevano eccezioni di controllo)
+if __name__ == "__main__" and profiling.enabled():
+    with profiling.profiled("rerun"):
+        runpy.run_path(__file__, run_name="meme_radar_page")
+    st.stop()
 
 # ==================== Config ====================
 st.set_page_config(page_title="Meme Radar — Solana", layout="wide")
@@ -18,43 +53,37 @@ st.title("Solana Meme Coin Radar")
 
 REFRESH_SEC   = int(os.getenv("REFRESH_SEC", "60"))
 PROXY_TICKET  = float(os.getenv("PROXY_TICKET_USD", "150"))
+UI_ALERTS     = os.getenv("UI_ALERTS", "1") != "0"  # 0 = alert gestiti da radar_daemon.py
+UI_POLL_SEC   = float(os.getenv("UI_POLL_SEC", "2"))         # controllo versione snapshot (solo fragment)
+UI_MIN_RERUN_SEC = float(os.getenv("UI_MIN_RERUN_SEC", "5"))  # intervallo minimo tra due rerun automatici
+ALERT_RULES_FILE = os.getenv("ALERT_RULES_FILE", "")  # regole alert aggiuntive (JSON, vedi alert_rules.py)
 BIRDEYE_URL   = "https://public-api.birdeye.so/defi/tokenlist?chain=solana&sort=createdBlock&order=desc&limit=50"
 AGE_LIMIT_HOURS = 10000.0
 
-SEARCH_QUERIES = [
-    "chain:solana raydium","chain:solana orca","chain:solana meteora","chain:solana lifinity",
-    "chain:solana usdc","chain:solana usdt","chain:solana sol","chain:solana bonk","chain:solana wif","chain:solana pepe",
-    "chain:solana pump",
-]
-UA_HEADERS = {
-    "User-Agent": "Mozilla/5.0 MemeRadar/1.0",
-    "Accept": "application/json",
-    "Accept-Language": "en-US,en;q=0.9",
-}
-
-# Use a single HTTP session
-_SESSION = requests.Session()
-_SESSION.headers.update(UA_HEADERS)
+# Sessione HTTP di processo (pool di connessioni condiviso tra rerun e sessioni)
+_SESSION = http_session()
 
 # =============== Session State ===============
+if "session_id" not in st.session_state: st.session_state["session_id"] = uuid.uuid4().hex
+metrics.touch_session(st.session_state["session_id"])
 if "app_running" not in st.session_state: st.session_state["app_running"] = True
 if "last_refresh_ts" not in st.session_state: st.session_state["last_refresh_ts"] = time.time()
-# Profit metrics baseline/ath per token
-for k in ("baseline_px","ath_px"):
-    if k not in st.session_state: st.session_state[k] = {}
 # Equity curve state
 if "eq_enabled" not in st.session_state: st.session_state["eq_enabled"] = True
 if "eq_init_capital" not in st.session_state: st.session_state["eq_init_capital"] = 1000.0
 if "eq_equity" not in st.session_state: st.session_state["eq_equity"] = float(st.session_state["eq_init_capital"])
-if "eq_history" not in st.session_state: st.session_state["eq_history"] = []   # [{ts,equity,ret,n}]
+if "eq_series" not in st.session_state: st.session_state["eq_series"] = EquitySeries(st.session_state["eq_init_capital"])
 if "eq_last_prices" not in st.session_state: st.session_state["eq_last_prices"] = {}
-# Alerts state
-if "tg_sent" not in st.session_state: st.session_state["tg_sent"] = {}
-# Entry Finder results state (for Paper Trading)
-if "entry_finder_results" not in st.session_state: st.session_state["entry_finder_results"] = pd.DataFrame()
+# Stato di sessione con limiti (TTL, voci, byte): risultati Entry Finder come riferimenti di riga, backtest, equity
+store = SessionStore(st.session_state)
+store.enforce()
+# Viste lazy: Streamlit ripulisce lo stato dei widget non renderizzati nel rerun; seminare e riassegnare le
+# loro chiavi le conserva a vista chiusa (servono anche a equity tick e alert Entry Finder)
+for _k, _v in LAZY_WIDGET_DEFAULTS.items():
+    st.session_state[_k] = st.session_state.get(_k, _v)
 
 # ================= Sidebar =================
-with st.sidebar:
+with st.sidebar, span("app.sidebar"):
     st.header("Impostazioni")
 
     st.subheader("Esecuzione")
@@ -210,16 +239,20 @@ with st.sidebar:
     st.divider(); st.subheader("Alert Telegram")
     TELEGRAM_BOT_TOKEN = st.text_input("Bot Token", value=os.getenv("TELEGRAM_BOT_TOKEN",""), type="password")
     TELEGRAM_CHAT_ID   = st.text_input("Chat ID", value=os.getenv("TELEGRAM_CHAT_ID",""))
+    if not UI_ALERTS: st.caption("Alert inviati dal servizio headless (radar_daemon.py): toggle disattivati.")
     st.markdown("**Soglie tabella (hit radar)**")
-    enable_alerts      = st.toggle("Abilita alert tabella (hit)", value=False)
+    enable_alerts      = st.toggle("Abilita alert tabella (hit)", value=False, disabled=not UI_ALERTS) and UI_ALERTS
     alert_tx1h_min     = st.number_input("Soglia txns 1h", min_value=0, value=200, step=10)
     alert_liq_min      = st.number_input("Soglia liquidity USD", min_value=0, value=20000, step=1000)
     alert_meme_min     = st.number_input("Soglia Meme Score (0=disattiva)", min_value=0, max_value=100, value=70, step=5)
     st.markdown("**Trailing-stop alert**")
-    enable_trailing    = st.toggle("Abilita trailing-stop alert", value=False)
+    enable_trailing    = st.toggle("Abilita trailing-stop alert", value=False, disabled=not UI_ALERTS) and UI_ALERTS
     trailing_dd_thr    = st.number_input("Soglia Drawdown (%)", value=-15.0, step=1.0)
     st.markdown("**Entry Finder alert**")
-    enable_entry_alerts = st.toggle("Abilita alert Entry Finder (🎯)", value=False)
+    enable_entry_alerts = st.toggle("Abilita alert Entry Finder (🎯)", value=False, disabled=not UI_ALERTS) and UI_ALERTS
+    # regole utente: come le altre, partono solo se abilitate esplicitamente
+    enable_custom_rules = bool(ALERT_RULES_FILE) and st.toggle(
+        f"Abilita regole da file ({os.path.basename(ALERT_RULES_FILE)})", value=False, disabled=not UI_ALERTS) and UI_ALERTS
     st.markdown("**Rate-limit**")
     alert_cooldown_min = st.number_input("Cooldown alert (min)", min_value=1, value=30, step=5)
     alert_max_per_run  = st.number_input("Max alert per refresh (hit)", min_value=1, value=3, step=1)
@@ -239,41 +272,6 @@ with st.sidebar:
 running = bool(st.session_state.get("app_running", True))
 st.markdown(f"**Stato:** {'🟢 Running' if running else '⏸️ Pausa'}")
 
-# 🔁 Auto-refresh (stabile)
-try:
-    from streamlit_autorefresh import st_autorefresh
-except Exception:
-    st_autorefresh = None
-
-if "last_refresh_ts" not in st.session_state:
-    st.session_state["last_refresh_ts"] = time.time()
-
-_prev_ts = float(st.session_state.get("last_refresh_ts", time.time()))
-_next_ts = _prev_ts + max(1, REFRESH_SEC)
-secs_left = max(0, int(round(_next_ts - time.time())))
-
-effective_auto_refresh = auto_refresh and running
-if effective_auto_refresh:
-    if st_autorefresh:
-        st_autorefresh(interval=int(REFRESH_SEC * 1000), key="auto_refresh_tick")
-    elif "fallback_rerun_thread" not in st.session_state:
-        def _delayed_rerun():
-            time.sleep(max(1, REFRESH_SEC))
-            try:
-                st.rerun()
-            except Exception:
-                pass
-        t = threading.Thread(target=_delayed_rerun, daemon=True)
-        t.start()
-        st.session_state["fallback_rerun_thread"] = True
-
-util_col1, util_col2 = st.columns([5, 1])
-with util_col1:
-    st.caption(f"Prossimo refresh ~{secs_left}s")
-with util_col2:
-    if st.button("Aggiorna ora", use_container_width=True):
-        st.rerun()
-
 # ================= Helpers =================
 def fetch_with_retry(url, tries=3, base_backoff=0.7, headers=None):
     last = (None, None)
@@ -290,32 +288,17 @@ def fetch_with_retry(url, tries=3, base_backoff=0.7, headers=None):
             last = (None, "ERR"); time.sleep(base_backoff*(i+1) + random.uniform(0,0.3))
     return last
 
-def fmt_int(n): return f"{int(round(n)):,}".replace(",", ".") if n is not None else "N/D"
+# Regole alert utente (ALERT_RULES_FILE), caricate una volta per processo
+@st.cache_resource(show_spinner=False)
+def load_custom_rules(path: str):
+    return load_rules(path) if path else []
 
-def hours_since_ms(ms_or_s):
-    if ms_or_s is None: return None
-    try:
-        v = int(ms_or_s)
-        if v > 10_000_000_000: v = v/1000.0
-        return max(0.0, (time.time() - v) / 3600.0)
-    except Exception: return None
+# Storico snapshot per il backtest (radar_daemon.py --record-dir), ricaricato solo se arrivano file nuovi
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_history_panel(directory: str, last_path: str, n_files: int):
+    return SnapshotPanel.from_files(list_history(directory))
 
-def ms_to_dt(ms_or_s):
-    if not ms_or_s: return ""
-    try:
-        v = int(ms_or_s)
-        if v > 10_000_000_000: v = v//1000
-        return datetime.datetime.utcfromtimestamp(v).strftime("%Y-%m-%d %H:%M")
-    except Exception: return str(ms_or_s)
-
-def fmt_age(hours):
-    if hours is None: return ""
-    if hours < 1: return f"{int(round(hours*60))}m"
-    if hours < 48:
-        h = int(hours); m = int(round((hours - h) * 60))
-        return f"{h}h {m}m"
-    d = int(hours // 24); h = int(hours % 24)
-    return f"{d}d {h}h"
+def fmt_int(n): return f"{int(round(n)):,}".replace(",", ".") if n is not None else "N/D"
 
 def safe_series_mean(s):
     vals = []
@@ -325,121 +308,98 @@ def safe_series_mean(s):
         except Exception: pass
     return (sum(vals)/len(vals)) if vals else None
 
-def safe_sort(df, col, ascending=False):
-    if df is None or df.empty or col not in df.columns: return df
-    return df.sort_values(by=[col], ascending=ascending)
-
-def to_float0(x, default=0.0):
-    if x is None: return default
-    try:
-        v = float(x); return v if math.isfinite(v) else default
-    except (TypeError, ValueError):
-        try:
-            s = str(x).replace(",", "").strip().replace("%", "")
-            v = float(s) if s else default
-            return v if math.isfinite(v) else default
-        except Exception:
-            return default
-
-def to_int0(x, default=0):
-    v = to_float0(x, float(default)); return int(round(v))
-
-# Meme Score helpers
-STRONG_MEMES = {"WIF","BONK","PEPE","DOGE","DOG","SHIB","WOJAK","MOG","TRUMP","ELON","CAT","KITTY","MOON","PUMP","FLOKI","BABYDOGE"}
-WEAK_MEMES   = {"FROG","COIN","INU","APE","GIGA","PONZI","LUNA","RUG","RICK","MORTY","ROCKET","HAMSTER"}
-DEX_WEIGHTS  = {"raydium":1.0, "orca":0.9, "meteora":0.85, "lifinity":0.8}
-
-def s_sigmoid(x, k=0.02):
-    try: return 1.0 / (1.0 + math.exp(-k * (float(x) - 200)))
-    except Exception: return 0.0
-def score_symbol(s):
-    S=(s or "").upper()
-    return 1.0 if any(t in S for t in STRONG_MEMES) else (0.6 if any(t in S for t in WEAK_MEMES) else 0.3)
-def score_age(hours):
-    if hours is None: return 0.5
-    return max(0.0, min(1.0, 1.0 - (hours / 72.0)))
-def score_liq(liq, mn, mx):
-    if liq is None or liq <= 0: return 0.0
-    try: mn = float(mn) if mn is not None else 0.0
-    except Exception: mn = 0.0
-    try: mx = float(mx) if mx not in (None, 0) else float("inf")
-    except Exception: mx = float("inf")
-    if mn <= liq <= mx: return 1.0
-    if liq < mn: return max(0.0, liq / (mn if mn > 0 else 1.0))
-    return max(0.0, (mx if mx < float("inf") else 0.0) / liq) if mx < float("inf") else 0.6
-def score_dex(d): return DEX_WEIGHTS.get((d or "").lower(), 0.6)
-
-def compute_meme_score_row(r, weights=None, sweet_min=None, sweet_max=None):
-    base = r.get("baseSymbol","") if hasattr(r, "get") else r["baseSymbol"]
-    dex  = r.get("dexId","") if hasattr(r, "get") else r["dexId"]
-    liq  = r.get("liquidityUsd", None) if hasattr(r, "get") else r["liquidityUsd"]
-    tx1  = r.get("txns1h", 0) if hasattr(r, "get") else r["txns1h"]
-    ageh = hours_since_ms(r.get("pairCreatedAt", 0) if hasattr(r, "get") else r["pairCreatedAt"])
-    local_weights = tuple(weights or (20,20,25,20,15))
-    f = (local_weights[0]*score_symbol(base) + local_weights[1]*score_age(ageh) +
-         local_weights[2]*s_sigmoid(tx1) + local_weights[3]*score_liq((liq or 0.0), sweet_min, sweet_max) +
-         local_weights[4]*score_dex(dex))
-    return round(100.0 * f / max(1e-6, sum(local_weights)))
-
 # ============== Provider init ==============
-if "provider" not in st.session_state:
-    prov = MarketDataProvider(refresh_sec=REFRESH_SEC, preserve_on_empty=True)
-    prov.set_queries(SEARCH_QUERIES)
-    st.session_state["provider"] = prov
-    prov.start_auto_refresh()  # aggiorna cache provider (non forza il rerun UI)
+# Un provider (un solo fetch) condiviso tra tutte le sessioni; i filtri provider della sessione si applicano
+# allo snapshot più sotto, in cache derivata. Il refresh gira nel suo thread e non forza il rerun UI
+provider: MarketDataProvider = get_shared_provider(refresh_sec=REFRESH_SEC)
+if disable_all_filters:
+    provider_filters = dict(only_raydium=False, min_liq=0.0, exclude_quotes=())
+else:
+    provider_filters = dict(only_raydium=bool(only_raydium), min_liq=float(min_liq or 0.0),
+                            exclude_quotes=tuple(sorted(str(x).upper() for x in (exclude_quotes or []))))
 
-provider: MarketDataProvider = st.session_state["provider"]
+# 🔁 Auto-refresh guidato dagli snapshot: un fragment leggero legge la versione del provider ogni UI_POLL_SEC
+# e lancia un rerun completo solo se c'è uno snapshot nuovo (al massimo uno ogni UI_MIN_RERUN_SEC).
+# Senza st.fragment (Streamlit vecchio) si ripiega su st_autorefresh a intervallo fisso.
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
 try:
-    if disable_all_filters:
-        provider.set_filters(only_raydium=False, min_liq=0, exclude_quotes=[])
-    else:
-        provider.set_filters(only_raydium=only_raydium, min_liq=min_liq, exclude_quotes=[str(x) for x in (exclude_quotes or [])])
+    from streamlit_autorefresh import st_autorefresh
 except Exception:
-    provider.set_filters(only_raydium=only_raydium if not disable_all_filters else False,
-                         min_liq=min_liq if not disable_all_filters else 0,
-                         exclude_quotes=[])
+    st_autorefresh = None
+
+def _snapshot_watcher():
+    v = provider.get_snapshot_version()
+    if v != st.session_state.get("rendered_snapshot_version", -1):
+        if time.time() - float(st.session_state.get("last_refresh_ts", 0.0)) >= UI_MIN_RERUN_SEC:
+            metrics.UI_RERUNS.inc(trigger="snapshot")
+            st.rerun()
+        metrics.UI_RERUNS.inc(trigger="throttled")
+    st.caption(f"Snapshot v{v} • auto-refresh su dati nuovi (controllo ogni {UI_POLL_SEC:g}s)")
+
+util_col1, util_col2 = st.columns([5, 1])
+with util_col1:
+    if auto_refresh and running:
+        if _fragment is not None:
+            _fragment(run_every=UI_POLL_SEC)(_snapshot_watcher)()
+        elif st_autorefresh:
+            st_autorefresh(interval=int(REFRESH_SEC * 1000), key="auto_refresh_tick")
+            st.caption(f"Refresh ogni {REFRESH_SEC}s")
+    else:
+        st.caption("Auto-refresh disattivato")
+with util_col2:
+    if st.button("Aggiorna ora", use_container_width=True):
+        st.rerun()
+
+with span("app.snapshot"):
+    df_snapshot, ts, snapshot_version = provider.get_snapshot_versioned()
+    codes = provider.get_last_http_codes()
+# rerun servito con lo stesso snapshot del rerun precedente = hit
+metrics.CACHE_REQUESTS.inc(cache="snapshot", result="hit" if ts and ts == st.session_state.get("last_snapshot_ts") else "miss")
+st.session_state["last_snapshot_ts"] = ts
+st.session_state["rendered_snapshot_version"] = snapshot_version
+
+# Tabelle derivate: cache di processo condivisa tra sessioni, chiave = snapshot + filtri provider + parametri
+# (derived_cache.py); sessioni con gli stessi filtri condividono tutto, a partire dallo snapshot filtrato
+SNAP_KEY = (provider.key, snapshot_version, tuple(sorted(provider_filters.items())))
+def derived(namespace: str, params: dict, compute):
+    return DERIVED.get_or_compute(namespace, SNAP_KEY, params, compute, session=st.session_state["session_id"])
 
-df_provider, ts = provider.get_snapshot()
-codes = provider.get_last_http_codes()
+with span("app.provider_filters"):
+    df_provider = derived("provider_filtered", {}, lambda: apply_provider_filters(df_snapshot, **provider_filters))
+
+# Indici di ranking per snapshot (top-K per volume/ROI/Change 1h/età): le viste fanno take, non sort_values
+def ranks_for(namespace: str, params: dict, df: pd.DataFrame, specs) -> RankIndex:
+    return derived(namespace, params, lambda: RankIndex(df, specs))
+
+prov_ranks = ranks_for("ranks_provider", {}, df_provider, PROVIDER_RANKS)
 st.caption(f"Aggiornato: {time.strftime('%H:%M:%S', time.localtime(ts))}" if ts else "Aggiornamento in corso…")
 
 # ============== Watchlist & Volume filtro dataset ==============
-df_view = df_provider.copy()
+df_view = df_provider.copy(deep=False)  # le colonne restano quelle dello snapshot condiviso
 pre_count = len(df_view)
 
-def norm_list(s):
-    out = []
-    for part in (s or "").replace(" ", "").split(","):
-        if not part: continue
-        out.append(part.upper() if len(part) <= 8 else part)
-    return out
-
-watchlist = norm_list(st.session_state.get("watchlist_input", ""))
-
-def is_watch_hit_row(r):
-    base = str(r.get("baseSymbol","")).upper() if hasattr(r,"get") else str(r["baseSymbol"]).upper()
-    quote= str(r.get("quoteSymbol","")).upper() if hasattr(r,"get") else str(r["quoteSymbol"]).upper()
-    addr = r.get("pairAddress","") if hasattr(r,"get") else r["pairAddress"]
-    return (watchlist and (base in watchlist or quote in watchlist or addr in watchlist))
-
-if st.session_state.get("watchlist_only", False) and not df_view.empty:
-    mask = df_view.apply(is_watch_hit_row, axis=1)
-    df_view = df_view[mask].reset_index(drop=True)
-post_watch_count = len(df_view)
-
-vmin = int(st.session_state.get("vol24_min", 0))
-vmax = int(st.session_state.get("vol24_max", 0))
-if not df_view.empty:
-    vol_series = pd.to_numeric(df_view["volume24hUsd"], errors="coerce").fillna(0)
-    mask_vol = (vol_series >= vmin) & ((vmax == 0) | (vol_series <= vmax))
-    df_view = df_view[mask_vol].reset_index(drop=True)
-post_vol_count = len(df_view)
+watchlist = norm_watchlist(st.session_state.get("watchlist_input", ""))
+
+with span("app.watchlist_volume"):
+    if st.session_state.get("watchlist_only", False) and not df_view.empty:
+        # indice simbolo/address per snapshot, condiviso tra sessioni: costo per rerun O(voci watchlist)
+        watch_index = derived("watch_index", {}, lambda: WatchlistIndex(df_provider))
+        df_view = df_view[watch_index.mask(watchlist)].reset_index(drop=True)
+    post_watch_count = len(df_view)
+
+    vmin = int(st.session_state.get("vol24_min", 0))
+    vmax = int(st.session_state.get("vol24_max", 0))
+    if not df_view.empty:
+        vol_series = pd.to_numeric(df_view["volume24hUsd"], errors="coerce").fillna(0)
+        mask_vol = (vol_series >= vmin) & ((vmax == 0) | (vol_series <= vmax))
+        df_view = df_view[mask_vol].reset_index(drop=True)
+    post_vol_count = len(df_view)
 
 # ============== KPI Base ==============
 if df_provider.empty:
     vol24_avg = None; tx1h_avg = None
 else:
-    top10_raw = df_provider.sort_values(by=["volume24hUsd"], ascending=False).head(10)
+    top10_raw = prov_ranks.take(df_provider, "volume", 10)
     vol24_avg = safe_series_mean(top10_raw["volume24hUsd"])
     tx1h_avg  = safe_series_mean(top10_raw["txns1h"])
 if (not vol24_avg or vol24_avg == 0) and (tx1h_avg and tx1h_avg > 0):
@@ -449,7 +409,8 @@ if (not vol24_avg or vol24_avg == 0) and (tx1h_avg and tx1h_avg > 0):
 be_headers = {"accept": "application/json"}
 be_key = os.getenv("BE_API_KEY","")
 if be_key: be_headers["x-api-key"] = be_key
-bird_data, bird_code = fetch_with_retry(BIRDEYE_URL, headers={**UA_HEADERS, **be_headers})
+with span("app.birdeye_fetch"):
+    bird_data, bird_code = fetch_with_retry(BIRDEYE_URL, headers={**UA_HEADERS, **be_headers})
 bird_tokens, bird_ok = [], False
 if bird_data and "data" in bird_data:
     if isinstance(bird_data["data"], dict) and isinstance(bird_data["data"].get("tokens"), list):
@@ -471,8 +432,7 @@ if bird_ok and bird_tokens:
     new_liq_values = [liquidity_from_birdeye_token(t) for t in bird_tokens[:20]]
     new_liq_values = [v for v in new_liq_values if v is not None]
 else:
-    recents = safe_sort(df_provider, "pairCreatedAt", ascending=False)
-    recents = recents.head(20) if recents is not None and not recents.empty else pd.DataFrame(columns=["liquidityUsd","baseSymbol"])
+    recents = prov_ranks.take(df_provider, "recent", 20) if not df_provider.empty else pd.DataFrame(columns=["liquidityUsd","baseSymbol"])
     liq_series = recents.get("liquidityUsd", pd.Series(dtype=float))
     new_liq_values = [float(x) for x in liq_series.tolist() if pd.notna(x)]
 new_liq_avg = (sum(new_liq_values)/len(new_liq_values)) if new_liq_values else None
@@ -483,7 +443,7 @@ if vol24_avg is not None and vol24_avg > 0:
     if vol24_avg > 1_000_000: score = "ON FIRE"
     elif vol24_avg > 200_000: score = "MEDIO"
     else: score = "FIACCO"
-tone = {"ON FIRE":"🟢","MEDIO":"🟡","FIACCO":"🔴","N/D":"⚪️"}.get(score,"")
+tone = HEAT_TONE.get(score, "")
 
 # ============== KPI UI ==============
 c1, c2, c3, c4 = st.columns(4)
@@ -492,133 +452,61 @@ with c2: st.metric("Volume 24h medio Top 10", fmt_int(vol24_avg))
 with c3: st.metric("Txns 1h medie Top 10", fmt_int(tx1h_avg))
 with c4: st.metric("Nuove coin – Liquidity media", fmt_int(new_liq_avg))
 
-# ============== ROI/ATH/DD helpers ==============
-def _addr_key_from_rowdict(rdict):
-    for k in ("baseAddress","pairAddress","Base Address","Pair Address"):
-        v = rdict.get(k)
-        if v: return str(v)
-    return rdict.get("Pair") or rdict.get("pair") or None
-
-def update_profit_metrics_from_raw(rdict):
-    addr = _addr_key_from_rowdict(rdict)
-    if not addr: return None, None, None
-    px = rdict.get("priceUsd")
-    try:
-        px = None if px in (None, "") else float(px)
-    except Exception:
-        px = None
-    if not px or px <= 0: return None, None, None
-
-    if addr not in st.session_state["baseline_px"]:
-        st.session_state["baseline_px"][addr] = float(px)
-    base = st.session_state["baseline_px"][addr]
-    prev_ath = st.session_state["ath_px"].get(addr, base)
-    new_ath = max(prev_ath, px)
-    st.session_state["ath_px"][addr] = new_ath
-
-    roi_pct = (px/base - 1.0)*100.0 if base>0 else None
-    ath_pct = (new_ath/base - 1.0)*100.0 if base>0 else None
-    dd_pct  = (px/new_ath - 1.0)*100.0 if new_ath>0 else None
-    return roi_pct, ath_pct, dd_pct
-
-# ============== Change helpers ==============
-def _to_float_pct(x):
-    if x is None: return None
-    try:
-        s = str(x).replace("%", "").strip()
-        return float(s) if s != "" else None
-    except Exception:
-        return None
-
-def _get_change_pct_from_nested(r, nested_key, candidates):
-    try:
-        obj = r.get(nested_key) if hasattr(r, "get") else r[nested_key]
-    except Exception:
-        obj = None
-    if isinstance(obj, dict):
-        for name in candidates:
-            if name in obj and obj[name] is not None:
-                val = _to_float_pct(obj[name])
-                if val is not None: return val
-    return None
-
-def _get_change_pct(r, flat_keys, nested_key, nested_candidates):
-    for k in flat_keys:
-        v = r.get(k) if hasattr(r, "get") else r[k]
-        val = _to_float_pct(v)
-        if val is not None: return val
-    return _get_change_pct_from_nested(r, nested_key, nested_candidates)
-
 # ============== Tabella (build) ==============
-def build_table(df):
-    rows = []
-    for r in df.to_dict(orient="records"):
-        mscore = compute_meme_score_row(r, (w_symbol, w_age, w_txns, w_liq, w_dex), liq_min_sweet, liq_max_sweet)
-        ageh = hours_since_ms(r.get("pairCreatedAt", 0))
-        chg_1h = _get_change_pct(r, ["priceChange1hPct","priceChangeH1Pct","pc1h","priceChange1h"], "priceChange", ("h1","1h","m60","60m"))
-        chg_4h = _get_change_pct(r, ["priceChange4hPct","priceChangeH4Pct","pc4h","priceChange4h"], "priceChange", ("h4","4h","m240","240m"))
-        if show_h6_fallback and chg_4h is None:
-            chg_4h = _get_change_pct(r, ["priceChange6hPct","priceChangeH6Pct","pc6h","priceChange6h"], "priceChange", ("h6","6h","m360","360m"))
-        chg_24h = _get_change_pct(r, ["priceChange24hPct","priceChangeH24Pct","pc24h","priceChange24h"], "priceChange", ("h24","24h","m1440","1440m"))
-        roi_pct, ath_pct, dd_pct = update_profit_metrics_from_raw(r)
-
-        rows.append({
-            "Meme Score": mscore,
-            "Pair": f"{r.get('baseSymbol','')}/{r.get('quoteSymbol','')}",
-            "DEX": r.get("dexId",""),
-            "Liquidity (USD)": to_int0(r.get("liquidityUsd"), 0),
-            "Txns 1h": to_int0(r.get("txns1h"), 0),
-            "Volume 24h (USD)": to_int0(r.get("volume24hUsd"), 0),
-            "Price (USD)": (None if r.get("priceUsd") in (None, "") else to_float0(r.get("priceUsd"), None)),
-            "ROI (%)": roi_pct, "ATH (%)": ath_pct, "Drawdown (%)": dd_pct,
-            "Change 1h (%)": chg_1h, "Change 4h/6h (%)": chg_4h, "Change 24h (%)": chg_24h,
-            "Created (UTC)": ms_to_dt(r.get("pairCreatedAt", 0)),
-            "Pair Age": fmt_age(ageh), "PairAgeHours": (float(ageh) if ageh is not None else None),
-            "Link": r.get("url",""),
-            "Base Address": r.get("baseAddress",""), "Pair Address": r.get("pairAddress",""),
-            "baseSymbol": r.get("baseSymbol",""), "quoteSymbol": r.get("quoteSymbol",""),
-        })
-    out = pd.DataFrame(rows)
-    if not out.empty and sort_by_meme:
-        out = out.sort_values(by=["Meme Score","Txns 1h","Liquidity (USD)"], ascending=[False, False, False])
-    return out
-
-df_pairs = build_table(df_view)
-
-# === Filtri SOLO tabella ===
-df_pairs_table = df_pairs.copy()
-if not df_pairs_table.empty and pairs_meme_min > 0:
-    df_pairs_table = df_pairs_table[pd.to_numeric(df_pairs_table["Meme Score"], errors="coerce").fillna(0) >= int(pairs_meme_min)]
-if not df_pairs_table.empty and "PairAgeHours" in df_pairs_table.columns:
-    age_series = pd.to_numeric(df_pairs_table["PairAgeHours"], errors="coerce")
-    df_pairs_table = df_pairs_table[age_series.between(float(pairs_age_min_h), float(pairs_age_max_h), inclusive="both")]
-if pairs_liq_enable and not df_pairs_table.empty and "Liquidity (USD)" in df_pairs_table.columns:
-    liq_series = pd.to_numeric(df_pairs_table["Liquidity (USD)"], errors="coerce").fillna(0)
-    df_pairs_table = df_pairs_table[(liq_series >= pairs_liq_min) & (liq_series <= pairs_liq_max)]
-if pairs_vol_enable and not df_pairs_table.empty and "Volume 24h (USD)" in df_pairs_table.columns:
-    vol_series_tbl = pd.to_numeric(df_pairs_table["Volume 24h (USD)"], errors="coerce").fillna(0)
-    df_pairs_table = df_pairs_table[(vol_series_tbl >= pairs_vol_min) & (vol_series_tbl <= pairs_vol_max)]
-if survivors_only and not df_pairs_table.empty:
-    age_series = pd.to_numeric(df_pairs_table["PairAgeHours"], errors="coerce").fillna(0)
-    roi_series = pd.to_numeric(df_pairs_table["ROI (%)"], errors="coerce")
-    df_pairs_table = df_pairs_table[(age_series >= 1.0) & (roi_series > 0)]
-
-# === PAIRS → Diagnostica (opzionale) ===
-df_pairs_diag = df_pairs.copy()
-if pairs_filters_to_strategy and not df_pairs_diag.empty:
-    if apply_meme_to_strat and pairs_meme_min > 0:
-        df_pairs_diag = df_pairs_diag[pd.to_numeric(df_pairs_diag["Meme Score"], errors="coerce").fillna(0) >= int(pairs_meme_min)]
-    if apply_age_to_strat and "PairAgeHours" in df_pairs_diag.columns:
-        age_series_str = pd.to_numeric(df_pairs_diag["PairAgeHours"], errors="coerce")
-        df_pairs_diag = df_pairs_diag[age_series_str.between(float(pairs_age_min_h), float(pairs_age_max_h), inclusive="both")]
-    if apply_liq_to_strat and pairs_liq_enable and "Liquidity (USD)" in df_pairs_diag.columns:
-        liq_series_str = pd.to_numeric(df_pairs_diag["Liquidity (USD)"], errors="coerce").fillna(0)
-        df_pairs_diag = df_pairs_diag[(liq_series_str >= pairs_liq_min) & (liq_series_str <= pairs_liq_max)]
-    if apply_vol_to_strat and pairs_vol_enable and "Volume 24h (USD)" in df_pairs_diag.columns:
-        vol_series_str = pd.to_numeric(df_pairs_diag["Volume 24h (USD)"], errors="coerce").fillna(0)
-        df_pairs_diag = df_pairs_diag[(vol_series_str >= pairs_vol_min) & (vol_series_str <= pairs_vol_max)]
+# Parametri che determinano df_view → tabella (watchlist/volume + Meme Score); età/Created calcolate
+# in batch con un "now" per minuto: la tabella è in cache per snapshot e minuto
+AGE_MINUTE = int(time.time() // 60)
+table_params = dict(
+    age_minute=AGE_MINUTE, watch=(bool(st.session_state.get("watchlist_only", False)), watchlist), vol=(vmin, vmax),
+    weights=(w_symbol, w_age, w_txns, w_liq, w_dex), sweet=(liq_min_sweet, liq_max_sweet),
+    h6_fallback=show_h6_fallback, sort_by_meme=sort_by_meme,
+)
+with span("app.build_table"):
+    # baseline/ATH per ROI del provider, aggiornati dal provider una volta per snapshot sul frame completo (qui
+    # solo letti): ROI/ATH sono "dalla prima volta che il processo ha visto la pair", uguali per tutte le sessioni
+    df_pairs = derived("pairs_table", table_params, lambda: build_table(
+        df_view, weights=(w_symbol, w_age, w_txns, w_liq, w_dex), sweet_min=liq_min_sweet, sweet_max=liq_max_sweet,
+        h6_fallback=show_h6_fallback, sort_by_meme=sort_by_meme,
+        baseline_px=provider.baseline_px, ath_px=provider.ath_px, now=AGE_MINUTE * 60.0,
+    ))
+
+with span("app.pairs_filters"):
+    # === Filtri SOLO tabella ===
+    table_filter_kw = dict(
+        meme_min=pairs_meme_min, age_range_h=(pairs_age_min_h, pairs_age_max_h),
+        liq_range=(pairs_liq_min, pairs_liq_max) if pairs_liq_enable else None,
+        vol_range=(pairs_vol_min, pairs_vol_max) if pairs_vol_enable else None,
+        survivors=survivors_only,
+    )
+    table_filter_params = dict(table_params, filters=table_filter_kw)
+    df_pairs_table = derived("pairs_filtered", table_filter_params, lambda: apply_pairs_filters(df_pairs, **table_filter_kw))
+
+    # === PAIRS → Diagnostica (opzionale) ===
+    df_pairs_diag = df_pairs; diag_params = table_params
+    if pairs_filters_to_strategy and not df_pairs_diag.empty:
+        diag_kw = dict(
+            meme_min=pairs_meme_min if apply_meme_to_strat else 0,
+            age_range_h=(pairs_age_min_h, pairs_age_max_h) if apply_age_to_strat else None,
+            liq_range=(pairs_liq_min, pairs_liq_max) if (apply_liq_to_strat and pairs_liq_enable) else None,
+            vol_range=(pairs_vol_min, pairs_vol_max) if (apply_vol_to_strat and pairs_vol_enable) else None,
+        )
+        diag_params = dict(table_params, filters=diag_kw)
+        df_pairs_diag = derived("pairs_diag", diag_params, lambda: apply_pairs_filters(df_pairs, **diag_kw))
 
 df_pairs_used = df_pairs_diag if (pairs_filters_to_strategy) else df_pairs
+used_params = diag_params if (pairs_filters_to_strategy) else table_params
+table_ranks = ranks_for("ranks_table", table_filter_params, df_pairs_table, TABLE_RANKS)
+
+def entry_scan(use_table: bool, p: dict, sort_mode: str):
+    """Entry Finder (maschere + auto-relax + grade + ordinamento) condiviso tra vista e alert, in cache."""
+    base = df_pairs_table if use_table else df_pairs
+    def compute():
+        if base is None or base.empty: return pd.DataFrame(), False, None, entry_diag_counts(pd.DataFrame())
+        dfE, relax, chosen = entry_finder_scan(base.copy(), p)
+        if not dfE.empty:
+            dfE = sort_entries(annotate_entries(dfE, p, liq_min_sweet, liq_max_sweet), sort_mode)
+        return dfE, relax, chosen, entry_diag_counts(base)
+    return derived("entry_scan", dict(table_filter_params, use_table=use_table, ef=p, sort=sort_mode), compute)
 
 # Pillola riassuntiva PAIRS→Diagnostica
 def _fmt_exp_range(lo_exp, hi_exp):
@@ -646,78 +534,45 @@ if pairs_filters_to_strategy:
 else:
     st.caption("PAIRS→Diagnostica: **OFF** — i filtri PAIRS impattano solo **Tabella/Top 10**, non la diagnostica.")
 
-# ============== Equity helpers & tick ==============
-def _addr_from_row(row: dict):
-    for k in ("Base Address","Pair Address"):
-        v = row.get(k)
-        if isinstance(v, str) and v: return v
-    return row.get("Pair")
-
-def _select_top_roi(df_pairs_table: pd.DataFrame, topN: int) -> pd.DataFrame:
-    if df_pairs_table is None or df_pairs_table.empty: return pd.DataFrame()
-    tmp = df_pairs_table.copy()
-    tmp["ROI_val"] = pd.to_numeric(tmp["ROI (%)"], errors="coerce")
-    tmp = tmp.dropna(subset=["ROI_val"])
-    if tmp.empty:
-        tmp["c1_val"] = pd.to_numeric(tmp["Change 1h (%)"], errors="coerce")
-        tmp = tmp.dropna(subset=["c1_val"]).sort_values(by="c1_val", ascending=False).head(topN)
-    else:
-        tmp = tmp.sort_values(by="ROI_val", ascending=False).head(topN)
-    return tmp
-
-def _equity_tick(df_pairs_table: pd.DataFrame, topN: int = 10) -> None:
-    if df_pairs_table is None or df_pairs_table.empty: return
-    sel = _select_top_roi(df_pairs_table, topN); 
-    if sel.empty: return
-    curr_prices = {}
-    for _, row in sel.iterrows():
-        addr = _addr_from_row(row); px = row.get("Price (USD)")
-        try:
-            if addr and px is not None and float(px) > 0: curr_prices[addr] = float(px)
-        except Exception: pass
-    if not curr_prices: return
-    prev = st.session_state["eq_last_prices"] or {}
-    keys = [k for k in curr_prices.keys() if k in prev and prev[k] > 0]
-    if keys:
-        rets = []
-        for k in keys:
-            try: rets.append(curr_prices[k] / prev[k] - 1.0)
-            except Exception: pass
-        if rets:
-            port_ret = sum(rets) / len(rets)
-            st.session_state["eq_equity"] *= (1.0 + port_ret)
-            st.session_state["eq_history"].append({"ts": time.time(),"equity": st.session_state["eq_equity"],"ret": port_ret,"n": len(keys)})
-    else:
-        st.session_state["eq_history"].append({"ts": time.time(),"equity": st.session_state["eq_equity"],"ret": 0.0,"n": 0})
-    st.session_state["eq_last_prices"] = curr_prices
-
-def _max_drawdown(equity_series: list[float]) -> float:
-    peak = -1e18; mdd = 0.0
-    for x in equity_series:
-        if x > peak: peak = x
-        if peak > 0:
-            dd = (x / peak) - 1.0
-            if dd < mdd: mdd = dd
-    return mdd
-
+# ============== Equity tick ==============
 if running and st.session_state.get("eq_enabled", True):
     topn_tick = int(st.session_state.get("eq_topN_tab", 10))
-    _equity_tick(df_pairs_table, topN=topn_tick)
+    with span("app.equity_tick"):
+        equity_tick(st.session_state, df_pairs_table, topN=topn_tick, ranks=table_ranks)
+
+# ============== Paper ledger: mark-to-market (una volta per snapshot, condiviso tra sessioni) ==============
+# Il ledger si apre solo quando serve (esecuzione attiva o vista Paper Trading). Best effort: con il file occupato
+# da un altro processo si attende al massimo 2 s, e un errore SQLite non interrompe il rerun
+if running:
+    with span("app.paper_mtm"):
+        try:
+            get_ledger().mark_to_market(df_snapshot, ts, source=mark_source(getattr(provider, "key", "")), busy_timeout=2.0)
+        except Exception as e:
+            st.caption(f"Paper ledger: mark-to-market non riuscito — {e}")
 
 # ============================ TABS ============================
-tab_radar, tab_winners, tab_equity, tab_entry, tab_paper = st.tabs(
-    ["📡 Radar", "🏆 Winners Now", "📈 Equity Curve", "🎯 Entry Finder", "🧪 Paper Trading"]
-)
-
-with tab_radar:
+# Vista lazy: st.tabs eseguirebbe tutti i corpi a ogni rerun, qui gira solo la vista selezionata.
+# Ogni vista è un fragment: un widget al suo interno riesegue solo la vista, non la pipeline globale.
+active_tab = st.radio("Vista", TAB_LABELS, horizontal=True, key="active_tab", label_visibility="collapsed")
+
+def tab_view(stage: str):
+    def deco(fn):
+        def run():
+            with span(stage): fn()
+        return _fragment(run) if _fragment is not None else run
+    return deco
+
+@tab_view("app.tab_radar")
+def radar_view():
     # Charts
     left, right = st.columns(2)
     with left:
         if not df_pairs_table.empty:
-            df_top = df_pairs_table.sort_values(by=["Volume 24h (USD)"], ascending=False).head(10)
+            df_top = table_ranks.take(df_pairs_table, "volume", 10)
             df_chart = pd.DataFrame({"Token": df_top["Pair"], "Volume 24h": df_top["Volume 24h (USD)"].fillna(0)})
-            fig = px.bar(df_chart, x="Token", y="Volume 24h", title="Top 10 Volume 24h (tabella filtrata)")
-            st.plotly_chart(fig, use_container_width=True)
+            with span("app.charts"):
+                fig = px.bar(df_chart, x="Token", y="Volume 24h", title="Top 10 Volume 24h (tabella filtrata)")
+                st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("Nessuna coppia disponibile con i filtri tabella attuali.")
     with right:
@@ -727,62 +582,71 @@ with tab_radar:
                 names.append(t.get("name") or t.get("symbol") or (t.get("mint") or "")[:6])
                 liqs.append(liquidity_from_birdeye_token(t) or 0)
             df_liq = pd.DataFrame({"Token": names, "Liquidity": liqs})
-            fig2 = px.bar(df_liq, x="Token", y="Liquidity", title="Ultime 20 Nuove Coin – Liquidity (Birdeye)")
-            st.plotly_chart(fig2, use_container_width=True)
+            with span("app.charts"):
+                fig2 = px.bar(df_liq, x="Token", y="Liquidity", title="Ultime 20 Nuove Coin – Liquidity (Birdeye)")
+                st.plotly_chart(fig2, use_container_width=True)
 
     # Tabella PAIRS + Drilldown
     st.markdown("### Pairs (post-filtri)")
     if not df_pairs_table.empty:
-        base_for_view = df_pairs_table
-        df_pairs_for_view = base_for_view.sort_values(by=["Volume 24h (USD)"], ascending=False).head(10) if show_top10_table else base_for_view
-
-        df_pairs_for_view = df_pairs_for_view.copy()
-        if "Select" not in df_pairs_for_view.columns:
-            df_pairs_for_view.insert(0, "Select", False)
-
-        display_cols = ["Select","Pair","DEX","Meme Score","Price (USD)",
-                        "ROI (%)","ATH (%)","Drawdown (%)",
-                        "Change 1h (%)","Change 4h/6h (%)","Change 24h (%)",
-                        "Txns 1h","Liquidity (USD)","Volume 24h (USD)","Pair Age","Link"]
-        if not show_pair_age and "Pair Age" in display_cols:
-            display_cols.remove("Pair Age")
+        row_ids = derived("pairs_row_ids", table_filter_params, lambda: pair_row_ids(df_pairs_table))
+        if show_top10_table:
+            view_pos = table_ranks.positions("volume", 10, df_pairs_table)
+            page_pos = view_pos; page_info = ""
+        else:
+            # paginazione lato server: ricerca/ordinamento sull'intera tabella, al browser solo la pagina
+            pc1, pc2, pc3, pc4 = st.columns([3, 2, 1, 1])
+            with pc1: query = st.text_input("Cerca (pair / DEX / address)", key="pairs_query")
+            with pc2: sort_label = st.selectbox("Ordina per", list(PAIRS_SORT), key="pairs_sort")
+            with pc3: page_size = int(st.selectbox("Righe", PAIRS_PAGE_SIZES, key="pairs_page_size"))
+            sort_col, sort_asc = PAIRS_SORT[sort_label]
+            view_pos = derived("pairs_view_pos", dict(table_filter_params, q=query.strip().lower(), sort=sort_label),
+                               lambda: pairs_view_positions(df_pairs_table, query, sort_col, sort_asc))
+            n_pages = max(1, -(-len(view_pos) // page_size))
+            if st.session_state.get("pairs_view_sig") != (query, sort_label, page_size):
+                st.session_state["pairs_view_sig"] = (query, sort_label, page_size)
+                st.session_state["pairs_page"] = 1
+            st.session_state["pairs_page"] = min(max(1, int(st.session_state.get("pairs_page", 1))), n_pages)
+            with pc4: page = int(st.number_input(f"Pagina (di {n_pages})", min_value=1, max_value=n_pages, step=1, key="pairs_page"))
+            page_pos = view_pos[(page - 1) * page_size: page * page_size]
+            page_info = f"  •  Righe {len(view_pos)} (pagina {page}/{n_pages})"
+
+        display_cols = [c for c in PAIRS_DISPLAY_COLS if show_pair_age or c != "Pair Age"]
+
+        # solo le colonne visibili della pagina; Select riflette la selezione persistente (per id di riga)
+        page_ids = row_ids[page_pos]
+        selected_id = st.session_state.get("pairs_selected_id")
+        df_page = df_pairs_table.iloc[page_pos][display_cols].reset_index(drop=True)
+        df_page.insert(0, "Select", page_ids == selected_id)
+        editor_key = f"pairs_editor_{params_key((page_ids.tolist(), st.session_state.get('pairs_sel_nonce', 0)))}"
 
         edited = st.data_editor(
-            df_pairs_for_view[display_cols],
-            key="pairs_editor",
+            df_page,
+            key=editor_key,
             hide_index=True,
             use_container_width=True,
             disabled=False,
-            column_config={
-                "Select": st.column_config.CheckboxColumn(help="Spunta per aprire il pannello drill-down"),
-                "Link": st.column_config.LinkColumn("Link"),
-                "Liquidity (USD)": st.column_config.NumberColumn(format="%,d"),
-                "Volume 24h (USD)": st.column_config.NumberColumn(format="%,d"),
-                "Meme Score": st.column_config.NumberColumn(help="0–100"),
-                "Price (USD)": st.column_config.NumberColumn(format="%.8f"),
-                "ROI (%)": st.column_config.NumberColumn(format="%.2f"),
-                "ATH (%)": st.column_config.NumberColumn(format="%.2f"),
-                "Drawdown (%)": st.column_config.NumberColumn(format="%.2f"),
-                "Change 1h (%)": st.column_config.NumberColumn(format="%.2f"),
-                "Change 4h/6h (%)": st.column_config.NumberColumn(format="%.2f"),
-                "Change 24h (%)": st.column_config.NumberColumn(format="%.2f"),
-            }
+            column_config=pairs_column_config(),
         )
 
         try:
-            sel_idx = edited.index[edited["Select"] == True].tolist()
-        except Exception:
-            sel_idx = []
-        selected_row = df_pairs_for_view.loc[sel_idx[-1]] if sel_idx else None
-
-        try:
-            n1 = pd.to_numeric(df_pairs_for_view.loc[edited.index, "Change 1h (%)"], errors="coerce").notna().sum()
-            n4 = pd.to_numeric(df_pairs_for_view.loc[edited.index, "Change 4h/6h (%)"], errors="coerce").notna().sum()
-            nroi = pd.to_numeric(df_pairs_for_view.loc[edited.index, "ROI (%)"], errors="coerce").notna().sum()
-            st.caption(f"Diagnostica Change/ROI: 1h {n1}/{len(edited)} • 4h/6h {n4}/{len(edited)} • ROI {nroi}/{len(edited)}")
+            checked = [page_ids[i] for i in edited.index[edited["Select"] == True]]
         except Exception:
-            pass
-        cap = "Top 10 per Volume 24h (tabella filtrata)." if show_top10_table else "Tutte le coppie (tabella filtrata)."
+            checked = []
+        newly = [i for i in checked if i != selected_id]
+        if newly or (selected_id in page_ids and selected_id not in checked):
+            selected_id = newly[-1] if newly else None
+            st.session_state["pairs_selected_id"] = selected_id
+            st.session_state["pairs_sel_nonce"] = st.session_state.get("pairs_sel_nonce", 0) + 1  # editor ripulito al prossimo rerun
+        sel_pos = np.flatnonzero(row_ids == selected_id) if selected_id is not None else []
+        selected_row = df_pairs_table.iloc[sel_pos[0]] if len(sel_pos) else None
+
+        df_rows = df_pairs_table.iloc[view_pos]
+        n1 = pd.to_numeric(df_rows["Change 1h (%)"], errors="coerce").notna().sum()
+        n4 = pd.to_numeric(df_rows["Change 4h/6h (%)"], errors="coerce").notna().sum()
+        nroi = pd.to_numeric(df_rows["ROI (%)"], errors="coerce").notna().sum()
+        st.caption(f"Diagnostica Change/ROI: 1h {n1}/{len(df_rows)} • 4h/6h {n4}/{len(df_rows)} • ROI {nroi}/{len(df_rows)}")
+        cap = "Top 10 per Volume 24h (tabella filtrata)." if show_top10_table else "Tutte le coppie (tabella filtrata)." + page_info
         cap += "  (Se H4 mancante, mostrata H6)" if show_h6_fallback else ""
         if survivors_only: cap += "  •  Filtro: Survivors 60m"
         st.caption(cap)
@@ -796,39 +660,6 @@ with tab_radar:
                 return data["pairs"][0], code
             return None, code
 
-        def _hostname(url: str) -> str:
-            try: return urlparse(url).hostname or ""
-            except Exception: return ""
-
-        def _collect_socials(info: dict) -> dict:
-            if not isinstance(info, dict): return {}
-            links = {}
-            webs = info.get("websites")
-            if isinstance(webs, list):
-                for w in webs:
-                    url = w.get("url") if isinstance(w, dict) else (w if isinstance(w,str) else None)
-                    if url and "http" in url: links.setdefault("website", url)
-            socs = info.get("socials")
-            if isinstance(socs, list):
-                for s in socs:
-                    if isinstance(s, dict):
-                        typ = (s.get("type") or s.get("name") or "").lower()
-                        url = s.get("url") or s.get("link")
-                    elif isinstance(s, str):
-                        typ = ""; url = s
-                    else:
-                        continue
-                    if not (url and "http" in url): continue
-                    if "twitter" in typ or typ == "x" or "x.com" in url: links.setdefault("twitter", url)
-                    elif "telegram" in typ or "t.me" in url: links.setdefault("telegram", url)
-                    elif "discord" in typ: links.setdefault("discord", url)
-                    elif "github" in typ: links.setdefault("github", url)
-                    elif "medium" in typ: links.setdefault("medium", url)
-                    elif "coingecko" in typ: links.setdefault("coingecko", url)
-                    elif "coinmarketcap" in typ or "cmc" in typ: links.setdefault("cmc", url)
-                    else: links.setdefault("other", url)
-            return links
-
         if selected_row is not None:
             pair_addr = None
             if "Pair Address" in df_pairs.columns and pd.notna(selected_row.get("Pair Address","")):
@@ -841,7 +672,8 @@ with tab_radar:
             if not pair_addr:
                 st.info("Impossibile determinare il Pair Address.")
             else:
-                pair, http_code = _fetch_pair_details_safely(pair_addr)
+                with span("app.drilldown_http"):
+                    pair, http_code = _fetch_pair_details_safely(pair_addr)
                 if not pair:
                     st.warning(f"Nessun dettaglio disponibile (DexScreener {http_code}).")
                 else:
@@ -870,13 +702,10 @@ with tab_radar:
                         bD.link_button("DexScreener", url_dex, use_container_width=True)
 
                     info_obj = pair.get("info", {}) or {}
-                    social_links = _collect_socials(info_obj)
+                    social_links = collect_socials(info_obj)
                     if social_links:
                         st.markdown("##### Social & Sito")
-                        ordered = [("website","Website"),("twitter","X / Twitter"),("telegram","Telegram"),
-                                   ("discord","Discord"),("github","GitHub"),("medium","Medium"),
-                                   ("coingecko","CoinGecko"),("cmc","CoinMarketCap"),("other","Altro")]
-                        buttons = [(label, social_links[k]) for k, label in ordered if k in social_links]
+                        buttons = [(label, social_links[k]) for k, label in SOCIAL_LABELS if k in social_links]
                         ncols = min(4, max(1, len(buttons)))
                         cols = st.columns(ncols)
                         for i,(label,url) in enumerate(buttons):
@@ -884,22 +713,7 @@ with tab_radar:
                     else:
                         st.caption("Social non disponibili.")
 
-                    _HUB_DOMAINS = {"linktr.ee","links.linktr.ee","beacons.ai","linkin.bio"}
-                    _SUSPICIOUS_DOMAINS = {"forms.gle","docs.google.com","site.google.com","notion.so","notion.site","pastebin.com","pastelink.net"}
-                    def _domain_in(set_domains, url):
-                        host = _hostname(url).lower()
-                        return any(host == d or host.endswith("." + d) for d in set_domains)
-                    status = "weak"; reasons=[]
-                    keys=set(social_links.keys())
-                    if keys == {"other"}:
-                        status="suspicious"; reasons.append("Solo link 'other'.")
-                    else:
-                        if "website" in social_links and _domain_in(_HUB_DOMAINS, social_links["website"]):
-                            reasons.append("Website è un link-hub (es. linktr.ee).")
-                        if any(_domain_in(_SUSPICIOUS_DOMAINS, u) for u in social_links.values()):
-                            reasons.append("Domini sospetti tra i link.")
-                        if ("website" in social_links) and (("twitter" in social_links) or ("telegram" in social_links)) and not reasons:
-                            status="strong"
+                    status, reasons = linkset_status(social_links)
                     if status=="strong": st.success("🛡️ Linkset solido (website + social).", icon="🛡️")
                     elif status=="weak": st.warning("🟡 Linkset limitato/medio.", icon="🟡")
                     else: st.error("🔴 Linkset sospetto.", icon="🚩")
@@ -931,8 +745,9 @@ with tab_radar:
                             if v is not None:
                                 vals.append(float(str(v).replace("%",""))); tfs.append(tf.upper())
                         if tfs:
-                            figc = px.bar(pd.DataFrame({"TF": tfs, "Change %": vals}), x="TF", y="Change %", title="Change % by TF")
-                            g1.plotly_chart(figc, use_container_width=True)
+                            with span("app.charts"):
+                                figc = px.bar(pd.DataFrame({"TF": tfs, "Change %": vals}), x="TF", y="Change %", title="Change % by TF")
+                                g1.plotly_chart(figc, use_container_width=True)
                         else:
                             g1.info("Change% non disponibile.")
                     except Exception:
@@ -945,8 +760,9 @@ with tab_radar:
                             rows_tx.append({"TF": tf.upper(), "Side": "Sells","Tx": pair.get("txns",{}).get(tf,{}).get("sells",0)})
                         dftx = pd.DataFrame(rows_tx)
                         if len(dftx):
-                            figt = px.bar(dftx, x="TF", y="Tx", color="Side", barmode="group", title="Buys/Sells")
-                            g2.plotly_chart(figt, use_container_width=True)
+                            with span("app.charts"):
+                                figt = px.bar(dftx, x="TF", y="Tx", color="Side", barmode="group", title="Buys/Sells")
+                                g2.plotly_chart(figt, use_container_width=True)
                         else:
                             g2.info("Tx breakdown non disponibile.")
                     except Exception:
@@ -956,8 +772,9 @@ with tab_radar:
                         v24 = float(pair.get("volume",{}).get("h24",0) or 0)
                         liq = float(pair.get("liquidity",{}).get("usd",0) or 0)
                         dflq = pd.DataFrame({"Metric": ["Vol 24h","Liquidity"], "USD": [v24, liq]})
-                        figv = px.bar(dflq, x="Metric", y="USD", title="Vol 24h vs Liquidity")
-                        g3.plotly_chart(figv, use_container_width=True)
+                        with span("app.charts"):
+                            figv = px.bar(dflq, x="Metric", y="USD", title="Vol 24h vs Liquidity")
+                            g3.plotly_chart(figv, use_container_width=True)
                     except Exception:
                         g3.info("Vol vs Liq non disponibile.")
     else:
@@ -967,7 +784,7 @@ with tab_radar:
     def market_heat_value(df: pd.DataFrame, topN: int) -> float:
         if df is None or df.empty: return 0.0
         if "Volume 24h (USD)" not in df.columns or "Txns 1h" not in df.columns: return 0.0
-        top = df.sort_values(by=["Volume 24h (USD)"], ascending=False).head(max(1, int(topN)))
+        top = ranks_for("ranks_used", used_params, df, TABLE_RANKS).take(df, "volume", max(1, int(topN)))
         return float(pd.to_numeric(top["Txns 1h"], errors="coerce").fillna(0).mean())
 
     st.markdown("### Diagnostica mercato")
@@ -993,11 +810,11 @@ with tab_radar:
         c_dex = cnt(s["DEX"].str.lower().isin(list(st.session_state.get("allowed_dex", ["raydium","orca","meteora","lifinity"]))))
         c_meme = cnt(s["Meme Score"] >= int(st.session_state.get("strat_meme", 70)))
         c_tx   = cnt(s["Txns 1h"] >= int(st.session_state.get("strat_txns", 250)))
-        if vmin is None: vmin = 0
+        vmin_d = vmin or 0
         if vol24_max > 0:
-            c_vol = cnt((s["Volume 24h (USD)"] >= vmin) & (s["Volume 24h (USD)"] <= vol24_max))
+            c_vol = cnt((s["Volume 24h (USD)"] >= vmin_d) & (s["Volume 24h (USD)"] <= vol24_max))
         else:
-            c_vol = cnt((s["Volume 24h (USD)"] >= vmin))
+            c_vol = cnt((s["Volume 24h (USD)"] >= vmin_d))
         c_turn = cnt((s["Volume 24h (USD)"] / s["Liquidity (USD)"].replace(0,1)) >= float(st.session_state.get("strat_turnover", 1.2)))
         c_chg  = cnt((chg_series >= float(st.session_state.get("chg_min", -8))) & (chg_series <= float(st.session_state.get("chg_max", 180))))
 
@@ -1011,25 +828,23 @@ with tab_radar:
         cols[6].metric("Turnover OK", c_turn)
         cols[7].metric("Change24 OK", c_chg)
 
-with tab_winners:
+@tab_view("app.tab_winners")
+def winners_view():
     st.markdown("### 🏆 Winners Now")
     if df_pairs_table.empty:
         st.info("Nessuna coppia disponibile con i filtri tabella attuali.")
     else:
-        df_roi = df_pairs_table.copy()
-        df_roi["ROI_val"] = pd.to_numeric(df_roi["ROI (%)"], errors="coerce")
-        df_roi = df_roi.dropna(subset=["ROI_val"]).sort_values(by="ROI_val", ascending=False).head(20)
-        cols_keep = ["Pair","DEX","Price (USD)","ROI (%)","ATH (%)","Drawdown (%)","Change 1h (%)","Liquidity (USD)","Volume 24h (USD)","Pair Age","Link"]
+        df_roi = table_ranks.take(df_pairs_table, "roi", 20)
+        cols_keep = WINNERS_COLS
         if df_roi.empty:
             st.warning("Nessun ROI calcolabile (prezzi non disponibili).")
         else:
             st.markdown("**Top 20 per ROI (%)**")
+            st.caption("ROI/ATH dal primo prezzo visto dal server per la pair (comune a tutte le sessioni), non dall'apertura di questa pagina.")
             st.dataframe(df_roi[cols_keep], use_container_width=True, hide_index=True)
 
         st.divider()
-        df_c1 = df_pairs_table.copy()
-        df_c1["c1_val"] = pd.to_numeric(df_c1["Change 1h (%)"], errors="coerce")
-        df_c1 = df_c1.dropna(subset=["c1_val"]).sort_values(by="c1_val", ascending=False).head(20)
+        df_c1 = table_ranks.take(df_pairs_table, "ch1", 20)
         if df_c1.empty:
             st.warning("Change 1h non disponibile.")
         else:
@@ -1038,34 +853,35 @@ with tab_winners:
                          use_container_width=True, hide_index=True)
         st.caption(f"Survivors 60m attivo: {'SÌ' if survivors_only else 'NO'}")
 
-with tab_equity:
+@tab_view("app.tab_equity")
+def equity_view():
     st.markdown("### 📈 Equity Curve (paper) — Top ROI Rebalance")
     colA, colB, colC, colD = st.columns(4)
     with colA:
-        eq_enabled = st.toggle("Tracking ON/OFF", value=st.session_state.get("eq_enabled", True), key="eq_enabled_tab")
+        eq_enabled = st.toggle("Tracking ON/OFF", key="eq_enabled_tab")
         st.session_state["eq_enabled"] = eq_enabled
     with colB:
-        topN_tab = st.number_input("Top N per ROI", min_value=1, max_value=50, value=int(st.session_state.get("eq_topN_tab", 10)), step=1, key="eq_topN_tab")
+        st.number_input("Top N per ROI", min_value=1, max_value=50, step=1, key="eq_topN_tab")
     with colC:
-        init_cap = st.number_input("Capitale iniziale", min_value=100.0, value=float(st.session_state.get("eq_init_capital", 1000.0)), step=100.0, key="eq_init_tab")
+        init_cap = st.number_input("Capitale iniziale", min_value=100.0, step=100.0, key="eq_init_tab")
     with colD:
         if st.button("🔄 Reset equity"):
             st.session_state["eq_init_capital"] = float(init_cap)
             st.session_state["eq_equity"] = float(init_cap)
-            st.session_state["eq_history"] = []
+            st.session_state["eq_series"] = EquitySeries(init_cap)
             st.session_state["eq_last_prices"] = {}
             st.success("Equity resettata.")
 
-    hist = st.session_state.get("eq_history", [])
-    if len(hist) < 1:
+    series: EquitySeries = st.session_state["eq_series"]
+    if len(series) < 1:
         st.info("Nessun dato ancora: attendi il primo refresh (o clicca 'Aggiorna ora').")
     else:
-        df_eq = pd.DataFrame(hist)
-        df_eq["t"] = pd.to_datetime(df_eq["ts"], unit="s")
-        base = float(st.session_state.get("eq_init_capital", 1000.0))
-        last_eq = float(df_eq["equity"].iloc[-1])
-        cum_ret = (last_eq / base - 1.0) if base > 0 else 0.0
-        mdd = _max_drawdown(df_eq["equity"].tolist())
+        # statistiche incrementali (intera sessione); lo storico è già limitato/downsampled
+        df_eq = series.to_frame()
+        base = series.initial
+        last_eq = series.equity
+        cum_ret = series.cum_return
+        mdd = series.max_drawdown
 
         m1, m2, m3, m4 = st.columns(4)
         m1.metric("Capitale iniziale", f"${base:,.2f}".replace(",", "."))
@@ -1073,60 +889,30 @@ with tab_equity:
         m3.metric("Rendimento cumulato", f"{cum_ret*100:.2f}%")
         m4.metric("Max Drawdown", f"{mdd*100:.2f}%")
 
-        fig_eq = px.line(df_eq, x="t", y="equity", title="Equity Curve (paper)")
-        st.plotly_chart(fig_eq, use_container_width=True)
+        with span("app.charts"):
+            # al browser arriva ~1 punto per pixel (LTTB); il CSV sotto resta a piena risoluzione
+            df_plot = downsample_frame(df_eq, "t", "equity")
+            fig_eq = px.line(df_plot, x="t", y="equity", title="Equity Curve (paper)")
+            st.plotly_chart(fig_eq, use_container_width=True)
+            if len(df_plot) < len(df_eq): st.caption(f"Grafico: {len(df_plot)} di {len(df_eq)} punti (downsampling LTTB).")
 
         with st.expander("Dettagli ultimo tick"):
-            last = df_eq.iloc[-1].to_dict()
+            last = series.last()
             st.write({
                 "Timestamp": str(df_eq["t"].iloc[-1]),
                 "Ritorno tick": f"{last.get('ret', 0.0)*100:.3f}%",
-                "N token considerati": int(last.get("n", 0))
+                "N token considerati": int(last.get("n", 0)),
+                "Tick totali (storico)": f"{series.ticks} ({len(series)} punti)",
             })
 
         csv = df_eq[["t","equity","ret","n"]].to_csv(index=False).encode("utf-8")
         st.download_button("📥 Scarica equity.csv", data=csv, file_name="equity_curve.csv", mime="text/csv")
 
 # ===================== Entry Finder (smart + presets + volume) =====================
-with tab_entry:
+@tab_view("app.tab_entry")
+def entry_view():
     st.markdown("### 🎯 Entry Finder — scanner ingressi (smart + presets)")
 
-    # Preset definitions
-    ENTRY_PRESETS = {
-        "Fiacco": {
-            "ms_min": 55, "tx_min": 80,
-            "liq_min": 5000, "liq_max": 150_000,
-            "age_min_m": 10, "age_max_m": 720,
-            "vol_min": 0, "vol_max": 0,
-            "ch1_min": -8, "ch1_max": 18,
-            "cap_24h": 120,
-            "trend_pos": True,
-            "allow_missing_ch1": True, "allow_missing_h4": True,
-            "survivor": False, "targetN": 10
-        },
-        "Medio": {
-            "ms_min": 65, "tx_min": 150,
-            "liq_min": 10_000, "liq_max": 250_000,
-            "age_min_m": 5, "age_max_m": 360,
-            "vol_min": 0, "vol_max": 0,
-            "ch1_min": -5, "ch1_max": 25,
-            "cap_24h": 150,
-            "trend_pos": True,
-            "allow_missing_ch1": True, "allow_missing_h4": True,
-            "survivor": False, "targetN": 12
-        },
-        "On-Fire": {
-            "ms_min": 70, "tx_min": 250,
-            "liq_min": 10_000, "liq_max": 0,
-            "age_min_m": 0, "age_max_m": 240,
-            "vol_min": 0, "vol_max": 0,
-            "ch1_min": -3, "ch1_max": 35,
-            "cap_24h": 200,
-            "trend_pos": True,
-            "allow_missing_ch1": True, "allow_missing_h4": True,
-            "survivor": False, "targetN": 15
-        }
-    }
     def apply_preset(p):
         for k, v in p.items():
             st.session_state[f"ef_{k}"] = v
@@ -1134,9 +920,7 @@ with tab_entry:
 
     try: _tx_heat = int(float(tx1h_avg or 0))
     except Exception: _tx_heat = 0
-    suggested = "Fiacco"
-    if _tx_heat >= 900: suggested = "On-Fire"
-    elif _tx_heat >= 250: suggested = "Medio"
+    suggested = suggest_entry_preset(_tx_heat)
 
     cP1, cP2, cP3, cP4 = st.columns([1,1,1,2])
     if cP1.button("🥶 Fiacco"): apply_preset(ENTRY_PRESETS["Fiacco"])
@@ -1147,10 +931,9 @@ with tab_entry:
 
     st.caption("Tip: puoi anche ignorare i filtri PAIRS per scansionare l’universo grezzo.")
 
-    base_choice = st.radio(
+    st.radio(
         "Sorgente dati",
-        ["Usa tabella filtrata (PAIRS)", "Ignora PAIRS (universo grezzo)"],
-        horizontal=True, key="ef_source"
+        EF_SOURCES, horizontal=True, key="ef_source"
     )
     df_base_for_entry = df_pairs_table if st.session_state.get("ef_source","").startswith("Usa") else df_pairs
     st.caption(f"Universo di lavoro: {0 if df_base_for_entry is None else len(df_base_for_entry)}")
@@ -1160,206 +943,65 @@ with tab_entry:
     else:
         # Widgets con chiavi persistenti (preset-friendly)
         c1, c2, c3 = st.columns(3)
-        ms_min = c1.slider("Meme Score ≥", 0, 100, st.session_state.get("ef_ms_min", 60), 1, key="ef_ms_min")
-        tx_min = c2.number_input("Txns 1h ≥", min_value=0, value=st.session_state.get("ef_tx_min", 150), step=25, key="ef_tx_min")
-        liq_min_e = c3.number_input("Liquidity USD min", min_value=0, value=st.session_state.get("ef_liq_min", 0), step=1000, key="ef_liq_min")
+        ms_min = c1.slider("Meme Score ≥", 0, 100, step=1, key="ef_ms_min")
+        tx_min = c2.number_input("Txns 1h ≥", min_value=0, step=25, key="ef_tx_min")
+        liq_min_e = c3.number_input("Liquidity USD min", min_value=0, step=1000, key="ef_liq_min")
 
         c4, c5, c6 = st.columns(3)
-        liq_max_e = c4.number_input("Liquidity USD max (0 = ∞)", min_value=0, value=st.session_state.get("ef_liq_max", 0), step=5000, key="ef_liq_max")
-        age_min_m = c5.number_input("Età min (min)", min_value=0, value=st.session_state.get("ef_age_min_m", 0), step=1, key="ef_age_min_m")
-        age_max_m = c6.number_input("Età max (min)", min_value=0, value=st.session_state.get("ef_age_max_m", 360), step=5, key="ef_age_max_m")
+        liq_max_e = c4.number_input("Liquidity USD max (0 = ∞)", min_value=0, step=5000, key="ef_liq_max")
+        age_min_m = c5.number_input("Età min (min)", min_value=0, step=1, key="ef_age_min_m")
+        age_max_m = c6.number_input("Età max (min)", min_value=0, step=5, key="ef_age_max_m")
 
         c7, c8, c9 = st.columns(3)
-        ch1_min = c7.number_input("Change 1h min (%)", value=st.session_state.get("ef_ch1_min", -3), step=1, key="ef_ch1_min")
-        ch1_max = c8.number_input("Change 1h max (%)", value=st.session_state.get("ef_ch1_max", 25), step=1, key="ef_ch1_max")
-        trend_pos = c9.toggle("Richiedi H4/H6 > 0", value=st.session_state.get("ef_trend_pos", True), key="ef_trend_pos")
+        ch1_min = c7.number_input("Change 1h min (%)", step=1, key="ef_ch1_min")
+        ch1_max = c8.number_input("Change 1h max (%)", step=1, key="ef_ch1_max")
+        trend_pos = c9.toggle("Richiedi H4/H6 > 0", key="ef_trend_pos")
 
         c10, c11, c12 = st.columns(3)
-        survivors_gate = c10.toggle("Richiedi Survivor 60m (ROI>0 & Age≥60m)", value=st.session_state.get("ef_survivor", False), key="ef_survivor")
-        cap_24h = c11.number_input("Limita overextension (Change 24h max %)", min_value=0, value=st.session_state.get("ef_cap_24h", 150), step=10, key="ef_cap_24h")
-        sort_mode = c12.radio("Ordina per", ["Momentum (1h %)", "Qualità (Meme Score)", "Freschezza (Age)"], horizontal=True, key="ef_sort_mode")
+        survivors_gate = c10.toggle("Richiedi Survivor 60m (ROI>0 & Age≥60m)", key="ef_survivor")
+        cap_24h = c11.number_input("Limita overextension (Change 24h max %)", min_value=0, step=10, key="ef_cap_24h")
+        sort_mode = c12.radio("Ordina per", EF_SORT_MODES, horizontal=True, key="ef_sort_mode")
 
         c13, c14, c15 = st.columns(3)
-        allow_missing_ch1 = c13.toggle("Consenti H1 mancante", value=st.session_state.get("ef_allow_missing_ch1", True), key="ef_allow_missing_ch1")
-        allow_missing_h4  = c14.toggle("Consenti H4/H6 mancante", value=st.session_state.get("ef_allow_missing_h4", True), key="ef_allow_missing_h4")
-        auto_relax        = c15.toggle("Auto-relax fino a N risultati", value=st.session_state.get("ef_auto_relax", True), key="ef_auto_relax")
-        targetN = st.number_input("Target risultati", min_value=1, max_value=100, value=st.session_state.get("ef_targetN", 10), step=1, key="ef_targetN")
+        allow_missing_ch1 = c13.toggle("Consenti H1 mancante", key="ef_allow_missing_ch1")
+        allow_missing_h4  = c14.toggle("Consenti H4/H6 mancante", key="ef_allow_missing_h4")
+        auto_relax        = c15.toggle("Auto-relax fino a N risultati", key="ef_auto_relax")
+        targetN = st.number_input("Target risultati", min_value=1, max_value=100, step=1, key="ef_targetN")
 
         # 🔎 Nuovi: filtri Volume 24h
         c16, c17 = st.columns(2)
-        vol_min_e = c16.number_input("Volume 24h USD min", min_value=0, value=st.session_state.get("ef_vol_min", 0), step=10000, key="ef_vol_min")
-        vol_max_e = c17.number_input("Volume 24h USD max (0 = ∞)", min_value=0, value=st.session_state.get("ef_vol_max", 0), step=100000, key="ef_vol_max")
-
-        topN_show = st.number_input("Mostra prime N", min_value=1, max_value=100, value=st.session_state.get("ef_topN_show", 25), step=1, key="ef_topN_show")
-
-        # Cast
-        dfC = df_base_for_entry.copy()
-        def _num(s, col, default=0.0):
-            if col not in s.columns: return pd.Series([default]*len(s))
-            return pd.to_numeric(s[col], errors="coerce").fillna(default)
-        age_h   = pd.to_numeric(dfC.get("PairAgeHours"), errors="coerce")
-        ms_col  = _num(dfC, "Meme Score")
-        tx_col  = _num(dfC, "Txns 1h")
-        liq_col = _num(dfC, "Liquidity (USD)")
-        vol_col = _num(dfC, "Volume 24h (USD)")
-        ch1_col = _num(dfC, "Change 1h (%)", default=-9999)
-        ch4_col = _num(dfC, "Change 4h/6h (%)", default=-9999)
-        ch24_col= _num(dfC, "Change 24h (%)", default=-9999)
-        roi_col = _num(dfC, "ROI (%)", default=-9999)
-
-        # Maschere
-        m_ms  = (ms_col >= ms_min)
-        m_tx  = (tx_col >= tx_min)
-        m_liq = (liq_col >= liq_min_e) & ((liq_max_e == 0) | (liq_col <= liq_max_e))
-        m_age = age_h.between(age_min_m/60.0, age_max_m/60.0, inclusive="both")
-        m_vol = (vol_col >= vol_min_e) & ((vol_max_e == 0) | (vol_col <= vol_max_e))
-
-        has_ch1 = ch1_col > -9998
-        m_ch1 = ((~has_ch1) | ch1_col.between(ch1_min, ch1_max, inclusive="both")) if allow_missing_ch1 else (has_ch1 & ch1_col.between(ch1_min, ch1_max, inclusive="both"))
-        has_h4 = ch4_col > -9998
-        if trend_pos:
-            m_ch4 = ((~has_h4) & allow_missing_h4) | (has_h4 & (ch4_col > 0))
-        else:
-            m_ch4 = (has_h4 | allow_missing_h4)
-        m_ch24 = (ch24_col <= cap_24h) | (ch24_col < -9998)
-
-        mask = m_ms & m_tx & m_liq & m_age & m_vol & m_ch1 & m_ch4 & m_ch24
-        if survivors_gate:
-            mask = mask & ((age_h >= 1.0) & (roi_col > 0))
-
-        dfE = dfC[mask].copy()
-
-        # Auto-relax (senza toccare i widget's session_state per evitare eccezioni)
-        relax_applied = False
-        chosen_params = None
-        if auto_relax and (dfE.empty or len(dfE) < targetN):
-            relax_applied = True
-            _tx = int(tx_min); _ch1min = int(ch1_min); _ch1max = int(ch1_max)
-            _liqmin = int(liq_min_e); _liqmax = int(liq_max_e)
-            _volmin = int(vol_min_e); _volmax = int(vol_max_e)
-            _agemin = int(age_min_m); _agemax = int(age_max_m)
-            _cap24 = int(cap_24h)
-            for _ in range(10):
-                _tx = max(50, _tx - 50)
-                _ch1min -= 3; _ch1max += 5
-                _liqmin = max(0, _liqmin - 5000)
-                _liqmax = 0 if _liqmax == 0 else min(1_000_000_000, int(_liqmax * 2))
-                _volmin = max(0, _volmin - 20_000)
-                _volmax = 0 if _volmax == 0 else min(2_000_000_000, int(_volmax * 2))
-                _agemin = max(0, _agemin - 5)
-                _agemax = min(720, _agemax + 60)
-                _cap24  = min(300, _cap24 + 30)
-
-                m_tx  = (tx_col >= _tx)
-                m_liq = (liq_col >= _liqmin) & ((_liqmax == 0) | (liq_col <= _liqmax))
-                m_age = age_h.between(_agemin/60.0, _agemax/60.0, inclusive="both")
-                m_vol = (vol_col >= _volmin) & ((_volmax == 0) | (vol_col <= _volmax))
-                m_ch1 = ((~(ch1_col > -9998)) | ch1_col.between(_ch1min, _ch1max, inclusive="both")) if allow_missing_ch1 else ( (ch1_col > -9998) & ch1_col.between(_ch1min, _ch1max, inclusive="both") )
-                m_ch4 = ((~(ch4_col > -9998)) | (ch4_col > 0)) if trend_pos else ( (ch4_col > -9998) | allow_missing_h4 )
-                m_c24 = (ch24_col <= _cap24) | (ch24_col < -9998)
-
-                m_relaxed = m_ms & m_tx & m_liq & m_age & m_vol & m_ch1 & m_ch4 & m_c24
-                if survivors_gate: m_relaxed &= ((age_h >= 1.0) & (roi_col > 0))
-                dfE = dfC[m_relaxed].copy()
-                chosen_params = dict(tx=_tx, ch1min=_ch1min, ch1max=_ch1max, liqmin=_liqmin, liqmax=_liqmax,
-                                     volmin=_volmin, volmax=_volmax, agemin=_agemin, agemax=_agemax, cap24=_cap24)
-                if len(dfE) >= targetN or len(dfE) > 0: break
+        vol_min_e = c16.number_input("Volume 24h USD min", min_value=0, step=10000, key="ef_vol_min")
+        vol_max_e = c17.number_input("Volume 24h USD max (0 = ∞)", min_value=0, step=100000, key="ef_vol_max")
+
+        topN_show = st.number_input("Mostra prime N", min_value=1, max_value=100, step=1, key="ef_topN_show")
+
+        ef_params = dict(ms_min=ms_min, tx_min=tx_min, liq_min=liq_min_e, liq_max=liq_max_e,
+                         age_min_m=age_min_m, age_max_m=age_max_m, vol_min=vol_min_e, vol_max=vol_max_e,
+                         ch1_min=ch1_min, ch1_max=ch1_max, cap_24h=cap_24h, trend_pos=trend_pos,
+                         allow_missing_ch1=allow_missing_ch1, allow_missing_h4=allow_missing_h4,
+                         survivor=survivors_gate, targetN=targetN, auto_relax=auto_relax)
+        dfE, relax_applied, chosen_params, diag = entry_scan(
+            st.session_state.get("ef_source", "").startswith("Usa"), ef_params, sort_mode)
 
         # Diagnostica rapida
-        def _diag_counts():
-            return {
-                "Universe": len(dfC),
-                "H1 n/d": int((ch1_col <= -9998).sum()),
-                "H4/6 n/d": int((ch4_col <= -9998).sum())
-            }
-        diag = _diag_counts()
         cols = st.columns(3)
         cols[0].metric("Universe", diag.get("Universe", 0))
         cols[1].metric("H1 n/d", diag.get("H1 n/d", 0))
         cols[2].metric("H4/6 n/d", diag.get("H4/6 n/d", 0))
 
-        # Entry grade + badge sintetico
-        def _entry_grade(row) -> tuple[int, str]:
-            ms = float(row.get("Meme Score", 0) or 0)
-            tx = float(row.get("Txns 1h", 0) or 0)
-            liq= float(row.get("Liquidity (USD)", 0) or 0)
-            vol= float(row.get("Volume 24h (USD)", 0) or 0)
-            c1 = row.get("Change 1h (%)", None)
-            c4 = row.get("Change 4h/6h (%)", None)
-            c24= row.get("Change 24h (%)", None)
-
-            heat = s_sigmoid(tx) * 100
-            sweet_liq = score_liq(liq, liq_min_sweet, liq_max_sweet) * 100
-            sweet_vol = 100.0 if (vol >= vol_min_e and (vol_max_e==0 or vol <= vol_max_e)) else (70.0 if vol>0 else 30.0)
-            mom_ok = 100.0 if (c1 is not None and ch1_min <= float(c1) <= ch1_max) else (60.0 if (c1 is None and allow_missing_ch1) else 20.0)
-            trend_ok = 100.0 if (c4 is not None and float(c4) > 0) else (60.0 if allow_missing_h4 else 20.0)
-            overext = 100.0 if (c24 is None or float(c24) <= cap_24h) else 40.0
-
-            grade = 0.25*ms + 0.2*heat + 0.15*sweet_liq + 0.1*sweet_vol + 0.15*mom_ok + 0.1*trend_ok + 0.05*overext
-            badge = "🟢" if grade >= 70 else ("🟡" if grade >= 55 else "🔴")
-            return int(round(grade)), badge
-
         if dfE.empty:
             st.warning("Nessun candidato con questi parametri. Prova un preset o allarga i range.")
         else:
-            # Reasons
-            reasons = []
-            grades = []
-            badges = []
-            for _, r in dfE.iterrows():
-                rs = []
-                try:
-                    if float(r.get("Meme Score", 0)) >= ms_min: rs.append("MS✓")
-                    if float(r.get("Txns 1h", 0)) >= tx_min: rs.append("Tx1h✓")
-                    L = float(r.get("Liquidity (USD)", 0))
-                    if (L >= liq_min_e) and ((liq_max_e == 0) or (L <= liq_max_e)): rs.append("Liq✓")
-                    V = float(r.get("Volume 24h (USD)", 0))
-                    if (V >= vol_min_e) and ((vol_max_e == 0) or (V <= vol_max_e)): rs.append("Vol24✓")
-                    v1 = r.get("Change 1h (%)", None)
-                    if pd.isna(v1):
-                        if allow_missing_ch1: rs.append("H1 n/d✓")
-                    else:
-                        if ch1_min <= float(v1) <= ch1_max: rs.append("H1✓")
-                    v4 = r.get("Change 4h/6h (%)", None)
-                    if pd.isna(v4):
-                        if allow_missing_h4: rs.append("H4/6 n/d✓")
-                    else:
-                        if (not trend_pos) or float(v4) > 0: rs.append("H4/6✓")
-                    if float(r.get("Change 24h (%)", 9999)) <= cap_24h: rs.append("24h≤cap")
-                    if survivors_gate and float(r.get("ROI (%)", -999))>0 and float(r.get("PairAgeHours",0))>=1.0:
-                        rs.append("Survivor✓")
-                except Exception:
-                    pass
-                reasons.append(", ".join(rs))
-                g, b = _entry_grade(r)
-                grades.append(g); badges.append(b)
-
-            dfE["Reasons"] = reasons
-            dfE["Entry Grade"] = grades
-            dfE["Badge"] = badges
-
-            # Ordinamento & show
-            if sort_mode.startswith("Momentum"):
-                dfE = dfE.sort_values(by=["Change 1h (%)","Entry Grade","Meme Score"], ascending=[False, False, False])
-            elif sort_mode.startswith("Qualità"):
-                dfE = dfE.sort_values(by=["Entry Grade","Meme Score","Txns 1h"], ascending=[False, False, False])
-            else:
-                dfE = dfE.sort_values(by=["PairAgeHours","Entry Grade","Meme Score"], ascending=[True, False, False])
-
-            keep_cols = ["Badge","Entry Grade","Pair","DEX","Meme Score","Price (USD)","Txns 1h",
-                         "Liquidity (USD)","Volume 24h (USD)",
-                         "Change 1h (%)","Change 4h/6h (%)","Change 24h (%)",
-                         "ROI (%)","ATH (%)","Drawdown (%)",
-                         "Pair Age","Link","Reasons"]
-            show_cols = [c for c in keep_cols if c in dfE.columns]
+            # Reasons + Entry grade + badge sintetico, già ordinati (entry_scan)
+            show_cols = [c for c in ENTRY_DISPLAY_COLS if c in dfE.columns]
             topN_show = int(st.session_state.get("ef_topN_show", 25))
             st.success(f"Candidati: {len(dfE)} — mostrati i primi {min(topN_show, len(dfE))}", icon="🎯")
             st.dataframe(dfE[show_cols].head(topN_show), use_container_width=True, hide_index=True)
             st.caption("Badge: 🟢 forte | 🟡 medio | 🔴 debole. Tip: apri **📡 Radar** e spunta la riga per il drill-down Jupiter/Raydium.")
 
-            # Salva i risultati per Paper Trading
-            st.session_state["entry_finder_results"] = dfE.copy()
-            st.session_state["entry_finder_saved_at"] = time.time()
+            # Salva i risultati per Paper Trading: id riga + colonne Entry Finder, niente copia della tabella
+            store.put("entry_finder_results", EntryRefs.from_frame(
+                dfE, pair_row_ids(dfE), st.session_state.get("ef_source", "").startswith("Usa")))
 
             # Info su auto-relax applicato
             if relax_applied and chosen_params:
@@ -1368,55 +1010,24 @@ with tab_entry:
                            f"vol∈[{chosen_params['volmin']},{'∞' if chosen_params['volmax']==0 else chosen_params['volmax']}], "
                            f"age∈[{chosen_params['agemin']}m,{chosen_params['agemax']}m], 24h≤{chosen_params['cap24']}%.")
 
-            # === ALERT TELEGRAM: Entry Finder ===
-            def tg_send(text: str):
-                if not (TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID): return False, "missing-credentials"
-                try:
-                    r = _SESSION.get(f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-                                     params={"chat_id": TELEGRAM_CHAT_ID, "text": text, "disable_web_page_preview": True}, timeout=15)
-                    return (True, None) if r.ok else (False, f"status={r.status_code}")
-                except Exception as e:
-                    return False, str(e)
-
-            cooldown = int(alert_cooldown_min) * 60
-            now = time.time()
-            if running and enable_entry_alerts and TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
-                max_send = int(alert_max_per_run)
-                sent = 0
-                for _, row in dfE.head(max_send*2).iterrows():
-                    if sent >= max_send: break
-                    addr = str(row.get("Base Address","")) or row.get("Pair")
-                    last_ts = st.session_state["tg_sent"].get(("entry", addr), 0)
-                    if now - last_ts < cooldown: continue
-                    pair = row.get("Pair",""); dex = row.get("DEX","")
-                    ms   = int(row.get("Meme Score",0) or 0)
-                    tx1  = int(row.get("Txns 1h",0) or 0)
-                    liq  = int(row.get("Liquidity (USD)",0) or 0)
-                    vol  = int(row.get("Volume 24h (USD)",0) or 0)
-                    px   = row.get("Price (USD)", None)
-                    ch1  = row.get("Change 1h (%)", None)
-                    link = row.get("Link","")
-                    grade= int(row.get("Entry Grade",0) or 0)
-                    badge= row.get("Badge","")
-                    txt = (f"🎯 ENTRY SIGNAL {badge} — {pair}\n"
-                           f"DEX: {dex} | Grade: {grade} | MS: {ms}\n"
-                           f"Tx1h: {tx1:,} | Liq: ${liq:,} | Vol24h: ${vol:,}")
-                    if isinstance(px,(int,float)) and px: txt += f"\nPrice: {px:.8f}"
-                    if ch1 is not None:
-                        try: txt += f"  |  H1: {float(ch1):.2f}%"
-                        except Exception: pass
-                    if link: txt += f"\n{link}"
-                    ok, err = tg_send(txt)
-                    if ok:
-                        st.session_state["tg_sent"][("entry", addr)] = now
-                        sent += 1
-
 # ===================== Paper Trading (vanilla) =====================
-with tab_paper:
+@tab_view("app.tab_paper")
+def paper_view():
     st.markdown("### 🧪 Paper Trading — dalle entry dell’Entry Finder (vanilla)")
     st.caption("Nota: simulazione didattica. Nessun trading reale.")
+    try:
+        ledger = get_ledger()
+    except Exception as e:
+        ledger = None
+        st.error(f"Paper ledger non disponibile ({PAPER_LEDGER_PATH}): {e}")
 
-    ef_df = st.session_state.get("entry_finder_results", None)
+    ef_refs = store.get("entry_finder_results")
+    ef_df = None
+    if ef_refs is not None:
+        ef_base, ef_params_key = (df_pairs_table, table_filter_params) if ef_refs.use_table else (df_pairs, table_params)
+        ef_lookup = derived("pairs_row_lookup", dict(ef_params_key, use_table=ef_refs.use_table),
+                            lambda: row_lookup(pair_row_ids(ef_base)))
+        ef_df = ef_refs.materialize(ef_base, ef_lookup)
 
     if ef_df is None or ef_df.empty:
         st.info("Non ci sono risultati salvati dall’Entry Finder. Vai nella tab **🎯 Entry Finder**, genera i candidati e verranno usati qui automaticamente.")
@@ -1436,12 +1047,7 @@ with tab_paper:
             dfPT = dfPT[pd.to_numeric(dfPT["Entry Grade"], errors="coerce").fillna(0) >= min_grade]
 
         # Ordinamento coerente
-        if sort_mode_pt.startswith("Entry"):
-            by = ["Entry Grade","Meme Score","Txns 1h"]; asc = [False, False, False]
-        elif sort_mode_pt.startswith("Momentum"):
-            by = ["Change 1h (%)","Entry Grade","Meme Score"]; asc = [False, False, False]
-        else:  # Freschezza
-            by = ["PairAgeHours","Entry Grade","Meme Score"]; asc = [True, False, False]
+        by, asc = next((v for k, v in PT_SORTS.items() if sort_mode_pt.startswith(k)), PT_SORTS["Freschezza"])
         for c in by:
             if c not in dfPT.columns: dfPT[c] = 0
         dfPT = dfPT.sort_values(by=by, ascending=asc)
@@ -1459,13 +1065,15 @@ with tab_paper:
         st.dataframe(dfPT[show_cols].head(100), use_container_width=True, hide_index=True)
 
         # Parametri allocazione
-        colO1, colO2, colO3 = st.columns(3)
+        colO1, colO2, colO3, colO4, colO5 = st.columns(5)
         default_open = max(1, min(5, len(dfPT)))
         topN_open = colO1.number_input("Apri prime N", min_value=1, max_value=100, value=default_open, step=1)
         risk_per_pos = colO2.number_input("Risk% eq. per posizione", min_value=0.5, max_value=10.0, value=2.0, step=0.5)
-        use_only_green = colO3.toggle("Solo 🟢 se disponibili", value=True)
+        trail_pct = colO3.number_input("Trailing stop %", 0.0, 90.0, PAPER_TRAIL_PCT, 1.0, help="0 = off")
+        stop_pct = colO4.number_input("Stop loss %", 0.0, 90.0, PAPER_STOP_PCT, 1.0, help="0 = off")
+        use_only_green = colO5.toggle("Solo 🟢 se disponibili", value=True)
 
-        # Simula entrata
+        # Apre le posizioni nel ledger persistente
         if st.button("📌 Simula entrata sulle prime N (da Entry Finder)"):
             dfSim = dfPT.copy()
             if use_only_green and "Badge" in dfSim.columns and (dfSim["Badge"] == "🟢").any():
@@ -1473,104 +1081,110 @@ with tab_paper:
 
             if dfSim.empty:
                 st.warning("Nessun candidato dopo i filtri correnti (badge/grade).")
-            else:
-                N = int(topN_open)
-                dfSim = dfSim.head(N)
-
-                cap = float(st.session_state.get("eq_equity", 1000.0))
-                alloc = cap * (risk_per_pos/100.0)  # allocazione flat per posizione
-
-                opened = []
-                for _, r in dfSim.iterrows():
-                    px = r.get("Price (USD)")
-                    pair = r.get("Pair")
-                    if px is None or px == 0: 
-                        continue
-                    opened.append({
-                        "pair": pair,
-                        "price": float(px),
-                        "alloc": float(alloc),
-                        "entry_grade": int(r.get("Entry Grade", 0) or 0),
-                        "badge": r.get("Badge",""),
-                        "link": r.get("Link","")
-                    })
-
-                if opened:
-                    st.success(f"Aperte {len(opened)} posizioni paper (alloc≈${alloc:,.2f} cad.).".replace(",", "."))
-                    with st.expander("Dettagli posizioni aperte"):
-                        st.write(opened)
+            elif ledger is not None:
+                alloc = ledger.summary()["equity"] * (risk_per_pos/100.0)  # allocazione flat per posizione
+                n_open = ledger.open_positions(dfSim.head(int(topN_open)), alloc, ts=ts or None,
+                                               trail_pct=trail_pct, stop_pct=stop_pct)
+                if n_open:
+                    st.success(f"Aperte {n_open} posizioni paper (alloc≈${alloc:,.2f} cad.).".replace(",", "."))
                 else:
-                    st.warning("Nessuna posizione aperta (prezzi non disponibili).")
+                    st.warning("Nessuna posizione aperta (prezzi non disponibili o pair già in portafoglio).")
+
+    # Ledger: posizioni marcate a ogni snapshot (PnL, esposizione, uscite trailing/stop)
+    if ledger is not None:
+        st.markdown("#### 📒 Portafoglio paper")
+        sm = ledger.summary()
+        l1, l2, l3, l4, l5 = st.columns(5)
+        l1.metric("Equity", f"${sm['equity']:,.2f}".replace(",", "."), f"{(sm['equity']/sm['initial_capital']-1)*100:.2f}%")
+        l2.metric("Esposizione", f"${sm['exposure']:,.2f}".replace(",", "."), f"{sm['open']} aperte", delta_color="off")
+        l3.metric("PnL non realizzato", f"${sm['unrealized_pnl']:,.2f}".replace(",", "."))
+        l4.metric("PnL realizzato", f"${sm['realized_pnl']:,.2f}".replace(",", "."))
+        l5.metric("Win rate chiuse", f"{sm['win_rate']*100:.1f}%" if sm["closed"] else "N/D", f"{sm['closed']} chiuse",
+                  delta_color="off")
+        pos_cols = POSITION_COLS
+        df_open = ledger.positions("open")
+        if not df_open.empty:
+            st.dataframe(df_open[pos_cols].assign(opened_ts=pd.to_datetime(df_open["opened_ts"], unit="s")),
+                         use_container_width=True, hide_index=True)
+        cL1, cL2, cL3 = st.columns(3)
+        if cL1.button("⏹️ Chiudi tutte le posizioni", disabled=df_open.empty):
+            st.success(f"Chiuse {ledger.close_positions()} posizioni all'ultimo prezzo marcato.")
+        reset_cap = cL2.number_input("Capitale reset", min_value=100.0, value=float(sm["initial_capital"]), step=100.0)
+        if cL3.button("🗑️ Reset ledger"):
+            ledger.reset(reset_cap)
+            st.success("Ledger azzerato.")
+        df_closed = ledger.positions("closed", limit=200)
+        if not df_closed.empty:
+            with st.expander(f"Posizioni chiuse (ultime {len(df_closed)})"):
+                st.dataframe(df_closed[["id", "pair", "entry_px", "exit_px", "pnl", "pnl_pct", "exit_reason"]]
+                             .assign(closed_ts=pd.to_datetime(df_closed["closed_ts"], unit="s")),
+                             use_container_width=True, hide_index=True)
+
+    # Backtest sullo storico snapshot: stesse maschere Entry Finder, uscite trailing/stop/take profit/tempo
+    st.markdown("#### ⏪ Backtest storico Entry Finder")
+    hist = list_history(SNAPSHOT_HISTORY_DIR) if SNAPSHOT_HISTORY_DIR else []
+    if len(hist) < 2:
+        st.caption("Storico snapshot assente: avvia `radar_daemon.py --record-dir <dir>` e imposta SNAPSHOT_HISTORY_DIR.")
+        return
+    colB1, colB2, colB3, colB4, colB5, colB6 = st.columns(6)
+    bt_preset = colB1.selectbox("Preset", ["auto", *ENTRY_PRESETS], key="bt_preset")
+    bt_trail = colB2.number_input("Trailing stop %", 0.0, 90.0, step=1.0, key="bt_trail")
+    bt_stop = colB3.number_input("Stop loss %", 0.0, 90.0, step=1.0, key="bt_stop")
+    bt_hold = colB4.number_input("Durata max (min)", 5, 10_080, step=5, key="bt_hold")
+    bt_open = colB5.number_input("Max posizioni aperte", 0, 100, step=1, key="bt_open", help="0 = illimitate")
+    bt_alloc = colB6.number_input("Alloc% per posizione", 0.5, 100.0, step=0.5, key="bt_alloc")
+    if st.button(f"▶️ Esegui backtest ({len(hist)} snapshot)"):
+        with st.spinner("Backtest in corso..."), span("app.backtest"):
+            from backtest import run_backtest  # solo su richiesta: fuori dall'avvio dell'app
+            panel = load_history_panel(SNAPSHOT_HISTORY_DIR, hist[-1], len(hist))
+            store.put("bt_result", run_backtest(
+                panel, bt_preset, trail_pct=bt_trail, stop_pct=bt_stop, max_hold_min=bt_hold, max_open=int(bt_open),
+                initial=float(st.session_state.get("eq_init_capital", 1000.0)), alloc_pct=float(bt_alloc)))
+    res = store.get("bt_result")
+    if not res: return
+    sm = res["summary"]
+    b1, b2, b3, b4 = st.columns(4)
+    b1.metric("Trade", f"{sm['trades']} / {sm['signals']} segnali")
+    b2.metric("Win rate", f"{sm['win_rate']*100:.1f}%" if sm["trades"] else "N/D")
+    b3.metric("Equity finale", f"${sm['final_equity']:,.2f}".replace(",", "."))
+    b4.metric("Max Drawdown", f"{sm['max_drawdown_pct']:.2f}%")
+    if not res["equity"].empty:
+        df_bt = res["equity"].assign(t=pd.to_datetime(res["equity"]["ts"], unit="s"))
+        st.plotly_chart(px.line(downsample_frame(df_bt, "t", "equity"), x="t", y="equity", title="Equity backtest"),
+                        use_container_width=True)
+    st.dataframe(res["trades"].head(500), use_container_width=True, hide_index=True)
+    st.download_button("📥 Scarica trades.csv", data=res["trades"].to_csv(index=False).encode("utf-8"),
+                       file_name="backtest_trades.csv", mime="text/csv")
+
+dict(zip(TAB_LABELS, (radar_view, winners_view, equity_view, entry_view, paper_view)))[active_tab]()
 
 # ============== Alert Telegram (global) ==============
-def tg_send(text: str):
-    if not (TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID): return False, "missing-credentials"
-    try:
-        r = _SESSION.get(f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-                         params={"chat_id": TELEGRAM_CHAT_ID, "text": text, "disable_web_page_preview": True}, timeout=15)
-        return (True, None) if r.ok else (False, f"status={r.status_code}")
-    except Exception as e:
-        return False, str(e)
-
-if "tg_sent" not in st.session_state: st.session_state["tg_sent"] = {}
 tg_sent_now = 0
-cooldown = int(alert_cooldown_min) * 60
-now = time.time()
-
-# (A) Alert "hit radar"
-if running and enable_alerts and (df_pairs_table is not None) and not df_pairs_table.empty and TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
-    try:
-        df_alert = df_pairs_table.copy()
-        mask = (df_alert["Txns 1h"] >= int(alert_tx1h_min)) & (df_alert["Liquidity (USD)"] >= int(alert_liq_min))
-        if int(alert_meme_min) > 0: mask &= (df_alert["Meme Score"] >= int(alert_meme_min))
-        df_alert = df_alert[mask]
-        if not df_alert.empty:
-            df_alert = df_alert.sort_values(by=["Meme Score","Txns 1h","Liquidity (USD)"], ascending=[False, False, False])
-            max_send = int(alert_max_per_run)
-            for _, row in df_alert.head(max_send*2).iterrows():
-                addr = str(row.get("Base Address","")) or row.get("Pair")
-                last_ts = st.session_state["tg_sent"].get(("hit", addr), 0)
-                if now - last_ts < cooldown: continue
-                pair = row.get("Pair",""); dex = row.get("DEX",""); ms = int(row.get("Meme Score",0) or 0)
-                tx1 = int(row.get("Txns 1h",0) or 0); liq = int(row.get("Liquidity (USD)",0) or 0)
-                vol = int(row.get("Volume 24h (USD)",0) or 0)
-                px  = row.get("Price (USD)", None); chg = row.get("Change 24h (%)", None)
-                link= row.get("Link","")
-                txt = f"⚡️ Radar Hit — {pair}\nDEX: {dex}  |  MemeScore: {ms}\nTxns 1h: {tx1:,}  |  Liq: ${liq:,}  |  Vol24h: ${vol:,}"
-                if isinstance(px,(int,float)) and px: txt += f"\nPrice: {px:.8f}"
-                if chg is not None:
-                    try: txt += f"  |  24h: {float(chg):.2f}%"
-                    except Exception: pass
-                if link: txt += f"\n{link}"
-                ok, err = tg_send(txt)
-                if ok:
-                    st.session_state["tg_sent"][("hit", addr)] = now
-                    tg_sent_now += 1
-                    if tg_sent_now >= max_send: break
-    except Exception as e:
-        st.caption(f"Alert Telegram (hit): errore — {e}")
 
-# (B) Trailing-stop alert su Drawdown
-if running and enable_trailing and (df_pairs_table is not None) and not df_pairs_table.empty and TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
-    try:
-        df_tr = df_pairs_table.copy()
-        dd_series = pd.to_numeric(df_tr["Drawdown (%)"], errors="coerce")
-        roi_series = pd.to_numeric(df_tr["ROI (%)"], errors="coerce")
-        mask_tr = (dd_series <= float(trailing_dd_thr)) & (roi_series >= 0)
-        df_tr = df_tr[mask_tr]
-        for _, row in df_tr.iterrows():
-            addr = str(row.get("Base Address","")) or row.get("Pair")
-            last_ts = st.session_state["tg_sent"].get(("trail", addr), 0)
-            if now - last_ts < cooldown: continue
-            pair = row.get("Pair",""); dd = row.get("Drawdown (%)"); roi=row.get("ROI (%)"); link=row.get("Link","")
-            txt = f"⚠️ Trailing stop — {pair}\nDD: {dd:.1f}%  |  ROI: {roi:.1f}%"
-            if link: txt += f"\n{link}"
-            ok, err = tg_send(txt)
-            if ok:
-                st.session_state["tg_sent"][("trail", addr)] = now
-                tg_sent_now += 1
-    except Exception as e:
-        st.caption(f"Alert Telegram (trailing): errore — {e}")
+# Candidati Entry Finder per la regola "entry": calcolati qui (non nella vista, che può non essere aperta)
+# con i parametri ef_* correnti della sessione
+entry_alert_df = pd.DataFrame()
+if running and UI_ALERTS and enable_entry_alerts and TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
+    with span("app.entry_alert_scan"):
+        ef_p = {k: st.session_state.get(f"ef_{k}", v) for k, v in EF_DEFAULTS.items()}
+        entry_alert_df = entry_scan(st.session_state.get("ef_source", "Usa").startswith("Usa"), ef_p,
+                                    st.session_state.get("ef_sort_mode", EF_SORT_MODES[0]))[0]
+
+with span("app.alerts"):
+    # Tutte le regole (hit, trailing, Entry Finder + ALERT_RULES_FILE) in un solo passaggio;
+    # cooldown per (regola, token) nell'outbox condivisa
+    if running and UI_ALERTS and TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
+        try:
+            rules = default_rules(tx_min=alert_tx1h_min, liq_min=alert_liq_min, meme_min=alert_meme_min,
+                                  dd_thr=trailing_dd_thr, max_per_run=alert_max_per_run,
+                                  cooldown_sec=int(alert_cooldown_min) * 60,
+                                  hit=enable_alerts, trail=enable_trailing, entry=enable_entry_alerts)
+            engine = RuleEngine(rules + (load_custom_rules(ALERT_RULES_FILE) if enable_custom_rules else []))
+            sent = engine.dispatch({"pairs": df_pairs_table, "entry": entry_alert_df},
+                                   get_outbox(), TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID)
+            tg_sent_now = sum(sent.values())
+        except Exception as e:
+            st.caption(f"Alert Telegram: errore — {e}")
 
 # ============== Diagnostica finale ==============
 st.subheader("Diagnostica")
@@ -1584,10 +1198,70 @@ with d5:
     st.text(f"Nuove coin source: {src}")
 st.caption(
     f"Stato: {'🟢 Running' if running else '⏸️ Pausa'} • Refresh: {REFRESH_SEC}s • "
-    f"TG alerts (run): {tg_sent_now} • Ticket proxy: ${PROXY_TICKET:.0f} • "
+    f"TG alerts accodati (run): {tg_sent_now} • Ticket proxy: ${PROXY_TICKET:.0f} • "
     f"PAIRS→Diagnostica: {'ON' if pairs_filters_to_strategy else 'OFF'} • "
     f"EquityCurve: tracking={'ON' if st.session_state.get('eq_enabled', True) else 'OFF'} • "
     f"TopN={int(st.session_state.get('eq_topN_tab', 10))} • Equity=${st.session_state.get('eq_equity', 0):,.2f}".replace(",", ".")
 )
 
+with st.expander("⏱️ Tempi per stadio (rolling p50/p95)"):
+    stage_rows = STATS.summary()
+    if stage_rows:
+        st.dataframe(
+            pd.DataFrame(stage_rows).rename(columns={"stage": "Stadio", "n": "Campioni", "last_ms": "Ultimo (ms)",
+                                                     "p50_ms": "p50 (ms)", "p95_ms": "p95 (ms)"}),
+            use_container_width=True, hide_index=True,
+            column_config={c: st.column_config.NumberColumn(format="%.1f") for c in STAGE_MS_COLS},
+        )
+        st.caption("app.* = stadi del rerun (app.rerun = totale, aggiornato a fine script) • provider.* = fasi del refresh provider.")
+    else:
+        st.caption("Nessun campione ancora.")
+    _lazy = ", ".join(f"{k[5:]} {v*1e3:.0f} ms" for k, v in STARTUP.items() if k.startswith("lazy:")) or "nessuno"
+    st.caption(f"Avvio a freddo (processo, {time.strftime('%H:%M:%S', time.localtime(PROCESS_START))}): "
+               f"import {STARTUP.get('imports', 0)*1e3:.0f} ms • primo rerun completo "
+               + (f"{STARTUP['first_rerun']*1e3:.0f} ms" if "first_rerun" in STARTUP else "in corso")
+               + f" • import in questo rerun {_IMPORT_SEC*1e3:.1f} ms • import lazy: {_lazy}")
+    if metrics.METRICS_PORT:
+        st.caption(f"Metriche Prometheus: http://{metrics.METRICS_HOST}:{metrics.METRICS_PORT}/metrics • "
+                   f"Sessioni attive: {metrics.active_sessions()}")
+
+_ob = get_outbox().stats()
+st.caption(f"Outbox Telegram: in coda {_ob['pending']} • inviati {_ob['sent_msgs']} msg / {_ob['sent_signals']} segnali • "
+           f"dedup {_ob['deduped']} • retry {_ob['retries']} • scartati {_ob['dropped']}"
+           + (f" • ultimo errore: {_ob['last_error']}" if _ob.get("last_error") else ""))
+if hasattr(provider, "writer_status"):
+    _ws = provider.writer_status()
+    st.caption(f"Provider in processo separato: `{_ws['name']}` • writer pid {_ws['pid']} • "
+               f"heartbeat {_ws['heartbeat_age']:.0f}s fa • snapshot v{_ws['version']} ({_ws['size']/1e6:.1f} MB "
+               f"{'in file mappato' if _ws.get('backend') == 'file' else 'in shared memory'})"
+               if _ws["alive"] else f"Provider in processo separato: `{_ws['name']}` • writer non attivo (riavvio automatico)")
+    if _ws.get("private_cols"):
+        st.caption(f"⚠️ Colonne snapshot copiate in memoria privata (non condivise tra repliche): {', '.join(_ws['private_cols'])}")
+_ss = store.stats()
+st.caption(f"Memoria sessione: {_ss['total_bytes']/1e6:.2f} MB (chiavi gestite {_ss['managed_bytes']/1e6:.2f}/"
+           f"{_ss['max_bytes']/1e6:.0f} MB) • {len(_ss['rows'])} chiavi • evizioni {_ss['evicted']}")
+with st.expander("🧠 Stato di sessione per chiave"):
+    st.dataframe(pd.DataFrame(_ss["rows"][:30]).rename(columns={"key": "Chiave", "bytes": "Byte", "items": "Voci",
+                                                                 "managed": "Gestita", "age_s": "Ultimo accesso (s)",
+                                                                 "ttl_s": "TTL (s)"}),
+                 use_container_width=True, hide_index=True)
+_dc = DERIVED.stats()
+st.caption(f"Cache derivata (processo): hit {_dc['hit_rate']*100:.0f}% • cross-sessione {_dc['cross_session_hit_rate']*100:.0f}% • "
+           f"{_dc['entries']} voci • {_dc['bytes']/1e6:.1f}/{_dc['max_bytes']/1e6:.0f} MB • evizioni {_dc['evictions']}")
+
+if profiling.enabled():
+    with st.expander(f"🔬 Profiling ({profiling.PROFILE_MODE}, sample={profiling.PROFILE_SAMPLE:g})"):
+        prof_reports = profiling.last_reports()
+        if not prof_reports:
+            st.caption(f"Nessun profilo ancora. Dump in `{profiling.PROFILE_DIR}` (ultimi {profiling.PROFILE_KEEP}).")
+        for rep in reversed(prof_reports[-5:]):
+            head = (f"**{rep['kind']}** • {time.strftime('%H:%M:%S', time.localtime(rep['ts']))} • "
+                    f"{rep['duration_s']*1e3:.0f} ms • {rep['status']}")
+            if rep.get("peak_mb") is not None: head += f" • peak {rep['peak_mb']:.1f} MB"
+            st.markdown(head + (f"  \n`{rep['file']}`" if rep["file"] else ""))
+            if rep["top"]:
+                st.dataframe(pd.DataFrame(rep["top"]), use_container_width=True, hide_index=True)
+
 st.session_state["last_refresh_ts"] = time.time()
+STATS.record("app.rerun", time.perf_counter() - _RERUN_T0)
+mark_startup("first_rerun", time.perf_counter() - _RERUN_T0)
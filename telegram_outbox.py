@@ -0,0 +1,197 @@
+# telegram_outbox.py
+# Outbox asincrona per gli alert Telegram: il render accoda e basta.
+# Un worker in background applica rate-limit per chat/globale, accorpa più segnali in un
+# unico messaggio, ritenta con backoff (rispettando retry_after su 429) e deduplica tra sessioni
+# (TTLDedupStore: una chiave resta attiva per il cooldown con cui è stata accodata).
+# Requisiti: requests
+
+import time, queue, random, threading
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import requests
+
+import metrics
+from alert_rules import TTLDedupStore
+from timing import STATS
+
+TG_API_URL = "https://api.telegram.org/bot{token}/sendMessage"
+TG_MAX_LEN = 4096
+
+
+@dataclass
+class _Msg:
+    token: str
+    chat_id: str
+    key: Hashable
+    text: str
+    ts_enq: float
+    attempts: int = 0
+    not_before: float = 0.0
+
+
+class TelegramOutbox:
+    """
+    Coda process-wide di messaggi Telegram.
+    - per_chat_interval: secondi minimi tra due invii alla stessa chat (Telegram: ~1 msg/s per chat)
+    - global_interval: secondi minimi tra due invii qualsiasi (Telegram: ~30 msg/s per bot)
+    - coalesce_window: attesa massima per accorpare segnali della stessa chat in un messaggio
+    """
+
+    def __init__(self, per_chat_interval: float = 1.1, global_interval: float = 0.04,
+                 coalesce_window: float = 2.0, max_batch: int = 8, max_attempts: int = 5,
+                 timeout: int = 15, dedupe_max: int = 20_000):
+        self.per_chat_interval = float(per_chat_interval)
+        self.global_interval = float(global_interval)
+        self.coalesce_window = float(coalesce_window)
+        self.max_batch = max(1, int(max_batch))
+        self.max_attempts = max(1, int(max_attempts))
+        self.timeout = int(timeout)
+
+        self._q: "queue.Queue[_Msg]" = queue.Queue()
+        self._pending: Dict[Tuple[str, str], List[_Msg]] = {}
+        self._last_chat_send: Dict[Tuple[str, str], float] = {}
+        self._last_send = 0.0
+        self._dedupe = TTLDedupStore(max_keys=dedupe_max)  # (chat_id, key) -> scadenza cooldown
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._th: Optional[threading.Thread] = None
+        self._stats = {"enqueued": 0, "deduped": 0, "sent_msgs": 0, "sent_signals": 0, "retries": 0, "dropped": 0}
+        self._last_error: Optional[str] = None
+
+    # ---------------- Public API ----------------
+
+    def enqueue(self, token: str, chat_id: str, key: Hashable, text: str, cooldown_sec: float = 0.0) -> bool:
+        """Accoda un segnale. False se (chat, key) è ancora in cooldown (anche da altre sessioni)."""
+        if not (token and chat_id): return False
+        now = time.time()
+        if not self._dedupe.add_if_absent((str(chat_id), key), float(cooldown_sec), now):
+            with self._lock: self._stats["deduped"] += 1
+            metrics.ALERT_OUTBOX_EVENTS.inc(event="deduped")
+            return False
+        with self._lock:
+            self._stats["enqueued"] += 1
+        metrics.ALERT_OUTBOX_EVENTS.inc(event="enqueued")
+        self._q.put(_Msg(str(token), str(chat_id), key, text, now))
+        self._ensure_worker()
+        return True
+
+    def is_cooling(self, chat_id: str, key: Hashable) -> bool:
+        """True se (chat, key) è in cooldown (durata fissata all'accodamento)."""
+        return self._dedupe.active((str(chat_id), key))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+            out["pending"] = sum(len(v) for v in self._pending.values()) + self._q.qsize()
+            out["last_error"] = self._last_error
+        out["dedupe_keys"] = len(self._dedupe)
+        return out
+
+    # ---------------- Worker ----------------
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._th is not None and self._th.is_alive(): return
+            self._th = threading.Thread(target=self._run, name="telegram-outbox", daemon=True)
+            self._th.start()
+
+    def _drain(self, wait: float) -> None:
+        try:
+            m = self._q.get(timeout=max(0.05, wait))
+        except queue.Empty:
+            return
+        while True:
+            with self._lock:
+                self._pending.setdefault((m.token, m.chat_id), []).append(m)
+            try:
+                m = self._q.get_nowait()
+            except queue.Empty:
+                return
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                has_pending = any(self._pending.values())
+            self._drain(0.25 if has_pending else 5.0)
+            try:
+                self._tick()
+            except Exception as e:  # il worker non deve morire
+                with self._lock: self._last_error = str(e)
+
+    def _tick(self) -> None:
+        now = time.time()
+        with self._lock:
+            chats = [(c, list(msgs)) for c, msgs in self._pending.items() if msgs]
+        for chat, msgs in chats:
+            ready = [m for m in msgs if m.not_before <= now]
+            if not ready: continue
+            oldest = min(m.ts_enq for m in ready)
+            if now - oldest < self.coalesce_window and len(ready) < self.max_batch: continue
+            if now - self._last_chat_send.get(chat, 0.0) < self.per_chat_interval: continue
+            if now - self._last_send < self.global_interval: continue
+
+            batch: List[_Msg] = []; size = 0
+            for m in ready:
+                add = len(m.text) + (2 if batch else 0)
+                if batch and (len(batch) >= self.max_batch or size + add > TG_MAX_LEN): break
+                batch.append(m); size += add
+            self._send_batch(chat, batch)
+            now = time.time()
+
+    def _send_batch(self, chat: Tuple[str, str], batch: List[_Msg]) -> None:
+        token, chat_id = chat
+        text = "\n\n".join(m.text for m in batch)[:TG_MAX_LEN]
+        t0 = time.perf_counter(); result = "error"; retry_after = None; fatal = False
+        try:
+            r = self._session.post(TG_API_URL.format(token=token), timeout=self.timeout,
+                                   data={"chat_id": chat_id, "text": text, "disable_web_page_preview": True})
+            result = "ok" if r.ok else f"http_{r.status_code}"
+            if r.status_code == 429:
+                try: retry_after = float(r.json().get("parameters", {}).get("retry_after"))
+                except Exception: retry_after = None
+            elif not r.ok and r.status_code < 500:
+                fatal = True  # 400/401/403: ritentare non serve
+        except Exception as e:
+            with self._lock: self._last_error = str(e)
+        finally:
+            metrics.ALERT_SEND_SECONDS.observe(time.perf_counter() - t0, result=result)
+            STATS.record("outbox.telegram_send", time.perf_counter() - t0)
+        now = time.time()
+        self._last_send = now
+        self._last_chat_send[chat] = now
+
+        with self._lock:
+            pend = self._pending.get(chat, [])
+            if result == "ok":
+                for m in batch: pend.remove(m)
+                self._stats["sent_msgs"] += 1; self._stats["sent_signals"] += len(batch)
+                metrics.ALERT_OUTBOX_EVENTS.inc(event="sent")
+                return
+            self._last_error = f"{result} (chat {chat_id})" if result != "error" else self._last_error
+            # stesso ritardo per tutto il batch, così il retry resta un unico messaggio
+            attempts = max(m.attempts for m in batch) + 1
+            delay = max(min(300.0, 2.0 ** attempts) + random.uniform(0, 0.5), retry_after or 0.0)
+            for m in batch:
+                m.attempts += 1
+                if fatal or m.attempts >= self.max_attempts:
+                    pend.remove(m)
+                    self._dedupe.discard((m.chat_id, m.key))  # non inviato: non blocca il prossimo rerun
+                    self._stats["dropped"] += 1
+                    metrics.ALERT_OUTBOX_EVENTS.inc(event="dropped")
+                else:
+                    m.not_before = now + delay
+                    self._stats["retries"] += 1
+                    metrics.ALERT_OUTBOX_EVENTS.inc(event="retry")
+
+
+_outbox: Optional[TelegramOutbox] = None
+_outbox_lock = threading.Lock()
+
+def get_outbox() -> TelegramOutbox:
+    """Outbox condivisa dal processo (tutte le sessioni Streamlit)."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = TelegramOutbox()
+        return _outbox
@@ -0,0 +1,5 @@
+# tests/conftest.py
+# I moduli dell'app sono piatti nella root del repo: la rendiamo importabile dai test
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,122 @@
+# tests/test_alert_rules.py
+# TTLDedupStore (scadenze, tetto chiavi) e RuleEngine (maschere vettoriali, ordinamento, cooldown in dispatch)
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from alert_rules import AlertRule, RuleEngine, TTLDedupStore, _Columns, default_rules, load_rules, rule_from_spec
+
+
+# ================= TTLDedupStore =================
+def test_dedup_key_blocks_until_expiry():
+    s = TTLDedupStore()
+    assert s.add_if_absent("k", 10, now=100.0)
+    assert not s.add_if_absent("k", 10, now=105.0)
+    assert s.active("k", now=109.9) and not s.active("k", now=110.0)
+    assert s.add_if_absent("k", 10, now=110.0)
+
+def test_dedup_zero_ttl_never_blocks():
+    s = TTLDedupStore()
+    assert s.add_if_absent("k", 0, now=1.0) and s.add_if_absent("k", 0, now=1.0)
+    assert not s.active("k", now=1.0)
+
+def test_dedup_discard_releases_key():
+    s = TTLDedupStore()
+    s.add_if_absent("k", 60, now=0.0)
+    s.discard("k")
+    assert s.add_if_absent("k", 60, now=1.0)
+
+def test_dedup_max_keys_evicts_closest_to_expiry():
+    s = TTLDedupStore(max_keys=2)
+    s.add_if_absent("a", 10, now=0.0)
+    s.add_if_absent("b", 30, now=0.0)
+    s.add_if_absent("c", 20, now=0.0)
+    assert not s.active("a", now=1.0)
+    assert s.active("b", now=1.0) and s.active("c", now=1.0)
+
+
+# ================= Regole =================
+@pytest.fixture
+def pairs():
+    return pd.DataFrame({
+        "Pair": ["AAA/SOL", "BBB/SOL", "CCC/USDC", "DDD/SOL"],
+        "Base Address": ["a", "b", "c", "d"],
+        "DEX": ["raydium", "Orca", "raydium", None],
+        "Txns 1h": [900, 300, np.nan, 1200],
+        "Meme Score": [80, 90, 70, 60],
+    })
+
+def _mask(rule: AlertRule, df: pd.DataFrame) -> list:
+    return rule.mask(_Columns(df)).tolist()
+
+def test_numeric_ops_treat_nan_as_false(pairs):
+    assert _mask(AlertRule("r", [("Txns 1h", ">=", 900)]), pairs) == [True, False, False, True]
+    assert _mask(AlertRule("r", [("Txns 1h", "!=", 300)]), pairs) == [True, False, False, True]
+
+def test_string_ops_are_case_insensitive(pairs):
+    assert _mask(AlertRule("r", [("DEX", "in", ["ORCA", "raydium"])]), pairs) == [True, True, True, False]
+    assert _mask(AlertRule("r", [("DEX", "not in", ["raydium"])]), pairs) == [False, True, False, True]
+    assert _mask(AlertRule("r", [("DEX", "==", "orca")]), pairs) == [False, True, False, False]
+
+def test_contains_matches_any_value_literally(pairs):
+    assert _mask(AlertRule("r", [("Pair", "contains", ["usdc", "bbb"])]), pairs) == [False, True, True, False]
+    # i valori non sono regex
+    assert _mask(AlertRule("r", [("Pair", "contains", "a.a")]), pairs) == [False, False, False, False]
+
+def test_conditions_are_anded_and_missing_column_matches_nothing(pairs):
+    r = AlertRule("r", [("Txns 1h", ">=", 500), ("DEX", "==", "raydium")])
+    assert _mask(r, pairs) == [True, False, False, False]
+    assert _mask(AlertRule("r", [("Nope", ">=", 1)]), pairs) == [False] * 4
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError): AlertRule("r", [("x", "~", 1)])
+    with pytest.raises(ValueError): AlertRule("r", source="boh")
+    with pytest.raises(ValueError): AlertRule("r", format="template")
+
+def test_evaluate_sorts_and_caps_candidates(pairs):
+    r = AlertRule("r", [("Txns 1h", ">=", 0)], sort=[("Meme Score", False)], max_per_run=1)
+    [(rule, cand)] = RuleEngine([r]).evaluate({"pairs": pairs})
+    assert rule is r
+    assert cand["Pair"].tolist() == ["BBB/SOL", "AAA/SOL"]  # 2 × max_per_run, Meme Score decrescente
+
+def test_rule_from_spec_and_load_rules(tmp_path):
+    spec = {"name": "whale", "when": [["Txns 1h", ">=", 800]], "sort": [["Txns 1h", False]],
+            "cooldown_min": 5, "format": "template", "template": "{Pair} {Mancante}"}
+    r = rule_from_spec(spec)
+    assert r.cooldown_sec == 300 and r.when == [("Txns 1h", ">=", 800)] and r.sort == [("Txns 1h", False)]
+    assert r.render(pd.Series({"Pair": "AAA/SOL"})) == "AAA/SOL "
+    p = tmp_path / "rules.json"
+    p.write_text(json.dumps({"rules": [spec]}), encoding="utf-8")
+    assert [x.name for x in load_rules(str(p))] == ["whale"]
+
+def test_default_rules_respect_enable_flags():
+    rules = default_rules(tx_min=1, liq_min=1, meme_min=0, dd_thr=-15, max_per_run=3, cooldown_sec=60,
+                          hit=True, trail=False, entry=True)
+    assert [r.name for r in RuleEngine(rules).rules] == ["hit", "entry"]
+
+
+# ================= dispatch =================
+class _Outbox:
+    def __init__(self, cooling=()):
+        self.cooling = set(cooling)
+        self.sent = []
+
+    def is_cooling(self, chat_id, key):
+        return key in self.cooling
+
+    def enqueue(self, token, chat_id, key, text, cooldown_sec=0.0):
+        if key in self.cooling: return False
+        self.cooling.add(key)
+        self.sent.append((key, text, cooldown_sec))
+        return True
+
+def test_dispatch_skips_cooling_keys_and_fills_up_to_max(pairs):
+    r = AlertRule("hot", [("Txns 1h", ">=", 0)], sort=[("Txns 1h", False)], max_per_run=2, cooldown_sec=60,
+                  format="template", template="{Pair}")
+    ob = _Outbox(cooling={("hot", "d")})
+    assert RuleEngine([r]).dispatch({"pairs": pairs}, ob, "tok", "chat") == {"hot": 2}
+    assert [t for _, t, _ in ob.sent] == ["AAA/SOL", "BBB/SOL"]
+    # secondo passaggio: tutto in cooldown
+    assert RuleEngine([r]).dispatch({"pairs": pairs}, ob, "tok", "chat") == {"hot": 0}
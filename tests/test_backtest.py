@@ -0,0 +1,72 @@
+# tests/test_backtest.py
+# Uscite del backtest: trailing dal massimo, stop, take profit, durata massima e fine dati, trade indipendenti
+import numpy as np
+import pytest
+from pandas.testing import assert_frame_equal
+
+from backtest import compute_exits
+from snapshot_history import SnapshotPanel
+
+
+def _panel(series, step=60.0):
+    """series: {pair: [prezzo per snapshot]} (NaN = pair assente nello snapshot)."""
+    n = max(len(v) for v in series.values())
+    snaps = []
+    for t in range(n):
+        pairs = [p for p, v in series.items() if t < len(v) and not np.isnan(v[t])]
+        snaps.append((t * step, {"pairAddress": np.array(pairs, dtype=str),
+                                 "priceUsd": np.array([series[p][t] for p in pairs], dtype="float64"),
+                                 "baseSymbol": np.array([p.upper() for p in pairs], dtype=str)}))
+    return SnapshotPanel.from_snapshots(snaps)
+
+def _exit(px, entry=0, **kw):
+    ex = compute_exits(_panel({"a": px}), np.array([entry]), **kw)
+    return ex.iloc[0]
+
+
+def test_trailing_stop_from_peak():
+    r = _exit([1.0, 1.5, 2.0, 1.8, 1.6, 2.5], trail_pct=15, stop_pct=25)
+    assert r["reason"] == "trail" and r["exit_row"] == 4
+    assert r["exit_px"] == 1.6 and r["ret_pct"] == pytest.approx(60.0)
+    assert r["peak_pct"] == pytest.approx(100.0)
+
+def test_stop_from_entry_price():
+    r = _exit([1.0, 0.9, 0.7, 2.0], trail_pct=0, stop_pct=25)
+    assert r["reason"] == "stop" and r["exit_row"] == 2 and r["ret_pct"] == pytest.approx(-30.0)
+
+def test_take_profit():
+    r = _exit([1.0, 1.2, 1.5, 1.1], trail_pct=0, stop_pct=0, tp_pct=40)
+    assert r["reason"] == "tp" and r["exit_row"] == 2
+
+def test_first_hit_wins():
+    # a t=2 scattano sia trailing (dal picco 1.3) sia stop (dal prezzo di entrata): stessa riga
+    r = _exit([1.0, 1.3, 0.7], trail_pct=10, stop_pct=20)
+    assert r["exit_row"] == 2 and r["reason"] in ("trail", "stop")
+    r = _exit([1.0, 1.3, 1.1, 0.7], trail_pct=10, stop_pct=20)
+    assert r["exit_row"] == 2 and r["reason"] == "trail"
+
+def test_max_hold_and_end_of_data():
+    px = [1.0, 1.01, 1.02, 1.03, 1.04]
+    r = _exit(px, max_hold_sec=120)
+    assert r["reason"] == "time" and r["exit_row"] == 2 and r["exit_ts"] == 120.0
+    r = _exit(px, max_hold_sec=86400)
+    assert r["reason"] == "end" and r["exit_row"] == 4
+    r = _exit(px, entry=4)  # entrata sull'ultima riga della pair
+    assert r["reason"] == "end" and r["exit_row"] == 4 and r["ret_pct"] == 0.0
+
+def test_entry_price_is_not_an_exit():
+    # il controllo parte dalla riga dopo l'entrata
+    r = _exit([1.0, 1.0, 0.5], trail_pct=0, stop_pct=0, tp_pct=0)
+    assert r["reason"] == "end" and r["exit_row"] == 2
+
+def test_trades_are_independent_across_pairs_and_chunks():
+    panel = _panel({"a": [1.0, 2.0, 1.0, 1.0], "b": [5.0, 5.5, 6.0, 4.0], "c": [np.nan, 1.0, 0.9, 3.0]})
+    entries = np.array([0, 1, 4, 8])
+    full = compute_exits(panel, entries, trail_pct=15, stop_pct=25)
+    assert full["pair"].tolist() == ["a", "a", "b", "c"]
+    assert full["reason"].tolist() == ["trail", "trail", "trail", "end"]
+    assert full["exit_row"].tolist() == [2, 2, 7, 10]
+    # il picco di un trade non passa al successivo, anche nello stesso blocco
+    assert full["peak_pct"].tolist() == pytest.approx([100.0, 0.0, 20.0, 200.0])
+    for chunk in (1, 2, 3):
+        assert_frame_equal(compute_exits(panel, entries, trail_pct=15, stop_pct=25, chunk_rows=chunk), full)
@@ -0,0 +1,99 @@
+# tests/test_derived_cache.py
+# Cache derivata: hit/miss per chiave, single-flight tra thread, errori, LRU per voci e per memoria
+import threading, time
+
+import pandas as pd
+import pytest
+
+from derived_cache import DerivedCache, params_key
+
+
+def test_params_key_is_canonical():
+    assert params_key({"a": 1, "b": (1, 2)}) == params_key({"b": [1, 2], "a": 1})
+    assert params_key({"a": 1}) != params_key({"a": 2})
+
+def test_hit_only_for_same_namespace_version_and_params():
+    c = DerivedCache(max_bytes=10**7, max_entries=10)
+    calls = []
+    def compute(v):
+        return lambda: calls.append(v) or v
+    assert c.get_or_compute("t", 1, {"x": 1}, compute("a")) == "a"
+    assert c.get_or_compute("t", 1, {"x": 1}, compute("b")) == "a"
+    assert c.get_or_compute("t", 2, {"x": 1}, compute("c")) == "c"
+    assert c.get_or_compute("u", 1, {"x": 1}, compute("d")) == "d"
+    assert c.get_or_compute("t", 1, {"x": 2}, compute("e")) == "e"
+    st = c.stats()
+    assert calls == ["a", "c", "d", "e"]
+    assert (st["hits"], st["misses"], st["entries"]) == (1, 4, 4)
+    assert st["namespaces"]["t"] == {"hits": 1, "misses": 3}
+
+def test_cross_session_hits_are_counted():
+    c = DerivedCache(max_bytes=10**7, max_entries=10)
+    c.get_or_compute("t", 1, {}, lambda: 1, session="s1")
+    c.get_or_compute("t", 1, {}, lambda: 1, session="s1")
+    c.get_or_compute("t", 1, {}, lambda: 1, session="s2")
+    assert c.stats()["cross_session_hits"] == 1
+
+def test_single_flight_computes_once_for_concurrent_callers():
+    c = DerivedCache(max_bytes=10**7, max_entries=10)
+    calls, out = [], []
+    gate = threading.Event()
+    def compute():
+        calls.append(1)
+        gate.wait(5)
+        return "v"
+    ths = [threading.Thread(target=lambda i=i: out.append(c.get_or_compute("t", 1, {}, compute, session=f"s{i}")))
+           for i in range(8)]
+    for t in ths: t.start()
+    time.sleep(0.2)
+    gate.set()
+    for t in ths: t.join(5)
+    assert len(calls) == 1 and out == ["v"] * 8
+    st = c.stats()
+    assert (st["misses"], st["hits"]) == (1, 7)
+
+def test_single_flight_delivers_uncacheable_values():
+    c = DerivedCache(max_bytes=1, max_entries=10)  # nessun valore entra in cache
+    calls, out = [], []
+    gate = threading.Event()
+    def compute():
+        calls.append(1)
+        gate.wait(5)
+        return "valore"
+    ths = [threading.Thread(target=lambda: out.append(c.get_or_compute("t", 1, {}, compute))) for _ in range(4)]
+    for t in ths: t.start()
+    time.sleep(0.2)
+    gate.set()
+    for t in ths: t.join(5)
+    assert len(calls) == 1 and out == ["valore"] * 4
+    assert c.stats()["entries"] == 0
+
+def test_failed_compute_raises_and_is_not_cached():
+    c = DerivedCache(max_bytes=10**7, max_entries=10)
+    def boom():
+        raise RuntimeError("x")
+    with pytest.raises(RuntimeError):
+        c.get_or_compute("t", 1, {}, boom)
+    assert c.get_or_compute("t", 1, {}, lambda: 2) == 2
+
+def test_lru_eviction_by_entries():
+    c = DerivedCache(max_bytes=10**7, max_entries=2)
+    c.get_or_compute("t", 1, {}, lambda: "a")
+    c.get_or_compute("t", 2, {}, lambda: "b")
+    c.get_or_compute("t", 1, {}, lambda: "a2")  # 1 diventa il più recente
+    c.get_or_compute("t", 3, {}, lambda: "c")   # esce 2
+    assert c.get_or_compute("t", 1, {}, lambda: "nuovo") == "a"
+    assert c.get_or_compute("t", 2, {}, lambda: "nuovo") == "nuovo"
+    assert c.stats()["evictions"] >= 1
+
+def test_eviction_by_bytes_and_uncacheable():
+    df = pd.DataFrame({"x": range(1000)})
+    nbytes = int(df.memory_usage(index=True, deep=True).sum())
+    c = DerivedCache(max_bytes=int(nbytes * 1.5), max_entries=100)
+    c.get_or_compute("t", 1, {}, lambda: df)
+    c.get_or_compute("t", 2, {}, lambda: df.copy())
+    st = c.stats()
+    assert st["entries"] == 1 and st["bytes"] <= st["max_bytes"] and st["evictions"] == 1
+    big = pd.DataFrame({"x": range(10_000)})
+    c.get_or_compute("t", 3, {}, lambda: big)
+    assert c.stats()["uncacheable"] == 1
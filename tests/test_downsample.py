@@ -0,0 +1,45 @@
+# tests/test_downsample.py
+# LTTB e min/max per bucket: numero di punti, estremi e picchi conservati
+import numpy as np
+import pandas as pd
+
+from downsample import downsample_frame, lttb_indices, minmax_indices
+
+
+def test_lttb_returns_all_points_when_under_budget():
+    assert lttb_indices(range(10), range(10), 10).tolist() == list(range(10))
+    assert lttb_indices(range(10), range(10), 2).tolist() == list(range(10))
+
+def test_lttb_size_order_and_endpoints():
+    x = np.arange(10_000.0)
+    y = np.sin(x / 300.0)
+    idx = lttb_indices(x, y, 500)
+    assert len(idx) == 500 and idx[0] == 0 and idx[-1] == 9_999
+    assert np.all(np.diff(idx) > 0)
+
+def test_lttb_keeps_isolated_spikes():
+    y = np.zeros(5_000)
+    y[1234], y[3777] = 50.0, -40.0
+    idx = lttb_indices(np.arange(5_000), y, 100)
+    assert 1234 in idx and 3777 in idx
+
+def test_lttb_accepts_datetimes_and_nan():
+    x = pd.date_range("2024-01-01", periods=1_000, freq="min")
+    y = np.random.default_rng(0).normal(size=1_000)
+    y[10] = np.nan
+    idx = lttb_indices(x, y, 50)
+    assert len(idx) == 50 and np.all(np.diff(idx) > 0)
+
+def test_minmax_keeps_global_extremes():
+    y = np.random.default_rng(1).normal(size=10_000)
+    idx = minmax_indices(y, 200)
+    assert len(idx) <= 200 and np.all(np.diff(idx) > 0)
+    assert int(np.argmax(y)) in idx and int(np.argmin(y)) in idx
+
+def test_downsample_frame():
+    df = pd.DataFrame({"t": np.arange(5_000), "v": np.cos(np.arange(5_000) / 50.0)})
+    small = df.head(100)
+    assert downsample_frame(small, "t", "v", max_points=200) is small
+    out = downsample_frame(df, "t", "v", max_points=300)
+    assert len(out) == 300 and out["t"].is_monotonic_increasing
+    assert len(downsample_frame(df, "t", "v", max_points=300, method="minmax")) <= 300
@@ -0,0 +1,58 @@
+# tests/test_equity_series.py
+# EquitySeries: statistiche esatte sull'intera sessione, storico a livelli limitato e ritorni composti
+import numpy as np
+import pytest
+
+from equity_series import EquitySeries
+
+
+def _feed(es: EquitySeries, n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    rets = rng.normal(0, 0.02, n)
+    eq = es.initial * np.cumprod(1.0 + rets)
+    for i in range(n):
+        es.append(float(i), eq[i], rets[i], i % 7)
+    return rets, eq
+
+def test_short_series_is_kept_verbatim():
+    es = EquitySeries(100.0, capacity=64)
+    rets, eq = _feed(es, 10)
+    ts, e, r, n = es.arrays()
+    assert len(es) == 10
+    assert np.array_equal(ts, np.arange(10.0)) and np.allclose(e, eq) and np.allclose(r, rets)
+    assert es.last()["equity"] == pytest.approx(eq[-1])
+
+def test_empty_series_defaults():
+    es = EquitySeries(100.0)
+    assert es.equity == 100.0 and es.cum_return == 0.0 and es.drawdown == 0.0 and len(es) == 0
+    assert all(len(a) == 0 for a in es.arrays())
+
+def test_stats_are_exact_over_the_whole_session():
+    es = EquitySeries(100.0, capacity=8, factor=2, tiers=2)
+    _, eq = _feed(es, 5000)
+    peak = np.maximum.accumulate(eq)
+    assert es.ticks == 5000
+    assert es.peak == pytest.approx(eq.max())
+    assert es.max_drawdown == pytest.approx((eq / peak - 1.0).min())
+    assert es.cum_return == pytest.approx(eq[-1] / 100.0 - 1.0)
+    assert es.drawdown == pytest.approx(eq[-1] / eq.max() - 1.0)
+
+def test_history_is_bounded_and_tiered():
+    es = EquitySeries(100.0, capacity=16, factor=4, tiers=3)
+    rets, eq = _feed(es, 10_000)
+    assert len(es) <= 3 * 16
+    ts, e, r, _ = es.arrays()
+    assert np.all(np.diff(ts) > 0)                      # dal più vecchio al più recente
+    assert np.array_equal(ts[-8:], np.arange(9992.0, 10_000.0))  # coda a piena risoluzione
+    assert e[-1] == pytest.approx(eq[-1])
+    # ogni punto accorpato porta ts/equity dell'ultimo tick del blocco e il ritorno composto del blocco
+    assert np.allclose(e, eq[ts.astype(int)])
+    prev = np.concatenate(([-1], ts[:-1].astype(int)))
+    for p, t_i, r_i in zip(prev, ts.astype(int), r):
+        if p >= 0: assert r_i == pytest.approx(np.prod(1.0 + rets[p + 1: t_i + 1]) - 1.0)
+
+def test_to_frame_has_time_column():
+    es = EquitySeries(100.0)
+    _feed(es, 3)
+    df = es.to_frame()
+    assert list(df.columns) == ["ts", "equity", "ret", "n", "t"] and len(df) == 3
@@ -0,0 +1,66 @@
+# tests/test_market_data.py
+# Filtri provider sullo snapshot condiviso e registro dei provider condivisi (senza rete)
+import pandas as pd
+import pytest
+
+import market_data
+from market_data import MarketDataProvider, apply_provider_filters, get_shared_provider
+
+
+@pytest.fixture
+def snap():
+    return pd.DataFrame({
+        "pairAddress": ["p1", "p2", "p3", "p4"],
+        "dexId": ["raydium", "orca", "Raydium", "raydium"],
+        "quoteSymbol": ["SOL", "SOL", "usdc", "SOL"],
+        "liquidityUsd": [5_000, 50_000, 80_000, None],
+        "volume24hUsd": [1, 2, 3, 4],
+    })
+
+def test_no_active_filter_returns_the_snapshot_itself(snap):
+    assert apply_provider_filters(snap) is snap
+    assert apply_provider_filters(snap, only_raydium=False, min_liq=0, exclude_quotes=()) is snap
+
+def test_filters_combine(snap):
+    out = apply_provider_filters(snap, only_raydium=True, min_liq=1_000, exclude_quotes=("USDC",))
+    assert out["pairAddress"].tolist() == ["p1"]
+    assert out.index.tolist() == [0]
+    assert apply_provider_filters(snap, exclude_quotes=["usdc"])["pairAddress"].tolist() == ["p1", "p2", "p4"]
+    assert apply_provider_filters(snap, min_liq=10_000)["pairAddress"].tolist() == ["p2", "p3"]
+
+def test_provider_dedup_keeps_highest_volume(snap):
+    prov = MarketDataProvider()
+    dup = pd.concat([snap, snap.assign(volume24hUsd=[10, 0, 0, 0])], ignore_index=True)
+    out = prov._apply_filters(dup)
+    assert sorted(out["pairAddress"]) == ["p1", "p2", "p3", "p4"]
+    assert out.loc[out["pairAddress"] == "p1", "volume24hUsd"].item() == 10
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(market_data, "_shared", type(market_data._shared)())
+    monkeypatch.setattr(market_data, "_shared_used", {})
+    monkeypatch.setattr(market_data, "PROVIDER_MODE", "thread")
+    monkeypatch.setattr(MarketDataProvider, "start_auto_refresh", lambda self: None)
+    stopped = []
+    monkeypatch.setattr(MarketDataProvider, "stop", lambda self: stopped.append(self.key))
+    return stopped
+
+def test_shared_provider_is_one_per_refresh_and_queries(registry):
+    a = get_shared_provider(refresh_sec=60)
+    assert get_shared_provider(refresh_sec=60) is a
+    assert a.key == (60, ()) and a.name == "shared_60s"
+    b = get_shared_provider(refresh_sec=60, queries=["chain:solana pump"])
+    assert b is not a and b.name.startswith("shared_60s_")
+
+def test_shared_provider_in_use_is_never_stopped(registry, monkeypatch):
+    monkeypatch.setattr(market_data, "MAX_SHARED_PROVIDERS", 1)
+    a = get_shared_provider(refresh_sec=60)
+    get_shared_provider(refresh_sec=30)
+    assert registry == [] and get_shared_provider(refresh_sec=60) is a
+    # inattivo oltre SHARED_PROVIDER_IDLE_SEC: al prossimo provider nuovo viene fermato
+    market_data._shared_used[(60, ())] -= market_data.SHARED_PROVIDER_IDLE_SEC + 1
+    market_data._shared_used[(30, ())] -= market_data.SHARED_PROVIDER_IDLE_SEC + 1
+    get_shared_provider(refresh_sec=15)
+    assert sorted(registry) == [(30, ()), (60, ())]
+    assert list(market_data._shared) == [(15, ())]
@@ -0,0 +1,96 @@
+# tests/test_paper_ledger.py
+# Ledger paper trading: apertura, mark-to-market (trailing/stop), idempotenza per sorgente, chiusure, lock
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from paper_ledger import PaperLedger, mark_source
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    led = PaperLedger(str(tmp_path / "ledger.sqlite"), initial_capital=1000)
+    yield led
+    led.close()
+
+def _rows(**px):
+    return pd.DataFrame({"Pair Address": list(px), "Price (USD)": list(px.values()),
+                         "Pair": [a.upper() + "/SOL" for a in px]})
+
+def _snap(**px):
+    return pd.DataFrame({"pairAddress": list(px), "priceUsd": list(px.values())})
+
+
+def test_open_positions_skips_invalid_and_held(ledger):
+    assert ledger.open_positions(_rows(a=1.0, b=0.0, c=2.0), alloc=100, ts=1.0) == 2
+    assert ledger.open_positions(_rows(a=1.5, d=4.0), alloc=100, ts=2.0) == 1  # a già aperta
+    pos = ledger.positions().set_index("pair_address")
+    assert sorted(pos.index) == ["a", "c", "d"]
+    assert pos.loc["c", "qty"] == 50.0 and pos.loc["c", "peak_px"] == 2.0
+    s = ledger.summary()
+    assert s["open"] == 3 and s["cash"] == 700.0 and s["equity"] == 1000.0
+
+def test_mark_to_market_trail_and_stop(ledger):
+    ledger.open_positions(_rows(a=1.0, b=1.0, c=1.0), alloc=100, ts=0.0, trail_pct=15, stop_pct=25)
+    out = ledger.mark_to_market(_snap(a=2.0, b=0.9, c=1.1, x=5.0), ts=10.0)
+    assert out == {"open": 3, "marked": 3, "closed": 0}
+    out = ledger.mark_to_market(_snap(a=1.6, b=0.7, c=1.0), ts=20.0)
+    assert out == {"open": 3, "marked": 3, "closed": 2}
+    closed = ledger.positions("closed").set_index("pair_address")
+    assert closed.loc["a", "exit_reason"] == "trail" and closed.loc["a", "peak_px"] == 2.0
+    assert closed.loc["a", "pnl"] == pytest.approx(60.0)
+    assert closed.loc["b", "exit_reason"] == "stop" and closed.loc["b", "pnl"] == pytest.approx(-30.0)
+    opened = ledger.positions().set_index("pair_address")
+    assert list(opened.index) == ["c"] and opened.loc["c", "peak_px"] == 1.1 and opened.loc["c", "last_ts"] == 20.0
+    s = ledger.summary()
+    assert s["realized_pnl"] == pytest.approx(30.0) and s["win_rate"] == 0.5 and s["last_mark_ts"] == 20.0
+
+def test_missing_pairs_keep_last_price(ledger):
+    ledger.open_positions(_rows(a=1.0), alloc=100, ts=0.0)
+    assert ledger.mark_to_market(_snap(z=1.0), ts=10.0) == {"open": 1, "marked": 0, "closed": 0}
+    assert ledger.positions().loc[0, "last_px"] == 1.0
+
+def test_mark_idempotent_per_source(ledger, tmp_path):
+    ledger.open_positions(_rows(a=1.0), alloc=100, ts=0.0)
+    ui, daemon = mark_source((60, ())), mark_source("daemon")
+    assert ledger.mark_to_market(_snap(a=1.2), ts=100.0, source=ui) is not None
+    assert ledger.mark_to_market(_snap(a=0.1), ts=100.0, source=ui) is None
+    assert ledger.mark_to_market(_snap(a=1.1), ts=50.0, source=daemon) is not None  # ts di un altro provider
+    # un altro processo sullo stesso file vede lo snapshot già marcato
+    other = PaperLedger(ledger.path)
+    try:
+        assert other.mark_to_market(_snap(a=0.1), ts=100.0, source=ui) is None
+    finally:
+        other.close()
+    assert ledger.positions().loc[0, "status"] == "open"
+
+def test_busy_timeout_raises_instead_of_blocking(ledger):
+    other = sqlite3.connect(ledger.path, isolation_level=None)
+    try:
+        other.execute("BEGIN IMMEDIATE")
+        with pytest.raises(sqlite3.OperationalError):
+            ledger.mark_to_market(_snap(a=1.0), ts=1.0, busy_timeout=0.05)
+        other.execute("ROLLBACK")
+    finally:
+        other.close()
+    assert ledger.mark_to_market(_snap(a=1.0), ts=1.0, busy_timeout=0.05) is not None  # timeout ripristinato
+
+def test_close_positions_at_last_mark(ledger):
+    ledger.open_positions(_rows(a=1.0, b=2.0), alloc=100, ts=0.0)
+    ledger.mark_to_market(_snap(a=1.1, b=2.2), ts=10.0)
+    ids = ledger.positions().set_index("pair_address")["id"]
+    assert ledger.close_positions([ids["a"]], ts=20.0) == 1
+    closed = ledger.positions("closed")
+    assert closed.loc[0, "exit_px"] == 1.1 and closed.loc[0, "exit_reason"] == "manual"
+    assert ledger.close_positions(ts=30.0, reason="all") == 1
+    assert ledger.positions().empty and ledger.summary()["closed"] == 2
+
+def test_reset_clears_positions_and_marks(ledger):
+    ledger.open_positions(_rows(a=1.0), alloc=100, ts=0.0)
+    ledger.mark_to_market(_snap(a=1.0), ts=10.0, source="ui")
+    ledger.reset(initial_capital=500)
+    s = ledger.summary()
+    assert s["open"] == 0 and s["initial_capital"] == 500.0 and s["last_mark_ts"] == 0.0
+    ledger.open_positions(_rows(a=1.0), alloc=100, ts=11.0)
+    assert ledger.mark_to_market(_snap(a=1.0), ts=10.0, source="ui") is not None  # marca di nuovo lo stesso ts
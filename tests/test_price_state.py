@@ -0,0 +1,76 @@
+# tests/test_price_state.py
+# Baseline/ATH aggiornati una volta per snapshot (update_price_state) e letti da build_table senza scritture
+import time
+
+import numpy as np
+import pandas as pd
+
+import price_state
+from price_state import PriceMap, price_key, price_maps, update_price_state
+from radar_pipeline import build_table
+
+
+def _snap(prices, **cols):
+    n = len(prices)
+    base = {"baseAddress": [f"b{i}" for i in range(n)], "pairAddress": [f"p{i}" for i in range(n)],
+            "baseSymbol": [f"T{i}" for i in range(n)], "quoteSymbol": ["SOL"] * n, "dexId": ["raydium"] * n,
+            "pairCreatedAt": [int(time.time() * 1000)] * n, "priceUsd": prices}
+    base.update(cols)
+    return pd.DataFrame(base)
+
+def test_price_key_precedence():
+    assert price_key({"baseAddress": "", "pairAddress": "p", "Pair": "X/Y"}) == "p"
+    assert price_key({"Base Address": "b"}) == "b"
+    assert price_key({"pair": "x/y"}) == "x/y"
+    assert price_key({}) is None
+
+def test_update_price_state_baseline_is_first_price_and_ath_the_max():
+    b, a = price_maps()
+    assert update_price_state(_snap([1.0, 2.0, np.nan, 0.0]), b, a) == 2
+    update_price_state(_snap([3.0, 1.0]), b, a)
+    update_price_state(_snap([2.0, 1.5]), b, a)
+    assert dict(b) == {"b0": 1.0, "b1": 2.0}
+    assert dict(a) == {"b0": 3.0, "b1": 2.0}
+
+def test_update_price_state_key_falls_back_to_pair_address():
+    b, a = price_maps()
+    update_price_state(_snap([1.0, 2.0], baseAddress=[None, ""]), b, a)
+    assert set(b) == {"p0", "p1"}
+
+def test_build_table_is_pure_and_reads_price_state():
+    b, a = price_maps()
+    update_price_state(_snap([1.0, 4.0]), b, a)
+    df = _snap([2.0, 2.0])
+    update_price_state(df, b, a)
+    before = (dict(b), dict(a))
+    t = build_table(df, baseline_px=b, ath_px=a, sort_by_meme=False)
+    t2 = build_table(df, baseline_px=b, ath_px=a, sort_by_meme=False)
+    assert (dict(b), dict(a)) == before
+    assert t["ROI (%)"].tolist() == [100.0, -50.0] == t2["ROI (%)"].tolist()
+    assert t["Drawdown (%)"].tolist() == [0.0, -50.0]
+
+def test_build_table_without_price_state_has_no_roi():
+    t = build_table(_snap([1.0]), baseline_px={}, ath_px={})
+    assert t["ROI (%)"].isna().all()
+
+def test_price_map_evicts_oldest_write_and_linked_keys():
+    baseline = {}
+    ath = PriceMap(max_items=3, ttl_sec=0, linked=baseline)
+    for k in "abcd":
+        baseline[k] = 1.0; ath[k] = 1.0
+        if k == "c": ath["a"] = 2.0  # riscrittura: "a" torna in coda
+    assert list(ath) == ["c", "a", "d"] and ath.evictions == 1
+    assert "b" not in baseline and sorted(baseline) == ["a", "c", "d"]
+
+def test_price_map_ttl_from_last_write(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(price_state.time, "time", lambda: now[0])
+    ath = PriceMap(max_items=1000, ttl_sec=60)
+    ath["old"] = 1.0
+    now[0] += 120
+    for i in range(254): ath[f"k{i}"] = 1.0
+    assert "old" in ath  # TTL verificato ogni 256 scritture
+    ath["k254"] = 1.0
+    assert "old" not in ath and len(ath) == 255 and ath.evictions == 1
+    del ath["k254"]
+    assert "k254" not in ath and ath.get("k254") is None
@@ -0,0 +1,64 @@
+# tests/test_session_store.py
+# Stato di sessione limitato: TTL dall'ultimo accesso, limiti per chiave, tetto di sessione; EntryRefs
+import numpy as np
+import pandas as pd
+
+from session_store import EntryRefs, SessionStore, row_lookup
+
+LIMITS = {
+    "results": {"ttl": 60.0, "max_items": 3, "evict": True},
+    "big": {"ttl": 0.0, "max_bytes": 10_000, "evict": True},
+    "pinned": {"ttl": 0.0, "evict": False},
+}
+
+
+def test_put_trims_and_get_touches():
+    state = {}
+    st = SessionStore(state, LIMITS)
+    st.put("results", list(range(10)))
+    assert state["results"] == [7, 8, 9]  # le più recenti
+    st.put("other", {"a": 1})  # chiave non gestita: nessun limite
+    assert st.get("other") == {"a": 1} and st.get("missing", 5) == 5
+    assert SessionStore(state, LIMITS).meta is st.meta  # metadati nello stato: sopravvivono al rerun
+
+def test_enforce_ttl_from_last_access():
+    st = SessionStore({}, LIMITS)
+    st.put("results", [1])
+    t0 = st.meta["access"]["results"]
+    assert st.enforce(now=t0 + 30) == []
+    st.meta["access"]["results"] = t0 + 30  # accesso (get) a t0 + 30
+    assert st.enforce(now=t0 + 80) == []
+    assert st.enforce(now=t0 + 100) == ["results"] and "results" not in st.state
+    assert st.meta["evicted"] == 1
+
+def test_enforce_max_bytes_per_key():
+    st = SessionStore({}, LIMITS)
+    st.put("big", np.zeros(100))
+    assert st.enforce() == []
+    st.put("big", pd.DataFrame({"x": np.zeros(10_000)}))
+    assert st.enforce() == ["big"]
+
+def test_session_cap_evicts_least_recent_evictable_only():
+    st = SessionStore({}, {"a": {"evict": True}, "b": {"evict": True}, "p": {"evict": False}}, max_bytes=250_000)
+    st.put("p", np.zeros(20_000))  # 160 KB, non rimovibile
+    st.put("a", np.zeros(10_000)); st.put("b", np.zeros(10_000))
+    st.meta["access"].update(a=1.0, b=2.0)
+    assert st.enforce(now=3.0) == ["a"]
+    assert sorted(k for k in st.state if not k.startswith("_")) == ["b", "p"]
+    s = st.stats()
+    assert [r["key"] for r in s["rows"]] == ["p", "b"] and s["managed_bytes"] <= s["max_bytes"]
+
+def test_entry_refs_materialize_from_current_table():
+    dfE = pd.DataFrame({"Pair": ["A", "B", "C"], "Price (USD)": [1.0, 2.0, 3.0], "Badge": ["x", "y", "z"],
+                        "Entry Grade": [3, 2, 1]})
+    refs = EntryRefs.from_frame(dfE, np.array(["ra", "rb", "rc"]), use_table=True)
+    assert len(refs) == 3 and set(refs.ann) == {"Badge", "Entry Grade"} and len(refs.head(2)) == 2
+    # tabella corrente: prezzi nuovi, "rb" uscita, ordine diverso
+    base = pd.DataFrame({"Pair": ["C", "A", "D"], "Price (USD)": [30.0, 10.0, 4.0]})
+    out = refs.materialize(base, row_lookup(np.array(["rc", "ra", "rd"])))
+    assert out["Pair"].tolist() == ["A", "C"] and out["Price (USD)"].tolist() == [10.0, 30.0]
+    assert out["Badge"].tolist() == ["x", "z"] and out["Entry Grade"].tolist() == [3, 1]
+
+def test_row_lookup_keeps_first_duplicate():
+    lk = row_lookup(np.array(["a", "b", "a"], dtype=object))
+    assert lk.to_dict() == {"a": 0, "b": 1}
@@ -0,0 +1,80 @@
+# tests/test_shared_snapshot.py
+# Formato colonnare della shared memory: round-trip di numeriche, stringhe con None, categorie; publisher/lettore
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import shared_snapshot as ss
+
+
+def _frame():
+    return pd.DataFrame({
+        "priceUsd": [1.5, np.nan, 3.0],
+        "txns1h": np.array([1, 2, 3], dtype=np.int64),
+        "liq": pd.array([10, None, 30], dtype="Int64"),
+        "flag": [True, False, True],
+        "pairAddress": ["a", None, "ç€"],
+        "mixed": ["x", 7, None],
+        "dexId": pd.Categorical(["raydium", "orca", "raydium"]),
+    })
+
+def _round_trip(df, meta=None):
+    size, write = ss.pack_frame(df, meta)
+    buf = bytearray(size)
+    write(buf)
+    return ss.unpack_frame(bytes(buf))
+
+
+def test_pack_unpack_round_trip():
+    out, meta = _round_trip(_frame(), {"ts": 12.5})
+    assert meta == {"ts": 12.5}
+    assert list(out.columns) == list(_frame().columns)
+    np.testing.assert_array_equal(out["priceUsd"], [1.5, np.nan, 3.0])
+    assert out["txns1h"].dtype == np.int64 and out["txns1h"].tolist() == [1, 2, 3]
+    assert out["liq"].dtype == np.float64 and np.isnan(out["liq"][1])  # nullable → float con NaN
+    assert out["flag"].dtype == bool and out["flag"].tolist() == [True, False, True]
+    assert out["pairAddress"].tolist()[0] == "a" and out["pairAddress"].tolist()[2] == "ç€"
+    assert pd.isna(out["pairAddress"][1])
+    assert out["mixed"].tolist()[:2] == ["x", "7"] and pd.isna(out["mixed"][2])
+    assert isinstance(out["dexId"].dtype, pd.CategoricalDtype)
+    assert out["dexId"].astype(str).tolist() == ["raydium", "orca", "raydium"]
+
+def test_numeric_columns_are_zero_copy_and_read_only():
+    size, write = ss.pack_frame(pd.DataFrame({"x": np.arange(5.0)}))
+    buf = bytearray(size)
+    write(buf)
+    ro = bytes(buf)
+    out, _ = ss.unpack_frame(ro)
+    arr = out["x"].to_numpy()
+    assert not arr.flags.writeable
+    assert np.shares_memory(arr, np.frombuffer(ro, np.uint8))
+
+def test_empty_frame_round_trip():
+    out, meta = _round_trip(pd.DataFrame({"a": pd.Series(dtype="float64"), "b": pd.Series(dtype=object)}))
+    assert len(out) == 0 and list(out.columns) == ["a", "b"] and meta == {}
+
+def test_is_stale():
+    assert ss.is_stale(None)
+    assert not ss.is_stale({"heartbeat": 100.0}, now=100.0 + ss.STALE_SEC)
+    assert ss.is_stale({"heartbeat": 100.0}, now=101.0 + ss.STALE_SEC)
+
+
+@pytest.mark.skipif(ss._posixshmem is None, reason="shared memory POSIX non disponibile")
+def test_publisher_reader_versions():
+    name = f"mrtest_{os.getpid()}"
+    pub = ss.SnapshotPublisher(name, keep=1)
+    try:
+        rd = ss.SharedSnapshotReader(name)
+        assert rd.snapshot()[2] == 0
+        assert pub.publish(_frame(), 10.0, {"sol": 200}) == 1
+        df, ts, v = rd.snapshot()
+        assert (v, ts, len(df)) == (1, 10.0, 3) and rd.header()["codes"] == {"sol": 200}
+        pub.publish(_frame().iloc[:1], 20.0)
+        df2, ts2, v2 = rd.snapshot()
+        assert (v2, ts2, len(df2)) == (2, 20.0, 1)
+        assert len(df) == 3 and df["priceUsd"][0] == 1.5  # la versione già mappata resta leggibile
+    finally:
+        pub.close()
+    assert ss.read_header(name) is None
@@ -0,0 +1,57 @@
+# tests/test_snapshot_files.py
+# Snapshot su file mappati: round-trip nel formato colonnare (e Arrow se c'è pyarrow), writer unico, retention
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import snapshot_files as sf
+from arrow_frames import HAS_ARROW
+
+
+def _frame(n=4):
+    return pd.DataFrame({"priceUsd": np.linspace(1.0, 2.0, n), "txns1h": np.arange(n, dtype=np.int64),
+                         "pairAddress": [f"p{i}" for i in range(n)]})
+
+FORMATS = ["columnar"] + (["arrow"] if HAS_ARROW else [])
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_write_read_frame_round_trip(tmp_path, fmt):
+    path = sf.write_frame(_frame(), str(tmp_path / "000000000001"), fmt)
+    assert path.endswith(sf._EXT[fmt]) and os.listdir(tmp_path) == [os.path.basename(path)]  # niente .tmp
+    df, lo, hi = sf._read_mapped(path)
+    assert df["priceUsd"].tolist() == _frame()["priceUsd"].tolist()
+    assert df["txns1h"].tolist() == [0, 1, 2, 3] and list(df["pairAddress"]) == ["p0", "p1", "p2", "p3"]
+    assert sf.private_columns(df, lo, hi) == []  # numeriche lette dal file mappato, senza copie
+    assert not df["priceUsd"].to_numpy().flags.writeable
+
+def test_private_columns_detects_copies(tmp_path):
+    df, lo, hi = sf._read_mapped(sf.write_frame(_frame(), str(tmp_path / "v"), "columnar"))
+    df = df.assign(priceUsd=df["priceUsd"] * 2)  # (assign può copiare anche le altre colonne)
+    assert "priceUsd" in sf.private_columns(df, lo, hi)
+
+def test_publisher_reader_versions_and_retention(tmp_path):
+    d = str(tmp_path / "snap")
+    pub = sf.FileSnapshotPublisher(d, keep=2, fmt="columnar")
+    try:
+        with pytest.raises(RuntimeError):
+            sf.FileSnapshotPublisher(d)  # un solo writer per directory (flock)
+        rd = sf.FileSnapshotReader(d)
+        assert rd.snapshot()[2] == 0
+        for i in range(1, 4):
+            assert pub.publish(_frame(i), float(i * 10), {"sol": 200}) == i
+        df, ts, v = rd.snapshot()
+        assert (v, ts, len(df)) == (3, 30.0, 3) and rd.header()["codes"] == {"sol": 200}
+        assert rd.private_columns == []
+        assert sorted(f for f in os.listdir(d) if f.endswith(".mrcol")) == ["000000000002.mrcol", "000000000003.mrcol"]
+    finally:
+        pub.close()
+    # il writer successivo riprende la numerazione e tiene solo il file corrente
+    pub = sf.FileSnapshotPublisher(d, keep=2, fmt="columnar")
+    try:
+        assert [f for f in os.listdir(d) if f.endswith(".mrcol")] == ["000000000003.mrcol"]
+        assert pub.publish(_frame(), 40.0) == 4
+    finally:
+        pub.close()
@@ -0,0 +1,66 @@
+# tests/test_snapshot_history.py
+# Storico snapshot: round-trip su file e lookup vettoriali del panel (riga precedente, orizzonte forward)
+import numpy as np
+import pandas as pd
+
+from snapshot_history import SnapshotPanel, list_history, load_snapshot, record_snapshot
+
+
+def _snap(pairs, px):
+    return {"pairAddress": np.array(pairs, dtype=str), "priceUsd": np.array(px, dtype="float64"),
+            "baseSymbol": np.array([p.upper() for p in pairs], dtype=str)}
+
+def _panel():
+    # A in tutti gli snapshot, B manca a t=120; ordine di input non cronologico
+    return SnapshotPanel.from_snapshots([
+        (120.0, _snap(["a"], [3.0])),
+        (0.0, _snap(["a", "b"], [1.0, 10.0])),
+        (60.0, _snap(["b", "a"], [20.0, 2.0])),
+        (180.0, _snap(["a", "b"], [4.0, 5.0])),
+    ])
+
+
+def test_record_and_load_round_trip(tmp_path):
+    df = pd.DataFrame({"pairAddress": ["x", "y"], "baseSymbol": ["X", None], "priceUsd": [1.5, "n/a"],
+                       "liquidityUsd": [1e4, 2e4]})
+    path = record_snapshot(df, 1_700_000_000.5, str(tmp_path))
+    assert list_history(str(tmp_path)) == [path]
+    ts, cols = load_snapshot(path)
+    assert ts == 1_700_000_000.5
+    assert cols["pairAddress"].tolist() == ["x", "y"] and cols["baseSymbol"].tolist() == ["X", ""]
+    assert cols["priceUsd"][0] == 1.5 and np.isnan(cols["priceUsd"][1])
+    assert record_snapshot(df.iloc[:0], 1.0, str(tmp_path)) is None
+    assert record_snapshot(df, 1.0, "") is None
+
+def test_list_history_window(tmp_path):
+    df = pd.DataFrame({"pairAddress": ["x"], "priceUsd": [1.0]})
+    paths = [record_snapshot(df, t, str(tmp_path)) for t in (300.0, 100.0, 200.0)]
+    assert list_history(str(tmp_path)) == [paths[1], paths[2], paths[0]]
+    assert list_history(str(tmp_path), since=150.0, until=250.0) == [paths[2]]
+
+def test_panel_sorted_by_pair_then_time():
+    p = _panel()
+    assert len(p) == 7 and p.times.tolist() == [0.0, 60.0, 120.0, 180.0]
+    assert p.pairs.tolist() == ["a", "b"] and p.symbols.tolist() == ["A", "B"]
+    assert p.p_idx.tolist() == [0, 0, 0, 0, 1, 1, 1]
+    assert p.ts.tolist() == [0.0, 60.0, 120.0, 180.0, 0.0, 60.0, 180.0]
+    assert p.cols["priceUsd"].tolist() == [1.0, 2.0, 3.0, 4.0, 10.0, 20.0, 5.0]
+    assert np.isnan(p.cols["liquidityUsd"]).all()  # campo assente: NaN
+
+def test_prev_index_requires_consecutive_snapshot():
+    # B a t=180 non ha riga nello snapshot precedente (t=120)
+    assert _panel().prev_index().tolist() == [-1, 0, 1, 2, -1, 4, -1]
+
+def test_forward_index_horizon_and_lag():
+    p = _panel()
+    assert p.forward_index(60).tolist() == [1, 2, 3, -1, 5, 6, -1]  # B: t=60 → t=180 entro lag 60
+    assert p.forward_index(60, max_lag_sec=0).tolist() == [1, 2, 3, -1, 5, -1, -1]
+    assert p.forward_index(120).tolist() == [2, 3, -1, -1, 6, 6, -1]
+    assert p.forward_index(1).tolist() == [-1] * 7  # lag di default = orizzonte
+    assert p.forward_index(1, max_lag_sec=120).tolist() == [1, 2, 3, -1, 5, 6, -1]
+
+def test_roi_from_first_positive_price():
+    p = SnapshotPanel.from_snapshots([(0.0, _snap(["a"], [0.0])), (60.0, _snap(["a"], [2.0])),
+                                      (120.0, _snap(["a"], [3.0]))])
+    roi = p.roi_pct()
+    assert np.isnan(roi[0]) and roi[1] == 0.0 and roi[2] == 50.0
@@ -0,0 +1,122 @@
+# tests/test_telegram_outbox.py
+# Outbox Telegram senza rete né worker: _drain/_tick chiamati a mano, sessione HTTP finta
+import time
+
+import pytest
+
+from telegram_outbox import TelegramOutbox
+
+
+class _Resp:
+    def __init__(self, status: int, body=None):
+        self.status_code = status
+        self.ok = 200 <= status < 300
+        self._body = body or {}
+
+    def json(self):
+        return self._body
+
+
+class _Session:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.posts = []
+
+    def post(self, url, timeout=None, data=None):
+        self.posts.append(data)
+        r = self.responses.pop(0) if self.responses else _Resp(200)
+        if isinstance(r, Exception): raise r
+        return r
+
+
+def _outbox(*responses, **kw) -> TelegramOutbox:
+    kw.setdefault("coalesce_window", 0.0)
+    kw.setdefault("per_chat_interval", 0.0)
+    kw.setdefault("global_interval", 0.0)
+    ob = TelegramOutbox(**kw)
+    ob._ensure_worker = lambda: None
+    ob._session = _Session(*responses)
+    return ob
+
+def _pump(ob: TelegramOutbox) -> None:
+    ob._drain(0.05)
+    ob._tick()
+
+
+def test_enqueue_dedups_within_cooldown():
+    ob = _outbox()
+    assert ob.enqueue("tok", "chat", "k1", "a", cooldown_sec=60)
+    assert not ob.enqueue("tok", "chat", "k1", "a di nuovo", cooldown_sec=60)
+    assert ob.enqueue("tok", "altra", "k1", "altra chat", cooldown_sec=60)
+    assert ob.is_cooling("chat", "k1") and not ob.is_cooling("chat", "k2")
+    st = ob.stats()
+    assert (st["enqueued"], st["deduped"], st["pending"]) == (2, 1, 2)
+
+def test_enqueue_needs_token_and_chat():
+    ob = _outbox()
+    assert not ob.enqueue("", "chat", "k", "x")
+    assert not ob.enqueue("tok", "", "k", "x")
+
+def test_signals_of_one_chat_are_coalesced_in_one_message():
+    ob = _outbox()
+    for i in range(3): ob.enqueue("tok", "chat", i, f"msg{i}")
+    _pump(ob)
+    assert len(ob._session.posts) == 1
+    assert ob._session.posts[0]["text"] == "msg0\n\nmsg1\n\nmsg2"
+    st = ob.stats()
+    assert (st["sent_msgs"], st["sent_signals"], st["pending"]) == (1, 3, 0)
+
+def test_batch_respects_max_batch_and_per_chat_interval():
+    ob = _outbox(max_batch=2, per_chat_interval=60.0)
+    for i in range(5): ob.enqueue("tok", "chat", i, f"msg{i}")
+    _pump(ob)
+    _pump(ob)  # stessa chat entro per_chat_interval: niente secondo invio
+    assert [p["text"] for p in ob._session.posts] == ["msg0\n\nmsg1"]
+    assert ob.stats()["pending"] == 3
+
+def test_young_batch_waits_for_coalesce_window():
+    ob = _outbox(coalesce_window=30.0)
+    ob.enqueue("tok", "chat", "k", "x")
+    _pump(ob)
+    assert ob._session.posts == [] and ob.stats()["pending"] == 1
+
+def test_429_retries_after_retry_after():
+    ob = _outbox(_Resp(429, {"parameters": {"retry_after": 7}}))
+    ob.enqueue("tok", "chat", "k", "x", cooldown_sec=60)
+    t0 = time.time()
+    _pump(ob)
+    st = ob.stats()
+    assert (st["retries"], st["sent_msgs"], st["pending"]) == (1, 0, 1)
+    m = ob._pending[("tok", "chat")][0]
+    assert m.attempts == 1 and m.not_before >= t0 + 7
+    _pump(ob)  # ancora in backoff
+    assert len(ob._session.posts) == 1
+    m.not_before = 0.0
+    _pump(ob)
+    st = ob.stats()
+    assert (st["sent_msgs"], st["pending"]) == (1, 0)
+
+@pytest.mark.parametrize("first", [_Resp(500), ConnectionError("rete giù")])
+def test_transient_errors_are_retried(first):
+    ob = _outbox(first)
+    ob.enqueue("tok", "chat", "k", "x")
+    _pump(ob)
+    assert ob.stats()["retries"] == 1 and ob.stats()["last_error"]
+
+def test_client_error_drops_and_releases_cooldown():
+    ob = _outbox(_Resp(403))
+    ob.enqueue("tok", "chat", "k", "x", cooldown_sec=600)
+    _pump(ob)
+    st = ob.stats()
+    assert (st["dropped"], st["pending"]) == (1, 0)
+    assert not ob.is_cooling("chat", "k")  # non inviato: il prossimo rerun può riaccodarlo
+    assert ob.enqueue("tok", "chat", "k", "x", cooldown_sec=600)
+
+def test_drop_after_max_attempts():
+    ob = _outbox(_Resp(500), _Resp(500), max_attempts=2)
+    ob.enqueue("tok", "chat", "k", "x")
+    _pump(ob)
+    ob._pending[("tok", "chat")][0].not_before = 0.0
+    _pump(ob)
+    st = ob.stats()
+    assert (st["retries"], st["dropped"], st["pending"]) == (1, 1, 0)
@@ -0,0 +1,77 @@
+# timing.py
+# Span di timing leggeri per stadio, con p50/p95 su finestra rolling
+# Condiviso da streamlit_app.py (stadi del rerun) e market_data.py (fasi del refresh provider)
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List
+
+
+def _percentile(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals: return 0.0
+    k = (len(sorted_vals) - 1) * q
+    lo = int(k); hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+
+class StageStats:
+    """
+    Campioni di durata (secondi) per stadio, ultimi `window` per stadio.
+    Thread-safe: il provider registra dal suo thread, l'app dai thread di rerun.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = max(10, int(window))
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            dq = self._samples.get(stage)
+            if dq is None:
+                dq = self._samples[stage] = deque(maxlen=self.window)
+            dq.append(float(seconds))
+            self._counts[stage] = self._counts.get(stage, 0) + 1
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            snap = {k: list(v) for k, v in self._samples.items()}
+            counts = dict(self._counts)
+        out = []
+        for stage in sorted(snap):
+            vals = snap[stage]
+            s = sorted(vals)
+            out.append({
+                "stage": stage, "n": counts.get(stage, len(vals)),
+                "last_ms": vals[-1] * 1e3 if vals else 0.0,
+                "p50_ms": _percentile(s, 0.50) * 1e3,
+                "p95_ms": _percentile(s, 0.95) * 1e3,
+            })
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear(); self._counts.clear()
+
+
+# Registro di processo (condiviso tra sessioni e thread provider)
+STATS = StageStats()
+span = STATS.span
+
+# Avvio a freddo del processo: primo valore per chiave (import dei moduli, primo rerun, import lazy)
+PROCESS_START = time.time()
+STARTUP: Dict[str, float] = {}
+
+def mark_startup(key: str, seconds: float) -> None:
+    STARTUP.setdefault(key, float(seconds))
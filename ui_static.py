@@ -0,0 +1,182 @@
+# ui_static.py
+# Tabelle costanti e helper puri di streamlit_app.py. Il top-level dell'app rigira a ogni rerun di ogni
+# sessione: qui stanno le parti che non dipendono dallo stato, costruite una volta per processo all'import.
+# Anche gli import pesanti usati solo da alcune viste (plotly.express) passano da qui, caricati al primo uso.
+# Requisiti: requests (streamlit solo per pairs_column_config)
+
+import copy, time, importlib, threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from market_data import UA_HEADERS
+from timing import mark_startup
+
+
+# ================= Import lazy =================
+class _LazyModule:
+    """Modulo importato al primo accesso a un attributo; il tempo d'import finisce nelle metriche di avvio."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._mod = None
+
+    def __getattr__(self, attr: str):
+        if self._mod is None:
+            t0 = time.perf_counter()
+            self._mod = importlib.import_module(self._name)
+            mark_startup(f"lazy:{self._name}", time.perf_counter() - t0)
+        return getattr(self._mod, attr)
+
+    @property
+    def loaded(self) -> bool:
+        return self._mod is not None
+
+def lazy_module(name: str) -> _LazyModule:
+    return _LazyModule(name)
+
+px = lazy_module("plotly.express")
+
+
+# ================= HTTP =================
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def http_session() -> requests.Session:
+    """Sessione HTTP di processo (pool di connessioni riusato tra rerun e sessioni)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update(UA_HEADERS)
+        return _session
+
+
+# ================= Tabelle UI =================
+TAB_LABELS = ["📡 Radar", "🏆 Winners Now", "📈 Equity Curve", "🎯 Entry Finder", "🧪 Paper Trading"]
+HEAT_TONE = {"ON FIRE": "🟢", "MEDIO": "🟡", "FIACCO": "🔴", "N/D": "⚪️"}
+
+# Tabella PAIRS completa: etichetta -> (colonna, ascending); None = ordine della tabella (Meme Score)
+PAIRS_SORT = {
+    "Ordine tabella": (None, False), "Volume 24h ↓": ("Volume 24h (USD)", False), "Txns 1h ↓": ("Txns 1h", False),
+    "Liquidity ↓": ("Liquidity (USD)", False), "ROI ↓": ("ROI (%)", False), "Change 1h ↓": ("Change 1h (%)", False),
+    "Più recenti": ("PairAgeHours", True), "Pair A→Z": ("Pair", True),
+}
+PAIRS_PAGE_SIZES = (25, 50, 100, 200)
+PAIRS_DISPLAY_COLS = ("Pair", "DEX", "Meme Score", "Price (USD)",
+                      "ROI (%)", "ATH (%)", "Drawdown (%)",
+                      "Change 1h (%)", "Change 4h/6h (%)", "Change 24h (%)",
+                      "Txns 1h", "Liquidity (USD)", "Volume 24h (USD)", "Pair Age", "Link")
+# colonna -> (tipo st.column_config, kwargs)
+PAIRS_COLUMN_SPECS = {
+    "Select": ("CheckboxColumn", {"help": "Spunta per aprire il pannello drill-down"}),
+    "Link": ("LinkColumn", {"label": "Link"}),
+    "Liquidity (USD)": ("NumberColumn", {"format": "%,d"}),
+    "Volume 24h (USD)": ("NumberColumn", {"format": "%,d"}),
+    "Meme Score": ("NumberColumn", {"help": "0–100"}),
+    "Price (USD)": ("NumberColumn", {"format": "%.8f"}),
+    **{c: ("NumberColumn", {"format": "%.2f"}) for c in ("ROI (%)", "ATH (%)", "Drawdown (%)", "Change 1h (%)",
+                                                          "Change 4h/6h (%)", "Change 24h (%)")},
+}
+WINNERS_COLS = ["Pair", "DEX", "Price (USD)", "ROI (%)", "ATH (%)", "Drawdown (%)", "Change 1h (%)", "Liquidity (USD)",
+                "Volume 24h (USD)", "Pair Age", "Link"]
+ENTRY_DISPLAY_COLS = ("Badge", "Entry Grade", "Pair", "DEX", "Meme Score", "Price (USD)", "Txns 1h",
+                      "Liquidity (USD)", "Volume 24h (USD)",
+                      "Change 1h (%)", "Change 4h/6h (%)", "Change 24h (%)",
+                      "ROI (%)", "ATH (%)", "Drawdown (%)",
+                      "Pair Age", "Link", "Reasons")
+# ordinamento candidati Paper Trading: prefisso della modalità -> (colonne, ascending)
+PT_SORTS = {
+    "Entry": (["Entry Grade", "Meme Score", "Txns 1h"], [False, False, False]),
+    "Momentum": (["Change 1h (%)", "Entry Grade", "Meme Score"], [False, False, False]),
+    "Freschezza": (["PairAgeHours", "Entry Grade", "Meme Score"], [True, False, False]),
+}
+POSITION_COLS = ["id", "pair", "entry_px", "last_px", "peak_px", "alloc", "value", "pnl", "pnl_pct", "dd_from_peak_pct",
+                 "trail_pct", "stop_pct", "opened_ts", "link"]
+# parametri Entry Finder della sessione quando la vista non è mai stata aperta (alert "entry")
+EF_DEFAULTS = dict(ms_min=60, tx_min=150, liq_min=0, liq_max=0, age_min_m=0, age_max_m=360, vol_min=0, vol_max=0,
+                   ch1_min=-3, ch1_max=25, cap_24h=150, trend_pos=True, allow_missing_ch1=True, allow_missing_h4=True,
+                   survivor=False, targetN=10, auto_relax=True)
+STAGE_MS_COLS = ("Ultimo (ms)", "p50 (ms)", "p95 (ms)")
+EF_SOURCES = ("Usa tabella filtrata (PAIRS)", "Ignora PAIRS (universo grezzo)")
+EF_SORT_MODES = ("Momentum (1h %)", "Qualità (Meme Score)", "Freschezza (Age)")
+# Widget delle viste lazy (tabella PAIRS, Equity, Entry Finder, backtest) -> valore iniziale. Streamlit scarta lo
+# stato dei widget non renderizzati nel rerun: l'app semina e riassegna solo queste chiavi a ogni rerun, e i
+# widget non passano value=/index= (il valore arriva dalla chiave, senza l'avviso "default + Session State API")
+LAZY_WIDGET_DEFAULTS = {
+    "pairs_query": "", "pairs_sort": next(iter(PAIRS_SORT)), "pairs_page_size": PAIRS_PAGE_SIZES[1], "pairs_page": 1,
+    "eq_enabled_tab": True, "eq_topN_tab": 10, "eq_init_tab": 1000.0,
+    "ef_source": EF_SOURCES[0], "ef_sort_mode": EF_SORT_MODES[0], "ef_topN_show": 25,
+    **{f"ef_{k}": v for k, v in EF_DEFAULTS.items()},
+    "bt_preset": "auto", "bt_trail": 15.0, "bt_stop": 25.0, "bt_hold": 1440, "bt_open": 0, "bt_alloc": 2.0,
+}
+
+@lru_cache(maxsize=1)
+def _pairs_column_config() -> Dict[str, Any]:
+    import streamlit as st
+    return {c: getattr(st.column_config, kind)(**kw) for c, (kind, kw) in PAIRS_COLUMN_SPECS.items()}
+
+def pairs_column_config() -> Dict[str, Any]:
+    """column_config della tabella PAIRS: costruita una volta, copiata perché Streamlit può aggiornarla."""
+    return copy.deepcopy(_pairs_column_config())
+
+
+# ================= Drill-down: social & domini =================
+SOCIAL_LABELS = (("website", "Website"), ("twitter", "X / Twitter"), ("telegram", "Telegram"),
+                 ("discord", "Discord"), ("github", "GitHub"), ("medium", "Medium"),
+                 ("coingecko", "CoinGecko"), ("cmc", "CoinMarketCap"), ("other", "Altro"))
+HUB_DOMAINS = frozenset({"linktr.ee", "links.linktr.ee", "beacons.ai", "linkin.bio"})
+SUSPICIOUS_DOMAINS = frozenset({"forms.gle", "docs.google.com", "site.google.com", "notion.so", "notion.site",
+                                "pastebin.com", "pastelink.net"})
+
+def hostname(url: str) -> str:
+    from urllib.parse import urlparse  # solo nel drill-down
+    try: return urlparse(url).hostname or ""
+    except Exception: return ""
+
+def domain_in(domains, url: str) -> bool:
+    host = hostname(url).lower()
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+def collect_socials(info: dict) -> dict:
+    if not isinstance(info, dict): return {}
+    links = {}
+    webs = info.get("websites")
+    if isinstance(webs, list):
+        for w in webs:
+            url = w.get("url") if isinstance(w, dict) else (w if isinstance(w, str) else None)
+            if url and "http" in url: links.setdefault("website", url)
+    socs = info.get("socials")
+    if isinstance(socs, list):
+        for s in socs:
+            if isinstance(s, dict):
+                typ = (s.get("type") or s.get("name") or "").lower()
+                url = s.get("url") or s.get("link")
+            elif isinstance(s, str):
+                typ = ""; url = s
+            else:
+                continue
+            if not (url and "http" in url): continue
+            if "twitter" in typ or typ == "x" or "x.com" in url: links.setdefault("twitter", url)
+            elif "telegram" in typ or "t.me" in url: links.setdefault("telegram", url)
+            elif "discord" in typ: links.setdefault("discord", url)
+            elif "github" in typ: links.setdefault("github", url)
+            elif "medium" in typ: links.setdefault("medium", url)
+            elif "coingecko" in typ: links.setdefault("coingecko", url)
+            elif "coinmarketcap" in typ or "cmc" in typ: links.setdefault("cmc", url)
+            else: links.setdefault("other", url)
+    return links
+
+def linkset_status(social_links: dict) -> Tuple[str, List[str]]:
+    """("strong" | "weak" | "suspicious", motivi) per il set di link del token."""
+    status = "weak"; reasons = []
+    if set(social_links) == {"other"}:
+        return "suspicious", ["Solo link 'other'."]
+    if "website" in social_links and domain_in(HUB_DOMAINS, social_links["website"]):
+        reasons.append("Website è un link-hub (es. linktr.ee).")
+    if any(domain_in(SUSPICIOUS_DOMAINS, u) for u in social_links.values()):
+        reasons.append("Domini sospetti tra i link.")
+    if ("website" in social_links) and (("twitter" in social_links) or ("telegram" in social_links)) and not reasons:
+        status = "strong"
+    return status, reasons